@@ -14,7 +14,7 @@ Variáveis necessárias:
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Dict
 import os
 
 
@@ -33,15 +33,21 @@ class Settings(BaseSettings):
     
     # LangChain / RAG
     EMBEDDING_MODEL: str = "models/embedding-001"  # Gemini embedding model
-    LLM_MODEL: str = "gemini-pro"  # Modelo Gemini para geração
+    LLM_MODEL: str = "gemini-2.5-flash"  # Modelo Gemini para geração (mesmo do rag_manager)
     
     # Configurações de texto
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    DEDUP_THRESHOLD: float = 0.85  # Jaccard para descartar chunks quase duplicados (0 desativa)
     
     # Scraping
     SCRAPER_TIMEOUT: int = 10
+    SCRAPER_CONNECT_TIMEOUT: float = 5.0
+    SCRAPER_HOST_TIMEOUTS: Dict[str, float] = {}  # timeout por host ({"consultas.anvisa.gov.br": 20})
     SCRAPER_USER_AGENT: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    SCRAPER_MAX_CONNECTIONS: int = 20  # pool compartilhado por todas as requisições
+    SCRAPER_PER_HOST_LIMIT: int = 4    # requisições simultâneas por host
+    SCRAPER_CACHE_PATH: str = "./data/http_cache.db"  # cache HTTP em disco ("" desativa)
     
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
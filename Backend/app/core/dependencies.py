@@ -27,6 +27,17 @@ def get_chroma_dependency():
     return get_chroma_client()
 
 
+@lru_cache()
+def get_vector_service():
+    """
+    Retorna a instância do VectorService (singleton): embeddings e índice
+    carregados uma vez para a busca local e o write-through de bulas da web.
+    """
+    # Import tardio: carregar o modelo de embeddings só quando for usado
+    from app.services.vector_service import VectorService
+    return VectorService()
+
+
 # Outras dependências podem ser adicionadas aqui:
 # - get_google_client()
 # - get_llm_instance()
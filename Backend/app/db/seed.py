@@ -4,14 +4,16 @@
 Este script é executado para popular o ChromaDB com bulas iniciais.
 Pode ser executado manualmente ou como parte do setup.
 
-IMPLEMENTAÇÃO NECESSÁRIA:
-- Ler PDFs de bulas de um diretório
-- Processar via vector_service
-- Armazenar no ChromaDB
+- Lê os PDFs de bulas de um diretório (um medicamento por PDF)
+- Opcionalmente, o guia de medicamentos completo (um documento por verbete)
+- Processa via vector_service em streaming, sem arquivos intermediários
+- Grava numa versão nova do índice, publicada só depois do smoke check
+- Exporta o snapshot do índice lido pela API (ver app/db/snapshot.py)
 """
 
 import asyncio
 from pathlib import Path
+from typing import Optional
 from app.services.vector_service import VectorService
 from app.core.config import settings
 from app.core.logger import setup_logger
@@ -19,16 +21,32 @@ from app.core.logger import setup_logger
 logger = setup_logger()
 
 
-async def seed_database(bulas_directory: str = "./data/bulas"):
+# Guia de medicamentos (origem dos arquivos de app/batches)
+GUIDE_PDF = Path(__file__).resolve().parent.parent / "modules" / "guia-medicamentos.pdf"
+
+
+async def seed_database(bulas_directory: str = "./data/bulas", guide_pdf: Optional[str] = None):
     """
-    🔹 IMPLEMENTAR: Popula o ChromaDB com bulas iniciais.
+    Popula o ChromaDB com bulas iniciais.
     
     Args:
         bulas_directory: Diretório contendo PDFs de bulas
+        guide_pdf: PDF do guia de medicamentos, ingerido verbete a verbete
     """
     logger.info("Iniciando seed do banco de dados...")
     
     try:
+        if guide_pdf:
+            vector_service = VectorService()
+            vector_service.begin_build()
+            logger.info(f"Processando guia de medicamentos: {guide_pdf}")
+            await vector_service.process_pdf(guide_pdf)
+            logger.info(f"Guia processado: {vector_service.last_report['files']} verbetes, "
+                        f"{vector_service.last_report['chunks']} chunks.")
+            vector_service.publish_build()
+            vector_service.export_snapshot()
+            return
+        
         # Verificar se diretório existe
         bulas_path = Path(bulas_directory)
         if not bulas_path.exists():
@@ -41,20 +59,22 @@ async def seed_database(bulas_directory: str = "./data/bulas"):
         # Inicializar serviço de vetorização
         vector_service = VectorService()
         
-        # TODO: Processar todos os PDFs do diretório
-        # pdf_files = list(bulas_path.glob("*.pdf"))
-        # 
-        # if not pdf_files:
-        #     logger.warning("Nenhum PDF encontrado no diretório.")
-        #     return
-        # 
-        # logger.info(f"Encontrados {len(pdf_files)} arquivos PDF")
-        # 
-        # for pdf_file in pdf_files:
-        #     medication_name = pdf_file.stem
-        #     logger.info(f"Processando: {medication_name}")
-        #     await vector_service.process_pdf(str(pdf_file), medication_name)
+        pdf_files = sorted(bulas_path.glob("*.pdf"))
+        
+        if not pdf_files:
+            logger.warning("Nenhum PDF encontrado no diretório.")
+            return
+        
+        logger.info(f"Encontrados {len(pdf_files)} arquivos PDF")
+        vector_service.begin_build()
+        
+        for pdf_file in pdf_files:
+            medication_name = pdf_file.stem
+            logger.info(f"Processando: {medication_name}")
+            await vector_service.process_pdf(str(pdf_file), medication_name)
         
+        vector_service.publish_build()
+        vector_service.export_snapshot()
         logger.info("Seed concluído com sucesso!")
         
     except Exception as e:
@@ -65,7 +85,9 @@ async def seed_database(bulas_directory: str = "./data/bulas"):
 if __name__ == "__main__":
     """
     Executar seed manualmente:
-    python -m app.db.seed
+    python -m app.db.seed            (PDFs de ./data/bulas)
+    python -m app.db.seed --guia     (guia de medicamentos completo)
     """
-    asyncio.run(seed_database())
+    import sys
+    asyncio.run(seed_database(guide_pdf=str(GUIDE_PDF) if "--guia" in sys.argv else None))
 
@@ -0,0 +1,65 @@
+"""
+🔹 SNAPSHOT DO ÍNDICE - Exportar e validar o artefato de deploy
+
+Exporta a coleção do ChromaDB e o catálogo de verbetes num único arquivo
+versionado e com checksum (ver modules/index_snapshot). A API abre esse
+arquivo via mmap na inicialização, sem carregar o ChromaDB.
+
+Executar a partir da pasta Backend:
+    python -m app.db.snapshot export [caminho]
+    python -m app.db.snapshot verify [caminho]
+"""
+
+import sys
+import json
+from app.modules.index_snapshot import verify_snapshot, SnapshotError, SNAPSHOT_PATH
+from app.core.logger import setup_logger
+
+logger = setup_logger()
+
+
+def export(path: str = SNAPSHOT_PATH) -> dict:
+    """
+    Gera o snapshot a partir do ChromaDB local.
+
+    Args:
+        path: Arquivo de destino
+
+    Returns:
+        Cabeçalho do snapshot gravado
+    """
+    from app.services.vector_service import VectorService
+    return VectorService().export_snapshot(path)
+
+
+def verify(path: str = SNAPSHOT_PATH) -> bool:
+    """
+    Confere formato e checksum de um snapshot (ex.: antes do deploy).
+
+    Args:
+        path: Arquivo a validar
+
+    Returns:
+        True se o snapshot é válido
+    """
+    try:
+        header = verify_snapshot(path)
+    except (SnapshotError, OSError) as e:
+        logger.error(f"Snapshot inválido: {e}")
+        return False
+    logger.info(f"Snapshot válido: {header['count']} chunks, modelo {header['model']}, "
+                f"gerado em {header['created_at']}, sha256 {header['sha256'][:12]}...")
+    return True
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    target = sys.argv[2] if len(sys.argv) > 2 else SNAPSHOT_PATH
+    if command == "export":
+        header = export(target)
+        print(json.dumps({key: header[key] for key in ("count", "dim", "size_mb", "sha256", "elapsed_sec")}))
+    elif command == "verify":
+        sys.exit(0 if verify(target) else 1)
+    else:
+        print(__doc__)
+        sys.exit(2)
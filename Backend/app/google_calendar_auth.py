@@ -2,7 +2,7 @@ import os
 import pickle
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from modules.calendar_client import build_calendar_service
 
 # Escopo: Permissão total de leitura/escrita na agenda
 SCOPES = ['https://www.googleapis.com/auth/calendar']
@@ -43,7 +43,7 @@ def get_calendar_service():
 
     # Constrói o objeto de serviço
     try:
-        service = build('calendar', 'v3', credentials=creds)
+        service = build_calendar_service(creds)
         return service
     except Exception as e:
         print(f"Erro ao construir o serviço do Google Calendar: {e}")
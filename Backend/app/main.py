@@ -1,24 +1,38 @@
 import os
+import sys
+import json
 import pickle
+import asyncio
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Body, Depends, Request
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, HTTPException, Body, Depends, Request, Header
+from fastapi.responses import RedirectResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
+from datetime import timedelta
 from contextlib import asynccontextmanager
 
 # LangChain & Google
 from langchain_google_genai import ChatGoogleGenerativeAI
-from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import Flow  # <--- [IMPORTANTE] Para o fluxo Web
 
 # NOSSOS MÓDULOS
-from google_calendar_auth import get_calendar_service
-from modules.rag_manager import RAGManager
+from modules.rag_manager import RAGManager, RagQueryResponse
+from modules.responses import ORJSONResponse, CompressionMiddleware
+from modules.metrics import MetricsMiddleware, record_cache, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from modules.token_store import (TokenStore, CalendarServiceCache, refresh_tokens_periodically, google_user_id,
+                                 DEFAULT_USER_ID)
+from modules.session import SessionSigner, SESSION_COOKIE, SESSION_MAX_AGE_SEC
+from modules.idempotency import IdempotencyStore, IdempotencyConflict, request_fingerprint, IDEMPOTENCY_HEADER
+from modules.outbox import Outbox
+from modules.job_queue import JobStore, JobManager, job_progress, FINAL_STATES
+from modules.treatment_store import TreatmentStore, CANCELLED
+from modules.treatment_index import TreatmentIndex
 from modules.intent_classifier import classify_intent, IntentResponse
 import modules.calendar_manager as calendar
+from modules.dose_timeline import dose_instants, rebase_start
+import modules.consolidation as consolidation
 
 # Carregar .env
 env_path = os.path.join(os.path.dirname(__file__), ".env")
@@ -32,13 +46,52 @@ if not GOOGLE_API_KEY:
 # Se seu React roda na 3000, mude para 3000. Se for 5173 (Vite), mantenha.
 FRONTEND_URL = "http://localhost:5173/chat"
 BACKEND_REDIRECT_URI = "http://127.0.0.1:8000/auth/callback"
-SCOPES = ['https://www.googleapis.com/auth/calendar']
+SCOPES = ['openid', 'https://www.googleapis.com/auth/calendar']
 CREDENTIALS_FILE = 'credentials.json'
+# Origens do frontend autorizadas a chamar a API com a sessão (separadas por vírgula)
+CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173").split(",")
+# Instalação local de um único usuário: requisições sem sessão usam o usuário padrão
+SINGLE_USER_MODE = os.getenv("SINGLE_USER_MODE", "0") == "1"
+# Mutações do Calendar passam pelo outbox local (resposta não espera o Google)
+CALENDAR_OUTBOX = os.getenv("CALENDAR_OUTBOX", "1") == "1"
+
+# Fallback web do RAG: tempo máximo da busca da bula nos sites
+RAG_WEB_TIMEOUT_SEC = float(os.getenv("RAG_WEB_TIMEOUT_SEC", "20"))
+# Os serviços de app/services (scraper, write-through) usam imports 'app.*'
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Estado global da aplicação
 app_state: Dict[str, Any] = {}
 
 
+def build_web_fallback(loop: asyncio.AbstractEventLoop) -> Optional[Callable[[str], Optional[str]]]:
+    """
+    Fallback web do RAGManager: busca a bula nos sites (ScraperService) e agenda
+    a vetorização no índice local (web_ingestion). RAGManager.query roda numa
+    thread; o scraping assíncrono roda no event loop da API. None se os
+    serviços não puderem ser carregados.
+    """
+    if BACKEND_DIR not in sys.path:
+        sys.path.append(BACKEND_DIR)
+    try:
+        from app.services.web_ingestion import fetch_and_ingest
+    except Exception as e:
+        print(f"⚠️ Fallback web do RAG desativado: {e}")
+        return None
+
+    def fetch(medication_name: str) -> Optional[str]:
+        future = asyncio.run_coroutine_threadsafe(fetch_and_ingest(medication_name), loop)
+        try:
+            best = future.result(timeout=RAG_WEB_TIMEOUT_SEC)
+        except TimeoutError:
+            future.cancel()
+            print(f"[RAG AVISO] Busca na web de '{medication_name}' passou de {RAG_WEB_TIMEOUT_SEC}s.")
+            return None
+        return best["content"] if best else None
+
+    return fetch
+
+
 # --- Gerenciamento do Ciclo de Vida ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -55,24 +108,61 @@ async def lifespan(app: FastAPI):
 
     # 2. RAG Manager
     print("[INIT] Carregando RAG Manager...")
-    app_state["rag_manager"] = RAGManager(google_api_key=GOOGLE_API_KEY)
+    app_state["rag_manager"] = RAGManager(google_api_key=GOOGLE_API_KEY,
+                                          web_fallback=build_web_fallback(asyncio.get_running_loop()))
+
+    # 3. Calendar: sessões assinadas, tokens por usuário (SQLite criptografado) + cache LRU de serviços
+    print("[INIT] Carregando armazenamento de tokens do Calendar...")
+    app_state["sessions"] = SessionSigner()
+    token_store = TokenStore()
+    service_cache = CalendarServiceCache(token_store)
+    app_state["calendar_services"] = service_cache
 
-    # 3. Calendar Service
-    # Tenta carregar se já existir token salvo, senão inicia como None
-    print("[INIT] Verificando autenticação do Calendar...")
+    # Migra o token.pickle antigo (usuário único) para o usuário padrão (acessível só com SINGLE_USER_MODE=1)
     if os.path.exists('token.pickle'):
         try:
-            app_state["calendar_service"] = get_calendar_service()  # Tenta carregar do pickle existente
-            print("✅ Calendar autenticado via token salvo.")
-        except:
-            app_state["calendar_service"] = None
-            print("⚠️ Token inválido ou expirado. Login necessário.")
-    else:
-        app_state["calendar_service"] = None
-        print("⚠️ Nenhum token encontrado. Login necessário.")
+            with open('token.pickle', 'rb') as token:
+                service_cache.set_credentials(DEFAULT_USER_ID, pickle.load(token))
+            os.remove('token.pickle')
+            print("✅ token.pickle migrado para o armazenamento de tokens.")
+        except Exception as e:
+            print(f"⚠️ Falha ao migrar token.pickle: {e}")
+
+    refresher = asyncio.create_task(refresh_tokens_periodically(service_cache))
+
+    # 4. Respostas salvas por Idempotency-Key (retries do frontend)
+    app_state["idempotency"] = IdempotencyStore()
+    app_state["idempotency"].purge_expired()
+
+    # 5. Outbox: journal local das mutações, sincronizado em batches por um worker
+    outbox = Outbox()
+    outbox.start(service_provider=service_cache.get)
+    app_state["outbox"] = outbox if CALENDAR_OUTBOX else None
+    app_state["outbox_journal"] = outbox  # sempre ativo: os jobs também o usam
+
+    # 6. Fila de jobs de agendamento em background (retoma os interrompidos)
+    job_store = JobStore()
+    app_state["jobs"] = JobManager(job_store, service_provider=service_cache.get, outbox=outbox)
+    resumed = app_state["jobs"].resume_pending()
+    if resumed:
+        print(f"[INIT] {resumed} job(s) de agendamento retomado(s).")
+
+    # 7. Registro local dos tratamentos (e dos eventos consolidados) + índice em memória
+    app_state["treatments"] = TreatmentStore()
+    app_state["treatment_index"] = TreatmentIndex(app_state["treatments"])
 
     yield
     print("--- 🛑 Encerrando API ---")
+    refresher.cancel()
+    token_store.close()
+    app_state["idempotency"].close()
+    app_state["jobs"].shutdown()
+    job_store.close()
+    outbox.stop()
+    app_state["treatments"].close()
+    scraper = sys.modules.get("app.services.scraper_service")
+    if scraper is not None:
+        await scraper.close_http_client()
     app_state.clear()
 
 
@@ -85,32 +175,94 @@ def get_rag_manager():
     return app_state["rag_manager"]
 
 
-def get_calendar_service_dep():
+def get_session_user(request: Request) -> Optional[str]:
+    # Sessão assinada no login: Authorization: Bearer (frontend/API) ou cookie (navegador)
+    sessions = app_state["sessions"]
+    authorization = request.headers.get("Authorization", "")
+    for token in (authorization[7:] if authorization.startswith("Bearer ") else None,
+                  request.cookies.get(SESSION_COOKIE)):
+        user_id = sessions.verify(token) if token else None
+        if user_id:
+            return user_id
+    return DEFAULT_USER_ID if SINGLE_USER_MODE else None
+
+
+def get_user_id(user_id: Optional[str] = Depends(get_session_user)) -> str:
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Sessão ausente ou inválida. Faça login em /auth/login")
+    return user_id
+
+
+def get_calendar_service_dep(user_id: str = Depends(get_user_id)):
+    try:
+        service = app_state["calendar_services"].get(user_id)
+    except Exception as e:
+        print(f"[AUTH ERROR] Falha ao carregar credenciais de '{user_id}': {e}")
+        service = None
     # Se não estiver logado, lança erro para o front saber
-    if not app_state.get("calendar_service"):
+    if not service:
         raise HTTPException(status_code=401, detail="Google Calendar não autenticado. Faça login em /auth/login")
-    return app_state["calendar_service"]
+    return service
+
+
+def run_idempotent(user_id: str, scope: str, key: Optional[str], payload, operation: Callable[[], Any]):
+    """
+    Executa a operação uma única vez por Idempotency-Key. Um retry com a mesma
+    chave recebe a resposta salva; erros não são salvos, para permitir nova tentativa.
+    """
+    if not key:
+        return operation()
+
+    store = app_state["idempotency"]
+    fingerprint = request_fingerprint(payload)
+    try:
+        saved = store.get(user_id, scope, key, fingerprint)
+    except IdempotencyConflict:
+        raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} já usada com outra requisição.")
+    record_cache("idempotency", hits=int(saved is not None), misses=int(saved is None))
+    if saved is not None:
+        print(f"[Idempotency] Repetição de '{scope}' com chave {key}; devolvendo resposta salva.")
+        return saved
+
+    if not store.begin(user_id, scope, key):
+        raise HTTPException(status_code=409, detail="Requisição com esta chave ainda em andamento.")
+    try:
+        result = operation()
+        if not (isinstance(result, dict) and "error" in result):
+            store.save(user_id, scope, key, fingerprint, result)
+        return result
+    finally:
+        store.end(user_id, scope, key)
 
 
 app = FastAPI(
     title="Assistente de Medicação API",
     description="API modular com RAG e Google Calendar.",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson em vez do json padrão em todas as respostas
+    default_response_class=ORJSONResponse
 )
 
+# brotli/gzip acima de COMPRESSION_MIN_SIZE (listas de eventos e doses ficam 9-25x menores)
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    # Origens explícitas: com credenciais, o navegador recusa "*"
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Por último = mais externo: a duração medida inclui compressão e CORS
+app.add_middleware(MetricsMiddleware)
 
 
 # --- Modelos Pydantic ---
 class RagQueryRequest(BaseModel):
     original_query: str
     topic: str
+    medicamento: Optional[str] = None  # do classificador de intenção; habilita a busca na web
 
 
 class ChatQuery(BaseModel):
@@ -120,6 +272,20 @@ class ChatQuery(BaseModel):
 class ScheduleRequest(BaseModel):
     instrucao: str
     start_time_str: str
+    # Modo consolidado: doses próximas de outros tratamentos viram um único evento
+    consolidar: bool = False
+    janela_minutos: int = Field(consolidation.CONSOLIDATION_WINDOW_MIN, ge=1, le=180)
+
+
+class PreviewRequest(BaseModel):
+    instrucao: Optional[str] = None
+    start_time_str: str
+    # Se vierem preenchidos, dispensam o parse da instrução pelo LLM
+    medicamento: Optional[str] = None
+    intervalo_horas: Optional[int] = Field(None, gt=0)
+    duracao_dias: Optional[int] = Field(None, gt=0)
+    page: int = Field(1, ge=1)
+    page_size: int = Field(50, ge=1, le=500)
 
 
 class DeleteRequest(BaseModel):
@@ -137,42 +303,273 @@ async def handle_chat_query(query: ChatQuery, llm: ChatGoogleGenerativeAI = Depe
     return classify_intent(query.query, llm)
 
 
-@app.post("/v1/rag/query")
+@app.post("/v1/rag/query", response_model=RagQueryResponse)
 async def post_rag_query(request: RagQueryRequest, rag_manager: RAGManager = Depends(get_rag_manager)):
-    result = rag_manager.query(request.original_query, request.topic)
+    # Recuperação e LLM bloqueiam (e o fallback web usa o event loop): roda em thread
+    result = await asyncio.to_thread(rag_manager.query, request.original_query, request.topic, request.medicamento)
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
     return result
 
 
 @app.post("/v1/calendar/schedule")
-async def schedule_treatment(request: ScheduleRequest, llm=Depends(get_llm), service=Depends(get_calendar_service_dep)):
-    details = calendar.parse_instruction(request.instrucao, llm)
-    if not details: raise HTTPException(status_code=400, detail="Erro no parse.")
+async def schedule_treatment(request: ScheduleRequest, background: bool = False,
+                             llm=Depends(get_llm), service=Depends(get_calendar_service_dep),
+                             user_id: str = Depends(get_user_id),
+                             idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)):
+    """
+    Agenda o tratamento. Com ?background=true responde 202 com um job_id e as
+    doses são criadas por um worker (progresso em /v1/calendar/jobs/{job_id}).
+    Com consolidar=true as doses são agrupadas com as de outros tratamentos
+    ativos (sempre na própria requisição: são poucas escritas por evento).
+    """
+    background = background and not request.consolidar
+
+    def operation():
+        details = calendar.parse_instruction(request.instrucao, llm)
+        if not details: raise HTTPException(status_code=400, detail="Erro no parse.")
+
+        start_time = calendar.get_start_time_from_string(request.start_time_str)
+        if not start_time: raise HTTPException(status_code=400, detail="Data inválida.")
+
+        # Avisos (duplicidade, sobreposição, interação) vêm do índice local, sem listar o Google
+        index = app_state["treatment_index"]
+        avisos = index.check(user_id, details, start_time, start_time + timedelta(days=int(details["duracao_dias"])))
+
+        # Com chave, o treatment_id (e os IDs das doses) se repetem num retry
+        treatment_id = calendar.new_treatment_id(f"{user_id}:{idempotency_key}" if idempotency_key else None)
+        if request.consolidar:
+            result = consolidation.schedule_consolidated(service, app_state["treatments"], user_id, details,
+                                                         start_time, treatment_id, request.janela_minutos,
+                                                         app_state["outbox"])
+            return {**result, "avisos": avisos}
+        app_state["treatments"].add_treatment(user_id, treatment_id, details, start_time)
+        if background:
+            return {**app_state["jobs"].submit(user_id, treatment_id, details, start_time), "avisos": avisos}
+        try:
+            result = calendar.create_calendar_events(service, details, start_time, treatment_id,
+                                                     app_state["outbox"], user_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        return {**result, "avisos": avisos}
+
+    scope = "schedule_background" if background else "schedule"
+    result = run_idempotent(user_id, scope, idempotency_key, request.model_dump(), operation)
+    app_state["treatment_index"].invalidate(user_id)
+    if background:
+        return ORJSONResponse(status_code=202, content=result)
+    return result
+
+
+@app.post("/v1/calendar/preview")
+async def preview_treatment(request: PreviewRequest, llm=Depends(get_llm),
+                            user_id: Optional[str] = Depends(get_session_user)):
+    """
+    Mostra (paginado) os horários das doses que seriam agendadas, sem acessar o
+    Google Calendar, para o usuário confirmar antes de agendar. Cada dose traz a
+    dose já agendada mais próxima, quando ela cai na janela de consolidação
+    (só com sessão: sem login não há doses agendadas para comparar).
+    """
+    if request.medicamento and request.intervalo_horas and request.duracao_dias:
+        details = {"medicamento": request.medicamento, "intervalo_horas": request.intervalo_horas,
+                   "duracao_dias": request.duracao_dias}
+    elif request.instrucao:
+        details = calendar.parse_instruction(request.instrucao, llm)
+        if not details: raise HTTPException(status_code=400, detail="Erro no parse.")
+    else:
+        raise HTTPException(status_code=400, detail="Informe a instrução ou medicamento, intervalo e duração.")
 
     start_time = calendar.get_start_time_from_string(request.start_time_str)
     if not start_time: raise HTTPException(status_code=400, detail="Data inválida.")
 
-    try:
-        return calendar.create_calendar_events(service, details, start_time)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    index = app_state["treatment_index"]
+    total = calendar.count_doses(details)
+    first_dose = (request.page - 1) * request.page_size
+    doses = []
+    for i, dose_time in dose_instants(start_time, details["intervalo_horas"], details["duracao_dias"],
+                                      first_dose, request.page_size):
+        nearest = index.nearest_dose(user_id, dose_time) if user_id else None
+        doses.append({
+            "dose": i + 1, "start_time": dose_time.isoformat(),
+            "start_time_formatted": dose_time.strftime('%d/%m/%Y %H:%M'),
+            "dose_proxima": nearest if nearest and nearest["distance_minutes"] <= consolidation.CONSOLIDATION_WINDOW_MIN
+            else None
+        })
+    # Até 500 doses por página: a resposta pronta pula o jsonable_encoder
+    return ORJSONResponse({
+        **details,
+        "avisos": index.check(user_id, details, start_time, start_time + timedelta(days=int(details["duracao_dias"])))
+        if user_id else [],
+        "total_doses": total,
+        "page": request.page,
+        "page_size": request.page_size,
+        "next_page": request.page + 1 if first_dose + request.page_size < total else None,
+        "doses": doses
+    })
 
 
 @app.get("/v1/calendar/events/{medicamento_nome}")
 async def get_future_events(medicamento_nome: str, service=Depends(get_calendar_service_dep)):
     events = calendar.find_future_events_by_name(service, medicamento_nome)
-    return {"medicamento": medicamento_nome, "events": events}
+    # Até 250 eventos: a resposta pronta pula o jsonable_encoder
+    return ORJSONResponse({"medicamento": medicamento_nome, "events": events})
 
 
 @app.post("/v1/calendar/delete")
-async def delete_calendar_events(request: DeleteRequest, service=Depends(get_calendar_service_dep)):
-    return calendar.delete_events(service, request.event_ids)
+async def delete_calendar_events(request: DeleteRequest, service=Depends(get_calendar_service_dep),
+                                 user_id: str = Depends(get_user_id),
+                                 idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)):
+    return run_idempotent(user_id, "delete", idempotency_key, request.model_dump(),
+                          lambda: calendar.delete_events(service, request.event_ids, app_state["outbox"], user_id))
 
 
 @app.put("/v1/calendar/edit/{event_id}")
-async def edit_calendar_event(event_id: str, request: EditRequest, service=Depends(get_calendar_service_dep)):
-    return calendar.edit_single_event(service, event_id, request.new_start_time_str)
+async def edit_calendar_event(event_id: str, request: EditRequest, service=Depends(get_calendar_service_dep),
+                              user_id: str = Depends(get_user_id),
+                              idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)):
+    return run_idempotent(user_id, f"edit:{event_id}", idempotency_key, request.model_dump(),
+                          lambda: calendar.edit_single_event(service, event_id, request.new_start_time_str))
+
+
+# === JOBS DE AGENDAMENTO EM BACKGROUND ===
+
+def get_user_job(job_id: str, user_id: str) -> dict:
+    job = app_state["jobs"].store.get(job_id)
+    if not job or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job
+
+
+@app.get("/v1/calendar/jobs/{job_id}")
+async def get_job(job_id: str, user_id: str = Depends(get_user_id)):
+    return job_progress(get_user_job(job_id, user_id))
+
+
+@app.get("/v1/calendar/jobs/{job_id}/stream")
+async def stream_job(job_id: str, user_id: str = Depends(get_user_id)):
+    """Progresso do job via Server-Sent Events, até ele terminar."""
+    get_user_job(job_id, user_id)
+
+    async def events():
+        last = None
+        while True:
+            progress = job_progress(app_state["jobs"].store.get(job_id))
+            if progress != last:
+                yield f"data: {json.dumps(progress, ensure_ascii=False)}\n\n"
+                last = progress
+            if progress["status"] in FINAL_STATES:
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.delete("/v1/calendar/jobs/{job_id}")
+async def cancel_job(job_id: str, user_id: str = Depends(get_user_id)):
+    get_user_job(job_id, user_id)
+    return job_progress(app_state["jobs"].cancel(job_id))
+
+
+# === SINCRONIZAÇÃO COM O GOOGLE (OUTBOX) ===
+
+@app.get("/v1/calendar/sync")
+async def get_sync_status(user_id: str = Depends(get_user_id)):
+    """Mutações ainda não enviadas ao Google e as que falharam de vez (com o último erro)."""
+    outbox = app_state["outbox_journal"]
+    return {"pending": outbox.pending_count(user_id), "failed": outbox.failed(user_id)}
+
+
+@app.post("/v1/calendar/sync/retry")
+async def retry_failed_sync(user_id: str = Depends(get_user_id)):
+    """Devolve as mutações que falharam para a fila do outbox."""
+    requeued = app_state["outbox_journal"].retry_failed(user_id)
+    return {"message": f"{requeued} operação(ões) devolvida(s) para sincronização.", "requeued": requeued}
+
+
+# === ENDPOINTS POR TRATAMENTO (filtro por treatment_id, sem busca por título) ===
+
+def get_user_treatment(treatment_id: str, user_id: str) -> Optional[dict]:
+    """
+    Tratamento do usuário no store, ou None se não estiver registrado (agendado
+    antes do store: só existe no Google dele). 404 se for de outro usuário.
+    """
+    store = app_state["treatments"]
+    treatment = store.get_treatment(user_id, treatment_id)
+    if treatment is None and store.is_registered(treatment_id):
+        raise HTTPException(status_code=404, detail="Tratamento não encontrado.")
+    return treatment
+
+
+@app.get("/v1/calendar/treatments/{treatment_id}")
+async def get_treatment_events(treatment_id: str, service=Depends(get_calendar_service_dep),
+                               user_id: str = Depends(get_user_id)):
+    treatment = get_user_treatment(treatment_id, user_id)
+    if treatment and treatment["consolidated"]:
+        events = consolidation.list_consolidated_events(app_state["treatments"], user_id, treatment_id)
+    else:
+        events = calendar.find_future_events_by_treatment(service, treatment_id)
+    return ORJSONResponse({"treatment_id": treatment_id, "events": events})
+
+
+@app.delete("/v1/calendar/treatments/{treatment_id}")
+async def delete_treatment(treatment_id: str, service=Depends(get_calendar_service_dep),
+                           user_id: str = Depends(get_user_id),
+                           idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)):
+    treatment = get_user_treatment(treatment_id, user_id)
+
+    def operation():
+        if treatment and treatment["consolidated"]:
+            return consolidation.cancel_consolidated(service, app_state["treatments"], user_id, treatment_id,
+                                                     app_state["outbox"])
+        result = calendar.delete_treatment(service, treatment_id, app_state["outbox"], user_id)
+        if "error" not in result:
+            app_state["treatments"].update_treatment(user_id, treatment_id, status=CANCELLED)
+        return result
+
+    result = run_idempotent(user_id, f"delete_treatment:{treatment_id}", idempotency_key, {}, operation)
+    app_state["treatment_index"].invalidate(user_id)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@app.put("/v1/calendar/treatments/{treatment_id}/edit")
+async def edit_treatment(treatment_id: str, request: EditRequest, service=Depends(get_calendar_service_dep),
+                         user_id: str = Depends(get_user_id),
+                         idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)):
+    treatment = get_user_treatment(treatment_id, user_id)
+
+    def operation():
+        if treatment and treatment["consolidated"]:
+            return consolidation.reschedule_consolidated(service, app_state["treatments"], user_id, treatment_id,
+                                                         request.new_start_time_str, outbox=app_state["outbox"])
+        result = calendar.edit_treatment(service, treatment_id, request.new_start_time_str,
+                                         treatment["intervalo_horas"] if treatment else None)
+        if "error" not in result and treatment:
+            # Mantém o início do tratamento no store alinhado com as doses reagendadas
+            start_time = rebase_start(calendar.parse_iso_datetime(treatment["start_time"]), treatment["intervalo_horas"],
+                                      calendar.parse_iso_datetime(result["previous_start_time"]),
+                                      calendar.parse_iso_datetime(result["new_start_time"]))
+            app_state["treatments"].update_treatment(
+                user_id, treatment_id, start_time=start_time.isoformat(),
+                end_time=(start_time + timedelta(days=treatment["duracao_dias"])).isoformat()
+            )
+        return result
+
+    result = run_idempotent(user_id, f"edit_treatment:{treatment_id}", idempotency_key, request.model_dump(),
+                            operation)
+    app_state["treatment_index"].invalidate(user_id)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+# === OBSERVABILIDADE ===
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas no formato do Prometheus: latência por etapa, Calendar, caches e requisições em andamento."""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 
 # === NOVO FLUXO DE AUTENTICAÇÃO WEB ===
@@ -182,10 +579,6 @@ async def login_google():
     """
     Gera a URL de autorização do Google e redireciona o navegador do usuário.
     """
-    # Se token existe, apaga para forçar novo login (opcional, mas bom para garantir)
-    if os.path.exists("token.pickle"):
-        os.remove("token.pickle")
-
     # Configura o fluxo OAuth
     flow = Flow.from_client_secrets_file(
         CREDENTIALS_FILE,
@@ -208,7 +601,9 @@ async def login_google():
 async def auth_callback(request: Request):
     """
     O Google redireciona para cá com um código (?code=...).
-    Trocamos o código pelo token, salvamos e mandamos para o Chat.
+    Trocamos o código pelo token, salvamos (por usuário) e mandamos para o Chat
+    com uma sessão assinada: no cookie HttpOnly e no fragmento da URL (#session=...),
+    que o navegador não envia a servidores; o frontend a guarda e manda como Bearer.
     """
     code = request.query_params.get("code")
     if not code:
@@ -224,18 +619,19 @@ async def auth_callback(request: Request):
         flow.fetch_token(code=code)
         creds = flow.credentials
 
-        # Salva o token.pickle (compatível com seu código antigo)
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
-
-        print("[AUTH] Token salvo com sucesso em token.pickle")
+        # O ID vem da conta Google (id_token verificado), não da sessão que estiver no navegador
+        user_id = await asyncio.to_thread(google_user_id, creds, flow.client_config["client_id"])
 
-        # Atualiza o serviço na memória da API
-        app_state["calendar_service"] = build('calendar', 'v3', credentials=creds)
+        # Salva o token criptografado e já deixa o serviço em cache
+        app_state["calendar_services"].set_credentials(user_id, creds)
+        print(f"[AUTH] Token salvo com sucesso para o usuário '{user_id}'")
 
         # REDIRECIONA O USUÁRIO DE VOLTA PARA O FRONTEND (PÁGINA DE CHAT)
         print(f"[AUTH] Login concluído. Redirecionando para {FRONTEND_URL}")
-        return RedirectResponse(FRONTEND_URL)
+        session = app_state["sessions"].sign(user_id)
+        response = RedirectResponse(f"{FRONTEND_URL}#session={session}")
+        response.set_cookie(SESSION_COOKIE, session, max_age=SESSION_MAX_AGE_SEC, httponly=True, samesite="lax")
+        return response
 
     except Exception as e:
         print(f"[AUTH ERROR] {e}")
@@ -243,11 +639,11 @@ async def auth_callback(request: Request):
 
 
 @app.post("/auth/logout")
-async def logout_google():
-    app_state["calendar_service"] = None
-    if os.path.exists("token.pickle"):
-        os.remove("token.pickle")
-    return {"message": "Deslogado com sucesso."}
+async def logout_google(user_id: str = Depends(get_user_id)):
+    app_state["calendar_services"].remove(user_id)
+    response = ORJSONResponse({"message": "Deslogado com sucesso."})
+    response.delete_cookie(SESSION_COOKIE)
+    return response
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+# modules/calendar_client.py
+import re
+import json
+import time
+import threading
+import httplib2
+import requests
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from modules.metrics import CALENDAR_CALLS, CALENDAR_SECONDS
+
+# Configurações do pool HTTP compartilhado
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 32
+HTTP_TIMEOUT_SEC = 30
+
+_session = None
+_session_lock = threading.Lock()
+
+# Operação da API pelo método + path (rótulo das métricas; o googleapiclient não passa o nome)
+_EVENTS_PATH = re.compile(r"/calendar/v3/calendars/[^/]+/events(?:/([^/?]+))?(?:/([^/?]+))?")
+_COLLECTION_OPERATIONS = {"GET": "events.list", "POST": "events.insert"}
+_ITEM_OPERATIONS = {"GET": "events.get", "PATCH": "events.patch", "PUT": "events.update", "DELETE": "events.delete"}
+_NAMED_OPERATIONS = {"import", "quickAdd", "watch", "move", "instances"}
+
+
+def api_operation(method: str, uri: str) -> str:
+    """'POST .../calendars/primary/events' -> 'events.insert'; batch -> 'batch'; o resto -> 'other'."""
+    if "/batch/" in uri:
+        return "batch"
+    match = _EVENTS_PATH.search(uri)
+    if match is None:
+        return "other"
+    item, action = match.groups()
+    if action in _NAMED_OPERATIONS:
+        return f"events.{action}"
+    if item is None:
+        return _COLLECTION_OPERATIONS.get(method, "other")
+    if item in _NAMED_OPERATIONS:
+        return f"events.{item}"
+    return _ITEM_OPERATIONS.get(method, "other")
+
+
+@lru_cache(maxsize=1)
+def get_discovery_document() -> dict:
+    """
+    Documento de discovery do Calendar v3, lido da cópia estática que acompanha
+    o google-api-python-client e parseado uma única vez por processo.
+    """
+    return json.loads(get_static_doc('calendar', 'v3'))
+
+
+def get_http_session() -> requests.Session:
+    """Sessão requests com pool de conexões keep-alive, compartilhada entre usuários."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+class PooledHttp:
+    """
+    Transporte compatível com httplib2.Http (interface usada pelo googleapiclient)
+    que envia as requisições pela sessão compartilhada, autenticando com as
+    credenciais de um usuário. Em 401 renova o token e tenta uma vez de novo.
+    """
+
+    def __init__(self, credentials, session: requests.Session = None, timeout: int = HTTP_TIMEOUT_SEC):
+        self.credentials = credentials
+        self.session = session or get_http_session()
+        self.timeout = timeout
+        self._auth_request = Request(self.session)
+
+    def _send(self, operation: str, method: str, uri: str, body, headers: dict):
+        """Uma requisição à API, contada nas métricas por operação e status."""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            resp = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout)
+            status = str(resp.status_code)
+            return resp
+        finally:
+            CALENDAR_SECONDS.labels(operation).observe(time.perf_counter() - start)
+            CALENDAR_CALLS.labels(operation, status).inc()
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        operation = api_operation(method, uri)
+        request_headers = dict(headers or {})
+        self.credentials.before_request(self._auth_request, method, uri, request_headers)
+        resp = self._send(operation, method, uri, body, request_headers)
+
+        if resp.status_code == 401 and getattr(self.credentials, 'refresh_token', None):
+            self.credentials.refresh(self._auth_request)
+            request_headers = dict(headers or {})
+            self.credentials.apply(request_headers)
+            resp = self._send(operation, method, uri, body, request_headers)
+
+        info = dict(resp.headers)
+        info['status'] = str(resp.status_code)
+        response = httplib2.Response(info)
+        response.reason = resp.reason
+        return response, resp.content
+
+    def close(self):
+        # A sessão é compartilhada; não fechamos o pool por usuário
+        pass
+
+
+def build_calendar_service(credentials, root_url: str = None):
+    """
+    Constrói o serviço 'calendar' sem buscar o discovery na rede e usando o
+    pool HTTP compartilhado. root_url (ex.: 'http://127.0.0.1:8001/') aponta
+    o serviço, inclusive os batches, para outro servidor.
+    """
+    document = get_discovery_document()
+    if root_url:
+        document = {**document, 'rootUrl': root_url}
+    return build_from_document(document, http=PooledHttp(credentials))
@@ -2,14 +2,23 @@
 import re
 import json
 import uuid
+import hashlib
 import pytz
 from datetime import datetime, timedelta
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
+from googleapiclient.errors import HttpError
+from collections import Counter
+from modules.dose_timeline import total_doses as _total_doses, dose_instant, dose_instants
+from modules.metrics import invoke_llm
 
 # Configurações
 TZ_SAO_PAULO = pytz.timezone("America/Sao_Paulo")
 
+# Respostas parciais (fields=): pedimos ao Google só o que o frontend usa
+EVENT_LIST_FIELDS = "nextPageToken,items(id,summary,start,extendedProperties/private)"
+EVENT_ID_FIELDS = "nextPageToken,items(id)"
+
 # Seu prompt parser
 PARSER_PROMPT = """
 Você é um assistente inteligente que extrai dados de prescrições médicas.
@@ -40,7 +49,7 @@ def parse_instruction(text: str, llm: ChatGoogleGenerativeAI) -> dict:
     print(f"[Parser] Analisando instrução: '{text}'")
     prompt = parser_prompt_template.format(instrucao=text)
     try:
-        response = llm.invoke(prompt)
+        response = invoke_llm(llm, prompt, "parser")
         content = response.content
         json_match = re.search(r"\{.*\}", content, re.DOTALL)
         if not json_match:
@@ -61,6 +70,21 @@ def parse_instruction(text: str, llm: ChatGoogleGenerativeAI) -> dict:
 
 # --- Funções do Google Calendar ---
 
+def new_treatment_id(idempotency_key: str = None) -> str:
+    """ID do tratamento; determinístico quando a requisição traz uma chave de idempotência."""
+    if idempotency_key:
+        return f"medsched_{hashlib.sha256(idempotency_key.encode()).hexdigest()[:8]}"
+    return f"medsched_{uuid.uuid4().hex[:8]}"
+
+
+def dose_event_id(treatment_id: str, dose_index: int) -> str:
+    """
+    ID determinístico do evento de uma dose. Hex é um subconjunto do base32hex
+    aceito pelo Calendar, então reenviar a mesma dose gera 409 em vez de duplicar.
+    """
+    return hashlib.sha1(f"{treatment_id}:{dose_index}".encode()).hexdigest()
+
+
 def get_start_time_from_string(start_str: str) -> datetime:
     """Valida e converte a string de data/hora de início."""
     try:
@@ -78,34 +102,76 @@ def get_start_time_from_string(start_str: str) -> datetime:
         return None
 
 
-def create_calendar_events(service, details: dict, start_time: datetime) -> dict:
-    """Cria os eventos no Google Calendar."""
-    medicamento = details["medicamento"]
-    intervalo_horas = int(details["intervalo_horas"])
-    duracao_dias = int(details["duracao_dias"])
-    total_doses = (duracao_dias * 24) // intervalo_horas
-    treatment_id = f"medsched_{uuid.uuid4().hex[:8]}"
+def count_doses(details: dict) -> int:
+    """Número total de doses do tratamento."""
+    return _total_doses(details["intervalo_horas"], details["duracao_dias"])
 
-    print(f"[Calendar] Agendando {total_doses} doses de {medicamento}...")
-    created_events = []
 
-    for i in range(total_doses):
-        dose_time = start_time + timedelta(hours=(i * intervalo_horas))
+def iter_dose_events(details: dict, start_time: datetime, treatment_id: str, first_dose: int = 0):
+    """Gera (índice, corpo do evento) de cada dose, a partir de first_dose."""
+    medicamento = details["medicamento"]
+    total_doses = count_doses(details)
+
+    for i, dose_time in dose_instants(start_time, details["intervalo_horas"], details["duracao_dias"], first_dose):
         end_time = dose_time + timedelta(minutes=30)
 
-        event_body = {
+        yield i, {
+            'id': dose_event_id(treatment_id, i),
             'summary': f'Tomar {medicamento.upper()}',
             'description': f'Dose {i + 1} de {total_doses} do tratamento.\n\nID do Tratamento: {treatment_id}',
             'start': {'dateTime': dose_time.isoformat(), 'timeZone': "America/Sao_Paulo"},
             'end': {'dateTime': end_time.isoformat(), 'timeZone': "America/Sao_Paulo"},
             'reminders': {'useDefault': False, 'overrides': [{'method': 'popup', 'minutes': 10}]},
-            'extendedProperties': {'private': {'treatment_id': treatment_id}}
+            'extendedProperties': {'private': {
+                'treatment_id': treatment_id,
+                'medicamento': medicamento.strip().lower()
+            }}
         }
-        try:
-            event = service.events().insert(calendarId='primary', body=event_body).execute()
-            created_events.append(event.get('id'))
-        except Exception as e:
-            print(f"[Calendar ERRO] Falha ao criar evento: {e}")
+
+
+def insert_dose_event(service, event_body: dict) -> bool:
+    """Insere uma dose. Retorna True se criada (ou já existente), False em caso de falha."""
+    try:
+        service.events().insert(calendarId='primary', body=event_body, fields='id').execute()
+        return True
+    except HttpError as e:
+        if e.resp.status == 409:
+            # Dose já criada por uma tentativa anterior do mesmo tratamento
+            return True
+        print(f"[Calendar ERRO] Falha ao criar evento: {e}")
+    except Exception as e:
+        print(f"[Calendar ERRO] Falha ao criar evento: {e}")
+    return False
+
+
+def create_calendar_events(service, details: dict, start_time: datetime, treatment_id: str = None,
+                           outbox=None, user_id: str = None) -> dict:
+    """
+    Cria os eventos no Google Calendar. Com um outbox, as doses são gravadas no
+    journal local e enviadas em background, sem esperar a API do Google.
+    """
+    medicamento = details["medicamento"]
+    treatment_id = treatment_id or new_treatment_id()
+
+    print(f"[Calendar] Agendando {count_doses(details)} doses de {medicamento}...")
+
+    if outbox is not None:
+        queued = outbox.append_many(
+            user_id,
+            [("insert", body['id'], body) for _, body in iter_dose_events(details, start_time, treatment_id)],
+            treatment_id
+        )
+        return {
+            "message": f"{queued} doses de {medicamento} agendadas.",
+            "treatment_id": treatment_id,
+            "total_doses": queued,
+            "pending_sync": queued
+        }
+
+    created_events = []
+    for _, event_body in iter_dose_events(details, start_time, treatment_id):
+        if insert_dose_event(service, event_body):
+            created_events.append(event_body['id'])
 
     return {
         "message": f"{len(created_events)} doses de {medicamento} agendadas.",
@@ -114,40 +180,92 @@ def create_calendar_events(service, details: dict, start_time: datetime) -> dict
     }
 
 
-def find_future_events_by_name(service, med_name: str) -> list:
-    """Busca e retorna eventos futuros na agenda pelo nome do medicamento."""
-    print(f"[Calendar] Buscando eventos futuros para: '{med_name}'")
+def _format_event(event: dict) -> dict:
+    """Converte um evento da API no formato esperado pelo frontend."""
+    start_str = event['start'].get('dateTime', event['start'].get('date'))
+    event_time = parse_iso_datetime(start_str)
+    private = event.get('extendedProperties', {}).get('private', {})
+    return {
+        "id": event['id'],
+        "summary": event.get('summary', ''),
+        "treatment_id": private.get('treatment_id'),
+        "start_time": event_time.isoformat(),
+        "start_time_formatted": event_time.strftime('%d/%m/%Y %H:%M')
+    }
+
+
+def _list_future_events(service, fields: str, **filters) -> list:
+    """Lista os eventos futuros da agenda com os filtros dados, percorrendo todas as páginas."""
     now_iso = datetime.now(TZ_SAO_PAULO).isoformat()
-    try:
+    events, page_token = [], None
+    while True:
         events_result = service.events().list(
-            calendarId='primary', q=f'Tomar {med_name.upper()}', timeMin=now_iso,
-            maxResults=250, singleEvents=True, orderBy='startTime'
+            calendarId='primary', timeMin=now_iso, maxResults=250, singleEvents=True,
+            orderBy='startTime', fields=fields, pageToken=page_token, **filters
         ).execute()
+        events.extend(events_result.get('items', []))
+        page_token = events_result.get('nextPageToken')
+        if not page_token:
+            return events
+
 
-        events = events_result.get('items', [])
+def _list_treatment_events(service, treatment_id: str, fields: str) -> list:
+    """
+    Lista os eventos futuros de um tratamento filtrando pela propriedade
+    privada 'treatment_id' (sem busca textual).
+    """
+    return _list_future_events(service, fields, privateExtendedProperty=f'treatment_id={treatment_id}')
+
+
+def find_future_events_by_name(service, med_name: str) -> list:
+    """
+    Busca e retorna eventos futuros na agenda pelo nome do medicamento.
+
+    Filtra pela propriedade privada 'medicamento' (gravada em minúsculas), sem
+    depender de maiúsculas/acentos do título. Eventos antigos, criados antes da
+    propriedade existir, só são achados pela busca textual no título.
+    """
+    print(f"[Calendar] Buscando eventos futuros para: '{med_name}'")
+    try:
+        events = _list_future_events(service, EVENT_LIST_FIELDS,
+                                     privateExtendedProperty=f'medicamento={med_name.strip().lower()}')
+        if not events:
+            legacy = _list_future_events(service, EVENT_LIST_FIELDS, q=f'Tomar {med_name.strip()}')
+            events = [event for event in legacy
+                      if 'medicamento' not in event.get('extendedProperties', {}).get('private', {})]
         # Formatar para o frontend
-        formatted_events = []
-        for event in events:
-            start_str = event['start'].get('dateTime', event['start'].get('date'))
-            event_time = parse_iso_datetime(start_str)
-            formatted_events.append({
-                "id": event['id'],
-                "summary": event['summary'],
-                "start_time": event_time.isoformat(),
-                "start_time_formatted": event_time.strftime('%d/%m/%Y %H:%M')
-            })
-        return formatted_events
+        return [_format_event(event) for event in events]
     except Exception as e:
         print(f"[Calendar ERRO] Falha ao buscar eventos: {e}")
         return []
 
 
-def delete_events(service, event_ids: list) -> dict:
+def find_future_events_by_treatment(service, treatment_id: str) -> list:
+    """Busca e retorna os eventos futuros de um tratamento pelo seu ID."""
+    print(f"[Calendar] Buscando eventos futuros do tratamento: '{treatment_id}'")
+    try:
+        events = _list_treatment_events(service, treatment_id, EVENT_LIST_FIELDS)
+        return [_format_event(event) for event in events]
+    except Exception as e:
+        print(f"[Calendar ERRO] Falha ao buscar eventos do tratamento: {e}")
+        return []
+
+
+def delete_events(service, event_ids: list, outbox=None, user_id: str = None) -> dict:
     """Deleta uma lista de eventos (um ou 'todos')."""
     if not isinstance(event_ids, list):
         event_ids = [event_ids]  # Garante que seja uma lista
 
     print(f"[Calendar] Deletando {len(event_ids)} eventos...")
+    if outbox is not None:
+        queued = outbox.append_many(user_id, [("delete", event_id, None) for event_id in event_ids])
+        return {
+            "message": f"{queued} eventos deletados.",
+            "deleted_count": queued,
+            "errors": [],
+            "pending_sync": queued
+        }
+
     deleted_count = 0
     errors = []
     for event_id in event_ids:
@@ -201,4 +319,92 @@ def edit_single_event(service, event_id: str, new_start_str: str) -> dict:
 
     except Exception as e:
         print(f"[Calendar ERRO] Falha ao atualizar evento: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+def delete_treatment(service, treatment_id: str, outbox=None, user_id: str = None) -> dict:
+    """Cancela todas as doses futuras de um tratamento."""
+    print(f"[Calendar] Cancelando tratamento {treatment_id}...")
+    try:
+        events = _list_treatment_events(service, treatment_id, EVENT_ID_FIELDS)
+    except Exception as e:
+        print(f"[Calendar ERRO] Falha ao buscar eventos do tratamento: {e}")
+        return {"error": str(e)}
+
+    event_ids = [event['id'] for event in events]
+    if outbox is not None:
+        # Doses ainda no outbox não aparecem no Google; o delete as anula localmente
+        event_ids += [event_id for event_id in outbox.pending_inserts(user_id, treatment_id)
+                      if event_id not in event_ids]
+    result = delete_events(service, event_ids, outbox, user_id)
+    result["treatment_id"] = treatment_id
+    return result
+
+
+def _infer_interval(events: list) -> int:
+    """
+    Intervalo (h) entre as doses listadas: o espaçamento mais comum. A mudança
+    de horário só afeta o espaçamento das doses que a atravessam (23h/25h).
+    """
+    starts = [parse_iso_datetime(event['start']['dateTime']) for event in events]
+    gaps = Counter(round((b - a).total_seconds() / 3600) for a, b in zip(starts, starts[1:]))
+    gaps.pop(0, None)
+    return gaps.most_common(1)[0][0] if gaps else 24
+
+
+def edit_treatment(service, treatment_id: str, new_start_str: str, intervalo_horas: int = None) -> dict:
+    """
+    Reagenda as doses futuras de um tratamento: a primeira dose passa para o
+    novo horário e as demais são recalculadas a partir dela pelo dose_instant,
+    mantendo o intervalo (e o horário de parede nos intervalos diários, mesmo
+    atravessando uma mudança de horário). Sem intervalo_horas, ele é deduzido
+    do espaçamento das doses.
+    """
+    print(f"[Calendar] Reagendando tratamento {treatment_id} para {new_start_str}...")
+    aware_new_time = get_start_time_from_string(new_start_str)
+    if aware_new_time is None:
+        return {"error": "Formato de data inválido. Use 'DD/MM/AAAA HH:MM' ou 'agora'."}
+
+    try:
+        events = _list_treatment_events(
+            service, treatment_id, "nextPageToken,items(id,start,end)"
+        )
+    except Exception as e:
+        print(f"[Calendar ERRO] Falha ao buscar eventos do tratamento: {e}")
+        return {"error": str(e)}
+
+    if not events:
+        return {"error": "Nenhuma dose futura encontrada para este tratamento."}
+
+    intervalo_horas = intervalo_horas or _infer_interval(events)
+    previous_start = parse_iso_datetime(events[0]['start']['dateTime'])
+    offset = aware_new_time - previous_start
+    updated_count = 0
+    errors = []
+    for k, event in enumerate(events):
+        duration = parse_iso_datetime(event['end']['dateTime']) - parse_iso_datetime(event['start']['dateTime'])
+        new_start = dose_instant(aware_new_time, intervalo_horas, k)
+        new_end = TZ_SAO_PAULO.normalize(new_start + duration)
+        body = {
+            'start': {'dateTime': new_start.isoformat(), 'timeZone': "America/Sao_Paulo"},
+            'end': {'dateTime': new_end.isoformat(), 'timeZone': "America/Sao_Paulo"}
+        }
+        try:
+            # patch envia só start/end; fields='id' evita devolver o evento inteiro
+            service.events().patch(
+                calendarId='primary', eventId=event['id'], body=body, fields='id'
+            ).execute()
+            updated_count += 1
+        except Exception as e:
+            print(f"[Calendar ERRO] Falha ao atualizar {event['id']}: {e}")
+            errors.append(event['id'])
+
+    return {
+        "message": f"{updated_count} doses reagendadas.",
+        "treatment_id": treatment_id,
+        "updated_count": updated_count,
+        "previous_start_time": previous_start.isoformat(),
+        "new_start_time": aware_new_time.isoformat(),
+        "offset_minutes": round(offset.total_seconds() / 60),
+        "errors": errors
+    }
@@ -0,0 +1,277 @@
+# modules/consolidation.py
+import os
+import bisect
+from datetime import datetime, timedelta
+from googleapiclient.errors import HttpError
+from modules.calendar_manager import (
+    TZ_SAO_PAULO, new_treatment_id, count_doses, dose_event_id, get_start_time_from_string, parse_iso_datetime
+)
+from modules.dose_timeline import dose_index, dose_instant, dose_instants
+from modules.treatment_store import CANCELLED
+
+# Configurações
+# Doses de tratamentos diferentes a até N minutos umas das outras viram um único evento
+CONSOLIDATION_WINDOW_MIN = int(os.getenv("CONSOLIDATION_WINDOW_MIN", "30"))
+
+INSERT, PATCH, DELETE = "insert", "patch", "delete"
+
+
+# --- Corpo dos eventos consolidados ---
+
+def _slot_text(members: list) -> tuple:
+    """Título e descrição do evento a partir das doses que ele agrupa."""
+    medicamentos = sorted({member["medicamento"].upper() for member in members})
+    lines = [f"- {member['medicamento'].upper()}: dose {member['dose_index'] + 1} "
+             f"(tratamento {member['treatment_id']})" for member in members]
+    return f"Tomar {' + '.join(medicamentos)}", "Doses deste horário:\n" + "\n".join(lines)
+
+
+def _slot_body(slot: dict, members: list) -> dict:
+    start = parse_iso_datetime(slot["start_time"]).astimezone(TZ_SAO_PAULO)
+    summary, description = _slot_text(members)
+    return {
+        'id': slot["event_id"],
+        'summary': summary,
+        'description': description,
+        'start': {'dateTime': start.isoformat(), 'timeZone': "America/Sao_Paulo"},
+        'end': {'dateTime': (start + timedelta(minutes=30)).isoformat(), 'timeZone': "America/Sao_Paulo"},
+        'reminders': {'useDefault': False, 'overrides': [{'method': 'popup', 'minutes': 10}]},
+        # A composição (quem está no evento) fica no treatment_store, não no Google
+        'extendedProperties': {'private': {'consolidated': '1'}}
+    }
+
+
+# --- Montagem das operações ---
+
+def _place_doses(store, user_id: str, treatment_id: str, medicamento: str, instants, window: timedelta,
+                 touched: dict):
+    """Encaixa cada (índice, horário) num slot existente da janela ou cria um novo."""
+    for i, dose_time in instants:
+        slot = store.member_slot(user_id, treatment_id, i)
+        if slot is None:
+            slot = store.find_slot(user_id, dose_time, window, exclude_treatment=treatment_id)
+        if slot is None:
+            slot = store.create_slot(user_id, dose_time)
+            touched[slot["slot_id"]] = (INSERT, slot)
+        else:
+            touched.setdefault(slot["slot_id"], (PATCH, slot))
+        store.add_member(slot["slot_id"], treatment_id, i, medicamento)
+
+
+def _future_doses(treatment: dict, now: datetime) -> list:
+    """(índice, horário) das doses do tratamento que ainda não passaram."""
+    start = parse_iso_datetime(treatment["start_time"])
+    end = parse_iso_datetime(treatment["end_time"])
+    first = max(0, dose_index(start, treatment["intervalo_horas"], now) - 1)
+    return [(i, dose_time) for i, dose_time in
+            dose_instants(start, treatment["intervalo_horas"], treatment["duracao_dias"], first_dose=first)
+            if now <= dose_time < end]
+
+
+def _adopt_overlapping(store, user_id: str, treatment_id: str, instants: list, window: timedelta,
+                       touched: dict) -> list:
+    """
+    Tratamentos ativos com eventos próprios que têm alguma dose futura na janela
+    de uma das novas doses passam para o modo consolidado: as doses futuras
+    entram em slots e os eventos próprios delas são removidos.
+    Retorna as operações de remoção desses eventos.
+    """
+    times = sorted(dose_time.timestamp() for _, dose_time in instants)
+    if not times:
+        return []
+    now = datetime.now(TZ_SAO_PAULO)
+    ops = []
+    for treatment in store.active_treatments(user_id):
+        if treatment["consolidated"] or treatment["treatment_id"] == treatment_id:
+            continue
+        doses = _future_doses(treatment, now)
+        overlaps = False
+        for _, dose_time in doses:
+            k = bisect.bisect_left(times, (dose_time - window).timestamp())
+            if k < len(times) and times[k] <= (dose_time + window).timestamp():
+                overlaps = True
+                break
+        if not overlaps:
+            continue
+        print(f"[Consolidação] Tratamento {treatment['treatment_id']} ({treatment['medicamento']}) "
+              f"passa a compartilhar eventos.")
+        _place_doses(store, user_id, treatment["treatment_id"], treatment["medicamento"], doses, window, touched)
+        store.update_treatment(user_id, treatment["treatment_id"],
+                               consolidated=int(window.total_seconds() // 60))
+        ops.extend((DELETE, dose_event_id(treatment["treatment_id"], i), None) for i, _ in doses)
+    return ops
+
+
+def _slot_ops(store, touched: dict) -> list:
+    """
+    Uma operação por slot alterado, calculada pela composição final: slots que
+    ficaram vazios são removidos, os demais recebem só o novo título/descrição.
+    """
+    ops = []
+    for slot_id, (op, slot) in touched.items():
+        members = store.slot_members(slot_id)
+        if not members:
+            store.retire_slot(slot_id)
+            if op != INSERT:
+                ops.append((DELETE, slot["event_id"], None))
+        elif op == INSERT:
+            ops.append((INSERT, slot["event_id"], _slot_body(slot, members)))
+        else:
+            summary, description = _slot_text(members)
+            ops.append((PATCH, slot["event_id"], {'summary': summary, 'description': description}))
+    return ops
+
+
+def _send(service, op: str, event_id: str, body: dict) -> bool:
+    events = service.events()
+    try:
+        if op == INSERT:
+            events.insert(calendarId='primary', body=body, fields='id').execute()
+        elif op == PATCH:
+            events.patch(calendarId='primary', eventId=event_id, body=body, fields='id').execute()
+        else:
+            events.delete(calendarId='primary', eventId=event_id).execute()
+        return True
+    except HttpError as e:
+        status = e.resp.status
+        if (op == INSERT and status == 409) or (op == DELETE and status in (404, 410)):
+            return True
+        print(f"[Consolidação ERRO] {op} em {event_id} falhou: {e}")
+    except Exception as e:
+        print(f"[Consolidação ERRO] {op} em {event_id} falhou: {e}")
+    return False
+
+
+def _apply(service, store, ops: list, outbox=None, user_id: str = None, treatment_id: str = None) -> dict:
+    """Envia as operações pelo outbox (batch em background) ou direto na API."""
+    if outbox is not None:
+        outbox.append_many(user_id, ops, treatment_id)
+        return {"pending_sync": len(ops), "errors": []}
+
+    errors = []
+    for op, event_id, body in ops:
+        if _send(service, op, event_id, body):
+            continue
+        if op == PATCH:
+            # O insert original pode ter falhado numa tentativa anterior: recria o evento inteiro
+            slot = store.slot_by_event(user_id, event_id)
+            if slot and _send(service, INSERT, event_id, _slot_body(slot, store.slot_members(slot["slot_id"]))):
+                continue
+        errors.append(event_id)
+    return {"errors": errors}
+
+
+# --- Operações por tratamento ---
+
+def schedule_consolidated(service, store, user_id: str, details: dict, start_time: datetime,
+                          treatment_id: str = None, window_minutes: int = CONSOLIDATION_WINDOW_MIN,
+                          outbox=None) -> dict:
+    """
+    Agenda o tratamento no modo consolidado: cada dose entra no evento de outro
+    tratamento ativo que esteja a até window_minutes dela, ou cria um evento novo.
+    Tratamentos com eventos próprios nessa janela são adotados (_adopt_overlapping).
+    """
+    medicamento = details["medicamento"]
+    treatment_id = treatment_id or new_treatment_id()
+    print(f"[Consolidação] Agendando {count_doses(details)} doses de {medicamento} "
+          f"(janela de {window_minutes} min)...")
+
+    window = timedelta(minutes=window_minutes)
+    instants = list(dose_instants(start_time, details["intervalo_horas"], details["duracao_dias"]))
+    touched = {}
+    # Tudo ou nada: o tratamento e as doses (dele e dos tratamentos adotados) num único commit
+    with store.transaction():
+        store.add_treatment(user_id, treatment_id, details, start_time, consolidation_window=window_minutes)
+        adopted = _adopt_overlapping(store, user_id, treatment_id, instants, window, touched)
+        _place_doses(store, user_id, treatment_id, medicamento, instants, window, touched)
+        ops = _slot_ops(store, touched)
+    result = _apply(service, store, adopted + ops, outbox, user_id, treatment_id)
+
+    shared = sum(1 for op, *_ in ops if op == PATCH)
+    return {
+        "message": f"{count_doses(details)} doses de {medicamento} agendadas "
+                   f"({shared} junto com outros medicamentos).",
+        "treatment_id": treatment_id,
+        "total_doses": count_doses(details),
+        "events_created": len(ops) - shared,
+        "events_shared": shared,
+        **result
+    }
+
+
+def cancel_consolidated(service, store, user_id: str, treatment_id: str, outbox=None) -> dict:
+    """Tira as doses futuras do tratamento dos eventos; eventos que ficam vazios são removidos."""
+    print(f"[Consolidação] Cancelando tratamento {treatment_id}...")
+    with store.transaction():
+        slots = store.treatment_slots(user_id, treatment_id, after=datetime.now(TZ_SAO_PAULO))
+        store.remove_treatment_members(user_id, treatment_id, [slot["slot_id"] for slot in slots])
+        ops = _slot_ops(store, {slot["slot_id"]: (PATCH, slot) for slot in slots})
+        store.update_treatment(user_id, treatment_id, status=CANCELLED)
+    result = _apply(service, store, ops, outbox, user_id, treatment_id)
+
+    deleted = sum(1 for op, *_ in ops if op == DELETE)
+    return {
+        "message": f"{len(slots)} doses canceladas ({deleted} eventos removidos, {len(ops) - deleted} atualizados).",
+        "treatment_id": treatment_id,
+        "deleted_count": len(slots),
+        **result
+    }
+
+
+def reschedule_consolidated(service, store, user_id: str, treatment_id: str, new_start_str: str,
+                            outbox=None) -> dict:
+    """
+    Reagenda as doses futuras do tratamento a partir do novo horário. A saída dos
+    slots antigos e a entrada nos novos são combinadas: cada evento afetado recebe
+    uma única operação (e um slot esvaziado pode ser reaproveitado pelas novas doses).
+    """
+    print(f"[Consolidação] Reagendando tratamento {treatment_id} para {new_start_str}...")
+    aware_new_time = get_start_time_from_string(new_start_str)
+    if aware_new_time is None:
+        return {"error": "Formato de data inválido. Use 'DD/MM/AAAA HH:MM' ou 'agora'."}
+
+    with store.transaction():
+        treatment = store.get_treatment(user_id, treatment_id)
+        slots = store.treatment_slots(user_id, treatment_id, after=datetime.now(TZ_SAO_PAULO))
+        if not treatment or not slots:
+            return {"error": "Nenhuma dose futura encontrada para este tratamento."}
+
+        # Mantém a numeração: as doses futuras continuam a partir da primeira ainda não tomada
+        first_dose = min(member["dose_index"] for member in store.slot_members(slots[0]["slot_id"])
+                         if member["treatment_id"] == treatment_id)
+        remaining = count_doses(treatment) - first_dose
+        store.remove_treatment_members(user_id, treatment_id, [slot["slot_id"] for slot in slots])
+
+        touched = {slot["slot_id"]: (PATCH, slot) for slot in slots}
+        intervalo = treatment["intervalo_horas"]
+        instants = ((first_dose + k, dose_instant(aware_new_time, intervalo, k)) for k in range(remaining))
+        _place_doses(store, user_id, treatment_id, treatment["medicamento"], instants,
+                     timedelta(minutes=treatment["consolidated"]), touched)
+        ops = _slot_ops(store, touched)
+        store.update_treatment(user_id, treatment_id, start_time=aware_new_time.isoformat(),
+                               end_time=(aware_new_time + timedelta(hours=remaining * intervalo)).isoformat())
+    result = _apply(service, store, ops, outbox, user_id, treatment_id)
+
+    return {
+        "message": f"{remaining} doses reagendadas.",
+        "treatment_id": treatment_id,
+        "updated_count": remaining,
+        "new_start_time": aware_new_time.isoformat(),
+        **result
+    }
+
+
+def list_consolidated_events(store, user_id: str, treatment_id: str) -> list:
+    """Eventos futuros do tratamento, no formato de calendar_manager._format_event."""
+    events = []
+    for slot in store.treatment_slots(user_id, treatment_id, after=datetime.now(TZ_SAO_PAULO)):
+        event_time = parse_iso_datetime(slot["start_time"]).astimezone(TZ_SAO_PAULO)
+        summary, _ = _slot_text(store.slot_members(slot["slot_id"]))
+        events.append({
+            "id": slot["event_id"],
+            "summary": summary,
+            "treatment_id": treatment_id,
+            "start_time": event_time.isoformat(),
+            "start_time_formatted": event_time.strftime('%d/%m/%Y %H:%M')
+        })
+    return events
@@ -0,0 +1,59 @@
+# modules/dose_timeline.py
+import pytz
+from datetime import datetime, timedelta
+
+TZ_SAO_PAULO = pytz.timezone("America/Sao_Paulo")
+
+
+def total_doses(intervalo_horas: int, duracao_dias: int) -> int:
+    """Número total de doses do tratamento."""
+    return (int(duracao_dias) * 24) // int(intervalo_horas)
+
+
+def dose_instant(start_time: datetime, intervalo_horas: int, index: int, tz=TZ_SAO_PAULO) -> datetime:
+    """
+    Horário da dose 'index', já localizado no fuso correto.
+
+    - Intervalos múltiplos de 24h (1x ao dia, dia sim/dia não): mantém o mesmo
+      horário de parede (08:00 continua 08:00 depois de uma mudança de horário).
+    - Demais intervalos (8/8h, 12/12h): mantém o intervalo real entre as doses,
+      recalculando o offset do fuso em cada dose.
+    """
+    start_time = tz.normalize(start_time.astimezone(tz))
+    intervalo_horas = int(intervalo_horas)
+
+    if intervalo_horas % 24 == 0:
+        naive = start_time.replace(tzinfo=None) + timedelta(days=index * intervalo_horas // 24)
+        # is_dst=False: horário inexistente (pulo do relógio) é empurrado para frente pelo normalize
+        return tz.normalize(tz.localize(naive, is_dst=False))
+
+    return tz.normalize(start_time + timedelta(hours=index * intervalo_horas))
+
+
+def dose_instants(start_time: datetime, intervalo_horas: int, duracao_dias: int,
+                  first_dose: int = 0, limit: int = None, tz=TZ_SAO_PAULO):
+    """
+    Gera (índice, horário) das doses de forma preguiçosa, a partir de first_dose.
+    Cada horário é calculado pelo índice, então memória é constante e pular
+    direto para uma página (first_dose) não exige gerar as doses anteriores.
+    """
+    end = total_doses(intervalo_horas, duracao_dias)
+    if limit is not None:
+        end = min(end, first_dose + limit)
+    for i in range(first_dose, end):
+        yield i, dose_instant(start_time, intervalo_horas, i, tz)
+
+
+def dose_index(start_time: datetime, intervalo_horas: int, instant: datetime) -> int:
+    """Índice da dose do tratamento que cai em 'instant' (a mais próxima; a mudança de horário só desloca 1h)."""
+    return round((instant - start_time).total_seconds() / 3600 / int(intervalo_horas))
+
+
+def rebase_start(start_time: datetime, intervalo_horas: int, old_instant: datetime, new_instant: datetime,
+                 tz=TZ_SAO_PAULO) -> datetime:
+    """
+    Novo início do tratamento para que a dose que caía em old_instant passe a
+    cair em new_instant, com as mesmas regras de dose_instant (horário de
+    parede nos intervalos diários, intervalo real nos demais).
+    """
+    return dose_instant(new_instant, intervalo_horas, -dose_index(start_time, intervalo_horas, old_instant), tz)
@@ -0,0 +1,225 @@
+# modules/drug_catalog.py
+import os
+import re
+import json
+import threading
+import unicodedata
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+from .index_versions import LEGACY_DB_DIR, CATALOG_FILE
+
+# Configurações
+# Caminho absoluto: gravado pela ingestão (cwd = Backend/) e lido pela API (cwd = app/).
+# Artefato gerado, fica junto do ChromaDB legado (como o catálogo de cada versão)
+DRUG_CATALOG_PATH = os.getenv("DRUG_CATALOG_PATH", os.path.join(LEGACY_DB_DIR, CATALOG_FILE))
+# Onde o catálogo ficava antes (versionado no git); só lido enquanto não houver o novo
+_OLD_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), CATALOG_FILE)
+
+# Rótulos das seções de um verbete, no início da linha ("Nome Comercial:", "Reação adversa;"...)
+_FIELD_LABELS = {
+    "nome_comercial": r"Nome\s+comercial",
+    "apresentacao": r"(?:Forma\s+de\s+)?Apresenta[çc][ãa]o",
+    "administracao": r"Administra[çc][ãa]o",
+    "dose": r"Dose",
+    "acao": r"A[çc][ãa]o",
+    "reacao_adversa": r"Rea[çc](?:[ãa]o|[õo]es)\s+adv\s*er\s*sas?",
+    "interacao": r"Intera[çc](?:[ãa]o|[õo]es)",
+}
+_LABEL = re.compile(
+    r"^[ \t]*(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in _FIELD_LABELS.items()) + r")[ \t]*[:;]",
+    re.IGNORECASE | re.MULTILINE
+)
+# Número do verbete no início do texto; o nome pode vir na mesma linha ("12.39  CLORIDRATO DE ...")
+_ENTRY_NUMBER = re.compile(r"^\s*(\d+\.\d+)(?!\d)")
+_PAGE_MARKER = re.compile(r"^[ \t]*-[ \t]*\d+[ \t]*-[ \t]*$", re.MULTILINE)
+_BRAND_SEPARATOR = re.compile(r"[;,]")
+_WHITESPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+
+
+def normalize_name(name: str) -> str:
+    """Minúsculas e sem acentos, para comparar nomes de medicamentos."""
+    folded = unicodedata.normalize("NFKD", name.strip().lower())
+    return "".join(ch for ch in folded if not unicodedata.combining(ch))
+
+
+def name_key(name: str) -> str:
+    """Palavras normalizadas do nome separadas por um espaço (chave do índice de nomes)."""
+    return " ".join(_WORD.findall(normalize_name(name)))
+
+
+def _clean(text: str) -> str:
+    return _WHITESPACE.sub(" ", _PAGE_MARKER.sub("", text)).strip(" ;")
+
+
+@dataclass
+class DrugRecord:
+    """Verbete do guia de medicamentos, campo a campo."""
+    number: str
+    name: str
+    brands: list = field(default_factory=list)
+    apresentacao: str = ""
+    administracao: str = ""
+    dose: str = ""
+    acao: str = ""
+    reacao_adversa: str = ""
+    interacao: str = ""
+    source: str = ""
+
+    @property
+    def key(self) -> str:
+        return normalize_name(self.name)
+
+    def metadata(self) -> dict:
+        """Metadados escalares copiados para cada chunk (filtráveis com where no Chroma)."""
+        return {
+            "medicamento": self.name,
+            "medicamento_norm": self.key,
+            "numero": self.number,
+            "nome_comercial": "; ".join(self.brands),
+            "administracao": self.administracao,
+        }
+
+    def as_text(self) -> str:
+        """Verbete reconstituído, para usar como contexto sem passar pelo índice vetorial."""
+        parts = [f"{self.number} {self.name}", f"Nome comercial: {'; '.join(self.brands)}"]
+        for label, value in (("Apresentação", self.apresentacao), ("Administração", self.administracao),
+                             ("Dose", self.dose), ("Ação", self.acao),
+                             ("Reação adversa", self.reacao_adversa), ("Interação", self.interacao)):
+            if value:
+                parts.append(f"{label}: {value}")
+        return "\n".join(parts)
+
+
+def parse_entry(text: str, source: str = "") -> Optional[DrugRecord]:
+    """
+    Converte o texto de um verbete (arquivo de batches/ ou verbete do PDF) em
+    DrugRecord. Retorna None se o texto não tiver número de verbete.
+    """
+    number = _ENTRY_NUMBER.search(text)
+    labels = list(_LABEL.finditer(text))
+    if number is None:
+        return None
+
+    # Nome: última linha preenchida antes de "Nome comercial" (ou do primeiro rótulo);
+    # as linhas anteriores podem ser o número e o título da seção ("COMPRIMIDOS")
+    header_end = next((m.start() for m in labels if m.lastgroup == "nome_comercial"),
+                      labels[0].start() if labels else len(text))
+    header = [line.strip() for line in text[number.end():header_end].splitlines() if line.strip()]
+    name = _WHITESPACE.sub(" ", header[-1]) if header else None
+
+    fields = {}
+    for i, match in enumerate(labels):
+        end = labels[i + 1].start() if i + 1 < len(labels) else len(text)
+        section = text[match.end():end]
+        if name is None and match.lastgroup == "nome_comercial":
+            # Alguns verbetes trazem o nome comercial antes do genérico (linha em maiúsculas)
+            lines = [line.strip() for line in section.splitlines() if line.strip()]
+            generic = next((line for line in reversed(lines[1:]) if line.isupper()), None)
+            if generic:
+                name = _WHITESPACE.sub(" ", generic)
+                section = section.replace(generic, "")
+        value = _clean(section)
+        # Um rótulo repetido (ex.: duas linhas "Dose:") acumula o texto
+        fields[match.lastgroup] = f"{fields[match.lastgroup]} {value}".strip() if match.lastgroup in fields else value
+
+    name = name or number.group(1)
+    brands = [brand.strip() for brand in _BRAND_SEPARATOR.split(fields.pop("nome_comercial", "")) if brand.strip()]
+    return DrugRecord(number=number.group(1), name=name, brands=brands, source=source, **fields)
+
+
+class DrugCatalog:
+    """
+    Catálogo dos verbetes (JSON compacto) com índice de nomes em memória:
+    nome genérico ou comercial normalizado -> verbetes. Permite busca exata
+    sem gerar embedding e filtros 'where' por medicamento_norm no Chroma.
+    """
+
+    def __init__(self, path: str = DRUG_CATALOG_PATH, records: Optional[list] = None):
+        """records: verbetes já carregados (ex.: do snapshot do índice) em vez do JSON em path."""
+        self.path = path
+        self._lock = threading.Lock()
+        self.records = {}   # origem -> DrugRecord
+        if records is None and path == DRUG_CATALOG_PATH and not os.path.exists(path):
+            path = _OLD_CATALOG_PATH
+        if records is None and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                records = json.load(f).get("records", [])
+        for item in records or []:
+            record = DrugRecord(**item)
+            self.records[record.source] = record
+        self._build_index()
+
+    def _build_index(self):
+        self._names = {}
+        for record in self.records.values():
+            # Associações ("DIPIRONA SÓDICA + CAFEÍNA") também entram por componente
+            components = record.name.split("+") if "+" in record.name else []
+            for name in [record.name, *components, *record.brands]:
+                key = name_key(name)
+                if key:
+                    self._names.setdefault(key, []).append(record)
+        self._max_words = max((key.count(" ") + 1 for key in self._names), default=0)
+
+    def __len__(self):
+        return len(self.records)
+
+    def upsert(self, records: list):
+        with self._lock:
+            for record in records:
+                self.records[record.source] = record
+            self._build_index()
+
+    def remove_sources(self, sources: list):
+        with self._lock:
+            for source in sources:
+                self.records.pop(source, None)
+            self._build_index()
+
+    def remove_prefix(self, prefix: str):
+        """Remove as origens de um documento (ex.: 'guia.pdf#' remove todos os verbetes do PDF)."""
+        self.remove_sources([source for source in self.records if source.startswith(prefix)])
+
+    def as_dicts(self) -> list:
+        """Verbetes serializáveis (JSON do catálogo e snapshot do índice)."""
+        with self._lock:
+            return [asdict(record) for record in self.records.values()]
+
+    def save(self):
+        """Grava o catálogo de forma atômica (arquivo temporário + rename)."""
+        payload = {"version": 1, "records": self.as_dicts()}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, name: str) -> list:
+        """Verbetes cujo nome genérico ou comercial é exatamente name (sem acento/caixa)."""
+        return self._unique(self._names.get(name_key(name), []))
+
+    def find_in_text(self, text: str) -> list:
+        """
+        Verbetes cujo nome aparece no texto (ex.: "quais as reações da aciclovir?").
+        Testa os n-gramas do texto contra o índice, do mais longo para o mais curto.
+        """
+        words = _WORD.findall(normalize_name(text))
+        for size in range(min(self._max_words, len(words)), 0, -1):
+            found = []
+            for start in range(len(words) - size + 1):
+                found.extend(self._names.get(" ".join(words[start:start + size]), []))
+            if found:
+                return self._unique(found)
+        return []
+
+    @staticmethod
+    def _unique(records: list) -> list:
+        # O mesmo verbete pode vir dos batches e do PDF: um por número
+        # (bulas da web não têm número: uma por origem)
+        seen, unique = set(), []
+        for record in records:
+            key = record.number or record.source
+            if key not in seen:
+                seen.add(key)
+                unique.append(record)
+        return unique
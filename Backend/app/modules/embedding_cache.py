@@ -0,0 +1,232 @@
+# modules/embedding_cache.py
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+# Configurações
+# Caminho absoluto: usado tanto pela API (cwd = app/) quanto pela ingestão (cwd = Backend/)
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.db")
+)
+# Consultas do usuário ficam só em memória (LRU); o SQLite guarda apenas os chunks dos documentos
+EMBEDDING_QUERY_CACHE_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "1024"))
+# API e ingestão escrevem no mesmo arquivo: espera o outro processo em vez de 'database is locked'
+EMBEDDING_CACHE_BUSY_MS = int(os.getenv("EMBEDDING_CACHE_BUSY_MS", "10000"))
+_LOOKUP_CHUNK = 500  # limite de parâmetros por SELECT ... IN (...)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def text_key(text: str) -> bytes:
+    """Hash do texto normalizado (NFC, espaços colapsados): mesma chave para variações de espaçamento."""
+    normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Cache persistente (SQLite) de embeddings: (modelo, hash do texto) -> vetor
+    em float16. Sobrevive a mudanças de chunking e reconstruções do índice.
+    """
+
+    def __init__(self, db_path: str = EMBEDDING_CACHE_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=EMBEDDING_CACHE_BUSY_MS / 1000)
+        self.conn.execute(f"PRAGMA busy_timeout={EMBEDDING_CACHE_BUSY_MS}")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                   model TEXT NOT NULL,
+                   text_hash BLOB NOT NULL,
+                   vector BLOB NOT NULL,
+                   PRIMARY KEY (model, text_hash)
+               ) WITHOUT ROWID"""
+        )
+        # Custo acumulado de codificação por modelo, para estimar o tempo economizado
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS encode_cost (
+                   model TEXT PRIMARY KEY,
+                   texts INTEGER NOT NULL,
+                   seconds REAL NOT NULL
+               )"""
+        )
+        self.conn.commit()
+
+    def get_many(self, model: str, keys: list) -> dict:
+        """{chave: vetor float16} das chaves encontradas."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(chunk))})", (model, *chunk)
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float16)) for key, vector in rows)
+        return found
+
+    def put_many(self, model: str, items: list, encode_sec: float = 0.0):
+        """Grava [(chave, vetor float16)] e o tempo gasto para codificá-los numa única transação."""
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(model, key, vector.tobytes()) for key, vector in items]
+            )
+            self.conn.execute(
+                "INSERT INTO encode_cost VALUES (?, ?, ?) ON CONFLICT(model) DO UPDATE SET "
+                "texts = texts + excluded.texts, seconds = seconds + excluded.seconds",
+                (model, len(items), encode_sec)
+            )
+            self.conn.commit()
+
+    def seconds_per_text(self, model: str) -> float:
+        """Custo médio histórico de codificar um texto com o modelo."""
+        with self._lock:
+            row = self.conn.execute("SELECT texts, seconds FROM encode_cost WHERE model = ?", (model,)).fetchone()
+        return row[1] / row[0] if row and row[0] else 0.0
+
+    def size(self) -> dict:
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        size_bytes = sum(os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal")
+                         if os.path.exists(path))
+        return {"entries": entries, "size_mb": round(size_bytes / 1024 / 1024, 2)}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings do LangChain com o EmbeddingCache na frente: só os textos
+    ausentes no cache vão para o modelo. Os vetores devolvidos são sempre os
+    arredondados para float16, então cache quente e frio dão o mesmo resultado.
+
+    Só os documentos vão para o SQLite: as consultas são texto livre do usuário
+    e cresceriam sem limite, então ficam num LRU em memória de
+    query_cache_size entradas.
+
+    on_lookup(operação, acertos, falhas, segundos no modelo), se informado, é
+    chamado a cada embed_query/embed_documents (métricas da API).
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache = None, on_lookup=None,
+                 query_cache_size: int = EMBEDDING_QUERY_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache or EmbeddingCache()
+        self.on_lookup = on_lookup
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()  # chave do texto -> vetor float16
+        self._queries_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.encode_sec = 0.0
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [text_key(text) for text in texts]
+        cached = self.cache.get_many(self.model_name, list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        elapsed = 0.0
+        if missing:
+            start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            elapsed = time.perf_counter() - start
+            self.encode_sec += elapsed
+            encoded = [(key, np.asarray(vector, dtype=np.float16)) for key, vector in zip(missing, vectors)]
+            self.cache.put_many(self.model_name, encoded, elapsed)
+            cached.update(encoded)
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        if self.on_lookup is not None:
+            self.on_lookup("documents", len(texts) - len(missing), len(missing), elapsed)
+        return [cached[key].astype(np.float32).tolist() for key in keys]
+
+    def embed_query(self, text: str) -> list:
+        key = text_key(text)
+        with self._queries_lock:
+            cached = self._queries.get(key)
+            if cached is not None:
+                self._queries.move_to_end(key)
+        if cached is None:
+            start = time.perf_counter()
+            cached = np.asarray(self.embeddings.embed_query(text), dtype=np.float16)
+            elapsed = time.perf_counter() - start
+            self.encode_sec += elapsed
+            with self._queries_lock:
+                self._queries[key] = cached
+                while len(self._queries) > self.query_cache_size:
+                    self._queries.popitem(last=False)
+            self.misses += 1
+            if self.on_lookup is not None:
+                self.on_lookup("query", 0, 1, elapsed)
+        else:
+            self.hits += 1
+            if self.on_lookup is not None:
+                self.on_lookup("query", 1, 0, 0.0)
+        return cached.astype(np.float32).tolist()
+
+    def stats(self) -> dict:
+        """Acertos, taxa de acerto, tempo economizado (acertos x custo médio histórico) e tamanho."""
+        lookups = self.hits + self.misses
+        per_text = self.cache.seconds_per_text(self.model_name)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "encode_sec": round(self.encode_sec, 3),
+            "time_saved_sec": round(self.hits * per_text, 3),
+            **self.cache.size()
+        }
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    Carrega o modelo de embeddings numa thread em segundo plano, para a API
+    ficar pronta sem esperar o modelo. As chamadas aguardam o carregamento;
+    com CachedEmbeddings na frente, consultas já vistas nem chegam aqui.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._model = None
+        self._error = None
+        self._ready = threading.Event()
+        threading.Thread(target=self._load, name="embedding-loader", daemon=True).start()
+
+    def _load(self):
+        try:
+            self._model = self._factory()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    @property
+    def model(self) -> Embeddings:
+        self._ready.wait()
+        if self._error is not None:
+            raise RuntimeError(f"Falha ao carregar o modelo de embeddings: {self._error}")
+        return self._model
+
+    def embed_documents(self, texts: list) -> list:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        return self.model.embed_query(text)
@@ -0,0 +1,94 @@
+# modules/idempotency.py
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+# Configurações
+IDEMPOTENCY_DB_PATH = os.getenv("IDEMPOTENCY_DB_PATH", "idempotency.db")
+IDEMPOTENCY_TTL_SEC = int(os.getenv("IDEMPOTENCY_TTL_SEC", str(24 * 3600)))
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyConflict(Exception):
+    """A mesma chave foi reutilizada com um corpo de requisição diferente."""
+
+
+def request_fingerprint(payload) -> str:
+    """Hash estável do corpo da requisição, para detectar reuso indevido da chave."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Guarda a resposta de cada (usuário, operação, chave) por IDEMPOTENCY_TTL_SEC.
+    Se o frontend repetir a requisição (ex.: após timeout), devolvemos a resposta
+    salva em vez de executar de novo.
+    """
+
+    def __init__(self, db_path: str = IDEMPOTENCY_DB_PATH, ttl: int = IDEMPOTENCY_TTL_SEC):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS idempotency (
+                   user_id TEXT NOT NULL,
+                   scope TEXT NOT NULL,
+                   key TEXT NOT NULL,
+                   fingerprint TEXT NOT NULL,
+                   response TEXT NOT NULL,
+                   created_at REAL NOT NULL,
+                   PRIMARY KEY (user_id, scope, key)
+               )"""
+        )
+        self.conn.commit()
+
+    def get(self, user_id: str, scope: str, key: str, fingerprint: str):
+        """Resposta salva para a chave, ou None. Lança IdempotencyConflict se o corpo mudou."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT fingerprint, response FROM idempotency "
+                "WHERE user_id = ? AND scope = ? AND key = ? AND created_at >= ?",
+                (user_id, scope, key, time.time() - self.ttl)
+            ).fetchone()
+        if not row:
+            return None
+        if row[0] != fingerprint:
+            raise IdempotencyConflict(key)
+        return json.loads(row[1])
+
+    def begin(self, user_id: str, scope: str, key: str) -> bool:
+        """Marca a chave como em execução. False se já houver uma requisição igual em andamento."""
+        with self._lock:
+            if (user_id, scope, key) in self._in_flight:
+                return False
+            self._in_flight.add((user_id, scope, key))
+            return True
+
+    def end(self, user_id: str, scope: str, key: str):
+        with self._lock:
+            self._in_flight.discard((user_id, scope, key))
+
+    def save(self, user_id: str, scope: str, key: str, fingerprint: str, response: dict):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO idempotency VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, scope, key, fingerprint, json.dumps(response, default=str), time.time())
+            )
+            self.conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM idempotency WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
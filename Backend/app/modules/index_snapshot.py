@@ -0,0 +1,240 @@
+# modules/index_snapshot.py
+import os
+import mmap
+import json
+import struct
+import hashlib
+import numpy as np
+from datetime import datetime, timezone
+
+# Configurações
+# Caminho absoluto: gravado pela ingestão (cwd = Backend/) e lido pela API (cwd = app/)
+SNAPSHOT_PATH = os.getenv(
+    "INDEX_SNAPSHOT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bulas_local.snap")
+)
+FORMAT_VERSION = 1
+_MAGIC = b"BULSNAP\x00"
+_HEADER_LEN = struct.Struct("<I")
+_ALIGN = 64           # seções alinhadas para o np.frombuffer direto no mmap
+_SEARCH_BLOCK = 65536  # linhas convertidas para float32 por vez na busca
+
+# Layout do arquivo:
+#   MAGIC | tamanho do cabeçalho (uint32) | cabeçalho JSON | padding | corpo
+# O cabeçalho traz versão, modelo, dimensão, offsets das seções (relativos ao
+# corpo) e o SHA-256 do corpo. Seções do corpo, nesta ordem:
+#   vectors   float16 [count x dim]   embeddings como estão no Chroma
+#   sq_norms  float32 [count]         |v|^2, para a distância L2 sem percorrer os vetores
+#   offsets   uint64  [count + 1]     início de cada texto em 'texts'
+#   texts     utf-8                   textos dos chunks, concatenados
+#   metadata  JSON                    {"ids": [...], "metadatas": [...]}
+#   catalog   JSON                    verbetes do DrugCatalog (índice de nomes)
+
+
+class SnapshotError(ValueError):
+    """Arquivo que não é um snapshot, de versão desconhecida ou corrompido."""
+
+
+def _pad(size: int) -> bytes:
+    return b"\0" * (-size % _ALIGN)
+
+
+def write_snapshot(path: str, ids: list, embeddings, documents: list, metadatas: list,
+                   catalog_records: list, model: str, collection: str, index_version: str = None) -> dict:
+    """
+    Grava o snapshot de forma atômica (arquivo temporário + rename).
+    index_version: versão blue/green exportada (None para o diretório legado);
+    a API só usa o snapshot se ela for a versão ativa do ponteiro.
+    Retorna o cabeçalho gravado.
+    """
+    if len(ids):
+        vectors = np.asarray(embeddings, dtype=np.float16).reshape(len(ids), -1)
+    else:
+        vectors = np.zeros((0, 0), dtype=np.float16)
+    sq_norms = np.square(vectors.astype(np.float32)).sum(axis=1, dtype=np.float32)
+    encoded = [text.encode("utf-8") for text in documents]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+    sections = {
+        "vectors": vectors.tobytes(),
+        "sq_norms": sq_norms.tobytes(),
+        "offsets": offsets.tobytes(),
+        "texts": b"".join(encoded),
+        "metadata": json.dumps({"ids": list(ids), "metadatas": list(metadatas)},
+                               ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        "catalog": json.dumps(catalog_records, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+    }
+
+    digest, layout, position = hashlib.sha256(), {}, 0
+    for name, data in sections.items():
+        layout[name] = [position, len(data)]
+        digest.update(data)
+        digest.update(_pad(len(data)))
+        position += len(data) + len(_pad(len(data)))
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "collection": collection,
+        "index_version": index_version,
+        "model": model,
+        "count": len(ids),
+        "dim": int(vectors.shape[1]) if len(ids) else 0,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "sections": layout,
+        "body_bytes": position,
+        "sha256": digest.hexdigest(),
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    prefix = _MAGIC + _HEADER_LEN.pack(len(header_bytes)) + header_bytes
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(prefix + _pad(len(prefix)))
+        for data in sections.values():
+            f.write(data)
+            f.write(_pad(len(data)))
+    # Checksum completo uma vez, no arquivo gravado, antes de publicá-lo: a API só confere tamanho e cabeçalho
+    try:
+        verify_snapshot(tmp_path)
+    except SnapshotError:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return header
+
+
+def _read_header(buffer) -> tuple:
+    if buffer[:len(_MAGIC)] != _MAGIC:
+        raise SnapshotError("Arquivo não é um snapshot do índice.")
+    start = len(_MAGIC) + _HEADER_LEN.size
+    (length,) = _HEADER_LEN.unpack(buffer[len(_MAGIC):start])
+    header = json.loads(bytes(buffer[start:start + length]))
+    if header.get("format_version") != FORMAT_VERSION:
+        raise SnapshotError(f"Versão de snapshot não suportada: {header.get('format_version')}.")
+    body_start = start + length + len(_pad(start + length))
+    if len(buffer) - body_start != header["body_bytes"]:
+        raise SnapshotError("Snapshot truncado.")
+    sections = header["sections"]
+    if any(offset + size > header["body_bytes"] for offset, size in sections.values()):
+        raise SnapshotError("Seção do snapshot fora do arquivo.")
+    count, dim = header["count"], header["dim"]
+    expected = {"vectors": count * dim * 2, "sq_norms": count * 4, "offsets": (count + 1) * 8}
+    if any(sections[name][1] != size for name, size in expected.items()):
+        raise SnapshotError("Seções do snapshot não batem com count/dim do cabeçalho.")
+    return header, body_start
+
+
+class IndexSnapshot:
+    """
+    Snapshot do índice aberto via mmap: os vetores são lidos direto do arquivo
+    (nada é copiado na abertura) e textos/metadados só são decodificados
+    quando usados. Substitui o ChromaDB na API (busca exata por força bruta,
+    mesma distância L2 do Chroma).
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH, verify: bool = False):
+        """
+        Na abertura só o cabeçalho e o tamanho de cada seção são conferidos (sem
+        ler o corpo). verify=True calcula também o SHA-256 do arquivo inteiro,
+        o que já é feito ao gravar (write_snapshot) e por verify_snapshot.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.header, self._body = _read_header(self._mm)
+            if verify:
+                self.verify()
+        except Exception:
+            self.close()
+            raise
+
+        count, dim = self.header["count"], self.header["dim"]
+        self.vectors = self._array("vectors", np.float16).reshape(count, dim)
+        self.sq_norms = self._array("sq_norms", np.float32)
+        self._offsets = self._array("offsets", np.uint64)
+        self._metadata = None
+
+    def _section(self, name: str) -> tuple:
+        offset, length = self.header["sections"][name]
+        return self._body + offset, length
+
+    def _array(self, name: str, dtype) -> np.ndarray:
+        offset, length = self._section(name)
+        return np.frombuffer(self._mm, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset)
+
+    def _json(self, name: str):
+        offset, length = self._section(name)
+        return json.loads(self._mm[offset:offset + length])
+
+    def __len__(self):
+        return self.header["count"]
+
+    def verify(self):
+        """Confere o SHA-256 do corpo com o do cabeçalho (SnapshotError se divergir)."""
+        with memoryview(self._mm) as view:
+            digest = hashlib.sha256(view[self._body:]).hexdigest()
+        if digest != self.header["sha256"]:
+            raise SnapshotError(f"Checksum do snapshot não confere: {self.path}")
+
+    @property
+    def ids(self) -> list:
+        return self._load_metadata()["ids"]
+
+    @property
+    def metadatas(self) -> list:
+        return self._load_metadata()["metadatas"]
+
+    def _load_metadata(self) -> dict:
+        if self._metadata is None:
+            self._metadata = self._json("metadata")
+        return self._metadata
+
+    def document(self, index: int) -> str:
+        offset, _ = self._section("texts")
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._mm[offset + start:offset + end].decode("utf-8")
+
+    def catalog_records(self) -> list:
+        """Verbetes do catálogo (dicts no formato de DrugRecord)."""
+        return self._json("catalog")
+
+    def search(self, query_vector, k: int) -> list:
+        """
+        Os k chunks mais próximos da consulta.
+
+        Returns:
+            [(índice, distância L2 ao quadrado)], do mais próximo ao mais distante
+        """
+        if not len(self):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        distances = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), _SEARCH_BLOCK):
+            block = self.vectors[start:start + _SEARCH_BLOCK].astype(np.float32)
+            distances[start:start + len(block)] = block @ query
+        distances = self.sq_norms - 2 * distances + float(query @ query)
+        k = min(k, len(self))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(int(index), max(float(distances[index]), 0.0)) for index in nearest]
+
+    def where(self, field: str, values) -> list:
+        """Índices dos chunks cujo metadado field está em values (como o $in do Chroma)."""
+        values = set(values)
+        return [index for index, metadata in enumerate(self.metadatas) if metadata.get(field) in values]
+
+    def close(self):
+        self.vectors = self.sq_norms = self._offsets = None
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+
+def verify_snapshot(path: str) -> dict:
+    """Valida formato e checksum de um snapshot; retorna o cabeçalho."""
+    snapshot = IndexSnapshot(path, verify=True)
+    header = snapshot.header
+    snapshot.close()
+    return header
@@ -0,0 +1,222 @@
+# modules/index_versions.py
+import os
+import re
+import json
+import time
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+# Configurações
+# Caminho absoluto: gravado pela ingestão (cwd = Backend/) e lido pela API (cwd = app/)
+INDEX_VERSIONS_DIR = os.getenv(
+    "INDEX_VERSIONS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "index_versions")
+)
+# ChromaDB de antes da primeira versão (ingestão e API resolvem o mesmo caminho absoluto)
+LEGACY_DB_DIR = os.getenv(
+    "CHROMA_DB_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "chroma_bulas_local")
+)
+POINTER_FILE = "current.json"
+CATALOG_FILE = "drug_catalog.json"    # catálogo de verbetes de cada versão
+POLL_INTERVAL_SEC = float(os.getenv("INDEX_POLL_SEC", "2"))
+WRITE_LOCK_FILE = "write.lock"
+WRITE_LOCK_TIMEOUT_SEC = float(os.getenv("INDEX_WRITE_LOCK_SEC", "600"))
+
+# Cada versão é um diretório próprio do ChromaDB (bulas_local@v3/...): a
+# ingestão grava num SQLite separado do que a API está lendo, sem disputar lock
+_VERSION = re.compile(r"^(?P<collection>.+)@v(?P<number>\d+)$")
+
+
+def version_name(collection: str, number: int) -> str:
+    return f"{collection}@v{number}"
+
+
+def version_dir(name: str, base_dir: str = INDEX_VERSIONS_DIR) -> str:
+    return os.path.join(base_dir, name)
+
+
+def list_versions(collection: str, base_dir: str = INDEX_VERSIONS_DIR) -> list:
+    """[(número, nome)] das versões da coleção em disco, da mais antiga à mais nova."""
+    if not os.path.isdir(base_dir):
+        return []
+    versions = []
+    for name in os.listdir(base_dir):
+        match = _VERSION.match(name)
+        if match and match.group("collection") == collection and os.path.isdir(os.path.join(base_dir, name)):
+            versions.append((int(match.group("number")), name))
+    return sorted(versions)
+
+
+def read_pointer(base_dir: str = INDEX_VERSIONS_DIR) -> Optional[dict]:
+    """Versão ativa ({'version', 'number', 'activated_at', ...}) ou None se ainda não há versões."""
+    try:
+        with open(os.path.join(base_dir, POINTER_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_pointer(name: str, number: int, base_dir: str = INDEX_VERSIONS_DIR, **extra) -> dict:
+    """
+    Ativa uma versão: troca o ponteiro de forma atômica (arquivo temporário +
+    rename). A versão que estava ativa fica registrada em 'previous'.
+    """
+    current = read_pointer(base_dir)
+    pointer = {
+        "version": name,
+        "number": number,
+        "previous": current["version"] if current and current["version"] != name else None,
+        "activated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **extra,
+    }
+    os.makedirs(base_dir, exist_ok=True)
+    path = os.path.join(base_dir, POINTER_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pointer, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return pointer
+
+
+@contextmanager
+def write_lock(base_dir: str = INDEX_VERSIONS_DIR, timeout: float = WRITE_LOCK_TIMEOUT_SEC):
+    """
+    Lock entre processos para gravar na versão ativa: o write-through da API
+    (bulas da web) e a ingestão (cópia no begin_build, troca do ponteiro no
+    publish) não se sobrepõem. Usa uma transação exclusiva do SQLite, então
+    funciona em qualquer sistema e é liberado se o processo morrer.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(base_dir, WRITE_LOCK_FILE), timeout=timeout, isolation_level=None)
+    try:
+        conn.execute("BEGIN EXCLUSIVE")
+        try:
+            yield
+        finally:
+            conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+
+
+def retire_versions(collection: str, base_dir: str = INDEX_VERSIONS_DIR) -> list:
+    """
+    Apaga as versões anteriores à ativa (inclusive builds que falharam no
+    smoke check), menos a que estava ativa antes dela: outros processos da
+    API ainda podem estar drenando consultas nela. Versões mais novas que a
+    ativa podem ser builds em andamento e ficam. Retorna os nomes apagados.
+    """
+    pointer = read_pointer(base_dir)
+    if pointer is None:
+        return []
+    retired = [name for number, name in list_versions(collection, base_dir)
+               if number < pointer["number"] and name != pointer.get("previous")]
+    for name in retired:
+        shutil.rmtree(version_dir(name, base_dir), ignore_errors=True)
+    return retired
+
+
+class _Handle:
+    def __init__(self, index, version: str):
+        self.index = index
+        self.version = version
+        self.refs = 0
+        self.retired = False
+
+
+class IndexRouter:
+    """
+    Entrega às consultas a versão ativa do índice. Uma thread observa o
+    ponteiro; quando ele muda, a nova versão é aberta em segundo plano e
+    trocada atomicamente. A anterior é fechada quando a última consulta que
+    a usava termina. Sem opener, a versão é fixa (snapshot ou diretório legado).
+    """
+
+    def __init__(self, index, version: str, opener=None, base_dir: str = INDEX_VERSIONS_DIR,
+                 poll_interval: float = POLL_INTERVAL_SEC):
+        """
+        Args:
+            index: Versão já aberta (deve ter close())
+            version: Nome da versão aberta
+            opener: Função (ponteiro) -> índice aberto, para as próximas versões
+            base_dir: Diretório das versões e do ponteiro
+            poll_interval: Segundos entre as leituras do ponteiro
+        """
+        self.base_dir = base_dir
+        self._opener = opener
+        self._lock = threading.Lock()
+        self._active = _Handle(index, version)
+        self._pointer_mtime = self._mtime()
+        self._stop = threading.Event()
+        if opener is not None:
+            threading.Thread(target=self._watch, args=(poll_interval,), name="index-router", daemon=True).start()
+
+    @property
+    def version(self) -> str:
+        return self._active.version
+
+    @contextmanager
+    def acquire(self):
+        """Usa a versão ativa durante o bloco; uma troca no meio não a fecha."""
+        with self._lock:
+            handle = self._active
+            handle.refs += 1
+        try:
+            yield handle.index
+        finally:
+            with self._lock:
+                handle.refs -= 1
+                drained = handle.retired and handle.refs == 0
+            if drained:
+                self._close(handle)
+
+    def _mtime(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.base_dir, POINTER_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _watch(self, poll_interval: float):
+        while not self._stop.wait(poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[Index] Falha ao trocar de versão: {e}")
+
+    def refresh(self) -> bool:
+        """Troca para a versão do ponteiro, se mudou. Retorna True se trocou."""
+        mtime = self._mtime()
+        if mtime == self._pointer_mtime:
+            return False
+        pointer = read_pointer(self.base_dir)
+        if pointer is None or pointer["version"] == self._active.version:
+            self._pointer_mtime = mtime
+            return False
+
+        # Abertura fora do lock: as consultas seguem na versão atual enquanto isso.
+        # Se falhar, o ponteiro é relido na próxima rodada
+        start = time.perf_counter()
+        new = _Handle(self._opener(pointer), pointer["version"])
+        self._pointer_mtime = mtime
+        with self._lock:
+            old, self._active = self._active, new
+            old.retired = True
+            drained = old.refs == 0
+        print(f"[Index] Versão {new.version} ativa (aberta em {time.perf_counter() - start:.2f}s); "
+              f"{old.version} sai quando as consultas em andamento terminarem.")
+        if drained:
+            self._close(old)
+        return True
+
+    @staticmethod
+    def _close(handle: _Handle):
+        handle.index.close()
+        print(f"[Index] Versão {handle.version} aposentada.")
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            handle = self._active
+        handle.index.close()
@@ -5,6 +5,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 from typing import Optional
+from modules.metrics import invoke_llm
 
 
 # 1. Atualizamos o modelo para incluir 'message'
@@ -51,7 +52,7 @@ def classify_intent(query: str, llm: ChatGoogleGenerativeAI) -> IntentResponse:
     prompt = prompt_template.format(user_query=query)
 
     try:
-        response = llm.invoke(prompt)
+        response = invoke_llm(llm, prompt, "intent")
         content = response.content
 
         # Limpeza básica do JSON
@@ -0,0 +1,175 @@
+# modules/job_queue.py
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import modules.calendar_manager as calendar
+
+# Configurações
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+
+# Estados de um job
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINAL_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobStore:
+    """Persiste os jobs de agendamento no SQLite, para sobreviverem a um restart."""
+
+    def __init__(self, db_path: str = JOBS_DB_PATH):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                   job_id TEXT PRIMARY KEY,
+                   user_id TEXT NOT NULL,
+                   status TEXT NOT NULL,
+                   treatment_id TEXT NOT NULL,
+                   details TEXT NOT NULL,
+                   start_time TEXT NOT NULL,
+                   total INTEGER NOT NULL,
+                   done INTEGER NOT NULL DEFAULT 0,
+                   next_dose INTEGER NOT NULL DEFAULT 0,
+                   errors TEXT NOT NULL DEFAULT '[]',
+                   cancel_requested INTEGER NOT NULL DEFAULT 0,
+                   created_at REAL NOT NULL,
+                   updated_at REAL NOT NULL
+               )"""
+        )
+        self.conn.commit()
+
+    def create(self, user_id: str, treatment_id: str, details: dict, start_time: datetime, total: int) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (job_id, user_id, status, treatment_id, details, start_time, total, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, QUEUED, treatment_id, json.dumps(details), start_time.isoformat(), total, now, now)
+            )
+            self.conn.commit()
+        return job_id
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self.conn.execute(f"UPDATE jobs SET {columns} WHERE job_id = ?", (*fields.values(), job_id))
+            self.conn.commit()
+
+    def pending(self) -> list:
+        """Jobs que não terminaram (ex.: interrompidos por um restart)."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def job_progress(job: dict) -> dict:
+    """Visão pública de um job (polling / SSE)."""
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "treatment_id": job["treatment_id"],
+        "medicamento": json.loads(job["details"])["medicamento"],
+        "done": job["done"],
+        "total": job["total"],
+        "errors": json.loads(job["errors"]),
+    }
+
+
+class JobManager:
+    """
+    Executa os agendamentos longos num pool de threads. O progresso fica no
+    JobStore a cada dose; como os IDs das doses são determinísticos, retomar
+    um job após restart não duplica eventos.
+    """
+
+    def __init__(self, store: JobStore, service_provider, workers: int = JOB_WORKERS, outbox=None):
+        self.store = store
+        self.service_provider = service_provider  # user_id -> serviço do Calendar
+        self.outbox = outbox  # doses que falharem vão para o outbox em vez de se perderem
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="calendar-job")
+
+    def submit(self, user_id: str, treatment_id: str, details: dict, start_time: datetime) -> dict:
+        job_id = self.store.create(user_id, treatment_id, details, start_time, calendar.count_doses(details))
+        self.executor.submit(self._run, job_id)
+        return job_progress(self.store.get(job_id))
+
+    def resume_pending(self) -> int:
+        """Recoloca na fila os jobs que não terminaram antes do último desligamento."""
+        pending = self.store.pending()
+        for job_id in pending:
+            self.executor.submit(self._run, job_id)
+        return len(pending)
+
+    def cancel(self, job_id: str):
+        """Pede o cancelamento; o worker para antes da próxima dose."""
+        job = self.store.get(job_id)
+        if job and job["status"] not in FINAL_STATES:
+            self.store.update(job_id, cancel_requested=1)
+            if job["status"] == QUEUED:
+                self.store.update(job_id, status=CANCELLED)
+        return self.store.get(job_id)
+
+    def shutdown(self):
+        # Jobs em execução ficam como 'running' no banco e são retomados no próximo start
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        job = self.store.get(job_id)
+        return job is None or bool(job["cancel_requested"])
+
+    def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINAL_STATES:
+            return
+
+        try:
+            service = self.service_provider(job["user_id"])
+            if service is None:
+                raise RuntimeError("Google Calendar não autenticado para este usuário.")
+
+            self.store.update(job_id, status=RUNNING)
+            details = json.loads(job["details"])
+            start_time = datetime.fromisoformat(job["start_time"])
+            done, errors = job["done"], json.loads(job["errors"])
+            print(f"[Jobs] Job {job_id}: agendando a partir da dose {job['next_dose'] + 1}/{job['total']}...")
+
+            for i, event_body in calendar.iter_dose_events(details, start_time, job["treatment_id"], job["next_dose"]):
+                if self._is_cancelled(job_id):
+                    self.store.update(job_id, status=CANCELLED)
+                    print(f"[Jobs] Job {job_id} cancelado na dose {i + 1}.")
+                    return
+                if calendar.insert_dose_event(service, event_body):
+                    done += 1
+                elif self.outbox is not None:
+                    self.outbox.append(job["user_id"], "insert", event_body['id'], event_body, job["treatment_id"])
+                    done += 1  # será sincronizada pelo outbox
+                else:
+                    errors.append(event_body['id'])
+                self.store.update(job_id, done=done, next_dose=i + 1, errors=json.dumps(errors))
+
+            self.store.update(job_id, status=COMPLETED)
+            print(f"[Jobs] Job {job_id} concluído: {done}/{job['total']} doses.")
+        except Exception as e:
+            print(f"[Jobs ERRO] Job {job_id} falhou: {e}")
+            errors = json.loads(self.store.get(job_id)["errors"]) + [str(e)]
+            self.store.update(job_id, status=FAILED, errors=json.dumps(errors))
@@ -0,0 +1,292 @@
+# modules/metrics.py
+import os
+import time
+import bisect
+import threading
+
+# Configurações
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "bulicoso")
+# Segundos: de um embedding (ms) a uma resposta lenta do LLM ou do Calendar
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Métricas registradas, na ordem de exposição em /metrics
+REGISTRY = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """
+    Base no formato do prometheus_client, sem a dependência: uma série por
+    combinação de rótulos. labels() é uma busca em dict e cada observação
+    custa um lock sem disputa, desprezível perto do que é medido.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # sem rótulos: a série aparece (zerada) desde o início
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Série de uma combinação de rótulos (strings, na ordem de labelnames)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera os rótulos {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _series(self):
+        return list(self._children.items())
+
+    def _lines(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._lines()])
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _lines(self):
+        for values, child in self._series():
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}"
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+
+class DerivedGauge(_Metric):
+    """Gauge calculado só na leitura de /metrics: collect() -> [(valores dos rótulos, valor)]."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple, collect):
+        super().__init__(name, help_text, labelnames)
+        self.collect = collect
+
+    def _lines(self):
+        for values, value in self.collect():
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(value)}"
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # o último é o +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        # le é inclusivo: bisect_left acha o primeiro limite >= value
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Context manager que observa a duração do bloco (também em caso de exceção)."""
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def _lines(self):
+        for values, child in self._series():
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}"
+
+
+def render() -> str:
+    """Todas as métricas no formato texto do Prometheus (0.0.4)."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# --- Métricas da API ---
+
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requisições HTTP em andamento.")
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds",
+                                 "Duração das requisições HTTP por rota (modelo do path) e status.",
+                                 ("method", "route", "status"))
+EMBEDDING_SECONDS = Histogram("embedding_duration_seconds",
+                              "Tempo do modelo de embeddings por chamada (só os textos fora do cache).",
+                              ("operation",))
+VECTOR_SEARCH_SECONDS = Histogram("vector_search_duration_seconds",
+                                  "Recuperação do RAG: exact = filtro pelo catálogo, similarity = busca vetorial "
+                                  "(inclui o embedding da pergunta), web = bula buscada na web.", ("method",))
+LLM_SECONDS = Histogram("llm_duration_seconds", "Latência das chamadas ao LLM por ponto de chamada.",
+                        ("call_site",))
+LLM_ERRORS = Counter("llm_errors_total", "Chamadas ao LLM que lançaram erro.", ("call_site",))
+CALENDAR_CALLS = Counter("calendar_api_calls_total", "Requisições HTTP à API do Google Calendar.",
+                         ("operation", "status"))
+CALENDAR_SECONDS = Histogram("calendar_api_duration_seconds", "Latência das requisições à API do Google Calendar.",
+                             ("operation",))
+CACHE_REQUESTS = Counter("cache_requests_total", "Consultas aos caches da API por resultado (hit/miss).",
+                         ("cache", "result"))
+
+
+def _hit_ratios():
+    totals = {}
+    for (cache, result), child in CACHE_REQUESTS._series():
+        hits, lookups = totals.get(cache, (0.0, 0.0))
+        totals[cache] = (hits + (child.value if result == "hit" else 0.0), lookups + child.value)
+    return [((cache,), round(hits / lookups, 4)) for cache, (hits, lookups) in sorted(totals.items()) if lookups]
+
+
+CACHE_HIT_RATIO = DerivedGauge("cache_hit_ratio", "Taxa de acerto de cada cache desde o início do processo.",
+                               ("cache",), _hit_ratios)
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0):
+    """Conta acertos e falhas de um cache."""
+    if hits:
+        CACHE_REQUESTS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, "miss").inc(misses)
+
+
+def record_embedding(operation: str, hits: int, misses: int, encode_sec: float):
+    """Gancho do CachedEmbeddings: cache de embeddings e tempo do modelo."""
+    record_cache("embeddings", hits, misses)
+    if misses:
+        EMBEDDING_SECONDS.labels(operation).observe(encode_sec)
+
+
+def invoke_llm(llm, prompt, call_site: str):
+    """llm.invoke(prompt) com a latência e os erros contados por ponto de chamada (rag, fallback, intent, parser)."""
+    start = time.perf_counter()
+    try:
+        return llm.invoke(prompt)
+    except Exception:
+        LLM_ERRORS.labels(call_site).inc()
+        raise
+    finally:
+        LLM_SECONDS.labels(call_site).observe(time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """Requisições em andamento e duração por rota; a rota é o modelo do path, não o path com o medicamento."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, status).observe(time.perf_counter() - start)
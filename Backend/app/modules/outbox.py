@@ -0,0 +1,307 @@
+# modules/outbox.py
+import os
+import json
+import time
+import sqlite3
+import threading
+from googleapiclient.errors import HttpError
+
+# Configurações
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", "outbox.db")
+OUTBOX_BATCH_SIZE = 50          # limite de requisições por batch da API do Calendar
+OUTBOX_INTERVAL_SEC = 5         # intervalo entre rodadas de replay
+# Backoff exponencial por operação: 5s, 10s, 20s... até 1h entre tentativas
+OUTBOX_BACKOFF_BASE_SEC = float(os.getenv("OUTBOX_BACKOFF_BASE_SEC", "5"))
+OUTBOX_BACKOFF_MAX_SEC = float(os.getenv("OUTBOX_BACKOFF_MAX_SEC", "3600"))
+# Erros definitivos (400, 403...) até a operação ficar 'failed'; falhas de rede,
+# 401, 429 e 5xx (Google fora do ar) só adiam, sem contar para o limite
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+
+INSERT, PATCH, DELETE = "insert", "patch", "delete"
+
+# Colunas adicionadas depois da primeira versão (journals antigos são migrados)
+_MIGRATIONS = {
+    "retries": "INTEGER NOT NULL DEFAULT 0",        # tentativas sem sucesso (define o backoff)
+    "next_attempt_at": "REAL NOT NULL DEFAULT 0",   # não reenviar antes disso
+    "last_error": "TEXT",
+}
+
+
+def is_transient(exception) -> bool:
+    """Falha que passa sozinha (rede, token, limite de taxa, Google fora do ar)."""
+    if not isinstance(exception, HttpError):
+        return True
+    status = exception.resp.status
+    if status == 403:
+        return "ratelimitexceeded" in str(exception).lower()
+    return status in (401, 408, 429) or status >= 500
+
+
+def coalesce(ops: list) -> list:
+    """
+    Reduz a sequência de operações pendentes de um mesmo evento (em ordem de seq):
+    - insert + delete      -> nada (o evento nunca chegou ao Google)
+    - insert + patch       -> insert com o corpo já atualizado
+    - patch + patch        -> um patch com os campos combinados
+    - patch + delete       -> delete
+    ops: (seq, op, body, retries). Um insert que já foi tentado (retries > 0)
+    pode ter sido aplicado apesar da falha transitória: não é anulado nem
+    absorve patches; o delete seguinte vale por si (404/410 se não chegou).
+    Retorna uma lista de (op, body, seqs): as seqs cobertas por cada operação final.
+    """
+    result, attempted = [], []
+    for seq, op, body, retries in ops:
+        last = result[-1] if result else None
+        fresh_insert = last and last[0] == INSERT and not attempted[-1]
+        if fresh_insert and op == DELETE:
+            result.pop()
+            attempted.pop()
+            # Nada a enviar, mas as seqs precisam ser removidas do journal
+            result.append((None, None, last[2] + [seq]))
+            attempted.append(False)
+        elif last and op == PATCH and (fresh_insert or last[0] == PATCH):
+            result[-1] = (last[0], {**last[1], **body}, last[2] + [seq])
+        elif last and op == DELETE and last[0] == PATCH:
+            result[-1] = (DELETE, None, last[2] + [seq])
+        else:
+            result.append((op, body, [seq]))
+            attempted.append(op == INSERT and retries > 0)
+    return result
+
+
+class Outbox:
+    """
+    Journal local (append-only) das mutações do Calendar. A operação é gravada
+    antes de respondermos ao usuário; um worker envia ao Google em batches.
+    """
+
+    def __init__(self, db_path: str = OUTBOX_DB_PATH):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS outbox (
+                   seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                   user_id TEXT NOT NULL,
+                   treatment_id TEXT,
+                   op TEXT NOT NULL,
+                   event_id TEXT NOT NULL,
+                   body TEXT,
+                   attempts INTEGER NOT NULL DEFAULT 0,
+                   status TEXT NOT NULL DEFAULT 'pending',
+                   created_at REAL NOT NULL
+               )"""
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(outbox)")}
+        for name, definition in _MIGRATIONS.items():
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE outbox ADD COLUMN {name} {definition}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, user_id, seq)")
+        self.conn.commit()
+
+    # --- Escrita (caminho da requisição) ---
+
+    def append_many(self, user_id: str, ops: list, treatment_id: str = None) -> int:
+        """Grava as operações [(op, event_id, body)] numa única transação."""
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO outbox (user_id, treatment_id, op, event_id, body, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(user_id, treatment_id, op, event_id, json.dumps(body) if body else None, now)
+                 for op, event_id, body in ops]
+            )
+            self.conn.commit()
+        self._wakeup.set()
+        return len(ops)
+
+    def append(self, user_id: str, op: str, event_id: str, body: dict = None, treatment_id: str = None):
+        self.append_many(user_id, [(op, event_id, body)], treatment_id)
+
+    def pending_inserts(self, user_id: str, treatment_id: str) -> list:
+        """IDs de doses de um tratamento que ainda não foram enviadas ao Google."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT event_id FROM outbox WHERE status = 'pending' AND user_id = ? "
+                "AND treatment_id = ? AND op = ?", (user_id, treatment_id, INSERT)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def pending_count(self, user_id: str = None) -> int:
+        query, params = "SELECT COUNT(*) FROM outbox WHERE status = 'pending'", ()
+        if user_id:
+            query, params = query + " AND user_id = ?", (user_id,)
+        with self._lock:
+            return self.conn.execute(query, params).fetchone()[0]
+
+    def failed(self, user_id: str) -> list:
+        """Operações do usuário que esgotaram as tentativas, com o último erro."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT seq, treatment_id, op, event_id, attempts, last_error, created_at FROM outbox "
+                "WHERE status = 'failed' AND user_id = ? ORDER BY seq", (user_id,)
+            ).fetchall()
+        return [{"seq": seq, "treatment_id": treatment_id, "op": op, "event_id": event_id, "attempts": attempts,
+                 "last_error": last_error, "created_at": created_at}
+                for seq, treatment_id, op, event_id, attempts, last_error, created_at in rows]
+
+    def retry_failed(self, user_id: str) -> int:
+        """Devolve as operações 'failed' do usuário para a fila, com as tentativas zeradas."""
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, retries = 0, next_attempt_at = 0 "
+                "WHERE status = 'failed' AND user_id = ?", (user_id,)
+            )
+            self.conn.commit()
+        self._wakeup.set()
+        return cursor.rowcount
+
+    # --- Replay ---
+
+    def _pending_by_user(self) -> dict:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT seq, user_id, op, event_id, body, retries, next_attempt_at FROM outbox "
+                "WHERE status = 'pending' ORDER BY seq"
+            ).fetchall()
+        by_user = {}
+        for seq, user_id, op, event_id, body, retries, next_attempt_at in rows:
+            events = by_user.setdefault(user_id, {})
+            events.setdefault(event_id, []).append(
+                (seq, op, json.loads(body) if body else None, retries, next_attempt_at))
+        return by_user
+
+    def _ack(self, seqs: list):
+        with self._lock:
+            self.conn.executemany("DELETE FROM outbox WHERE seq = ?", [(seq,) for seq in seqs])
+            self.conn.commit()
+
+    def _retry_later(self, seqs: list, error: str, count_attempt: bool = True):
+        """
+        Adia as operações com backoff exponencial. Só erros definitivos contam
+        para OUTBOX_MAX_ATTEMPTS; falhas transitórias adiam indefinidamente.
+        """
+        if not seqs:
+            return
+        counted = int(count_attempt)
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE outbox SET retries = retries + 1, attempts = attempts + ?, last_error = ?, "
+                "next_attempt_at = ? + min(?, ? * (1 << min(retries, 20))), "
+                "status = CASE WHEN attempts + ? >= ? THEN 'failed' ELSE status END WHERE seq = ?",
+                [(counted, error[:500], time.time(), OUTBOX_BACKOFF_MAX_SEC, OUTBOX_BACKOFF_BASE_SEC,
+                  counted, OUTBOX_MAX_ATTEMPTS, seq) for seq in seqs]
+            )
+            failed = self.conn.execute(
+                f"SELECT COUNT(*) FROM outbox WHERE status = 'failed' AND seq IN ({','.join('?' * len(seqs))})",
+                seqs
+            ).fetchone()[0] if counted else 0
+            self.conn.commit()
+        if failed:
+            print(f"[Outbox ERRO] {failed} operação(ões) marcada(s) como 'failed' após {OUTBOX_MAX_ATTEMPTS} "
+                  f"tentativas: {error}")
+
+    @staticmethod
+    def _build_request(service, op: str, event_id: str, body: dict):
+        events = service.events()
+        if op == INSERT:
+            return events.insert(calendarId='primary', body=body, fields='id')
+        if op == PATCH:
+            return events.patch(calendarId='primary', eventId=event_id, body=body, fields='id')
+        return events.delete(calendarId='primary', eventId=event_id)
+
+    def drain(self, service_provider) -> int:
+        """Envia as operações pendentes em batches. Retorna quantas foram confirmadas."""
+        applied = 0
+        now = time.time()
+        for user_id, events in self._pending_by_user().items():
+            final_ops = []
+            for event_id, ops in events.items():
+                reduced = []
+                for op, body, seqs in coalesce([pending[:4] for pending in ops]):
+                    if op is None:
+                        self._ack(seqs)  # insert + delete se anularam
+                    else:
+                        reduced.append((op, event_id, body, seqs))
+                # A ordem dentro de um batch não é garantida: só uma operação
+                # por evento em cada rodada (o restante vai na próxima); um
+                # evento em backoff espera inteiro, para não furar a ordem
+                if reduced and max(next_attempt_at for *_, next_attempt_at in ops) <= now:
+                    final_ops.append(reduced[0])
+            if not final_ops:
+                continue
+
+            seqs = [seq for *_, op_seqs in final_ops for seq in op_seqs]
+            try:
+                service = service_provider(user_id)
+            except Exception as e:
+                # Ex.: RefreshError de um token revogado. Só este usuário espera
+                print(f"[Outbox ERRO] Credenciais de '{user_id}' indisponíveis: {e}")
+                self._retry_later(seqs, f"credenciais: {e}", count_attempt=False)
+                continue
+            if service is None:
+                # Usuário sem login no momento; tenta de novo depois (com backoff)
+                self._retry_later(seqs, "usuário sem login", count_attempt=False)
+                continue
+
+            for start in range(0, len(final_ops), OUTBOX_BATCH_SIZE):
+                applied += self._send_batch(service, final_ops[start:start + OUTBOX_BATCH_SIZE])
+        return applied
+
+    def _send_batch(self, service, ops: list) -> int:
+        done, transient, failed = [], [], []
+
+        def callback(request_id, response, exception):
+            op, _, _, seqs = ops[int(request_id)]
+            status = exception.resp.status if isinstance(exception, HttpError) else None
+            # 409 em insert: já existe (ID determinístico); 404/410 em delete: já removido
+            if exception is None or (op == INSERT and status == 409) or (op == DELETE and status in (404, 410)):
+                done.extend(seqs)
+            else:
+                print(f"[Outbox ERRO] {op} falhou: {exception}")
+                (transient if is_transient(exception) else failed).append((seqs, str(exception)))
+
+        batch = service.new_batch_http_request(callback=callback)
+        for i, (op, event_id, body, _) in enumerate(ops):
+            batch.add(self._build_request(service, op, event_id, body), request_id=str(i))
+        try:
+            batch.execute()
+        except Exception as e:
+            # Falha de transporte do batch inteiro: adia tudo sem gastar tentativas
+            print(f"[Outbox ERRO] Batch falhou, será reenviado: {e}")
+            done, failed = [], []
+            transient = [(seqs, f"batch: {e}") for *_, seqs in ops]
+
+        self._ack(done)
+        for seqs, error in transient:
+            self._retry_later(seqs, error, count_attempt=False)
+        for seqs, error in failed:
+            self._retry_later(seqs, error)
+        return len(done)
+
+    # --- Worker ---
+
+    def start(self, service_provider, interval: int = OUTBOX_INTERVAL_SEC):
+        def loop():
+            while not self._stop.is_set():
+                self._wakeup.wait(interval)
+                self._wakeup.clear()
+                try:
+                    applied = self.drain(service_provider)
+                    if applied:
+                        print(f"[Outbox] {applied} operação(ões) sincronizada(s) com o Google Calendar.")
+                except Exception as e:
+                    print(f"[Outbox ERRO] Falha no replay: {e}")
+
+        self._thread = threading.Thread(target=loop, name="calendar-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._lock:
+            self.conn.close()
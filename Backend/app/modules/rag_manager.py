@@ -1,22 +1,38 @@
 # modules/rag_manager.py
 import os
 import re
+import math
 import time
+import threading
 import numpy as np
 from dotenv import load_dotenv
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
+from pydantic import BaseModel, Field
 import json
+from modules.embedding_cache import CachedEmbeddings, LazyEmbeddings
+from modules.drug_catalog import DrugCatalog, DRUG_CATALOG_PATH
+from modules.index_snapshot import IndexSnapshot, SnapshotError, SNAPSHOT_PATH
+from modules.index_versions import IndexRouter, read_pointer, version_dir, CATALOG_FILE, LEGACY_DB_DIR
+from modules.metrics import invoke_llm, record_embedding, VECTOR_SEARCH_SECONDS
 
 # Suas configurações globais do RAG
-# Resolve o caminho do banco relativo ao arquivo atual (rag_manager.py está em app/modules/)
-# Queremos chegar em app/chroma_bulas_local
-DB_DIR = "modules/chroma_bulas_local"
+# Diretório legado do ChromaDB: o mesmo caminho absoluto em que o VectorService grava
+DB_DIR = LEGACY_DB_DIR
 COLLECTION_NAME = "bulas_local"
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 RAG_TOP_K = 5
 MIN_CONFIDENCE_THRESHOLD = 0.6
+# Fallback web: bula baixada quando o índice local não tem o medicamento
+RAG_WEB_CONFIDENCE = float(os.getenv("RAG_WEB_CONFIDENCE", "0.7"))
+RAG_WEB_MAX_CHARS = int(os.getenv("RAG_WEB_MAX_CHARS", "12000"))
+# Bulas da web gravadas pelo write-through (metadado 'document' e prefixo da origem no catálogo)
+WEB_DOCUMENT = "web"
+# Snapshot exportado na ingestão (modules/index_snapshot): sem versões da ingestão, substitui o ChromaDB.
+# O checksum completo é feito ao gravar; INDEX_SNAPSHOT_VERIFY=1 o refaz em toda inicialização
+INDEX_SNAPSHOT_VERIFY = os.getenv("INDEX_SNAPSHOT_VERIFY", "0") == "1"
 
 # Seu template de prompt RAG
 RAG_PROMPT_TEMPLATE = """
@@ -43,18 +59,127 @@ Responda APENAS com o objeto JSON.
 """
 
 
+class RagAnswer(BaseModel):
+    answer: str = Field(description="Resposta para o usuário.")
+    confidence: float = Field(description="Confiança de 0 a 1.")
+
+
+class RagQueryResponse(BaseModel):
+    query: str
+    # Objeto, não uma string JSON dentro do JSON: o frontend lê response.answer direto
+    response: RagAnswer
+    confidence: float
+    time_sec: float
+
+
+def parse_llm_json(raw_text: str):
+    """Objeto JSON da resposta do LLM (sem blocos de código markdown nem texto em volta), ou None."""
+    raw_text = raw_text.strip()
+    if raw_text.startswith("```"):
+        # Remove primeira linha (```json) e última (```)
+        raw_text = re.sub(r"^```[a-zA-Z]*\n", "", raw_text)
+        raw_text = re.sub(r"\n```$", "", raw_text)
+    json_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
+    try:
+        parsed = json.loads(json_match.group(0) if json_match else raw_text)
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+class IndexVersion:
+    """
+    Uma versão aberta do índice (ChromaDB ou snapshot) e o catálogo de verbetes
+    gerado com ela. O write-through grava as bulas da web no ChromaDB e no
+    catálogo desta versão enquanto ela está em uso: o JSON é relido quando muda
+    e, com snapshot, o ChromaDB é aberto na primeira consulta a essas bulas.
+    """
+
+    def __init__(self, catalog_path: str, vectordb=None, snapshot=None, open_vectordb=None):
+        self.catalog_path = catalog_path
+        self.snapshot = snapshot
+        self._vectordb = vectordb
+        self._open_vectordb = open_vectordb
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._catalog_mtime = None
+        self.web_keys = frozenset()
+
+    @property
+    def vectordb(self):
+        if self._vectordb is None and self._open_vectordb is not None:
+            with self._lock:
+                if self._vectordb is None:
+                    self._vectordb = self._open_vectordb()
+        return self._vectordb
+
+    @property
+    def catalog(self) -> DrugCatalog:
+        """Catálogo da versão, relido só quando o JSON muda (como o VectorService._load_catalog)."""
+        try:
+            mtime = os.stat(self.catalog_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._catalog is None or mtime != self._catalog_mtime:
+            with self._lock:
+                if self.snapshot is not None:
+                    # Verbetes do snapshot + os gravados depois dele (bulas da web)
+                    catalog = DrugCatalog(self.catalog_path, records=self.snapshot.catalog_records())
+                    if mtime is not None:
+                        catalog.upsert(DrugCatalog(self.catalog_path).records.values())
+                else:
+                    catalog = DrugCatalog(self.catalog_path)
+                self.web_keys = frozenset(record.key for record in catalog.records.values()
+                                          if record.source.startswith(f"{WEB_DOCUMENT}#"))
+                self._catalog, self._catalog_mtime = catalog, mtime
+        return self._catalog
+
+    def close(self):
+        if self.snapshot is not None:
+            self.snapshot.close()
+        if self._vectordb is not None and hasattr(self._vectordb._client, "close"):
+            self._vectordb._client.close()  # libera o SQLite da versão aposentada
+
+
 class RAGManager:
-    def __init__(self, google_api_key: str):
+    def __init__(self, google_api_key: str, web_fallback=None):
+        """
+        web_fallback(medicamento) -> texto da bula ou None: busca na web quando o
+        índice local não tem o medicamento e agenda a vetorização (write-through).
+        A API injeta o de app/services (este módulo não importa app.*).
+        """
         print("[RAG] Inicializando RAG Manager...")
+        start_time = time.time()
+        self.router = None
+        self.web_fallback = web_fallback
         try:
-            self.embedding_func = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2"
-            )
-            self.vectordb = Chroma(
-                persist_directory=DB_DIR,
-                collection_name=COLLECTION_NAME,
-                embedding_function=self.embedding_func
+            # O modelo só é preciso na busca vetorial: carrega em segundo plano.
+            # Mesmo cache em disco da ingestão: perguntas repetidas não passam pelo modelo
+            self.embedding_func = CachedEmbeddings(
+                LazyEmbeddings(lambda: HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)),
+                model_name=EMBEDDING_MODEL_NAME,
+                on_lookup=record_embedding
             )
+            # Ordem: snapshot de deploy (se for da versão ativa), versões blue/green da
+            # ingestão (ponteiro), diretório legado
+            pointer = read_pointer()
+            snapshot = self._open_snapshot(pointer)
+            if snapshot is not None:
+                # Bulas da web gravadas depois do snapshot ficam no ChromaDB da versão ativa
+                directory = version_dir(pointer["version"]) if pointer else DB_DIR
+                index = IndexVersion(self._catalog_path(directory), snapshot=snapshot,
+                                     open_vectordb=lambda: self._open_chroma(directory))
+                if pointer is not None:
+                    # Próximas versões publicadas são abertas pelo ChromaDB
+                    self.router = IndexRouter(index, pointer["version"], opener=self._open_version)
+                else:
+                    self.router = IndexRouter(index, "snapshot")
+            elif pointer is not None:
+                self.router = IndexRouter(self._open_version(pointer), pointer["version"], opener=self._open_version)
+            else:
+                # Catálogo de verbetes gerado na ingestão: nome citado na pergunta -> busca exata
+                index = IndexVersion(self._catalog_path(DB_DIR), vectordb=self._open_chroma(DB_DIR))
+                self.router = IndexRouter(index, COLLECTION_NAME)
             self.llm_rag = ChatGoogleGenerativeAI(
                 model="gemini-2.5-flash",
                 temperature=0.5,
@@ -64,18 +189,124 @@ class RAGManager:
                 input_variables=["context_chunks", "question"],
                 template=RAG_PROMPT_TEMPLATE
             )
-            print("[RAG] RAG Manager carregado.")
+            with self.router.acquire() as index:
+                verbetes = len(index.catalog)
+            print(f"[RAG] RAG Manager carregado em {time.time() - start_time:.2f}s "
+                  f"(índice {self.router.version}, {verbetes} verbetes no catálogo).")
         except Exception as e:
             print(f"[RAG ERRO CRÍTICO] Falha ao carregar ChromaDB: {e}")
-            self.vectordb = None
+            self.router = None
+
+    def _open_chroma(self, directory: str):
+        return Chroma(
+            persist_directory=directory,
+            collection_name=COLLECTION_NAME,
+            embedding_function=self.embedding_func
+        )
+
+    @staticmethod
+    def _catalog_path(directory: str) -> str:
+        """O diretório legado usa o catálogo global; cada versão tem o seu (como no VectorService)."""
+        return DRUG_CATALOG_PATH if directory == DB_DIR else os.path.join(directory, CATALOG_FILE)
+
+    def _open_version(self, pointer: dict) -> IndexVersion:
+        """Abre uma versão gerada pela ingestão (diretório próprio do ChromaDB + catálogo)."""
+        directory = version_dir(pointer["version"])
+        return IndexVersion(self._catalog_path(directory), vectordb=self._open_chroma(directory))
+
+    def _open_snapshot(self, pointer: dict = None):
+        """
+        Snapshot do índice (mmap, checksum conferido), ou None para usar o
+        ChromaDB. Com versões blue/green, só vale se foi exportado da versão ativa.
+        """
+        if not os.path.exists(SNAPSHOT_PATH):
+            return None
+        try:
+            snapshot = IndexSnapshot(SNAPSHOT_PATH, verify=INDEX_SNAPSHOT_VERIFY)
+        except (SnapshotError, OSError) as e:
+            print(f"[RAG AVISO] Snapshot inválido ({e}). Usando o ChromaDB.")
+            return None
+        if snapshot.header["model"] != EMBEDDING_MODEL_NAME:
+            print(f"[RAG AVISO] Snapshot gerado com outro modelo ({snapshot.header['model']}). Usando o ChromaDB.")
+            snapshot.close()
+            return None
+        if pointer is not None and snapshot.header.get("index_version") != pointer["version"]:
+            print(f"[RAG AVISO] Snapshot da versão {snapshot.header.get('index_version')}, mas a ativa é "
+                  f"{pointer['version']}. Usando o ChromaDB.")
+            snapshot.close()
+            return None
+        print(f"[RAG] Snapshot do índice: {len(snapshot)} chunks, gerado em {snapshot.header['created_at']}.")
+        return snapshot
 
     def _compute_confidence(self, scores):
         if not scores: return 0.0
         return round(float(np.mean(scores)), 3)
 
-    def query(self, medicamento: str, topic: str) -> dict:
+    def _exact_context(self, index: IndexVersion, query: str):
+        """
+        Se a pergunta cita um medicamento do catálogo, retorna os chunks dos
+        verbetes dele via filtro 'where' (sem embedding nem busca vetorial).
+        """
+        records = index.catalog.find_in_text(query)[:RAG_TOP_K]
+        if not records:
+            return None
+        keys = sorted({record.key for record in records})
+        if index.snapshot is not None:
+            found = [(index.snapshot.metadatas[i], index.snapshot.document(i))
+                     for i in index.snapshot.where("medicamento_norm", keys)]
+            web_keys = [key for key in keys if key in index.web_keys]
+            if web_keys:
+                # Bulas da web gravadas depois do snapshot: a versão do ChromaDB prevalece
+                result = index.vectordb.get(where={"$and": [{"medicamento_norm": {"$in": web_keys}},
+                                                            {"document": WEB_DOCUMENT}]})
+                chunks = {(metadata.get("source"), metadata.get("start_index")): (metadata, text)
+                          for metadata, text in found}
+                chunks.update(((metadata.get("source"), metadata.get("start_index")), (metadata, text))
+                              for metadata, text in zip(result["metadatas"], result["documents"]))
+                found = list(chunks.values())
+        else:
+            result = index.vectordb.get(where={"medicamento_norm": {"$in": keys}})
+            found = list(zip(result["metadatas"], result["documents"]))
+        if not found:
+            # Índice ainda sem os metadados: usa o próprio verbete do catálogo
+            return [record.as_text() for record in records]
+        chunks = sorted(found,
+                        key=lambda item: (item[0].get("source", ""), item[0].get("start_index", 0)))
+        return [text for _, text in chunks]
+
+    def _similarity_search(self, index: IndexVersion, query: str):
+        """[(texto, relevância)] dos RAG_TOP_K chunks mais próximos, no snapshot ou no ChromaDB."""
+        if index.snapshot is None:
+            docs_with_scores = index.vectordb.similarity_search_with_relevance_scores(query, k=RAG_TOP_K)
+            return [(d.page_content, score) for d, score in docs_with_scores]
+        # Mesma relevância que o Chroma (distância L2) devolve via LangChain
+        hits = index.snapshot.search(self.embedding_func.embed_query(query), RAG_TOP_K)
+        found = [(index.snapshot.document(i), 1.0 - distance / math.sqrt(2)) for i, distance in hits]
+        if index.web_keys:
+            # Bulas da web gravadas depois do snapshot (o vetor da pergunta sai do cache)
+            docs_with_scores = index.vectordb.similarity_search_with_relevance_scores(
+                query, k=RAG_TOP_K, filter={"document": WEB_DOCUMENT})
+            texts = {text for text, _ in found}
+            found += [(d.page_content, score) for d, score in docs_with_scores if d.page_content not in texts]
+        return sorted(found, key=lambda hit: hit[1], reverse=True)[:RAG_TOP_K]
+
+    def _web_context(self, medication_name: str):
+        """Texto da bula buscada na web (já agendada para o índice), ou None."""
+        if self.web_fallback is None or not medication_name:
+            return None
+        try:
+            with VECTOR_SEARCH_SECONDS.labels("web").time():
+                content = self.web_fallback(medication_name)
+        except Exception as e:
+            print(f"[RAG AVISO] Falha na busca da bula na web: {e}")
+            return None
+        return content[:RAG_WEB_MAX_CHARS] if content else None
+
+    def query(self, medicamento: str, topic: str, medication_name: str = None) -> dict:
         """
         Executa a consulta RAG com o guardrail.
+        medication_name: nome do medicamento (classificador de intenção); com
+        ele, uma bula ausente do índice é buscada na web antes do fallback ao LLM.
         """
         start_time = time.time()
 
@@ -84,31 +315,43 @@ class RAGManager:
             print(f"[RAG Guardrail] Tópico bloqueado: '{topic}'.")
             return {
                 "query": f"Consulta sobre {medicamento} ({topic})",
-                "response": json.dumps({
+                "response": {
                     "answer": "Desculpe, como assistente de saúde, só posso fornecer informações sobre 'reações adversas' para evitar o risco de automedicação. Para outras dúvidas, consulte seu médico.",
                     "confidence": 0.0
-                }),
+                },
                 "confidence": 0.0,
                 "time_sec": 0.01
             }
 
-        if self.vectordb is None:
+        if self.router is None:
             return {"error": "Banco RAG não inicializado."}
 
         query = medicamento
         print(f"[RAG] Executando consulta: '{query}'")
 
-        docs_with_scores = self.vectordb.similarity_search_with_relevance_scores(
-            query, k=RAG_TOP_K
-        )
-
-        context_blocks, scores = [], []
-        for d, score in docs_with_scores:
-            similarity = 1.0 - score
-            scores.append(similarity)
-            context_blocks.append(d.page_content)
-
-        confidence = self._compute_confidence(scores)
+        # A versão do índice fica presa só durante a recuperação (não durante o LLM)
+        with self.router.acquire() as index:
+            with VECTOR_SEARCH_SECONDS.labels("exact").time():
+                context_blocks = self._exact_context(index, query)
+            if context_blocks:
+                print(f"[RAG] Medicamento encontrado no catálogo. {len(context_blocks)} trechos sem busca vetorial.")
+                confidence = 1.0
+            else:
+                context_blocks, scores = [], []
+                with VECTOR_SEARCH_SECONDS.labels("similarity").time():
+                    hits = self._similarity_search(index, query)
+                # Relevância (1 = idêntico), do Chroma ou do snapshot: já é a confiança do trecho
+                for text, score in hits:
+                    scores.append(score)
+                    context_blocks.append(text)
+
+                confidence = self._compute_confidence(scores)
+
+        if confidence < MIN_CONFIDENCE_THRESHOLD or not context_blocks:
+            web_text = self._web_context(medication_name)
+            if web_text:
+                print(f"[RAG] Bula de '{medication_name}' encontrada na web (agendada para o índice local).")
+                context_blocks, confidence = [web_text], RAG_WEB_CONFIDENCE
         context_str = "\n\n".join(context_blocks) if context_blocks else "NOT_FOUND"
 
         #
@@ -130,31 +373,20 @@ class RAGManager:
             """
 
             try:
-                resp = self.llm_rag.invoke(fallback_prompt)
-                raw_text = resp.content
-
-                # Limpar markdown code blocks se houver
-                raw_text = raw_text.strip()
-                if raw_text.startswith("```"):
-                    # Remove primeira linha (```json) e última (```)
-                    raw_text = re.sub(r"^```[a-zA-Z]*\n", "", raw_text)
-                    raw_text = re.sub(r"\n```$", "", raw_text)
-
-                # Tentar limpar a resposta do LLM para garantir que é só o JSON
-                json_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
-                if json_match:
-                    raw_text = json_match.group(0)
-                    # Tenta parsear para garantir que o JSON é válido e pegar a confiança
-                    parsed_json = json.loads(raw_text)
-                    confidence = parsed_json.get("confidence", 0.5)  # Pega a confiança que o LLM retornou
+                resp = invoke_llm(self.llm_rag, fallback_prompt, "fallback")
+                parsed_json = parse_llm_json(resp.content)
+                if parsed_json is not None:
+                    # Pega a confiança que o LLM retornou
+                    confidence = float(parsed_json.get("confidence", 0.5))
+                    answer = {"answer": str(parsed_json.get("answer", "NOT_FOUND")), "confidence": confidence}
                 else:
                     # Se o LLM não retornar JSON, forçamos o formato
-                    raw_text = json.dumps({"answer": "NOT_FOUND", "confidence": 0.2})
+                    answer = {"answer": "NOT_FOUND", "confidence": 0.2}
                     confidence = 0.2
 
             except Exception as e:
                 print(f"[RAG ERRO] Erro no fallback do Gemini: {e}")
-                raw_text = json.dumps({"answer": f"Erro no fallback do Gemini: {e}", "confidence": 0.0})
+                answer = {"answer": f"Erro no fallback do Gemini: {e}", "confidence": 0.0}
                 confidence = 0.0
 
         else:
@@ -162,36 +394,18 @@ class RAGManager:
             print(f"[RAG] Confiança alta ({confidence:.2f}). Usando RAG com ChromaDB.")
             try:
                 prompt = self.prompt_template.format(context_chunks=context_str, question=query)
-                resp = self.llm_rag.invoke(prompt)
-                raw_text = resp.content
-
-                # Limpar markdown code blocks se houver
-                raw_text = raw_text.strip()
-                if raw_text.startswith("```"):
-                    raw_text = re.sub(r"^```[a-zA-Z]*\n", "", raw_text)
-                    raw_text = re.sub(r"\n```$", "", raw_text)
-
-                # Injetar a confiança calculada (RAG score) no JSON de resposta
-                try:
-                    # Tenta encontrar o JSON na string (caso haja texto antes/depois)
-                    json_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
-                    if json_match:
-                        clean_json_str = json_match.group(0)
-                        response_json = json.loads(clean_json_str)
-                        response_json["confidence"] = confidence # Sobrescreve com a confiança do RAG
-                        raw_text = json.dumps(response_json, ensure_ascii=False)
-                    else:
-                        # Se não achar JSON, tenta parsear tudo ou mantém como está
-                        response_json = json.loads(raw_text)
-                        response_json["confidence"] = confidence
-                        raw_text = json.dumps(response_json, ensure_ascii=False)
-                except Exception as json_err:
-                    print(f"[RAG AVISO] Falha ao injetar confiança no JSON: {json_err}")
-                    # Se falhar o parse, mantemos o raw_text original do LLM,
-                    # mas a confiança externa (do return) estará correta.
+                resp = invoke_llm(self.llm_rag, prompt, "rag")
+                parsed_json = parse_llm_json(resp.content)
+                if parsed_json is not None and "answer" in parsed_json:
+                    # Injetar a confiança calculada (RAG score) na resposta
+                    answer = {"answer": str(parsed_json["answer"]), "confidence": confidence}
+                else:
+                    print("[RAG AVISO] LLM não retornou JSON; usando o texto como resposta.")
+                    # A confiança externa (do return) continua correta
+                    answer = {"answer": resp.content.strip(), "confidence": confidence}
 
             except Exception as e:
-                raw_text = json.dumps({"answer": f"Erro no RAG: {e}", "confidence": 0.0})
+                answer = {"answer": f"Erro no RAG: {e}", "confidence": 0.0}
                 confidence = 0.0  # Sobrescreve a confiança em caso de erro
 
         #
@@ -201,7 +415,7 @@ class RAGManager:
         # Este 'return' é o único no final da função
         # e é executado após o 'if' ou o 'else' terminarem.
         elapsed = round(time.time() - start_time, 2)
-        return {"query": query, "response": raw_text, "confidence": confidence, "time_sec": elapsed}
+        return {"query": query, "response": answer, "confidence": confidence, "time_sec": elapsed}
 
 if __name__ == "__main__":
     load_dotenv(".env", override=True)
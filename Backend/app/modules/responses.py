@@ -0,0 +1,83 @@
+# modules/responses.py
+import os
+import orjson
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, IdentityResponder, DEFAULT_EXCLUDED_CONTENT_TYPES
+from starlette.responses import JSONResponse
+
+try:
+    import brotli
+except ImportError:  # opcional: sem o pacote, só gzip
+    brotli = None
+
+# Configurações
+# Respostas menores que isso saem sem compressão (o cabeçalho gzip não compensa)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Níveis para respostas dinâmicas: o ganho acima disso é pequeno e o custo de CPU dobra
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse serializada pelo orjson (direto para bytes UTF-8, sem
+    escapar acentos). Devolvida diretamente pelo endpoint, também pula o
+    jsonable_encoder do FastAPI.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """Se o Accept-Encoding aceita a codificação (ignora as marcadas com q=0)."""
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        if name.strip() == encoding:
+            q = params.replace(" ", "").partition("q=")[2]
+            try:
+                return not q or float(q) > 0
+            except ValueError:
+                return True
+    return False
+
+
+class BrotliResponder(IdentityResponder):
+    """Como o GZipResponder do Starlette (limite de tamanho, streaming, tipos excluídos), com brotli."""
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = BROTLI_QUALITY,
+                 exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES):
+        super().__init__(app, minimum_size, exclude_content_types=exclude_content_types)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=self.quality)
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compressão das respostas acima de minimum_size bytes: brotli se o cliente
+    aceitar (e o pacote estiver instalado), senão gzip. Streams de eventos
+    (SSE) e respostas já codificadas passam direto.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, compresslevel: int = GZIP_LEVEL,
+                 brotli_quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] == "http" and brotli is not None
+                and accepts_encoding(Headers(scope=scope).get("accept-encoding", ""), "br")):
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality,
+                                        exclude_content_types=self.exclude_content_types)
+            await responder(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,66 @@
+# modules/session.py
+import os
+import hmac
+import time
+import base64
+import hashlib
+import secrets
+
+# Configurações
+SESSION_SECRET_FILE = os.getenv("SESSION_SECRET_FILE", "session.key")
+SESSION_MAX_AGE_SEC = int(os.getenv("SESSION_MAX_AGE_DAYS", "30")) * 24 * 3600
+SESSION_COOKIE = "bulicoso_session"
+
+
+def _load_secret() -> bytes:
+    """
+    Carrega a chave que assina as sessões. Usa SESSION_SECRET do .env; se não
+    existir, gera uma chave local em SESSION_SECRET_FILE (apenas desenvolvimento).
+    """
+    secret = os.getenv("SESSION_SECRET")
+    if secret:
+        return secret.encode()
+
+    if os.path.exists(SESSION_SECRET_FILE):
+        with open(SESSION_SECRET_FILE, 'rb') as f:
+            return f.read().strip()
+
+    print(f"[Session] ⚠️ SESSION_SECRET não definida. Gerando chave local em '{SESSION_SECRET_FILE}'.")
+    secret = secrets.token_urlsafe(32).encode()
+    fd = os.open(SESSION_SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secret)
+    return secret
+
+
+class SessionSigner:
+    """
+    Sessão no formato '<user_id>.<emitida em>.<HMAC-SHA256>'. Só o servidor
+    conhece a chave, então um cliente não consegue se passar por outro usuário
+    trocando o ID; sessões expiram depois de max_age segundos.
+    """
+
+    def __init__(self, secret: bytes = None, max_age: int = SESSION_MAX_AGE_SEC):
+        self.secret = secret or _load_secret()
+        self.max_age = max_age
+
+    def _signature(self, payload: str) -> str:
+        digest = hmac.new(self.secret, payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    def sign(self, user_id: str) -> str:
+        payload = f"{user_id}.{int(time.time())}"
+        return f"{payload}.{self._signature(payload)}"
+
+    def verify(self, token: str):
+        """ID do usuário da sessão, ou None se a assinatura não confere ou a sessão expirou."""
+        try:
+            user_id, issued_at, signature = token.rsplit(".", 2)
+            age = time.time() - int(issued_at)
+        except (AttributeError, ValueError):
+            return None
+        if not user_id or not hmac.compare_digest(signature, self._signature(f"{user_id}.{issued_at}")):
+            return None
+        if not -60 <= age <= self.max_age:
+            return None
+        return user_id
@@ -0,0 +1,229 @@
+# modules/token_store.py
+import os
+import json
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from cryptography.fernet import Fernet
+from google.oauth2.credentials import Credentials
+from google.auth.exceptions import RefreshError
+from google.oauth2 import id_token
+from google.auth.transport.requests import Request
+from modules.calendar_client import build_calendar_service, get_http_session
+from modules.metrics import record_cache
+
+# Configurações
+TOKEN_DB_PATH = os.getenv("TOKEN_DB_PATH", "tokens.db")
+TOKEN_KEY_FILE = os.getenv("TOKEN_KEY_FILE", "token.key")
+SERVICE_CACHE_SIZE = int(os.getenv("CALENDAR_SERVICE_CACHE_SIZE", "128"))
+REFRESH_MARGIN = timedelta(minutes=10)   # renova tokens que expiram nesta janela
+REFRESH_INTERVAL_SEC = 60                # frequência da varredura em background
+DEFAULT_USER_ID = "default"
+
+
+def is_revoked(exception) -> bool:
+    """RefreshError com 'invalid_grant': refresh token revogado ou expirado, só um novo login resolve."""
+    return isinstance(exception, RefreshError) and "invalid_grant" in str(exception)
+
+
+def _load_fernet() -> Fernet:
+    """
+    Carrega a chave de criptografia dos tokens. Usa TOKEN_ENCRYPTION_KEY do .env;
+    se não existir, gera uma chave local em TOKEN_KEY_FILE (apenas desenvolvimento).
+    """
+    key = os.getenv("TOKEN_ENCRYPTION_KEY")
+    if key:
+        return Fernet(key.encode())
+
+    if os.path.exists(TOKEN_KEY_FILE):
+        with open(TOKEN_KEY_FILE, 'rb') as f:
+            return Fernet(f.read().strip())
+
+    print(f"[TokenStore] ⚠️ TOKEN_ENCRYPTION_KEY não definida. Gerando chave local em '{TOKEN_KEY_FILE}'.")
+    key = Fernet.generate_key()
+    fd = os.open(TOKEN_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return Fernet(key)
+
+
+def google_user_id(creds: Credentials, client_id: str, request=None) -> str:
+    """
+    ID do usuário a partir da identidade verificada no Google: o 'sub' do
+    id_token (OpenID Connect), conferindo assinatura, emissor e audiência.
+    """
+    if not creds.id_token:
+        raise ValueError("O Google não retornou id_token (escopo 'openid' ausente).")
+    claims = id_token.verify_oauth2_token(creds.id_token, request or Request(get_http_session()), audience=client_id)
+    return claims["sub"]
+
+
+class TokenStore:
+    """Armazena as credenciais OAuth de cada usuário no SQLite, criptografadas."""
+
+    def __init__(self, db_path: str = TOKEN_DB_PATH):
+        self.fernet = _load_fernet()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS tokens (
+                   user_id TEXT PRIMARY KEY,
+                   token BLOB NOT NULL,
+                   expiry TEXT,
+                   updated_at TEXT NOT NULL
+               )"""
+        )
+        # Tokens antigos: coluna adicionada depois da primeira versão
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tokens)")}
+        if "invalid" not in columns:
+            self.conn.execute("ALTER TABLE tokens ADD COLUMN invalid INTEGER NOT NULL DEFAULT 0")
+        self.conn.commit()
+
+    def save(self, user_id: str, creds: Credentials):
+        token = self.fernet.encrypt(creds.to_json().encode())
+        expiry = creds.expiry.isoformat() if creds.expiry else None
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tokens (user_id, token, expiry, updated_at) VALUES (?, ?, ?, ?)",
+                (user_id, token, expiry, datetime.utcnow().isoformat())
+            )
+            self.conn.commit()
+
+    def load(self, user_id: str):
+        """Credenciais do usuário, ou None se não houver (ou se o token foi revogado)."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT token FROM tokens WHERE user_id = ? AND invalid = 0", (user_id,)
+            ).fetchone()
+        if not row:
+            return None
+        info = json.loads(self.fernet.decrypt(row[0]))
+        return Credentials.from_authorized_user_info(info, info.get("scopes"))
+
+    def delete(self, user_id: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM tokens WHERE user_id = ?", (user_id,))
+            self.conn.commit()
+
+    def mark_invalid(self, user_id: str):
+        """Marca o token como revogado: não é mais renovado nem carregado até um novo login (save)."""
+        with self._lock:
+            self.conn.execute("UPDATE tokens SET invalid = 1 WHERE user_id = ?", (user_id,))
+            self.conn.commit()
+
+    def expiring_users(self, margin: timedelta = REFRESH_MARGIN) -> list:
+        """Usuários cujo token (válido) expira antes de agora + margin."""
+        limit = (datetime.utcnow() + margin).isoformat()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT user_id FROM tokens WHERE invalid = 0 AND expiry IS NOT NULL AND expiry < ?", (limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class CalendarServiceCache:
+    """
+    Cache LRU de objetos 'calendar' já construídos, um por usuário.
+    Evita reconstruir o serviço (e recarregar o token) a cada requisição.
+    """
+
+    def __init__(self, store: TokenStore, max_size: int = SERVICE_CACHE_SIZE):
+        self.store = store
+        self.max_size = max_size
+        self._entries = OrderedDict()  # user_id -> (creds, service)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry:
+                self._entries.move_to_end(user_id)
+                record_cache("calendar_service", hits=1)
+                return entry[1]
+
+        record_cache("calendar_service", misses=1)
+        creds = self.store.load(user_id)
+        if creds is None:
+            return None
+        if not creds.valid and creds.refresh_token:
+            # Só acontece na primeira carga de um token já expirado
+            try:
+                creds.refresh(Request(get_http_session()))
+            except RefreshError as e:
+                if not is_revoked(e):
+                    raise
+                self._invalidate(user_id, e)
+                return None
+            self.store.save(user_id, creds)
+        return self._put(user_id, creds)
+
+    def set_credentials(self, user_id: str, creds: Credentials):
+        """Salva novas credenciais (login) e já deixa o serviço em cache."""
+        self.store.save(user_id, creds)
+        return self._put(user_id, creds)
+
+    def remove(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+        self.store.delete(user_id)
+
+    def _invalidate(self, user_id: str, error: Exception):
+        """Token revogado pelo usuário (ou expirado): sai do cache e espera um novo login."""
+        print(f"[TokenStore] Token de '{user_id}' revogado; será preciso fazer login de novo: {error}")
+        with self._lock:
+            self._entries.pop(user_id, None)
+        self.store.mark_invalid(user_id)
+
+    def _put(self, user_id: str, creds: Credentials):
+        service = build_calendar_service(creds)
+        with self._lock:
+            self._entries[user_id] = (creds, service)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                print(f"[TokenStore] Serviço do usuário '{evicted}' removido do cache (LRU).")
+        return service
+
+    def refresh_expiring(self, margin: timedelta = REFRESH_MARGIN) -> int:
+        """
+        Renova os tokens que estão perto de expirar. As credenciais em cache são
+        renovadas no próprio objeto, então o serviço já construído continua válido.
+        """
+        refreshed = 0
+        for user_id in self.store.expiring_users(margin):
+            with self._lock:
+                entry = self._entries.get(user_id)
+            creds = entry[0] if entry else self.store.load(user_id)
+            if creds is None or not creds.refresh_token:
+                continue
+            try:
+                creds.refresh(Request(get_http_session()))
+                self.store.save(user_id, creds)
+                refreshed += 1
+            except RefreshError as e:
+                if is_revoked(e):
+                    self._invalidate(user_id, e)
+                else:
+                    print(f"[TokenStore ERRO] Falha ao renovar token de '{user_id}': {e}")
+            except Exception as e:
+                print(f"[TokenStore ERRO] Falha ao renovar token de '{user_id}': {e}")
+        return refreshed
+
+
+async def refresh_tokens_periodically(cache: CalendarServiceCache, interval: int = REFRESH_INTERVAL_SEC):
+    """Tarefa de background: renova tokens antes que uma requisição precise fazê-lo."""
+    while True:
+        try:
+            refreshed = await asyncio.to_thread(cache.refresh_expiring)
+            if refreshed:
+                print(f"[TokenStore] {refreshed} token(s) renovado(s) em background.")
+        except Exception as e:
+            print(f"[TokenStore ERRO] Falha na renovação em background: {e}")
+        await asyncio.sleep(interval)
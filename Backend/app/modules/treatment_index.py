@@ -0,0 +1,212 @@
+# modules/treatment_index.py
+import bisect
+import threading
+from datetime import datetime
+from modules.calendar_manager import TZ_SAO_PAULO, parse_iso_datetime
+from modules.dose_timeline import dose_index, dose_instants
+from modules.drug_catalog import DrugCatalog, name_key, normalize_name
+from modules.metrics import record_cache
+
+
+class IntervalTree:
+    """
+    Árvore de intervalos estática: os intervalos [início, fim) ficam num array
+    ordenado pelo início e cada nó (o meio de um trecho do array) guarda o maior
+    fim da sua subárvore. Consulta de sobreposição em O(log n + k).
+    """
+
+    def __init__(self, intervals: list):
+        # intervals: [(inicio, fim, payload)] com inicio/fim em timestamp
+        self._items = sorted(intervals, key=lambda item: item[0])
+        self._max_end = [0.0] * len(self._items)
+        self._build(0, len(self._items) - 1)
+
+    def _build(self, lo: int, hi: int) -> float:
+        if lo > hi:
+            return float("-inf")
+        mid = (lo + hi) // 2
+        self._max_end[mid] = max(self._items[mid][1], self._build(lo, mid - 1), self._build(mid + 1, hi))
+        return self._max_end[mid]
+
+    def __len__(self):
+        return len(self._items)
+
+    def overlap(self, start: float, end: float) -> list:
+        """Payloads dos intervalos que se sobrepõem a [start, end)."""
+        found = []
+        self._query(0, len(self._items) - 1, start, end, found)
+        return found
+
+    def _query(self, lo: int, hi: int, start: float, end: float, found: list):
+        if lo > hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] <= start:
+            return  # nada nesta subárvore termina depois do início procurado
+        self._query(lo, mid - 1, start, end, found)
+        item_start, item_end, payload = self._items[mid]
+        if item_start >= end:
+            return  # à direita todos começam depois do fim procurado
+        if item_end > start:
+            found.append(payload)
+        self._query(mid + 1, hi, start, end, found)
+
+
+class _UserIndex:
+    """
+    Spans dos tratamentos ativos (árvore) e horários das doses (lista ordenada)
+    de um usuário. Só entram as doses a partir de 'now': as já tomadas não são
+    consultadas e um tratamento longo não precisa ser gerado desde o início.
+    """
+
+    def __init__(self, treatments: list, now: datetime = None):
+        now = now or datetime.now(TZ_SAO_PAULO)
+        spans, doses = [], []
+        for treatment in treatments:
+            start = parse_iso_datetime(treatment["start_time"])
+            end = parse_iso_datetime(treatment["end_time"])
+            spans.append((start.timestamp(), end.timestamp(), treatment))
+            # dose_index arredonda; começa uma dose antes e descarta as que já passaram
+            first = max(0, dose_index(start, treatment["intervalo_horas"], now) - 1)
+            for i, dose_time in dose_instants(start, treatment["intervalo_horas"], treatment["duracao_dias"],
+                                              first_dose=first):
+                if dose_time >= end:
+                    break
+                if dose_time >= now:
+                    doses.append((dose_time.timestamp(), i, treatment))
+        doses.sort(key=lambda dose: dose[0])
+        self.tree = IntervalTree(spans)
+        self.dose_times = [dose[0] for dose in doses]
+        self.doses = doses
+
+
+class TreatmentIndex:
+    """
+    Índice em memória, por usuário, dos tratamentos ativos do treatment_store.
+    Evita listar eventos no Google para detectar duplicidade/sobreposição e
+    para achar a dose já agendada mais próxima de um horário.
+    """
+
+    def __init__(self, store, catalog: DrugCatalog = None):
+        """catalog: catálogo de verbetes para as interações; por padrão o DRUG_CATALOG_PATH."""
+        self.store = store
+        self._catalog = catalog
+        self._lock = threading.Lock()
+        self._users = {}
+        self._interactions = None
+
+    def _get(self, user_id: str) -> _UserIndex:
+        with self._lock:
+            index = self._users.get(user_id)
+        if index is None:
+            record_cache("treatment_index", misses=1)
+            index = _UserIndex(self.store.active_treatments(user_id))
+            with self._lock:
+                self._users[user_id] = index
+        else:
+            record_cache("treatment_index", hits=1)
+        return index
+
+    def invalidate(self, user_id: str):
+        """Descarta o índice do usuário; é reconstruído na próxima consulta."""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    # --- Consultas ---
+
+    def overlapping(self, user_id: str, start: datetime, end: datetime) -> list:
+        """Tratamentos ativos cujo período se sobrepõe a [start, end)."""
+        return self._get(user_id).tree.overlap(start.timestamp(), end.timestamp())
+
+    def nearest_dose(self, user_id: str, instant: datetime):
+        """Dose já agendada mais próxima do horário (busca binária), ou None."""
+        index = self._get(user_id)
+        if not index.doses:
+            return None
+        target = instant.timestamp()
+        pos = bisect.bisect_left(index.dose_times, target)
+        candidates = [p for p in (pos - 1, pos) if 0 <= p < len(index.doses)]
+        best = min(candidates, key=lambda p: abs(index.dose_times[p] - target))
+        timestamp, dose_index, treatment = index.doses[best]
+        dose_time = datetime.fromtimestamp(timestamp, TZ_SAO_PAULO)
+        return {
+            "treatment_id": treatment["treatment_id"],
+            "medicamento": treatment["medicamento"],
+            "dose": dose_index + 1,
+            "start_time": dose_time.isoformat(),
+            "start_time_formatted": dose_time.strftime('%d/%m/%Y %H:%M'),
+            "distance_minutes": round(abs(timestamp - target) / 60)
+        }
+
+    def check(self, user_id: str, details: dict, start_time: datetime, end_time: datetime) -> list:
+        """
+        Avisos para um novo tratamento: mesmo medicamento já ativo no período
+        (duplicado se o intervalo também for igual) ou interação conhecida com
+        um medicamento ativo no período.
+        """
+        new_name = normalize_name(details["medicamento"])
+        warnings = []
+        for treatment in self.overlapping(user_id, start_time, end_time):
+            name = normalize_name(treatment["medicamento"])
+            base = {"treatment_id": treatment["treatment_id"], "medicamento": treatment["medicamento"]}
+            if name == new_name:
+                duplicate = int(treatment["intervalo_horas"]) == int(details["intervalo_horas"])
+                warnings.append({
+                    **base,
+                    "tipo": "duplicado" if duplicate else "sobreposicao",
+                    "mensagem": f"{treatment['medicamento']} já está agendado neste período "
+                                f"(a cada {treatment['intervalo_horas']}h)."
+                })
+            elif self.interacts(new_name, name):
+                warnings.append({
+                    **base,
+                    "tipo": "interacao",
+                    "mensagem": f"A bula indica interação entre {details['medicamento']} e {treatment['medicamento']}."
+                })
+        return warnings
+
+    # --- Interações (campo 'interacao' dos verbetes do DrugCatalog) ---
+
+    def _load_interactions(self):
+        """
+        Prepara, uma única vez, o catálogo e o texto de interação de cada verbete
+        já normalizado (" palavra palavra "), e um índice reverso palavra -> verbetes
+        para nomes que não batem exatamente com o verbete ("ranitidina" no
+        verbete "CLORIDRATO DE RANITIDINA").
+        """
+        with self._lock:
+            if self._interactions is None:
+                catalog = self._catalog if self._catalog is not None else DrugCatalog()
+                texts, words = {}, {}
+                for record in catalog.records.values():
+                    if record.interacao:
+                        texts[id(record)] = f" {name_key(record.interacao)} "
+                        for word in set(name_key(record.name).split()):
+                            words.setdefault(word, []).append(record)
+                self._catalog = catalog
+                self._interaction_words = words
+                self._interactions = texts
+                print(f"[Índice] {len(texts)} seções de interação carregadas.")
+        return self._interactions
+
+    def _records_for(self, name: str) -> list:
+        """Verbetes do medicamento: busca exata no catálogo ou verbetes que contêm todas as palavras do nome."""
+        records = self._catalog.lookup(name)
+        if records:
+            return records
+        candidates = None
+        for word in name_key(name).split():
+            ids = {id(record): record for record in self._interaction_words.get(word, [])}
+            candidates = ids if candidates is None else {k: v for k, v in candidates.items() if k in ids}
+        return list(candidates.values()) if candidates else []
+
+    def _mentions(self, name_a: str, name_b: str) -> bool:
+        """A seção de interação de algum verbete de name_a cita name_b (palavras inteiras)."""
+        needle = f" {name_key(name_b)} "
+        if needle == "  ":
+            return False
+        return any(needle in self._interactions.get(id(record), "") for record in self._records_for(name_a))
+
+    def interacts(self, name_a: str, name_b: str) -> bool:
+        self._load_interactions()
+        return self._mentions(name_a, name_b) or self._mentions(name_b, name_a)
@@ -0,0 +1,227 @@
+# modules/treatment_store.py
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+# Configurações
+TREATMENTS_DB_PATH = os.getenv("TREATMENTS_DB_PATH", "treatments.db")
+
+ACTIVE, CANCELLED = "active", "cancelled"
+
+
+def to_utc_iso(dt: datetime) -> str:
+    """Horário em UTC com formato fixo, para comparar/ordenar como texto no SQLite."""
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+class TreatmentStore:
+    """
+    Registro local dos tratamentos agendados e, no modo consolidado, dos
+    horários compartilhados (slots) e de quais doses pertencem a cada um.
+    Toda consulta por tratamento ou slot é filtrada pelo usuário dono.
+    """
+
+    def __init__(self, db_path: str = TREATMENTS_DB_PATH):
+        self._lock = threading.RLock()
+        self._depth = 0  # transações abertas (aninhadas) pela thread que tem o lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS treatments (
+                   treatment_id TEXT PRIMARY KEY,
+                   user_id TEXT NOT NULL,
+                   medicamento TEXT NOT NULL,
+                   intervalo_horas INTEGER NOT NULL,
+                   duracao_dias INTEGER NOT NULL,
+                   start_time TEXT NOT NULL,
+                   end_time TEXT NOT NULL,
+                   consolidated INTEGER NOT NULL DEFAULT 0,  -- janela em minutos (0 = eventos próprios)
+                   status TEXT NOT NULL,
+                   created_at REAL NOT NULL
+               );
+               CREATE INDEX IF NOT EXISTS treatments_user ON treatments (user_id, status);
+
+               CREATE TABLE IF NOT EXISTS slots (
+                   slot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   user_id TEXT NOT NULL,
+                   start_time TEXT NOT NULL,
+                   event_id TEXT NOT NULL,
+                   status TEXT NOT NULL
+               );
+               CREATE INDEX IF NOT EXISTS slots_user_time ON slots (user_id, status, start_time);
+
+               CREATE TABLE IF NOT EXISTS slot_members (
+                   slot_id INTEGER NOT NULL,
+                   treatment_id TEXT NOT NULL,
+                   dose_index INTEGER NOT NULL,
+                   medicamento TEXT NOT NULL,
+                   PRIMARY KEY (slot_id, treatment_id, dose_index)
+               );
+               CREATE INDEX IF NOT EXISTS slot_members_treatment ON slot_members (treatment_id);"""
+        )
+        self.conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Agrupa as escritas num único commit (tudo ou nada): as doses de um
+        tratamento entram juntas, e nenhuma outra thread vê o estado parcial.
+        """
+        with self._lock:
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                if self._depth == 1:
+                    self.conn.rollback()
+                raise
+            else:
+                if self._depth == 1:
+                    self.conn.commit()
+            finally:
+                self._depth -= 1
+
+    def _commit(self):
+        if not self._depth:
+            self.conn.commit()
+
+    # --- Tratamentos ---
+
+    def add_treatment(self, user_id: str, treatment_id: str, details: dict, start_time: datetime,
+                      consolidation_window: int = 0):
+        end_time = start_time + timedelta(days=int(details["duracao_dias"]))
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO treatments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (treatment_id, user_id, details["medicamento"], int(details["intervalo_horas"]),
+                 int(details["duracao_dias"]), start_time.isoformat(), end_time.isoformat(),
+                 int(consolidation_window), ACTIVE, time.time())
+            )
+            self._commit()
+
+    def get_treatment(self, user_id: str, treatment_id: str):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM treatments WHERE treatment_id = ? AND user_id = ?",
+                                    (treatment_id, user_id)).fetchone()
+        return dict(row) if row else None
+
+    def is_registered(self, treatment_id: str) -> bool:
+        """Se o tratamento existe no store, de qualquer usuário."""
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM treatments WHERE treatment_id = ?",
+                                     (treatment_id,)).fetchone() is not None
+
+    def active_treatments(self, user_id: str) -> list:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM treatments WHERE user_id = ? AND status = ?", (user_id, ACTIVE)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def update_treatment(self, user_id: str, treatment_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self.conn.execute(f"UPDATE treatments SET {columns} WHERE treatment_id = ? AND user_id = ?",
+                              (*fields.values(), treatment_id, user_id))
+            self._commit()
+
+    # --- Slots (modo consolidado) ---
+
+    def find_slot(self, user_id: str, dose_time: datetime, window: timedelta, exclude_treatment: str = None):
+        """
+        Slot ativo mais próximo de dose_time dentro da janela, ou None. Slots que
+        já têm uma dose de exclude_treatment são ignorados (duas doses do mesmo
+        remédio nunca viram um único evento).
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM slots WHERE user_id = ? AND status = ? "
+                "AND start_time BETWEEN ? AND ? "
+                "AND slot_id NOT IN (SELECT slot_id FROM slot_members WHERE treatment_id = ?) "
+                "ORDER BY abs(julianday(start_time) - julianday(?)) LIMIT 1",
+                (user_id, ACTIVE, to_utc_iso(dose_time - window), to_utc_iso(dose_time + window),
+                 exclude_treatment or "", to_utc_iso(dose_time))
+            ).fetchone()
+        return dict(row) if row else None
+
+    def member_slot(self, user_id: str, treatment_id: str, dose_index: int):
+        """Slot ativo que já contém a dose (retry do mesmo agendamento), ou None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT s.* FROM slots s JOIN slot_members m ON m.slot_id = s.slot_id "
+                "WHERE s.user_id = ? AND m.treatment_id = ? AND m.dose_index = ? AND s.status = ?",
+                (user_id, treatment_id, dose_index, ACTIVE)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def create_slot(self, user_id: str, start_time: datetime) -> dict:
+        # ID aleatório: um slot removido não pode ter o ID reaproveitado no Google (409)
+        event_id = uuid.uuid4().hex
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO slots (user_id, start_time, event_id, status) VALUES (?, ?, ?, ?)",
+                (user_id, to_utc_iso(start_time), event_id, ACTIVE)
+            )
+            self._commit()
+        return {"slot_id": cursor.lastrowid, "user_id": user_id, "start_time": to_utc_iso(start_time),
+                "event_id": event_id, "status": ACTIVE}
+
+    def slot_by_event(self, user_id: str, event_id: str):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM slots WHERE event_id = ? AND user_id = ?",
+                                    (event_id, user_id)).fetchone()
+        return dict(row) if row else None
+
+    def retire_slot(self, slot_id: int):
+        with self._lock:
+            self.conn.execute("UPDATE slots SET status = ? WHERE slot_id = ?", (CANCELLED, slot_id))
+            self._commit()
+
+    def add_member(self, slot_id: int, treatment_id: str, dose_index: int, medicamento: str) -> bool:
+        """Associa a dose ao slot. False se a associação já existia (retry)."""
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO slot_members VALUES (?, ?, ?, ?)",
+                (slot_id, treatment_id, dose_index, medicamento)
+            )
+            self._commit()
+        return cursor.rowcount > 0
+
+    def slot_members(self, slot_id: int) -> list:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM slot_members WHERE slot_id = ? ORDER BY medicamento, treatment_id",
+                (slot_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def treatment_slots(self, user_id: str, treatment_id: str, after: datetime = None) -> list:
+        """Slots ativos do usuário em que o tratamento tem doses (opcionalmente só os futuros)."""
+        query = ("SELECT DISTINCT s.* FROM slots s "
+                 "JOIN slot_members m ON m.slot_id = s.slot_id "
+                 "WHERE s.user_id = ? AND m.treatment_id = ? AND s.status = ?")
+        params = [user_id, treatment_id, ACTIVE]
+        if after is not None:
+            query += " AND s.start_time > ?"
+            params.append(to_utc_iso(after))
+        with self._lock:
+            rows = self.conn.execute(query + " ORDER BY s.start_time", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def remove_treatment_members(self, user_id: str, treatment_id: str, slot_ids: list):
+        with self._lock:
+            self.conn.executemany(
+                "DELETE FROM slot_members WHERE treatment_id = ? AND slot_id = ? "
+                "AND slot_id IN (SELECT slot_id FROM slots WHERE user_id = ?)",
+                [(treatment_id, slot_id, user_id) for slot_id in slot_ids]
+            )
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,189 @@
+"""
+🔹 EXTRAÇÃO DE BULAS EM HTML - Parser em streaming (lxml)
+
+Lê a página do scraper em pedaços com o HTMLPullParser do lxml (libxml2),
+sem montar a árvore inteira nem passar pelo BeautifulSoup:
+
+1. iter_blocks: texto de cada bloco (p, li, td, h1-h6...) assim que ele
+   fecha; menus, scripts, rodapé e formulários são ignorados e o que já foi
+   lido é liberado, então a memória não cresce com o tamanho da página
+2. sections_from_blocks: guarda só as seções que indexamos (indicações,
+   posologia, reações adversas e interações), reconhecidas pelos mesmos
+   títulos de extract_key_sections
+3. extract_bula_text: seções num texto com títulos, pronto para o índice
+
+Benchmark contra o BeautifulSoup: benchmarks/bench_html_extract.py
+"""
+
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+from lxml import etree
+from app.core.logger import setup_logger
+from app.utils.text_processing import section_heading
+
+logger = setup_logger()
+
+# Seções indexadas, na ordem do texto final, com o título usado nele
+INDEXED_SECTIONS = {
+    "indications": "Indicações",
+    "dosage": "Posologia",
+    "side_effects": "Reações adversas",
+    "interactions": "Interações",
+}
+CHUNK_SIZE = 64 * 1024
+# Blocos cujo texto vira uma linha; os títulos encerram a seção corrente
+BLOCK_TAGS = frozenset({
+    "p", "li", "dt", "dd", "td", "th", "caption", "blockquote", "pre", "div", "section", "article",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+})
+HEADING_TAGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6", "dt"})
+# Subárvores que nunca são bula
+SKIP_TAGS = frozenset({
+    "head", "script", "style", "noscript", "template", "iframe", "svg",
+    "nav", "header", "footer", "aside", "form", "button", "select",
+})
+# Só essas tags geram eventos: inline (a, span, b...) não passa pelo Python
+_EVENT_TAGS = sorted(BLOCK_TAGS | SKIP_TAGS | {"br"})
+
+
+def _chunks(content: Union[bytes, str, Iterable[bytes]], chunk_size: int) -> Iterator[bytes]:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    if isinstance(content, (bytes, bytearray)):
+        for start in range(0, len(content), chunk_size):
+            yield bytes(content[start:start + chunk_size])
+    else:
+        yield from content
+
+
+def _release(element):
+    """Libera um bloco já lido e seus irmãos anteriores (o texto entre eles passa para o pai)."""
+    tail = element.tail
+    element.clear()
+    element.tail = tail
+    parent = element.getparent()
+    if parent is None:
+        return
+    while element.getprevious() is not None:
+        previous = parent[0]
+        # Remover um elemento leva junto o texto que vem depois dele
+        if previous.tail and previous.tail.strip():
+            parent.text = f"{parent.text or ''} {previous.tail}"
+        del parent[0]
+
+
+def iter_blocks(content: Union[bytes, str, Iterable[bytes]], encoding: Optional[str] = None,
+                chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[str, str]]:
+    """
+    Gera o texto de cada bloco da página, em streaming.
+
+    Um bloco com blocos dentro (ex.: div com parágrafos) só entrega o texto
+    que está fora deles, depois dos filhos.
+
+    Args:
+        content: HTML em bytes, str ou iterável de pedaços em bytes (resposta em streaming)
+        encoding: Charset do Content-Type; None usa o <meta charset> da página
+        chunk_size: Tamanho dos pedaços entregues ao parser
+
+    Yields:
+        (tag, texto do bloco com espaços colapsados)
+    """
+    if isinstance(content, str):
+        encoding = "utf-8"
+    parser = etree.HTMLPullParser(events=("start", "end"), tag=_EVENT_TAGS, encoding=encoding, no_network=True,
+                                  remove_comments=True, remove_pis=True)
+    skipping = 0
+
+    def drain():
+        nonlocal skipping
+        for event, element in parser.read_events():
+            tag = element.tag
+            if not isinstance(tag, str):
+                continue
+            if tag in SKIP_TAGS:
+                if event == "start":
+                    skipping += 1
+                else:
+                    skipping -= 1
+                    _release(element)
+            elif event == "end" and tag == "br":
+                element.tail = f" {element.tail or ''}"
+            elif event == "end" and tag in BLOCK_TAGS:
+                if not skipping:
+                    text = " ".join("".join(element.itertext()).split())
+                    if text:
+                        yield tag, text
+                _release(element)
+
+    for chunk in _chunks(content, chunk_size):
+        parser.feed(chunk)
+        yield from drain()
+    parser.close()
+    yield from drain()
+
+
+def sections_from_blocks(blocks: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+    """
+    Separa os blocos nas seções indexadas.
+
+    Um bloco que começa com um título ("Posologia", "3. Reações adversas:",
+    "Para que este medicamento é indicado?") abre a seção, e o resto dele já
+    é conteúdo; um título (h1-h6) que não é de seção a encerra. Seções não
+    indexadas (contraindicações, cuidados) são reconhecidas e descartadas.
+
+    Args:
+        blocks: (tag, texto) na ordem do documento
+
+    Returns:
+        {seção: texto} só com as seções indexadas encontradas
+    """
+    parts = {name: [] for name in INDEXED_SECTIONS}
+    current = None
+    for tag, text in blocks:
+        heading = section_heading(text)
+        if heading is not None:
+            current, end = heading
+            text = text[end:].strip(" ;:")
+        elif tag in HEADING_TAGS:
+            current = None
+            continue
+        if text and current in parts:
+            parts[current].append(text)
+    return {name: "\n".join(texts) for name, texts in parts.items() if texts}
+
+
+def extract_sections(content: Union[bytes, str, Iterable[bytes]], encoding: Optional[str] = None) -> Dict[str, str]:
+    """
+    Seções indexadas de uma página de bula.
+
+    Args:
+        content: HTML em bytes, str ou iterável de pedaços
+        encoding: Charset do Content-Type (None = detectar pela página)
+
+    Returns:
+        {seção: texto} (vazio se a página não tiver nenhuma)
+    """
+    try:
+        return sections_from_blocks(iter_blocks(content, encoding))
+    except etree.LxmlError as e:
+        logger.warning(f"HTML ilegível: {str(e)}")
+        return {}
+
+
+def format_sections(sections: Dict[str, str]) -> str:
+    """{'dosage': '...'} -> 'Posologia: ...', seções separadas por linha em branco."""
+    return "\n\n".join(f"{title}: {sections[name]}" for name, title in INDEXED_SECTIONS.items() if sections.get(name))
+
+
+def extract_bula_text(content: Union[bytes, str, Iterable[bytes]], encoding: Optional[str] = None) -> Optional[str]:
+    """
+    Texto da bula com só as seções indexadas, cada uma com seu título
+    (extract_key_sections o separa de novo).
+
+    Args:
+        content: HTML em bytes, str ou iterável de pedaços
+        encoding: Charset do Content-Type (None = detectar pela página)
+
+    Returns:
+        Texto das seções, ou None se nenhuma for encontrada
+    """
+    return format_sections(extract_sections(content, encoding)) or None
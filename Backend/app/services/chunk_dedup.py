@@ -0,0 +1,171 @@
+"""
+🔹 DEDUPLICAÇÃO DE CHUNKS - MinHash + LSH na ingestão
+
+O guia repete muito texto padrão ("Ainda não foram disponibilizados
+resultados dos estudos das interações", "mesmas doses dos adultos") e o
+mesmo verbete existe nos batches e no PDF. Chunks quase idênticos só
+ocupam espaço no índice e tomam lugares úteis do top-k.
+
+1. Assinatura MinHash de cada chunk (3-gramas de palavras, sem acentos)
+2. LSH em bandas para achar candidatos sem comparar todos os pares
+3. Candidato com Jaccard estimado >= limiar -> o chunk é descartado e
+   registrado como duplicata do chunk canônico (origem + offset)
+
+O índice dos chunks canônicos é salvo em disco (.npz) para que ingestões
+incrementais continuem deduplicando contra o que já está no ChromaDB.
+"""
+
+import os
+import re
+import zlib
+import numpy as np
+from typing import List, Tuple, Dict, Optional
+from app.core.logger import setup_logger
+from app.utils.text_processing import fold_accents
+
+logger = setup_logger()
+
+NUM_PERM = 64               # permutações (tamanho da assinatura)
+SHINGLE_SIZE = 3            # palavras por shingle
+_MERSENNE = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD = re.compile(r"\w+")
+
+# Permutações fixas: assinaturas comparáveis entre execuções e processos.
+# a e b cobrem todo o intervalo [0, p): com a pequeno, (a*x + b) mod p preserva
+# a ordem de x e o mínimo seria sempre o mesmo shingle em todas as permutações
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, _MERSENNE, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str) -> set:
+    """3-gramas de palavras do texto normalizado (minúsculas, sem acentos)."""
+    words = _WORD.findall(fold_accents(text).lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """
+    Assinatura MinHash (NUM_PERM valores) do texto.
+
+    Os shingles são hasheados com crc32 (estável entre processos, ao
+    contrário de hash()) e as permutações (a*x + b) mod p aplicadas em numpy
+    (o produto estoura 64 bits de propósito, como no datasketch).
+    """
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+    if hashes.size == 0:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % np.uint64(_MERSENNE)
+    return (permuted & np.uint64(_MAX_HASH)).min(axis=1)
+
+
+def lsh_params(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """
+    (bandas, linhas por banda) com o maior limiar LSH (1/b)^(1/r) que não
+    passa de threshold: prioriza não perder pares; a confirmação é feita
+    pela similaridade estimada das assinaturas.
+    """
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    below = [option for option in options if (1 / option[0]) ** (1 / option[1]) <= threshold]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1])) if below else (num_perm, 1)
+
+
+class MinHashDeduplicator:
+    """
+    Índice LSH dos chunks canônicos. filter() separa os chunks novos em
+    mantidos e duplicatas; os mantidos entram no índice na hora, então
+    duplicatas dentro do mesmo lote também são detectadas.
+    """
+
+    def __init__(self, threshold: float, path: Optional[str] = None):
+        """
+        Args:
+            threshold: Jaccard estimado mínimo para considerar duplicata (0-1)
+            path: Arquivo .npz do índice persistido (None = só em memória)
+        """
+        self.threshold = threshold
+        self.path = path
+        self.bands, self.rows = lsh_params(threshold)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], set] = {}
+        if path and os.path.exists(path):
+            data = np.load(path)
+            for chunk_id, signature in zip(data["ids"], data["signatures"]):
+                self._add(str(chunk_id), signature)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _add(self, chunk_id: str, signature: np.ndarray):
+        self.signatures[chunk_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(chunk_id)
+
+    def add(self, chunks: List[Tuple[str, str]]):
+        """Registra chunks já gravados no ChromaDB ([(id, texto)]), ex.: ao retomar uma ingestão."""
+        for chunk_id, text in chunks:
+            self._add(chunk_id, minhash(text))
+
+    def remove(self, chunk_ids: List[str]):
+        """Tira chunks apagados do ChromaDB do índice."""
+        for chunk_id in chunk_ids:
+            signature = self.signatures.pop(chunk_id, None)
+            if signature is None:
+                continue
+            for key in self._band_keys(signature):
+                bucket = self._buckets.get(key)
+                if bucket:
+                    bucket.discard(chunk_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def match(self, signature: np.ndarray) -> Optional[str]:
+        """Chunk canônico mais parecido acima do limiar, ou None."""
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self._buckets.get(key, set())
+        best, best_score = None, self.threshold
+        for candidate in candidates:
+            score = float(np.mean(self.signatures[candidate] == signature))
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def filter(self, chunks: List[Tuple[str, str, dict]]) -> Tuple[list, list]:
+        """
+        Args:
+            chunks: [(id, texto, metadados)] de uma origem
+
+        Returns:
+            (chunks mantidos, [(origem, offset, id do chunk canônico)])
+        """
+        kept, duplicates = [], []
+        for chunk in chunks:
+            chunk_id, text, metadata = chunk
+            signature = minhash(text)
+            canonical = self.match(signature)
+            if canonical is not None and canonical != chunk_id:
+                duplicates.append((metadata["source"], metadata["start_index"], canonical))
+            else:
+                self._add(chunk_id, signature)
+                kept.append(chunk)
+        return kept, duplicates
+
+    def save(self):
+        """Grava o índice de forma atômica (arquivo temporário + rename)."""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npz"
+        ids = list(self.signatures)
+        signatures = np.array([self.signatures[i] for i in ids], dtype=np.uint64).reshape(len(ids), NUM_PERM)
+        np.savez(tmp_path, ids=np.array(ids, dtype=str), signatures=signatures)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,208 @@
+"""
+🔹 CACHE HTTP - Respostas do scraper em disco (SQLite)
+
+Cache privado (RFC 9111) das páginas baixadas pelo ScraperService:
+
+1. Resposta fresca (Cache-Control max-age, Expires ou heurística pelo
+   Last-Modified): devolvida sem tocar a rede
+2. Resposta vencida com ETag/Last-Modified: requisição condicional
+   (If-None-Match / If-Modified-Since); um 304 só renova os cabeçalhos
+3. no-store (ou Vary: *): não é guardada; no-cache: guardada, mas sempre revalidada
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict
+from app.core.logger import setup_logger
+
+logger = setup_logger()
+
+# Status que podem ser guardados (sem cache de erros)
+CACHEABLE_STATUS = {200, 203}
+# Heurística para respostas só com Last-Modified: 10% da idade, no máximo 1 dia
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX_SEC = 86400
+# Cabeçalhos renovados por um 304
+_REFRESHED_HEADERS = ("cache-control", "expires", "etag", "last-modified", "date", "age")
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """'max-age=60, no-cache' -> {'max-age': '60', 'no-cache': None}"""
+    directives = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class CachedResponse:
+    """Resposta guardada: cabeçalhos em minúsculas, corpo em bytes."""
+    url: str
+    status: int
+    headers: Dict[str, str]
+    content: bytes
+    stored_at: float
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get("last-modified")
+
+    @property
+    def charset(self) -> Optional[str]:
+        """Charset do Content-Type, ou None se o servidor não informar."""
+        content_type = self.headers.get("content-type", "")
+        if "charset=" not in content_type:
+            return None
+        return content_type.split("charset=")[-1].split(";")[0].strip().strip('"') or None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.charset or "utf-8", errors="replace")
+
+    def freshness_lifetime(self) -> float:
+        """Segundos em que a resposta vale sem revalidar (0 = revalidar sempre)."""
+        directives = parse_cache_control(self.headers.get("cache-control", ""))
+        if "no-cache" in directives:
+            return 0.0
+        if directives.get("max-age") is not None:
+            try:
+                return max(float(directives["max-age"]), 0.0)
+            except ValueError:
+                return 0.0
+        date = _http_date(self.headers.get("date")) or self.stored_at
+        expires = self.headers.get("expires")
+        if expires is not None:
+            expires_at = _http_date(expires)
+            return max(expires_at - date, 0.0) if expires_at else 0.0
+        last_modified = _http_date(self.last_modified)
+        if last_modified is not None:
+            return min(max(date - last_modified, 0.0) * HEURISTIC_FRACTION, HEURISTIC_MAX_SEC)
+        return 0.0
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        try:
+            age = float(self.headers.get("age", 0))
+        except ValueError:
+            age = 0.0
+        return (now or time.time()) - self.stored_at + age < self.freshness_lifetime()
+
+    def validators(self) -> Dict[str, str]:
+        """Cabeçalhos da requisição condicional."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def is_storable(status: int, headers: Dict[str, str]) -> bool:
+    """Se uma resposta a GET pode entrar no cache (headers em minúsculas)."""
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    return (status in CACHEABLE_STATUS and "no-store" not in directives
+            and headers.get("vary", "").strip() != "*")
+
+
+class HttpCache:
+    """
+    Cache HTTP persistente: URL (com query) -> última resposta 200 e seus
+    cabeçalhos. Métodos síncronos (consultas curtas ao SQLite); o scraper
+    os chama em thread para não bloquear o event loop.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Caminho do arquivo SQLite do cache
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   url TEXT PRIMARY KEY,
+                   status INTEGER NOT NULL,
+                   headers TEXT NOT NULL,
+                   content BLOB NOT NULL,
+                   stored_at REAL NOT NULL
+               )"""
+        )
+        self.conn.commit()
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status, headers, content, stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(url, row[0], json.loads(row[1]), row[2], row[3])
+
+    def put(self, url: str, status: int, headers: Dict[str, str], content: bytes) -> Optional[CachedResponse]:
+        """
+        Guarda a resposta se ela puder ser guardada (senão apaga a versão antiga).
+
+        Returns:
+            A resposta guardada, ou None
+        """
+        headers = {name.lower(): value for name, value in headers.items()}
+        if not is_storable(status, headers):
+            self.delete(url)
+            return None
+        cached = CachedResponse(url, status, headers, content, time.time())
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                              (url, status, json.dumps(headers), content, cached.stored_at))
+            self.conn.commit()
+        return cached
+
+    def refresh(self, cached: CachedResponse, headers: Dict[str, str]) -> CachedResponse:
+        """Aplica os cabeçalhos de um 304 à resposta guardada e reinicia sua idade."""
+        headers = {name.lower(): value for name, value in headers.items()}
+        merged = {**cached.headers, **{name: headers[name] for name in _REFRESHED_HEADERS if name in headers}}
+        if "age" not in headers:
+            merged.pop("age", None)
+        refreshed = CachedResponse(cached.url, cached.status, merged, cached.content, time.time())
+        with self._lock:
+            self.conn.execute("UPDATE responses SET headers = ?, stored_at = ? WHERE url = ?",
+                              (json.dumps(merged), refreshed.stored_at, cached.url))
+            self.conn.commit()
+        return refreshed
+
+    def delete(self, url: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self.conn.commit()
+
+    def size(self) -> dict:
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        size_bytes = sum(os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal")
+                         if os.path.exists(path))
+        return {"entries": entries, "size_mb": round(size_bytes / 1024 / 1024, 2)}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,537 @@
+"""
+🔹 PIPELINE DE INGESTÃO - Leitura, embedding e escrita em estágios paralelos
+
+Substitui o laço arquivo a arquivo do VectorService por três estágios que
+rodam ao mesmo tempo:
+
+1. Leitura + split: pool de processos (um arquivo por tarefa)
+2. Embedding: um único estágio que codifica lotes grandes e de tamanho fixo
+3. Escrita: thread que faz upsert em massa no ChromaDB
+
+Com um MinHashDeduplicator, chunks quase idênticos a outros já indexados
+são descartados antes do embedding (ver chunk_dedup).
+
+Cada estágio mantém contadores (itens, tempo ocupado, vazão) e o relatório
+final traz o tempo de ponta a ponta.
+
+Os IDs dos chunks são determinísticos (hash de arquivo + offset), então
+reprocessar um arquivo sobrescreve os mesmos vetores. O IngestManifest
+guarda o hash de cada arquivo e seus chunks para a ingestão incremental.
+
+Cada origem cujos chunks já chegaram ao ChromaDB é registrada na hora no
+IngestCheckpoint; se a ingestão cair no meio, a próxima retoma dali (os
+lotes já codificados estão no cache de embeddings).
+
+Cada arquivo de batches/ é um verbete do guia: o split também o converte em
+DrugRecord (modules/drug_catalog), cujos campos viram metadados dos chunks e
+entram no relatório para atualizar o catálogo de medicamentos.
+"""
+
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+from pathlib import Path
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import List, Tuple, Dict, Iterable, Optional, Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from app.core.config import settings
+from app.core.logger import setup_logger
+from app.modules.drug_catalog import DrugRecord, parse_entry
+from app.utils.text_processing import clean_text
+from app.services.chunk_dedup import MinHashDeduplicator
+
+logger = setup_logger()
+
+# Tamanhos de lote
+EMBED_BATCH_SIZE = 256      # chunks por chamada ao modelo de embedding
+WRITE_BATCH_SIZE = 1024     # chunks por upsert (abaixo do limite de batch do Chroma)
+WRITE_QUEUE_SIZE = 8        # lotes já codificados aguardando escrita
+
+# Versão do formato dos chunks (IDs, metadados); manifestos de outra versão são
+# descartados e tudo é reingerido (o cache de embeddings evita recodificar)
+MANIFEST_VERSION = 4
+
+# Splitter por processo do pool (criado uma vez por worker)
+_splitter = None
+
+
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    global _splitter
+    if _splitter is None:
+        _splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=["\n\n", "\n", " ", ""]
+        )
+    return _splitter
+
+
+def chunk_id(source: str, offset: int) -> str:
+    """ID determinístico de um chunk: hash do arquivo de origem e do offset no texto."""
+    return hashlib.sha1(f"{source}:{offset}".encode("utf-8")).hexdigest()
+
+
+def file_hash(file_path: str) -> str:
+    """Hash SHA-256 do conteúdo do arquivo."""
+    return hashlib.sha256(Path(file_path).read_bytes()).hexdigest()
+
+
+def split_document(source: str, text: str, chunk_size: int, chunk_overlap: int,
+                   metadata: dict = None) -> List[Tuple[str, str, dict]]:
+    """
+    Divide o texto de uma origem em chunks com IDs determinísticos.
+
+    Args:
+        source: Identificador da origem (nome do arquivo, verbete do PDF...)
+        text: Texto completo da origem
+        chunk_size: Tamanho máximo de cada chunk
+        chunk_overlap: Sobreposição entre chunks consecutivos
+        metadata: Metadados extras copiados para cada chunk
+
+    Returns:
+        [(id, texto, metadados)]
+    """
+    chunks = []
+    offset = 0
+    for chunk in _get_splitter(chunk_size, chunk_overlap).split_text(text):
+        # Offset do chunk no texto (como o add_start_index do LangChain)
+        offset = text.find(chunk, offset)
+        chunks.append((chunk_id(source, offset), chunk,
+                       {**(metadata or {}), "source": source, "start_index": offset}))
+        offset += 1
+    return chunks
+
+
+def load_and_split(file_path: str, chunk_size: int, chunk_overlap: int) -> Tuple[str, List[Tuple[str, str, dict]], float, Optional[DrugRecord]]:
+    """
+    Lê, limpa (clean_text), interpreta e divide um arquivo em chunks (executado nos processos do pool).
+
+    Args:
+        file_path: Caminho do arquivo .txt
+        chunk_size: Tamanho máximo de cada chunk
+        chunk_overlap: Sobreposição entre chunks consecutivos
+
+    Returns:
+        (nome do arquivo, [(id, texto, metadados)], segundos gastos, verbete ou None)
+    """
+    start = time.perf_counter()
+    filename = Path(file_path).name
+    text = clean_text(Path(file_path).read_text(encoding="utf-8"), keep_newlines=True)
+    record = parse_entry(text, source=filename)
+    chunks = split_document(filename, text, chunk_size, chunk_overlap, record.metadata() if record else None)
+    return filename, chunks, time.perf_counter() - start, record
+
+
+@dataclass
+class StageStats:
+    """Contadores de um estágio do pipeline."""
+    name: str
+    unit: str
+    items: int = 0
+    busy_sec: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.busy_sec if self.busy_sec else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "unit": self.unit,
+            "busy_sec": round(self.busy_sec, 3),
+            f"{self.unit}_per_sec": round(self.throughput, 1)
+        }
+
+
+class IngestionPipeline:
+    """
+    Pipeline de ingestão em três estágios (leitura/split, embedding, escrita).
+    """
+
+    def __init__(self, embedding_func, vectordb, embed_batch_size: int = EMBED_BATCH_SIZE,
+                 write_batch_size: int = WRITE_BATCH_SIZE, workers: int = None,
+                 chunk_size: int = settings.CHUNK_SIZE, chunk_overlap: int = settings.CHUNK_OVERLAP,
+                 dedup: Optional[MinHashDeduplicator] = None, on_source_done: Optional[Callable] = None,
+                 on_progress: Optional[Callable[[Dict], None]] = None):
+        """
+        Args:
+            embedding_func: Embeddings do LangChain (usa embed_documents)
+            vectordb: VectorStore Chroma do LangChain (destino dos chunks)
+            embed_batch_size: Chunks por lote de embedding
+            write_batch_size: Chunks por upsert no ChromaDB
+            workers: Processos de leitura/split (padrão: número de CPUs)
+            chunk_size: Tamanho máximo de cada chunk
+            chunk_overlap: Sobreposição entre chunks consecutivos
+            dedup: Índice MinHash/LSH; se informado, chunks quase duplicados
+                não são gravados e vão para 'duplicates' no relatório
+            on_source_done: Chamado (da thread de escrita) com (origem, IDs,
+                duplicatas, verbete) assim que todos os chunks da origem foram
+                gravados; usado pelo IngestCheckpoint
+            on_progress: Chamado a cada origem lida com {'files', 'total',
+                'chunks_embedded', 'chunks_written', 'elapsed_sec'}
+        """
+        self.embedding_func = embedding_func
+        self.vectordb = vectordb
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = write_batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.dedup = dedup
+        self.on_source_done = on_source_done
+        self.on_progress = on_progress
+
+    def run(self, files: List[str]) -> Dict:
+        """
+        Ingere os arquivos e retorna o relatório do pipeline.
+
+        Args:
+            files: Caminhos dos arquivos a ingerir
+
+        Returns:
+            Dicionário com arquivos/chunks processados, falhas, IDs gravados por
+            arquivo, verbetes interpretados ('records'), tempo total e os
+            contadores de cada estágio
+        """
+        failed = set()
+
+        def split_files():
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(load_and_split, path, self.chunk_size, self.chunk_overlap): path
+                           for path in files}
+                for future in as_completed(futures):
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        logger.error(f"Erro ao processar {futures[future]}: {str(e)}")
+                        failed.add(Path(futures[future]).name)
+
+        return self._run(split_files(), failed, total=len(files))
+
+    def run_documents(self, documents: Iterable[Tuple[str, str, dict]], parse_entries: bool = True) -> Dict:
+        """
+        Ingere documentos já extraídos (ex.: verbetes de um PDF) sem arquivos
+        intermediários. O iterável é consumido sob demanda, então a memória
+        fica limitada aos lotes em andamento. Os documentos que são verbetes
+        também entram em 'records' do relatório.
+
+        Args:
+            documents: Iterável de (origem, texto, metadados extras)
+            parse_entries: Se False, os documentos não são tratados como
+                verbetes (ex.: páginas de uma bula avulsa)
+
+        Returns:
+            Relatório no mesmo formato de run()
+        """
+        def split_documents():
+            for source, text, metadata in documents:
+                start = time.perf_counter()
+                text = clean_text(text, keep_newlines=True)
+                record = parse_entry(text, source=source) if parse_entries else None
+                if record:
+                    metadata = {**record.metadata(), **(metadata or {})}
+                chunks = split_document(source, text, self.chunk_size, self.chunk_overlap, metadata)
+                yield source, chunks, time.perf_counter() - start, record
+
+        return self._run(split_documents(), set())
+
+    def _run(self, split_results: Iterable, failed: set, total: int = None) -> Dict:
+        start = time.perf_counter()
+        stats = {
+            "read_split": StageStats("read_split", "files"),
+            "embed": StageStats("embed", "chunks"),
+            "write": StageStats("write", "chunks"),
+        }
+        if self.dedup is not None:
+            stats["dedup"] = StageStats("dedup", "chunks")
+        chunk_ids = {}
+        duplicates = {}
+        records = {}
+        # (chunks enviados à escrita até a origem, origem): a escrita é em ordem,
+        # então a origem está completa quando esse total de chunks foi gravado
+        completions = deque()
+        sent = 0
+
+        def complete(flushed: int):
+            while completions and completions[0][0] <= flushed:
+                _, source = completions.popleft()
+                if source in failed or self.on_source_done is None:
+                    continue
+                try:
+                    self.on_source_done(source, chunk_ids[source], duplicates.get(source, []), records.get(source))
+                except Exception as e:
+                    logger.error(f"Erro ao registrar {source} no checkpoint: {str(e)}")
+
+        write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        writer = threading.Thread(target=self._write_stage, args=(write_queue, stats["write"], failed, complete),
+                                  name="ingest-writer", daemon=True)
+        writer.start()
+
+        pending = []
+        try:
+            for source, chunks, elapsed, record in split_results:
+                stats["read_split"].items += 1
+                stats["read_split"].busy_sec += elapsed
+                if self.dedup is not None and chunks:
+                    dedup_start = time.perf_counter()
+                    stats["dedup"].items += len(chunks)
+                    chunks, duplicates[source] = self.dedup.filter(chunks)
+                    stats["dedup"].busy_sec += time.perf_counter() - dedup_start
+                chunk_ids[source] = [chunk[0] for chunk in chunks]
+                if record:
+                    records[source] = record
+                if not chunks and not duplicates.get(source):
+                    logger.warning(f"Nenhum chunk gerado para {source}")
+                sent += len(chunks)
+                completions.append((sent, source))
+
+                # Enquanto o pool lê os próximos arquivos, codificamos lotes cheios
+                pending.extend(chunks)
+                while len(pending) >= self.embed_batch_size:
+                    self._embed_stage(pending[:self.embed_batch_size], write_queue, stats["embed"])
+                    del pending[:self.embed_batch_size]
+
+                if stats["read_split"].items % 50 == 0:
+                    logger.info(f"Progresso: {stats['read_split'].items}/{total or '?'} arquivos lidos, "
+                                f"{stats['embed'].items} chunks codificados.")
+                if self.on_progress is not None:
+                    self.on_progress({
+                        "files": stats["read_split"].items,
+                        "total": total,
+                        "chunks_embedded": stats["embed"].items,
+                        "chunks_written": stats["write"].items,
+                        "elapsed_sec": time.perf_counter() - start,
+                    })
+            if pending:
+                self._embed_stage(pending, write_queue, stats["embed"])
+        finally:
+            write_queue.put(None)
+            writer.join()
+            if self.dedup is not None:
+                # Chunks que não chegaram ao ChromaDB não podem servir de canônicos
+                self.dedup.remove([chunk for source in failed for chunk in chunk_ids.get(source, [])])
+
+        elapsed = time.perf_counter() - start
+        report = {
+            "files": stats["read_split"].items,
+            "files_failed": sorted(failed),
+            "chunks": stats["write"].items,
+            "chunk_ids": {source: ids for source, ids in chunk_ids.items() if source not in failed},
+            "records": [record for source, record in records.items() if source not in failed],
+            "duplicates": {source: dups for source, dups in duplicates.items() if dups and source not in failed},
+            "elapsed_sec": round(elapsed, 3),
+            "files_per_sec": round(stats["read_split"].items / elapsed, 1) if elapsed else 0.0,
+            "stages": {name: stage.as_dict() for name, stage in stats.items()}
+        }
+        logger.info(f"Pipeline concluído: {report['files']} arquivos, {report['chunks']} chunks "
+                    f"em {report['elapsed_sec']}s.")
+        return report
+
+    def _embed_stage(self, batch: List[Tuple[str, str, dict]], write_queue: queue.Queue, stats: StageStats):
+        texts = [text for _, text, _ in batch]
+        start = time.perf_counter()
+        vectors = self.embedding_func.embed_documents(texts)
+        stats.busy_sec += time.perf_counter() - start
+        stats.items += len(texts)
+        # Bloqueia se a escrita ficar para trás (fila limitada = memória limitada)
+        write_queue.put(([chunk[0] for chunk in batch], texts, [chunk[2] for chunk in batch], vectors))
+
+    def _write_stage(self, write_queue: queue.Queue, stats: StageStats, failed: set, complete: Callable):
+        buffer = ([], [], [], [])
+        flushed = 0
+        while True:
+            item = write_queue.get()
+            if item is not None:
+                for target, values in zip(buffer, item):
+                    target.extend(values)
+            if buffer[0] and (item is None or len(buffer[0]) >= self.write_batch_size):
+                self._flush(buffer, stats, failed)
+                flushed += len(buffer[0])
+                buffer = ([], [], [], [])
+                complete(flushed)
+            if item is None:
+                # Origens sem chunks depois do último upsert
+                complete(flushed)
+                return
+
+    def _flush(self, buffer: tuple, stats: StageStats, failed: set):
+        ids, texts, metadatas, vectors = buffer
+        start = time.perf_counter()
+        for i in range(0, len(ids), self.write_batch_size):
+            end = i + self.write_batch_size
+            try:
+                # Embeddings já calculados: grava direto na coleção, sem recodificar
+                self.vectordb._collection.upsert(
+                    ids=ids[i:end],
+                    documents=texts[i:end],
+                    metadatas=metadatas[i:end],
+                    embeddings=vectors[i:end]
+                )
+                stats.items += len(ids[i:end])
+            except Exception as e:
+                logger.error(f"Erro ao gravar {len(ids[i:end])} chunks no ChromaDB: {str(e)}")
+                failed.update(metadata["source"] for metadata in metadatas[i:end])
+        stats.busy_sec += time.perf_counter() - start
+
+
+class IngestManifest:
+    """
+    Manifesto da ingestão incremental: para cada arquivo de origem, o hash do
+    conteúdo, os IDs dos chunks gravados e os chunks descartados como
+    duplicatas ([origem, offset, id canônico]). Salvo em JSON ao lado do ChromaDB.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Caminho do arquivo JSON do manifesto
+        """
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.entries = data.get("files", {})
+
+    def plan(self, files: List[str], purge_missing: bool = False) -> Dict:
+        """
+        Compara os arquivos com o manifesto.
+
+        Args:
+            files: Caminhos dos arquivos candidatos
+            purge_missing: Se True, arquivos de texto do manifesto ausentes em files
+                são removidos (PDFs ingeridos à parte não entram na limpeza)
+
+        Returns:
+            Dicionário com listas 'new', 'modified', 'unchanged' (caminhos),
+            'removed' (nomes) e 'hashes' ({nome: hash})
+        """
+        plan = {"new": [], "modified": [], "unchanged": [], "removed": [], "hashes": {}}
+        names = set()
+        for path in files:
+            name = Path(path).name
+            names.add(name)
+            digest = file_hash(path)
+            plan["hashes"][name] = digest
+            entry = self.entries.get(name)
+            if entry is None:
+                plan["new"].append(path)
+            elif entry["hash"] != digest:
+                plan["modified"].append(path)
+            else:
+                plan["unchanged"].append(path)
+        if purge_missing:
+            plan["removed"] = sorted(name for name, entry in self.entries.items()
+                                     if name not in names and entry.get("kind", "text") == "text")
+        return plan
+
+    def chunk_ids(self, names: List[str]) -> List[str]:
+        return [chunk for name in names for chunk in self.entries.get(name, {}).get("chunk_ids", [])]
+
+    def update(self, name: str, digest: str, chunk_ids: List[str], kind: str = "text",
+               duplicates: Optional[List] = None):
+        self.entries[name] = {"hash": digest, "chunk_ids": chunk_ids, "kind": kind,
+                              "duplicates": [list(dup) for dup in duplicates or []]}
+
+    def dependents(self, names: List[str]) -> List[str]:
+        """
+        Entradas cujas duplicatas apontam para chunks das entradas em names
+        (direta ou indiretamente). Ao apagar os canônicos, elas precisam ser
+        reprocessadas para o conteúdo continuar no índice.
+        """
+        stale, found = set(names), []
+        deleted = set(self.chunk_ids(names))
+        while deleted:
+            new = [name for name, entry in self.entries.items() if name not in stale
+                   and any(dup[2] in deleted for dup in entry.get("duplicates", []))]
+            stale.update(new)
+            found.extend(new)
+            deleted = set(self.chunk_ids(new))
+        return found
+
+    def duplicate_locations(self) -> Dict[str, List[Tuple[str, int]]]:
+        """{id do chunk canônico: [(origem, offset) de cada duplicata descartada]}."""
+        locations = {}
+        for entry in self.entries.values():
+            for source, offset, canonical in entry.get("duplicates", []):
+                locations.setdefault(canonical, []).append((source, offset))
+        return locations
+
+    def remove(self, name: str):
+        self.entries.pop(name, None)
+
+    def invalidate(self, name: str):
+        """Força o reprocessamento na próxima ingestão, mantendo os IDs para a limpeza."""
+        if name in self.entries:
+            self.entries[name]["hash"] = ""
+
+    def save(self):
+        """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class IngestCheckpoint:
+    """
+    Diário (JSON Lines) das origens já gravadas no ChromaDB durante uma
+    ingestão: hash, IDs dos chunks, duplicatas e verbete. Cada linha vai para
+    o disco (fsync) assim que os chunks da origem são gravados; se o processo
+    cair, a próxima ingestão aplica o diário ao manifesto e só reprocessa o
+    resto. Apagado quando o manifesto é salvo.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Caminho do arquivo .jsonl do checkpoint
+        """
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self) -> List[Dict]:
+        """Entradas registradas (a última linha, se cortada no meio da gravação, é ignorada)."""
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return entries
+
+    def record(self, name: str, digest: str, chunk_ids: List[str], duplicates: Optional[List] = None,
+               record: Optional[DrugRecord] = None):
+        line = json.dumps({"name": name, "hash": digest, "chunk_ids": chunk_ids,
+                           "duplicates": [list(dup) for dup in duplicates or []],
+                           "record": asdict(record) if record else None}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def clear(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,90 @@
+"""
+🔹 LEITURA DE PDF EM STREAMING - Guia de medicamentos e bulas em PDF
+
+Lê o PDF página a página (sem carregar o texto inteiro) e entrega os
+verbetes direto ao pipeline de ingestão, sem arquivos .txt intermediários:
+
+1. iter_pdf_pages: texto de cada página, sem os marcadores "- 83 -"
+2. iter_drug_entries: junta as linhas em verbetes ("1.102 SACHAROMYCES..."),
+   inclusive quando um verbete continua na página seguinte
+"""
+
+import re
+import time
+from typing import Iterator, Tuple, Optional, Dict
+from pypdf import PdfReader
+from app.core.logger import setup_logger
+from app.utils.text_processing import strip_page_markers
+
+logger = setup_logger()
+
+# Número do verbete sozinho na linha ("1.102"); no sumário o número vem na mesma linha do nome
+ENTRY_NUMBER = re.compile(r"^\s*(\d+\.\d+)\s*$")
+# Linha que segue o nome do medicamento em todos os verbetes
+TRADE_NAME = re.compile(r"^\s*Nome\s+comercial", re.IGNORECASE)
+# O pypdf guarda em cache todo objeto já lido; limpar a cada N páginas mantém a
+# memória limitada sem reprocessar as fontes compartilhadas a cada página
+PDF_CACHE_RESET_PAGES = 50
+
+
+def iter_pdf_pages(pdf_path: str, stats: Optional[Dict] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Gera (número da página, texto) sob demanda.
+
+    Args:
+        pdf_path: Caminho do PDF
+        stats: Dicionário opcional atualizado com 'pages' e 'extract_sec'
+
+    Yields:
+        (número da página a partir de 1, texto sem marcadores de página)
+    """
+    reader = PdfReader(pdf_path)
+    for number, page in enumerate(reader.pages, 1):
+        start = time.perf_counter()
+        text = strip_page_markers(page.extract_text() or "")
+        if number % PDF_CACHE_RESET_PAGES == 0:
+            reader.resolved_objects.clear()
+        if stats is not None:
+            stats["pages"] = stats.get("pages", 0) + 1
+            stats["extract_sec"] = stats.get("extract_sec", 0.0) + time.perf_counter() - start
+        yield number, text
+
+
+def _entry(number: str, page: int, lines: list) -> Dict:
+    body = [line.rstrip() for line in lines]
+    # O nome é a última linha preenchida antes de "Nome comercial"
+    name = None
+    for i, line in enumerate(body):
+        if TRADE_NAME.match(line):
+            name = next((previous.strip() for previous in reversed(body[:i]) if previous.strip()), None)
+            break
+    if name is None:
+        name = next((line.strip() for line in body if line.strip()), number)
+    return {"number": number, "name": name, "page": page, "text": f"{number}\n" + "\n".join(body).strip()}
+
+
+def iter_drug_entries(pages: Iterator[Tuple[int, str]]) -> Iterator[Dict]:
+    """
+    Agrupa as linhas das páginas em verbetes. Um verbete começa numa linha
+    só com o número ("1.102") e termina no próximo; quebras de página no
+    meio são ignoradas. O texto antes do primeiro verbete (capa, sumário)
+    é descartado.
+
+    Args:
+        pages: Iterável de (número da página, texto), ex.: iter_pdf_pages()
+
+    Yields:
+        {'number', 'name', 'page' (página inicial), 'text'}
+    """
+    number, page_start, lines = None, None, []
+    for page_number, text in pages:
+        for line in text.splitlines():
+            match = ENTRY_NUMBER.match(line)
+            if match:
+                if number is not None:
+                    yield _entry(number, page_start, lines)
+                number, page_start, lines = match.group(1), page_number, []
+            elif number is not None:
+                lines.append(line)
+    if number is not None:
+        yield _entry(number, page_start, lines)
@@ -3,30 +3,47 @@
 
 Este é o núcleo de IA do sistema. Implementa o pipeline RAG completo:
 
-1. Busca contexto relevante no ChromaDB (vetorização)
-2. Recupera chunks relacionados ao medicamento
+1. Busca contexto relevante no índice local (VectorService.find_medication)
+2. Se a bula não está no índice, busca na web (ScraperService)
 3. Envia contexto + prompt ao Gemini API
 4. Retorna texto simplificado e acessível
 
-IMPLEMENTAÇÃO NECESSÁRIA:
-- Configurar LangChain retriever com ChromaDB
-- Implementar busca semântica de chunks
-- Criar prompts otimizados para simplificação
-- Integrar com Gemini API via LangChain
-- Tratamento de erros e fallback para web scraping
+A bula encontrada na web é vetorizada em segundo plano (web_ingestion): as
+próximas consultas do mesmo medicamento saem do índice local.
 """
 
-from typing import Optional
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
+import asyncio
+from typing import Optional, List
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.prompts import PromptTemplate
 from app.core.config import settings
 from app.core.logger import setup_logger
+from app.core.dependencies import get_vector_service
 from app.services.scraper_service import ScraperService
+from app.services.web_ingestion import fetch_and_ingest
 
 logger = setup_logger()
 
+# Limite do texto da bula enviado ao LLM (uma bula da web inteira passa disso)
+MAX_CONTEXT_CHARS = 12000
+
+SIMPLIFY_PROMPT_TEMPLATE = """
+Você é um assistente especializado em simplificar bulas de medicamentos
+para idosos. Simplifique o seguinte texto técnico, tornando-o claro e
+acessível, mantendo informações essenciais sobre:
+- Para que serve
+- Como tomar
+- Cuidados e efeitos colaterais importantes
+- Quando não tomar
+
+Use apenas o texto da bula abaixo.
+
+Medicamento: {medication_name}
+Bula original: {context}
+
+Texto simplificado:
+"""
+
 
 class RAGService:
     """
@@ -47,113 +64,92 @@ class RAGService:
         """
         self.chroma_client = chroma_client
         self.scraper_service = ScraperService()
-        
-        # TODO: Inicializar LangChain components
-        # - Vector store (Chroma)
-        # - LLM (ChatGoogleGenerativeAI)
-        # - Retriever
-        # - Chain (RetrievalQA)
+        self.llm = ChatGoogleGenerativeAI(
+            model=settings.LLM_MODEL,
+            google_api_key=settings.GOOGLE_API_KEY,
+            temperature=0.7
+        )
+        self.prompt_template = PromptTemplate(
+            input_variables=["context", "medication_name"],
+            template=SIMPLIFY_PROMPT_TEMPLATE
+        )
         
         logger.info("RAGService inicializado")
     
     
     async def simplify_medication_info(self, medication_name: str) -> str:
         """
-        🔹 IMPLEMENTAR: Simplifica a bula de um medicamento.
+        Simplifica a bula de um medicamento.
         
         Fluxo:
-        1. Buscar no ChromaDB usando embedding do nome do medicamento
-        2. Se não encontrar, buscar na web via scraper_service
-        3. Recuperar chunks relevantes (top-k)
-        4. Construir prompt com contexto + instruções de simplificação
-        5. Chamar Gemini API para gerar texto simplificado
-        6. Retornar resultado
+        1. Buscar no índice local (catálogo de nomes, depois busca vetorial)
+        2. Se não encontrar, buscar na web (e agendar a vetorização)
+        3. Construir prompt com contexto + instruções de simplificação
+        4. Chamar Gemini API para gerar texto simplificado
         
         Args:
             medication_name: Nome do medicamento
             
         Returns:
             Texto simplificado da bula
+            
+        Raises:
+            LookupError: Bula não encontrada nem no índice nem na web
         """
         logger.info(f"Simplificando bula para: {medication_name}")
         
         try:
-            # TODO: Passo 1 - Buscar no ChromaDB
-            # vector_store = Chroma(
-            #     client=self.chroma_client,
-            #     collection_name=settings.CHROMA_COLLECTION_NAME,
-            #     embedding_function=embedding_function
-            # )
-            # retriever = vector_store.as_retriever(search_kwargs={"k": 5})
-            # docs = retriever.get_relevant_documents(medication_name)
-            
-            # TODO: Passo 2 - Se não encontrar, buscar na web
-            # if not docs:
-            #     logger.info("Bula não encontrada no ChromaDB, buscando na web...")
-            #     web_content = await self.scraper_service.fetch_medication_info(medication_name)
-            #     # Vetorizar e adicionar ao ChromaDB para próximas buscas
-            #     # await vector_service.add_document(medication_name, web_content)
-            
-            # TODO: Passo 3 - Construir prompt de simplificação
-            # prompt_template = PromptTemplate(
-            #     input_variables=["context", "medication_name"],
-            #     template="""
-            #     Você é um assistente especializado em simplificar bulas de medicamentos
-            #     para idosos. Simplifique o seguinte texto técnico, tornando-o claro e
-            #     acessível, mantendo informações essenciais sobre:
-            #     - Para que serve
-            #     - Como tomar
-            #     - Cuidados e efeitos colaterais importantes
-            #     - Quando não tomar
-            #     
-            #     Medicamento: {medication_name}
-            #     Bula original: {context}
-            #     
-            #     Texto simplificado:
-            #     """
-            # )
-            
-            # TODO: Passo 4 - Chamar Gemini API
-            # llm = ChatGoogleGenerativeAI(
-            #     model=settings.LLM_MODEL,
-            #     google_api_key=settings.GOOGLE_API_KEY,
-            #     temperature=0.7
-            # )
-            # chain = RetrievalQA.from_chain_type(
-            #     llm=llm,
-            #     chain_type="stuff",
-            #     retriever=retriever,
-            #     return_source_documents=True
-            # )
-            # result = chain({"query": f"Simplifique a bula de {medication_name}"})
-            
-            # Por enquanto, retorna placeholder
-            return f"""
-            [IMPLEMENTAR] Bula simplificada para {medication_name}
+            # Passo 1 - Buscar no índice local (catálogo de nomes, depois busca vetorial)
+            docs = await self.search_medication_context(medication_name)
+            context = "\n\n".join(doc.page_content for doc in docs)
+
+            # Passo 2 - Se não encontrar, buscar na web
+            if not docs:
+                logger.info("Bula não encontrada no índice local, buscando na web...")
+                context = await self.fetch_from_web(medication_name)
+            if not context:
+                raise LookupError(f"Bula não encontrada para: {medication_name}")
             
-            Esta função deve:
-            1. Buscar a bula no ChromaDB
-            2. Se não encontrar, buscar na web
-            3. Usar LangChain + Gemini para simplificar
-            4. Retornar texto acessível
-            """
+            # Passos 3 e 4 - Prompt de simplificação + Gemini (chamada bloqueante, fora do event loop)
+            prompt = self.prompt_template.format(context=context[:MAX_CONTEXT_CHARS],
+                                                 medication_name=medication_name)
+            response = await asyncio.to_thread(self.llm.invoke, prompt)
+            return response.content.strip()
             
         except Exception as e:
             logger.error(f"Erro no RAG service: {str(e)}")
             raise
     
     
-    async def search_medication_context(self, medication_name: str, top_k: int = 5):
+    async def search_medication_context(self, medication_name: str, top_k: int = 5) -> List:
         """
-        🔹 IMPLEMENTAR: Busca contexto relevante sobre um medicamento.
+        Busca contexto relevante sobre um medicamento no índice local.
         
         Args:
             medication_name: Nome do medicamento
-            top_k: Número de chunks a retornar
+            top_k: Número de chunks da busca vetorial
             
         Returns:
-            Lista de documentos relevantes
+            Lista de documentos relevantes (vazia se a bula não está no índice)
         """
-        # TODO: Implementar busca semântica no ChromaDB
-        pass
-
+        try:
+            vector_service = await asyncio.to_thread(get_vector_service)
+            return await asyncio.to_thread(vector_service.find_medication, medication_name, top_k)
+        except Exception as e:
+            logger.error(f"Erro na busca local: {str(e)}")
+            return []
+    
+    
+    async def fetch_from_web(self, medication_name: str) -> Optional[str]:
+        """
+        Busca a bula na web e a entrega à ingestão em segundo plano
+        (write-through); a resposta atual usa o texto baixado sem esperar.
+        
+        Args:
+            medication_name: Nome do medicamento
+            
+        Returns:
+            Texto da bula, ou None
+        """
+        best = await fetch_and_ingest(medication_name, self.scraper_service)
+        return best["content"] if best else None
@@ -4,134 +4,236 @@
 Este serviço é usado como fallback quando uma bula não é encontrada
 no ChromaDB. Faz scraping de sites de bulas de medicamentos.
 
-IMPLEMENTAÇÃO NECESSÁRIA:
-- Buscar em sites como Anvisa, Bulário Eletrônico, etc.
-- Extrair texto relevante usando BeautifulSoup
-- Limpar e normalizar o texto
-- Retornar conteúdo para vetorização
+- Cliente httpx assíncrono com um pool de conexões compartilhado por todas
+  as instâncias (o RAGService cria um ScraperService por requisição)
+- Limite de requisições simultâneas e timeout por host
+- Cache HTTP em disco (ver http_cache): bula repetida custa um 304 ou nada
+- search_multiple_sources consulta todos os sites ao mesmo tempo
+- Extração só das seções indexadas da bula com o parser em streaming do
+  lxml (ver bula_extractor), em thread, fora do event loop
 """
 
-import requests
-from bs4 import BeautifulSoup
-from typing import Optional
+import time
+import asyncio
+import threading
+import httpx
+from typing import Optional, List, Dict
 from app.core.config import settings
 from app.core.logger import setup_logger
+from app.services.http_cache import HttpCache, CachedResponse
+from app.services.bula_extractor import extract_bula_text
 from app.utils.text_processing import clean_text, normalize_medication_name
 
 logger = setup_logger()
 
+# Trechos menores que isso são menus/avisos, não uma bula
+MIN_CONTENT_CHARS = 200
+
+# Estado compartilhado: pool de conexões, semáforos por host e cache em disco.
+# O cliente pertence ao event loop em que foi criado; outro loop cria outro
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_client_creation: Optional[asyncio.Task] = None
+_host_limits: Dict[str, asyncio.Semaphore] = {}
+_cache: Optional[HttpCache] = None
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "revalidated": 0, "misses": 0, "errors": 0}
+
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        headers={"User-Agent": settings.SCRAPER_USER_AGENT},
+        timeout=httpx.Timeout(settings.SCRAPER_TIMEOUT, connect=settings.SCRAPER_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=settings.SCRAPER_MAX_CONNECTIONS,
+                            max_keepalive_connections=settings.SCRAPER_MAX_CONNECTIONS),
+        follow_redirects=True
+    )
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """
+    Cliente httpx compartilhado, criado no primeiro uso dentro do event loop.
+    A criação carrega os certificados TLS (~150 ms), então roda em thread.
+    """
+    global _client, _client_loop, _client_creation
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        # Corrotinas que chegam durante a criação esperam pelo mesmo cliente
+        if _client_creation is None or _client_creation.get_loop() is not loop:
+            _client_creation = loop.create_task(asyncio.to_thread(_new_client))
+        creation = _client_creation
+        client = await creation
+        if _client_creation is creation:
+            _client, _client_loop, _client_creation = client, loop, None
+            _host_limits.clear()
+    return _client
+
+
+async def close_http_client():
+    """Fecha o pool compartilhado (shutdown da aplicação)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    """Cache HTTP em disco, ou None se SCRAPER_CACHE_PATH estiver vazio."""
+    global _cache
+    with _cache_lock:
+        if _cache is None and settings.SCRAPER_CACHE_PATH:
+            _cache = HttpCache(settings.SCRAPER_CACHE_PATH)
+    return _cache
+
+
+def scraper_stats() -> Dict:
+    """Contadores do cache HTTP desde o início do processo."""
+    lookups = _stats["hits"] + _stats["revalidated"] + _stats["misses"]
+    return {**_stats, "hit_rate": round((_stats["hits"] + _stats["revalidated"]) / lookups, 3) if lookups else 0.0}
+
+
+def _host_limit(host: str) -> asyncio.Semaphore:
+    if host not in _host_limits:
+        _host_limits[host] = asyncio.Semaphore(settings.SCRAPER_PER_HOST_LIMIT)
+    return _host_limits[host]
+
+
+def _timeout(host: str) -> httpx.Timeout:
+    seconds = settings.SCRAPER_HOST_TIMEOUTS.get(host, settings.SCRAPER_TIMEOUT)
+    return httpx.Timeout(seconds, connect=min(seconds, settings.SCRAPER_CONNECT_TIMEOUT))
+
 
 class ScraperService:
     """
     Serviço para busca e scraping de bulas na web.
-    
+
     Responsabilidades:
     - Buscar bulas em sites especializados
     - Extrair e limpar conteúdo
     - Retornar texto processado
     """
-    
+
     def __init__(self):
         """Inicializa o serviço de scraping."""
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": settings.SCRAPER_USER_AGENT
-        })
-        
-        # Sites para buscar bulas
+        # Sites para buscar bulas (consultados com ?q=<nome normalizado>)
         self.bula_sites = [
             "https://www.anvisa.gov.br/datavisa/fila_bula/index.asp",
             # Adicionar outros sites relevantes
         ]
-        
+
         logger.info("ScraperService inicializado")
-    
-    
+
+
+    async def fetch(self, url: str, params: Optional[Dict] = None) -> CachedResponse:
+        """
+        GET com cache HTTP: resposta fresca sai do disco; vencida é
+        revalidada (304 renova o cache); as demais vão à rede pelo pool
+        compartilhado, respeitando o limite de conexões do host.
+
+        Args:
+            url: Endereço da página
+            params: Parâmetros de query
+
+        Returns:
+            Resposta (guardada ou não no cache)
+
+        Raises:
+            httpx.HTTPError: Erro de rede, timeout ou status 4xx/5xx
+        """
+        request_url = httpx.URL(url, params=params)
+        key = str(request_url)
+        cache = await asyncio.to_thread(get_http_cache)
+        cached = await asyncio.to_thread(cache.get, key) if cache is not None else None
+        if cached is not None and cached.is_fresh():
+            _stats["hits"] += 1
+            return cached
+
+        client = await get_http_client()
+        headers = cached.validators() if cached is not None else {}
+        try:
+            async with _host_limit(request_url.host):
+                response = await client.get(request_url, headers=headers, timeout=_timeout(request_url.host))
+            if response.status_code == 304 and cached is not None:
+                _stats["revalidated"] += 1
+                return await asyncio.to_thread(cache.refresh, cached, dict(response.headers.items()))
+            response.raise_for_status()
+        except httpx.HTTPError:
+            _stats["errors"] += 1
+            raise
+
+        _stats["misses"] += 1
+        response_headers = dict(response.headers.items())
+        stored = None
+        if cache is not None:
+            stored = await asyncio.to_thread(cache.put, key, response.status_code, response_headers, response.content)
+        return stored or CachedResponse(key, response.status_code, response_headers, response.content, time.time())
+
+
     async def fetch_medication_info(self, medication_name: str) -> Optional[str]:
         """
-        🔹 IMPLEMENTAR: Busca informações de um medicamento na web.
-        
+        Busca informações de um medicamento na web.
+
         Args:
             medication_name: Nome do medicamento
-            
+
         Returns:
-            Texto da bula encontrado, ou None
+            Texto da bula encontrado (do primeiro site da lista que tiver), ou None
         """
         logger.info(f"Buscando bula na web para: {medication_name}")
-        
+
         try:
-            # Normalizar nome do medicamento
-            normalized_name = normalize_medication_name(medication_name)
-            
-            # TODO: Implementar busca em sites de bulas
-            # 1. Fazer requisição para site de bulas
-            # 2. Parsear HTML com BeautifulSoup
-            # 3. Extrair texto relevante
-            # 4. Limpar e normalizar texto
-            # 5. Retornar conteúdo
-            
-            # Exemplo de estrutura:
-            # for site in self.bula_sites:
-            #     try:
-            #         response = self.session.get(
-            #             site,
-            #             params={"q": normalized_name},
-            #             timeout=settings.SCRAPER_TIMEOUT
-            #         )
-            #         response.raise_for_status()
-            #         
-            #         soup = BeautifulSoup(response.content, 'html.parser')
-            #         # Extrair conteúdo relevante
-            #         content = self._extract_bula_content(soup)
-            #         
-            #         if content:
-            #             return clean_text(content)
-            #     except Exception as e:
-            #         logger.warning(f"Erro ao buscar em {site}: {str(e)}")
-            #         continue
-            
+            results = await self.search_multiple_sources(medication_name)
+            if results:
+                return results[0]["content"]
+
             logger.warning(f"Bula não encontrada na web para: {medication_name}")
             return None
-            
+
         except Exception as e:
             logger.error(f"Erro no scraping: {str(e)}")
             return None
-    
-    
-    def _extract_bula_content(self, soup: BeautifulSoup) -> Optional[str]:
+
+
+    def _extract_bula_content(self, content: bytes, encoding: Optional[str] = None) -> Optional[str]:
         """
-        🔹 IMPLEMENTAR: Extrai conteúdo da bula do HTML parseado.
-        
+        Extrai da página só as seções que indexamos (indicações, posologia,
+        reações adversas e interações), sem montar a árvore do HTML.
+
         Args:
-            soup: Objeto BeautifulSoup com HTML parseado
-            
+            content: HTML da resposta em bytes
+            encoding: Charset do Content-Type (None = detectar pela página)
+
         Returns:
-            Texto extraído da bula
+            Texto das seções, com títulos, ou None se a página não for uma bula
         """
-        # TODO: Implementar extração específica para cada site
-        # Identificar seções relevantes (indicações, posologia, etc.)
-        # Extrair texto e limpar HTML
-        
-        return None
-    
-    
+        text = extract_bula_text(content, encoding)
+        if not text or len(text) < MIN_CONTENT_CHARS:
+            return None
+        return clean_text(text, keep_newlines=True)
+
+
+    async def _fetch_source(self, site: str, normalized_name: str) -> Optional[Dict]:
+        try:
+            response = await self.fetch(site, params={"q": normalized_name})
+            # Parse é CPU: fora do event loop
+            content = await asyncio.to_thread(self._extract_bula_content, response.content, response.charset)
+        except Exception as e:
+            logger.warning(f"Erro ao buscar em {site}: {str(e)}")
+            return None
+        return {"source": site, "url": response.url, "content": content} if content else None
+
+
     async def search_multiple_sources(self, medication_name: str) -> List[Dict]:
         """
-        🔹 IMPLEMENTAR: Busca em múltiplas fontes e retorna resultados.
-        
+        Busca em múltiplas fontes ao mesmo tempo e retorna os resultados.
+
         Args:
             medication_name: Nome do medicamento
-            
+
         Returns:
-            Lista de resultados encontrados
+            Lista de resultados encontrados ({'source', 'url', 'content'}), na
+            ordem de self.bula_sites
         """
-        results = []
-        
-        # TODO: Buscar em múltiplas fontes e agregar resultados
-        # for site in self.bula_sites:
-        #     content = await self.fetch_medication_info(medication_name)
-        #     if content:
-        #         results.append({"source": site, "content": content})
-        
-        return results
-
+        normalized_name = normalize_medication_name(medication_name)
+        results = await asyncio.gather(*(self._fetch_source(site, normalized_name) for site in self.bula_sites))
+        return [result for result in results if result]
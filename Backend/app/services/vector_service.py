@@ -7,29 +7,74 @@ Este serviço é responsável pelo processo offline de ingestão:
 2. Fazer split em chunks com TextSplitter
 3. Gerar embeddings usando HuggingFace Embeddings (all-MiniLM-L6-v2)
 4. Armazenar no ChromaDB para busca semântica
+
+PDFs (ex.: guia-medicamentos.pdf, origem dos batches) são lidos em streaming
+e entram no mesmo pipeline verbete a verbete (ver process_pdf).
+
+Cada verbete também é interpretado campo a campo (modules/drug_catalog): o
+nome do medicamento vai nos metadados dos chunks (filtro 'where' por
+medicamento_norm) e o verbete completo no catálogo usado na busca exata.
+
+Ao final, o índice pode ser exportado num snapshot de arquivo único
+(modules/index_snapshot) que a API abre via mmap em vez do ChromaDB.
+
+Reingestões são blue/green (modules/index_versions): begin_build() copia a
+versão ativa para um diretório novo (bulas_local@vN), a ingestão grava nele
+e publish_build() valida a versão com um smoke check antes de trocar o
+ponteiro que a API lê. A API nunca vê um índice pela metade.
+
+Ingestões em lote são retomáveis: cada arquivo gravado entra num checkpoint
+no diretório da versão em construção; se o processo cair, begin_build()
+reabre a mesma versão e ingest_files() só reprocessa o que faltou.
+
+Bulas buscadas na web (fallback do RAGManager da API e do RAGService) entram
+no índice ativo por ingest_web_document() (write-through, ver web_ingestion):
+as próximas consultas do mesmo medicamento saem do índice local via
+find_medication(). Durante um build, publish_build() as leva para a nova versão.
 """
 
 import os
+import time
+import hashlib
+import threading
+import shutil
+import asyncio
 from pathlib import Path
-from typing import List, Optional
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import List, Optional, Dict, Callable
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from app.core.config import settings
 from app.core.logger import setup_logger
+from app.services.ingestion_pipeline import IngestionPipeline, IngestManifest, IngestCheckpoint, EMBED_BATCH_SIZE
+from app.services.pdf_ingestion import iter_pdf_pages, iter_drug_entries
+from app.services.chunk_dedup import MinHashDeduplicator
+from app.modules.embedding_cache import CachedEmbeddings
+from app.modules.drug_catalog import DrugCatalog, DrugRecord, DRUG_CATALOG_PATH, normalize_name
+from app.modules.index_versions import (
+    INDEX_VERSIONS_DIR, LEGACY_DB_DIR, CATALOG_FILE, read_pointer, write_pointer, list_versions, retire_versions,
+    version_name, version_dir, write_lock
+)
+from app.modules.index_snapshot import write_snapshot, SNAPSHOT_PATH
 
 logger = setup_logger()
 
 # Configurações locais para garantir compatibilidade com rag_manager.py
-# Configurações locais para garantir compatibilidade com rag_manager.py
-# Resolve o caminho do banco relativo ao arquivo atual (vector_service.py está em app/services/)
-# Queremos chegar em app/chroma_bulas_local
-_current_dir = os.path.dirname(os.path.abspath(__file__)) # .../app/services
-_app_dir = os.path.dirname(_current_dir) # .../app
-DB_DIR = os.path.join(_app_dir, "chroma_bulas_local")
+# Diretório legado do ChromaDB: o mesmo caminho absoluto que o RAGManager lê
+DB_DIR = LEGACY_DB_DIR
 COLLECTION_NAME = "bulas_local"
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Manifesto da ingestão incremental (hash e chunks de cada arquivo), dentro do diretório do índice
+MANIFEST_FILE = f"{COLLECTION_NAME}.manifest.json"
+# Assinaturas MinHash dos chunks canônicos (deduplicação entre ingestões)
+DEDUP_INDEX_FILE = f"{COLLECTION_NAME}.minhash.npz"
+# Arquivos já gravados pela ingestão em andamento (retomada após uma queda)
+CHECKPOINT_FILE = f"{COLLECTION_NAME}.checkpoint.jsonl"
+SMOKE_SAMPLES = 3
+# Bulas da web: metadado document="web", origem "web#<nome normalizado>"
+WEB_DOCUMENT = "web"
+# Relevância mínima (0-1) para um chunk da busca vetorial contar como a bula do medicamento
+MIN_RELEVANCE = 0.6
 
 class VectorService:
     """
@@ -40,67 +85,394 @@ class VectorService:
         """Inicializa o serviço de vetorização."""
         logger.info("Inicializando VectorService...")
         
-        # Configurar embeddings (mesmo modelo do rag_manager.py)
-        self.embedding_func = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        # Configurar embeddings (mesmo modelo do rag_manager.py), com cache em disco
+        self.embedding_func = CachedEmbeddings(
+            HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME, encode_kwargs={"batch_size": 64}),
+            model_name=EMBEDDING_MODEL_NAME
         )
         
-        # Configurar text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        # Inicializar ChromaDB na versão ativa (ou no diretório legado, antes da primeira versão)
+        pointer = read_pointer()
+        self._open_index(version_dir(pointer["version"]) if pointer else DB_DIR)
+        # Versão em construção (begin_build) e se alguma ingestão mudou algo nela
+        self._build: Optional[Dict] = None
+        self._build_changed = False
         
-        # Inicializar ChromaDB
+        # Relatório da última ingestão em lote (ver ingest_files)
+        self.last_report: Optional[Dict] = None
+        # Catálogo em memória para find_medication (recarregado se o JSON mudar)
+        self._catalog: Optional[DrugCatalog] = None
+        self._catalog_mtime: Optional[int] = None
+        self._index_lock = threading.Lock()
+
+        logger.info("VectorService inicializado com sucesso.")
+    
+    def _close_index(self):
+        """Fecha o cliente do ChromaDB atual (o diretório pode ser apagado ou trocado depois)."""
+        if hasattr(self.vectordb._client, "close"):
+            self.vectordb._client.close()
+
+    def _open_index(self, directory: str):
+        """Passa a ler e gravar no ChromaDB (e manifesto, MinHash, catálogo) de directory."""
+        self.db_dir = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.dedup_path = os.path.join(directory, DEDUP_INDEX_FILE)
+        self.checkpoint_path = os.path.join(directory, CHECKPOINT_FILE)
+        self.catalog_path = self._catalog_path(directory)
         self.vectordb = Chroma(
-            persist_directory=DB_DIR,
+            persist_directory=directory,
             collection_name=COLLECTION_NAME,
             embedding_function=self.embedding_func
         )
-        
-        logger.info("VectorService inicializado com sucesso.")
-    
-    async def process_text_file(self, file_path: str) -> bool:
+
+    @staticmethod
+    def _catalog_path(directory: str) -> str:
+        """O diretório legado usa o catálogo global; cada versão tem o seu."""
+        return DRUG_CATALOG_PATH if directory == DB_DIR else os.path.join(directory, CATALOG_FILE)
+
+    def begin_build(self, resume: bool = True) -> str:
+        """
+        Começa uma nova versão do índice (blue/green): copia o diretório da
+        versão ativa para bulas_local@vN e passa a gravar na cópia. A API
+        continua lendo a versão ativa, num SQLite separado.
+
+        Args:
+            resume: Se a versão mais nova não foi publicada e tem checkpoint
+                (ingestão interrompida), continua nela em vez de copiar de novo
+
+        Returns:
+            Nome da versão em construção
+        """
+        versions = list_versions(COLLECTION_NAME)
+        pointer = read_pointer()
+        if resume and versions and versions[-1][0] > (pointer["number"] if pointer else 0):
+            number, name = versions[-1]
+            if os.path.exists(os.path.join(version_dir(name), CHECKPOINT_FILE)):
+                self._build = {"name": name, "number": number, "base_dir": self.db_dir}
+                # A cópia já tem gravações da ingestão interrompida
+                self._build_changed = True
+                self._close_index()
+                self._open_index(version_dir(name))
+                logger.info(f"Retomando a versão {name} do índice (ingestão interrompida).")
+                return name
+
+        number = versions[-1][0] + 1 if versions else 1
+        name = version_name(COLLECTION_NAME, number)
+        target = version_dir(name)
+        # Com o lock, o write-through da API não grava na versão ativa no meio da cópia
+        with write_lock():
+            if os.path.isdir(self.db_dir):
+                shutil.copytree(self.db_dir, target)
+            else:
+                os.makedirs(target)
+            if self.catalog_path != os.path.join(target, CATALOG_FILE) and os.path.exists(self.catalog_path):
+                shutil.copy2(self.catalog_path, os.path.join(target, CATALOG_FILE))
+
+        self._build = {"name": name, "number": number, "base_dir": self.db_dir}
+        self._build_changed = False
+        self._close_index()
+        self._open_index(target)
+        logger.info(f"Construindo a versão {name} do índice a partir de {self._build['base_dir']}.")
+        return name
+
+    def smoke_check(self) -> Dict:
+        """
+        Recuperação de teste na versão atual: coleção não vazia, chunks de
+        amostra voltam como vizinho mais próximo deles mesmos, verbetes do
+        catálogo são achados pelo filtro 'where' e a busca por texto (modelo
+        + índice) devolve resultados.
+
+        Returns:
+            {'ok', 'chunks', 'errors'}
+        """
+        collection = self.vectordb._collection
+        count = collection.count()
+        errors = []
+        if count == 0:
+            errors.append("coleção vazia")
+        else:
+            sample = collection.get(limit=SMOKE_SAMPLES, include=["embeddings", "documents"])
+            for chunk_id, embedding in zip(sample["ids"], sample["embeddings"]):
+                hit = collection.query(query_embeddings=[embedding], n_results=1, include=["distances"])
+                if hit["ids"][0][0] != chunk_id and hit["distances"][0][0] > 1e-6:
+                    errors.append(f"{chunk_id} não é o vizinho mais próximo de si mesmo")
+            records = list(DrugCatalog(self.catalog_path).records.values())[:SMOKE_SAMPLES]
+            for record in records:
+                if not collection.get(where={"medicamento_norm": record.key}, limit=1)["ids"]:
+                    errors.append(f"verbete {record.number} ({record.name}) sem chunks no índice")
+            if not self.vectordb.similarity_search(sample["documents"][0][:200], k=1):
+                errors.append("busca por texto sem resultados")
+        return {"ok": not errors, "chunks": count, "errors": errors}
+
+    def publish_build(self) -> Dict:
+        """
+        Valida a versão em construção e troca o ponteiro lido pela API (rename
+        atômico). Versões antigas saem, menos a anterior, que processos da API
+        ainda podem estar drenando. Se nenhuma ingestão mudou nada, a cópia é
+        descartada e a versão ativa continua.
+
+        Bulas da web gravadas na versão ativa durante o build são copiadas para
+        a nova versão antes da troca, sob o mesmo lock do write-through.
+
+        Returns:
+            {'version', 'published', 'smoke_check', 'retired', 'web_replayed'}
+
+        Raises:
+            RuntimeError: Sem versão em construção
+            ValueError: Smoke check falhou (o ponteiro não muda)
         """
-        Processa um arquivo de texto e adiciona ao ChromaDB.
+        if self._build is None:
+            raise RuntimeError("Nenhuma versão em construção (chame begin_build antes).")
+        build, self._build = self._build, None
+
+        if not self._build_changed:
+            self._close_index()
+            shutil.rmtree(self.db_dir, ignore_errors=True)
+            self._open_index(build["base_dir"])
+            logger.info(f"Nenhuma mudança; versão {build['name']} descartada.")
+            return {"version": (read_pointer() or {}).get("version"), "published": False,
+                    "smoke_check": None, "retired": [], "web_replayed": 0}
+
+        check = self.smoke_check()
+        if not check["ok"]:
+            logger.error(f"Smoke check da versão {build['name']} falhou: {check['errors']}")
+            raise ValueError(f"Smoke check da versão {build['name']} falhou: {'; '.join(check['errors'])}")
+
+        with write_lock():
+            replayed = self._replay_web_documents(build["base_dir"])
+            write_pointer(build["name"], build["number"], chunks=check["chunks"] + replayed)
+            # Catálogo global acompanha a versão ativa (snapshot de deploy, diretório legado);
+            # já inclui os verbetes da web copiados acima
+            tmp_path = f"{DRUG_CATALOG_PATH}.tmp"
+            shutil.copy2(self.catalog_path, tmp_path)
+            os.replace(tmp_path, DRUG_CATALOG_PATH)
+        retired = retire_versions(COLLECTION_NAME)
+        logger.info(f"Versão {build['name']} ativa ({check['chunks']} chunks). Aposentadas: {retired or 'nenhuma'}.")
+        return {"version": build["name"], "published": True, "smoke_check": check, "retired": retired,
+                "web_replayed": replayed}
+
+    def _replay_web_documents(self, base_dir: str) -> int:
         """
+        Copia para a versão em construção as bulas da web que o write-through
+        gravou na versão base depois do begin_build: chunks com os vetores já
+        calculados, entradas do manifesto, assinaturas MinHash e verbetes do
+        catálogo. Chamar com o write_lock.
+
+        Args:
+            base_dir: Diretório da versão de onde o build foi copiado
+
+        Returns:
+            Número de chunks copiados
+        """
+        base_manifest = IngestManifest(os.path.join(base_dir, MANIFEST_FILE))
+        manifest = IngestManifest(self.manifest_path)
+        sources = [name for name, entry in base_manifest.entries.items() if entry.get("kind") == WEB_DOCUMENT
+                   and manifest.entries.get(name, {}).get("hash") != entry["hash"]]
+        if not sources:
+            return 0
+
+        base = Chroma(persist_directory=base_dir, collection_name=COLLECTION_NAME,
+                      embedding_function=self.embedding_func)
         try:
-            # Carregar arquivo
-            loader = TextLoader(file_path, encoding='utf-8')
-            documents = loader.load()
-            
-            # Adicionar metadados extras se necessário
-            # O nome do arquivo pode ser usado como metadado
-            filename = Path(file_path).name
-            for doc in documents:
-                doc.metadata["source"] = filename
-                # Tentar extrair nome do medicamento do conteúdo (primeiras linhas) ou do nome do arquivo
-                # Por enquanto, deixamos genérico
-            
-            # Dividir em chunks
-            chunks = self.text_splitter.split_documents(documents)
-            
-            if not chunks:
-                logger.warning(f"Nenhum chunk gerado para {file_path}")
-                return False
-
-            # Adicionar ao ChromaDB
-            # O Chroma persiste automaticamente por padrão nas versões mais novas, 
-            # mas o método add_documents gerencia isso.
-            self.vectordb.add_documents(chunks)
-            
-            logger.info(f"Processado: {filename} - {len(chunks)} chunks")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Erro ao processar {file_path}: {str(e)}")
+            found = base._collection.get(where={"source": {"$in": sources}},
+                                         include=["embeddings", "documents", "metadatas"])
+        finally:
+            if hasattr(base._client, "close"):
+                base._client.close()
+
+        dedup = self._open_dedup()
+        if dedup is not None:
+            dedup.remove(manifest.chunk_ids(sources))
+        self.vectordb._collection.delete(where={"source": {"$in": sources}})
+        if found["ids"]:
+            self.vectordb._collection.add(ids=found["ids"], embeddings=found["embeddings"],
+                                          documents=found["documents"], metadatas=found["metadatas"])
+            if dedup is not None:
+                dedup.add(list(zip(found["ids"], found["documents"])))
+                dedup.save()
+
+        base_catalog = DrugCatalog(self._catalog_path(base_dir))
+        catalog = DrugCatalog(self.catalog_path)
+        catalog.upsert([base_catalog.records[source] for source in sources if source in base_catalog.records])
+        catalog.save()
+        for source in sources:
+            manifest.entries[source] = base_manifest.entries[source]
+        manifest.save()
+        logger.info(f"{len(sources)} bula(s) da web gravada(s) durante o build copiadas "
+                    f"({len(found['ids'])} chunks).")
+        return len(found["ids"])
+
+    async def process_text_file(self, file_path: str) -> bool:
+        """
+        Processa um arquivo de texto e adiciona ao ChromaDB (se mudou desde a
+        última ingestão).
+        """
+        report = await asyncio.to_thread(self.ingest_files, [file_path])
+        filename = Path(file_path).name
+        if filename in report["files_failed"]:
             return False
+        logger.info(f"Processado: {filename} - {report['chunks']} chunks gravados")
+        return True
     
-    async def process_directory(self, directory_path: str) -> int:
+    def ingest_files(self, files: List[str], workers: Optional[int] = None,
+                     embed_batch_size: int = EMBED_BATCH_SIZE, purge_missing: bool = False,
+                     progress: Optional[Callable[[Dict], None]] = None) -> Dict:
         """
-        Processa todos os arquivos .txt de um diretório.
+        Ingestão incremental pelo pipeline em estágios (leitura/split em
+        processos, embedding em lotes grandes, upsert em massa).
+
+        Arquivos com o mesmo hash do manifesto são ignorados; arquivos novos ou
+        alterados têm os chunks antigos apagados e são reprocessados. Chunks
+        quase duplicados de outros já indexados são descartados (ver
+        chunk_dedup); se um chunk canônico sai, os arquivos que apontavam
+        para ele também são reprocessados.
+
+        Cada arquivo gravado entra no checkpoint; se uma ingestão anterior
+        caiu no meio, os arquivos do checkpoint são aplicados ao manifesto
+        antes do plano e não são reprocessados.
+
+        Args:
+            files: Caminhos dos arquivos .txt
+            workers: Processos de leitura/split (padrão: número de CPUs)
+            embed_batch_size: Chunks por lote de embedding
+            purge_missing: Remove do ChromaDB os arquivos do manifesto que não
+                estão em files (usado ao sincronizar um diretório inteiro)
+            progress: Chamado a cada arquivo lido (ver IngestionPipeline)
+
+        Returns:
+            Relatório do pipeline (contadores por estágio, tempo total,
+            quantos arquivos eram novos, alterados, iguais, removidos ou
+            retomados do checkpoint e as estatísticas do cache de embeddings
+            e da deduplicação)
+        """
+        start = time.perf_counter()
+        self.embedding_func.reset_stats()
+        manifest = IngestManifest(self.manifest_path)
+        dedup = self._open_dedup()
+        checkpoint = IngestCheckpoint(self.checkpoint_path)
+        resumed = self._resume(checkpoint, manifest, dedup)
+        plan = manifest.plan(files, purge_missing)
+        to_process = plan["new"] + plan["modified"]
+
+        # Arquivos com duplicatas de chunks que vão sair do índice voltam ao pipeline
+        paths = {Path(path).name: path for path in files}
+        dependents = manifest.dependents([Path(path).name for path in to_process] + plan["removed"])
+        for name in dependents:
+            if name in paths:
+                to_process.append(paths[name])
+            else:
+                logger.warning(f"{name} tinha duplicatas de chunks removidos; será reprocessado na próxima ingestão.")
+                manifest.invalidate(name)
+        self._build_changed |= bool(to_process or plan["removed"] or dependents or resumed)
+        if dedup is not None:
+            dedup.remove(manifest.chunk_ids([Path(path).name for path in to_process] + plan["removed"]))
+
+        # Chunks antigos (inclusive de ingestões sem manifesto, com IDs aleatórios)
+        # saem por 'source' numa única chamada
+        stale_sources = [Path(path).name for path in to_process] + plan["removed"]
+        if stale_sources:
+            self.vectordb._collection.delete(where={"source": {"$in": stale_sources}})
+        for name in plan["removed"]:
+            manifest.remove(name)
+
+        if to_process:
+            def on_source_done(name, chunk_ids, duplicates, record):
+                checkpoint.record(name, plan["hashes"][name], chunk_ids, duplicates, record)
+
+            pipeline = IngestionPipeline(self.embedding_func, self.vectordb, embed_batch_size=embed_batch_size,
+                                         workers=workers, dedup=dedup, on_source_done=on_source_done,
+                                         on_progress=progress)
+            try:
+                report = pipeline.run(to_process)
+            finally:
+                checkpoint.close()
+        else:
+            report = {"files": 0, "files_failed": [], "chunks": 0, "chunk_ids": {}, "records": [],
+                      "duplicates": {}, "stages": {}}
+
+        # Catálogo de verbetes acompanha o ChromaDB: sai o que foi apagado, entra o reprocessado
+        if stale_sources or report["records"]:
+            catalog = DrugCatalog(self.catalog_path)
+            catalog.remove_sources(stale_sources)
+            catalog.upsert(report["records"])
+            catalog.save()
+        report["records"] = len(report["records"])
+
+        for path in to_process:
+            name = Path(path).name
+            if name in report["chunk_ids"]:
+                manifest.update(name, plan["hashes"][name], report["chunk_ids"][name],
+                                duplicates=report["duplicates"].get(name))
+            else:
+                manifest.remove(name)  # chunks antigos já apagados; reprocessa na próxima vez
+        manifest.save()
+        if dedup is not None:
+            dedup.save()
+        checkpoint.clear()
+        report["dedup"] = self._dedup_report(report, dedup)
+
+        elapsed = time.perf_counter() - start
+        report.update({
+            "new": len(plan["new"]),
+            "modified": len(plan["modified"]),
+            "unchanged": len([path for path in plan["unchanged"]
+                              if Path(path).name not in dependents and Path(path).name not in resumed]),
+            "dependents": len(dependents),
+            "removed": len(plan["removed"]),
+            "resumed": len(resumed),
+            "elapsed_sec": round(elapsed, 3),
+            "files_per_sec": round(len(files) / elapsed, 1) if elapsed else 0.0,
+            "embedding_cache": self.embedding_func.stats()
+        })
+        logger.info(f"Ingestão: {report['new']} novos, {report['modified']} alterados, "
+                    f"{report['unchanged']} sem mudança, {report['removed']} removidos "
+                    f"em {report['elapsed_sec']}s.")
+        self.last_report = report
+        return report
+
+    def _resume(self, checkpoint: IngestCheckpoint, manifest: IngestManifest,
+                dedup: Optional[MinHashDeduplicator]) -> List[str]:
+        """
+        Aplica o checkpoint de uma ingestão interrompida: os arquivos que já
+        estavam gravados entram no manifesto, no catálogo e no índice MinHash
+        (que são salvos na hora) e o checkpoint é apagado.
+
+        Returns:
+            Nomes dos arquivos retomados
+        """
+        entries = checkpoint.load()
+        if not entries:
+            return []
+        names = [entry["name"] for entry in entries]
+        # Duplicatas dos chunks antigos desses arquivos (já apagados) precisam ser
+        # reprocessadas; as que também estão no checkpoint são sobrescritas abaixo
+        for name in manifest.dependents(names):
+            manifest.invalidate(name)
+        if dedup is not None:
+            dedup.remove(manifest.chunk_ids(names))
+            chunk_ids = [chunk for entry in entries for chunk in entry["chunk_ids"]]
+            if chunk_ids:
+                stored = self.vectordb._collection.get(ids=chunk_ids, include=["documents"])
+                dedup.add(list(zip(stored["ids"], stored["documents"])))
+        for entry in entries:
+            manifest.update(entry["name"], entry["hash"], entry["chunk_ids"], duplicates=entry["duplicates"])
+
+        catalog = DrugCatalog(self.catalog_path)
+        catalog.remove_sources(names)
+        catalog.upsert([DrugRecord(**entry["record"]) for entry in entries if entry["record"]])
+        catalog.save()
+        manifest.save()
+        if dedup is not None:
+            dedup.save()
+        checkpoint.clear()
+        logger.info(f"Retomando ingestão interrompida: {len(names)} arquivos já gravados.")
+        return names
+
+    async def process_directory(self, directory_path: str, workers: Optional[int] = None,
+                                progress: Optional[Callable[[Dict], None]] = None) -> int:
+        """
+        Processa todos os arquivos .txt de um diretório pelo pipeline de ingestão.
+        O relatório completo fica em self.last_report.
         """
         logger.info(f"Iniciando processamento do diretório: {directory_path}")
         path = Path(directory_path)
@@ -109,21 +481,293 @@ class VectorService:
             logger.error(f"Diretório não encontrado: {directory_path}")
             return 0
             
-        count = 0
-        files = list(path.glob("*.txt"))
+        files = sorted(str(file_path) for file_path in path.glob("*.txt"))
         total = len(files)
         
         logger.info(f"Encontrados {total} arquivos para processar.")
         
-        for i, file_path in enumerate(files, 1):
-            success = await self.process_text_file(str(file_path))
-            if success:
-                count += 1
-            
-            if i % 10 == 0:
-                logger.info(f"Progresso: {i}/{total} arquivos processados.")
+        # O pipeline é síncrono (processos + threads); não bloqueia o event loop
+        report = await asyncio.to_thread(self.ingest_files, files, workers=workers, purge_missing=True,
+                                         progress=progress)
+        count = total - len(report["files_failed"])
         
         logger.info(f"Processamento concluído. {count}/{total} arquivos ingeridos com sucesso.")
         return count
 
+    def ingest_pdf(self, pdf_path: str, medication_name: Optional[str] = None,
+                   embed_batch_size: int = EMBED_BATCH_SIZE) -> Dict:
+        """
+        Ingestão em streaming de um PDF: as páginas são lidas sob demanda e
+        enviadas ao pipeline sem arquivos intermediários.
+
+        Sem medication_name o PDF é tratado como o guia de medicamentos (um
+        documento por verbete, mesmo que o verbete atravesse páginas); com
+        medication_name, como a bula de um único medicamento (um documento
+        por página).
+
+        Args:
+            pdf_path: Caminho do PDF
+            medication_name: Nome do medicamento, para PDFs de uma única bula
+            embed_batch_size: Chunks por lote de embedding
+
+        Returns:
+            Relatório do pipeline, com 'pages' e 'extract_sec' da leitura do PDF
+        """
+        start = time.perf_counter()
+        self.embedding_func.reset_stats()
+        name = Path(pdf_path).name
+        manifest = IngestManifest(self.manifest_path)
+        plan = manifest.plan([pdf_path])
+        pdf_stats = {"pages": 0, "extract_sec": 0.0}
+
+        dedup = None
+        if plan["unchanged"]:
+            report = {"files": 0, "files_failed": [], "chunks": 0, "chunk_ids": {}, "records": 0,
+                      "duplicates": {}, "stages": {}}
+        else:
+            self._build_changed = True
+            # Quem tinha duplicatas dos chunks antigos do PDF é reprocessado na próxima ingestão
+            for dependent in manifest.dependents([name]):
+                logger.warning(f"{dependent} tinha duplicatas de chunks de {name}; será reprocessado.")
+                manifest.invalidate(dependent)
+            dedup = self._open_dedup()
+            if dedup is not None:
+                dedup.remove(manifest.chunk_ids([name]))
+            self.vectordb._collection.delete(where={"document": name})
+            catalog = DrugCatalog(self.catalog_path)
+            catalog.remove_prefix(f"{name}#")
+            pages = iter_pdf_pages(pdf_path, pdf_stats)
+            if medication_name:
+                documents = ((f"{name}#p{number}", text, {"document": name, "medicamento": medication_name,
+                                                          "page": number})
+                             for number, text in pages if text.strip())
+            else:
+                # Nome, nomes comerciais etc. vêm do verbete interpretado pelo pipeline
+                documents = ((f"{name}#{entry['number']}", entry["text"], {"document": name, "page": entry["page"]})
+                             for entry in iter_drug_entries(pages))
+            pipeline = IngestionPipeline(self.embedding_func, self.vectordb, embed_batch_size=embed_batch_size,
+                                         dedup=dedup)
+            report = pipeline.run_documents(documents, parse_entries=not medication_name)
+
+            catalog.upsert(report["records"])
+            catalog.save()
+            report["records"] = len(report["records"])
+
+            if report["files_failed"]:
+                manifest.remove(name)  # reprocessa o PDF inteiro na próxima vez
+            else:
+                manifest.update(name, plan["hashes"][name],
+                                [chunk for ids in report["chunk_ids"].values() for chunk in ids], kind="pdf",
+                                duplicates=[dup for dups in report["duplicates"].values() for dup in dups])
+            manifest.save()
+            if dedup is not None:
+                dedup.save()
+        report["dedup"] = self._dedup_report(report, dedup)
+
+        elapsed = time.perf_counter() - start
+        report.update({
+            "new": len(plan["new"]),
+            "modified": len(plan["modified"]),
+            "unchanged": len(plan["unchanged"]),
+            "removed": 0,
+            "elapsed_sec": round(elapsed, 3),
+            "files_per_sec": round(pdf_stats["pages"] / elapsed, 1) if elapsed else 0.0,
+            "pages": pdf_stats["pages"],
+            "extract_sec": round(pdf_stats["extract_sec"], 3),
+            "embedding_cache": self.embedding_func.stats()
+        })
+        logger.info(f"PDF {name}: {report['pages']} páginas, {report['files']} documentos, "
+                    f"{report['chunks']} chunks em {report['elapsed_sec']}s.")
+        self.last_report = report
+        return report
+
+    def ingest_web_document(self, medication_name: str, content: str, url: str = "") -> Dict:
+        """
+        Write-through de uma bula baixada da web: limpa, divide, codifica e
+        grava os chunks na versão ativa do índice (document="web") e inclui o
+        medicamento no catálogo, para a busca exata por nome. Conteúdo igual
+        ao já gravado não é reprocessado. Durante um build, publish_build
+        leva estas bulas para a nova versão.
+
+        Args:
+            medication_name: Nome do medicamento buscado
+            content: Texto extraído da página
+            url: Endereço de onde o texto veio
+
+        Returns:
+            Relatório do pipeline, com 'source' e 'unchanged'
+        """
+        start = time.perf_counter()
+        # Lock: o begin_build não copia a versão ativa no meio desta gravação, e o
+        # publish_build só troca o ponteiro depois de copiar o que foi gravado aqui
+        with write_lock():
+            self._follow_active_version()
+            record = DrugRecord(number="", name=medication_name.strip(),
+                                source=f"{WEB_DOCUMENT}#{normalize_name(medication_name)}")
+            source = record.source
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            manifest = IngestManifest(self.manifest_path)
+            if manifest.entries.get(source, {}).get("hash") == digest:
+                return {"source": source, "unchanged": True, "files": 0, "files_failed": [], "chunks": 0,
+                        "elapsed_sec": round(time.perf_counter() - start, 3)}
+
+            for dependent in manifest.dependents([source]):
+                logger.warning(f"{dependent} tinha duplicatas de chunks de {source}; será reprocessado.")
+                manifest.invalidate(dependent)
+            dedup = self._open_dedup()
+            if dedup is not None:
+                dedup.remove(manifest.chunk_ids([source]))
+            self.vectordb._collection.delete(where={"source": source})
+
+            metadata = {**record.metadata(), "document": WEB_DOCUMENT, "url": url}
+            pipeline = IngestionPipeline(self.embedding_func, self.vectordb, dedup=dedup)
+            report = pipeline.run_documents([(source, content, metadata)], parse_entries=False)
 
+            catalog = DrugCatalog(self.catalog_path)
+            catalog.remove_sources([source])
+            if not report["files_failed"]:
+                catalog.upsert([record])
+            catalog.save()
+            if report["files_failed"]:
+                manifest.remove(source)
+            else:
+                manifest.update(source, digest, report["chunk_ids"].get(source, []), kind=WEB_DOCUMENT,
+                                duplicates=report["duplicates"].get(source))
+            manifest.save()
+            if dedup is not None:
+                dedup.save()
+            report["dedup"] = self._dedup_report(report, dedup)
+            report.update({"source": source, "unchanged": False, "records": len(report["records"]),
+                           "elapsed_sec": round(time.perf_counter() - start, 3)})
+            logger.info(f"Bula da web de {medication_name} no índice: {report['chunks']} chunks "
+                        f"em {report['elapsed_sec']}s.")
+            return report
+
+    def _open_dedup(self) -> Optional[MinHashDeduplicator]:
+        """Índice MinHash persistido, ou None se a deduplicação estiver desativada."""
+        if not 0 < settings.DEDUP_THRESHOLD < 1:
+            return None
+        return MinHashDeduplicator(settings.DEDUP_THRESHOLD, self.dedup_path)
+
+    @staticmethod
+    def _dedup_report(report: Dict, dedup: Optional[MinHashDeduplicator]) -> Dict:
+        """Chunks verificados, descartados e a redução do índice nesta ingestão."""
+        dropped = sum(len(dups) for dups in report.pop("duplicates", {}).values())
+        checked = report["stages"].get("dedup", {}).get("items", 0)
+        return {
+            "threshold": dedup.threshold if dedup is not None else None,
+            "checked": checked,
+            "dropped": dropped,
+            "reduction_pct": round(100 * dropped / checked, 1) if checked else 0.0,
+            "index_chunks": len(dedup) if dedup is not None else None
+        }
+
+    def chunk_locations(self, chunk_id: str) -> List[Dict]:
+        """
+        Todas as origens de um chunk: a dele e as das duplicatas descartadas
+        na ingestão (ex.: o mesmo verbete nos batches e no PDF).
+
+        Args:
+            chunk_id: ID do chunk no ChromaDB
+
+        Returns:
+            [{'source', 'start_index'}], começando pelo próprio chunk
+        """
+        found = self.vectordb._collection.get(ids=[chunk_id], include=["metadatas"])
+        locations = [{"source": metadata["source"], "start_index": metadata.get("start_index")}
+                     for metadata in found["metadatas"]]
+        duplicates = IngestManifest(self.manifest_path).duplicate_locations().get(chunk_id, [])
+        return locations + [{"source": source, "start_index": offset} for source, offset in duplicates]
+
+    def find_medication(self, medication_name: str, top_k: int = 5,
+                        min_relevance: float = MIN_RELEVANCE) -> List[Document]:
+        """
+        Bula de um medicamento no índice local: se o nome está no catálogo
+        (guia ou web), todos os chunks dele via filtro 'where'; senão, os top_k
+        chunks da busca vetorial com relevância >= min_relevance.
+
+        Args:
+            medication_name: Nome do medicamento
+            top_k: Chunks da busca vetorial
+            min_relevance: Relevância mínima (0-1) da busca vetorial
+
+        Returns:
+            Documentos encontrados (lista vazia = buscar na web)
+        """
+        self._follow_active_version()
+        catalog = self._load_catalog()
+        records = catalog.lookup(medication_name) or catalog.find_in_text(medication_name)
+        if records:
+            keys = sorted({record.key for record in records})
+            found = self.vectordb._collection.get(where={"medicamento_norm": {"$in": keys}},
+                                                  include=["documents", "metadatas"])
+            chunks = sorted(zip(found["metadatas"], found["documents"]),
+                            key=lambda item: (item[0].get("source", ""), item[0].get("start_index", 0)))
+            if chunks:
+                return [Document(page_content=text, metadata=metadata) for metadata, text in chunks]
+        return [document for document, score in
+                self.vectordb.similarity_search_with_relevance_scores(medication_name, k=top_k)
+                if score >= min_relevance]
+
+    def _load_catalog(self) -> DrugCatalog:
+        """Catálogo da versão em uso, relido só quando o JSON muda (write-through, nova versão)."""
+        try:
+            mtime = os.stat(self.catalog_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._catalog is None or mtime != self._catalog_mtime:
+            self._catalog, self._catalog_mtime = DrugCatalog(self.catalog_path), mtime
+        return self._catalog
+
+    def _follow_active_version(self):
+        """
+        Fora de um build, acompanha o ponteiro: a ingestão pode ter publicado
+        outra versão (e aposentado a que este processo abriu).
+        """
+        if self._build is not None:
+            return
+        pointer = read_pointer()
+        directory = version_dir(pointer["version"]) if pointer else DB_DIR
+        with self._index_lock:
+            if directory != self.db_dir:
+                logger.info(f"Versão ativa do índice mudou; abrindo {directory}.")
+                self._close_index()
+                self._open_index(directory)
+                self._catalog = None
+
+    def export_snapshot(self, path: str = SNAPSHOT_PATH) -> Dict:
+        """
+        Exporta a coleção inteira (vetores em float16, textos, metadados) e o
+        catálogo de verbetes num snapshot de arquivo único, com checksum.
+
+        Args:
+            path: Arquivo de destino (gravado de forma atômica)
+
+        Returns:
+            Cabeçalho do snapshot, com 'size_mb' e 'elapsed_sec'
+        """
+        start = time.perf_counter()
+        data = self.vectordb._collection.get(include=["embeddings", "documents", "metadatas"])
+        # Versão exportada: a API confere com o ponteiro antes de usar o snapshot
+        in_versions = os.path.dirname(os.path.abspath(self.db_dir)) == os.path.abspath(INDEX_VERSIONS_DIR)
+        header = write_snapshot(
+            path, data["ids"], data["embeddings"], data["documents"], data["metadatas"],
+            DrugCatalog(self.catalog_path).as_dicts(), model=EMBEDDING_MODEL_NAME, collection=COLLECTION_NAME,
+            index_version=os.path.basename(self.db_dir) if in_versions else None
+        )
+        header["size_mb"] = round(os.path.getsize(path) / 1024 / 1024, 2)
+        header["elapsed_sec"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Snapshot exportado: {path} ({header['count']} chunks, {header['size_mb']} MB).")
+        return header
+
+    async def process_pdf(self, pdf_path: str, medication_name: Optional[str] = None) -> bool:
+        """
+        Processa um PDF (guia de medicamentos ou bula) e adiciona ao ChromaDB.
+        O relatório completo fica em self.last_report.
+        """
+        try:
+            report = await asyncio.to_thread(self.ingest_pdf, pdf_path, medication_name)
+        except Exception as e:
+            logger.error(f"Erro ao processar {pdf_path}: {str(e)}")
+            return False
+        return not report["files_failed"]
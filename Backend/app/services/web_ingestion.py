@@ -0,0 +1,121 @@
+"""
+🔹 INGESTÃO WRITE-THROUGH - Bulas da web vão para o índice em segundo plano
+
+Quando o RAGManager da API (ou o RAGService) não acha a bula localmente e a
+busca no ScraperService (fetch_and_ingest), o texto baixado é entregue a esta
+fila. Uma tarefa em segundo plano (uma por vez, fora do event loop) limpa,
+divide, codifica e grava os chunks via VectorService.ingest_web_document,
+com document="web" nos metadados e o medicamento no catálogo. A resposta ao
+usuário não espera a ingestão; as próximas consultas do mesmo medicamento
+saem do índice local.
+"""
+
+import asyncio
+from typing import Optional, Callable, Dict
+from app.core.logger import setup_logger
+from app.services.scraper_service import ScraperService
+from app.utils.text_processing import normalize_medication_name
+
+logger = setup_logger()
+
+
+def _default_vector_service():
+    from app.core.dependencies import get_vector_service
+    return get_vector_service()
+
+
+class WebIngestionQueue:
+    """
+    Fila de bulas da web a vetorizar. Compartilhada pelo processo (o
+    RAGService é criado a cada requisição); o mesmo medicamento não entra
+    duas vezes enquanto está pendente.
+    """
+
+    def __init__(self, vector_service_factory: Optional[Callable] = None):
+        """
+        Args:
+            vector_service_factory: Função que retorna o VectorService
+                (padrão: singleton de app.core.dependencies)
+        """
+        self._factory = vector_service_factory or _default_vector_service
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending = set()
+        self.stats = {"submitted": 0, "ingested": 0, "unchanged": 0, "failed": 0, "chunks": 0}
+
+    def submit(self, medication_name: str, content: str, url: str = "") -> bool:
+        """
+        Agenda a ingestão (chamar de dentro do event loop).
+
+        Returns:
+            False se o medicamento já estava na fila
+        """
+        key = normalize_medication_name(medication_name)
+        if not key or not content or key in self._pending:
+            return False
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._queue, self._loop = asyncio.Queue(), loop
+            self._pending.clear()
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run(self._queue))
+        self._pending.add(key)
+        self._queue.put_nowait((key, medication_name, content, url))
+        self.stats["submitted"] += 1
+        return True
+
+    async def _run(self, tasks: asyncio.Queue):
+        while True:
+            key, medication_name, content, url = await tasks.get()
+            try:
+                # Embedding e escrita no ChromaDB bloqueiam: rodam em thread
+                service = await asyncio.to_thread(self._factory)
+                report = await asyncio.to_thread(service.ingest_web_document, medication_name, content, url)
+                if report["unchanged"]:
+                    self.stats["unchanged"] += 1
+                elif report["files_failed"]:
+                    self.stats["failed"] += 1
+                else:
+                    self.stats["ingested"] += 1
+                    self.stats["chunks"] += report["chunks"]
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Erro ao vetorizar a bula da web de {medication_name}: {str(e)}")
+            finally:
+                self._pending.discard(key)
+                tasks.task_done()
+
+    async def join(self):
+        """Espera a fila esvaziar (shutdown, testes)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+# Fila do processo
+web_ingestion = WebIngestionQueue()
+
+
+async def fetch_and_ingest(medication_name: str, scraper: Optional[ScraperService] = None) -> Optional[Dict]:
+    """
+    Busca a bula na web e a entrega à fila de vetorização (write-through); quem
+    chama usa o texto baixado sem esperar a ingestão.
+
+    Args:
+        medication_name: Nome do medicamento
+        scraper: ScraperService a usar (padrão: um novo, que compartilha o pool)
+
+    Returns:
+        Melhor resultado ({'source', 'url', 'content'}), ou None
+    """
+    results = await (scraper or ScraperService()).search_multiple_sources(medication_name)
+    if not results:
+        logger.warning(f"Bula não encontrada na web para: {medication_name}")
+        return None
+    best = results[0]
+    if web_ingestion.submit(medication_name, best["content"], best["url"]):
+        logger.info(f"Bula de {medication_name} ({best['url']}) agendada para vetorização.")
+    return best
@@ -1,135 +1,248 @@
 """
-🔹 PROCESSAMENTO DE TEXTO - Funções auxiliares
+🔹 PROCESSAMENTO DE TEXTO - Normalização de alto desempenho
 
-Este módulo contém funções auxiliares para processamento de texto:
+Este módulo fica em todo caminho de ingestão e de scraping, então tudo é
+preparado uma vez na importação:
 
-1. Limpeza e normalização de texto
-2. Detecção de idioma
-3. Remoção de caracteres especiais
-4. Normalização de nomes de medicamentos
+1. Padrões regex pré-compilados (nada é compilado por chamada)
+2. Tabelas de tradução para remover acentos (bytes.translate no trecho
+   Latin-1, str.translate no resto) e str.split() para colapsar espaços
+3. Remoção dos marcadores de página ("- 83 -") e da hifenização de fim de
+   linha (palavras compostas mantêm o hífen)
+4. Separação das seções de uma bula numa única passada
+5. API em lote (process_documents) para documentos inteiros ou listas
 
-IMPLEMENTAÇÃO NECESSÁRIA:
-- Implementar funções de limpeza
-- Normalização de texto
-- Detecção de idioma (se necessário)
+Benchmark sobre o corpus batches/: benchmarks/bench_text_processing.py
 """
 
 import re
-from typing import Optional
+import html
+import unicodedata
+from typing import Optional, Iterable, List, Dict, Tuple, Union
 from app.core.logger import setup_logger
 
 logger = setup_logger()
 
 
-def clean_text(text: str) -> str:
+def _fold_char(char: str) -> str:
+    base = "".join(c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c))
+    return base if base != char and base.isascii() else char
+
+
+# Acentos: "Reação" -> "Reacao". O caminho rápido é bytes.translate sobre o
+# texto em Latin-1 (tabela de 256 posições, só mapeamentos 1:1); textos com
+# caracteres fora do Latin-1 ("–", "μ") usam a tabela completa de str.translate
+_LATIN1_FOLD = bytes(
+    ord(_fold_char(chr(code))) if len(_fold_char(chr(code))) == 1 else code for code in range(256)
+)
+_FOLD_TABLE = {code: _fold_char(chr(code)) for code in range(0x80, 0x250) if _fold_char(chr(code)) != chr(code)}
+_FOLD_TABLE.update({code: None for code in range(0x300, 0x370)})  # marcas combinantes soltas (NFD)
+_NON_LATIN1 = re.compile(r"([^\x00-\xff]+)")
+
+# Caracteres invisíveis (soft hyphen, zero-width, BOM) e nulos; espaços
+# especiais (\xa0, \u2009...) já são tratados por str.split()
+_INVISIBLE = re.compile("[\x00\xad\u200b-\u200d\u2060\ufeff]")
+# Marcador de página numa linha própria: "- 83 -" (o texto recebe um "\n" na frente)
+_PAGE_MARKER = re.compile(r"\n[ \t]*-[ \t]*\d+[ \t]*-[ \t]*(?=\n|\Z)")
+# "pacien-\ntes" -> "pacientes"; o padrão começa no hífen (busca rápida) e a
+# letra minúscula anterior é conferida na substituição, para não juntar listas "- item"
+_HYPHENATION = re.compile(r"-[ \t]*\n[ \t]*(?=[a-zà-ÿ])")
+_WORD_BEFORE = re.compile(r"[^\W\d_]+\Z")
+_WORD_AFTER = re.compile(r"[^\W\d_]+")
+_HYPHENATED_WORD = re.compile(r"[^\W\d_]+-[^\W\d_]+")
+# Prefixos que pedem hífen ("anti-inflamatório", "pós-operatório"): a quebra
+# no hífen mantém o hífen em vez de juntar as partes
+_COMPOUND_PREFIXES = frozenset({
+    "anti", "auto", "contra", "extra", "infra", "intra", "inter", "micro", "macro", "neo", "pseudo", "semi",
+    "sub", "super", "supra", "ultra", "ex", "vice", "pós", "pré", "pró", "recém", "sem", "além", "aquém",
+    "bem", "mal", "não", "quase", "co", "hiper", "hipo", "mini", "multi", "poli", "pan", "circum",
+})
+_MULTI_NEWLINE = re.compile(r"\n{3,}")
+_NON_NAME = re.compile(r"[^a-z0-9+ ]+")
+
+_HTML_DROP = re.compile(r"<(script|style|noscript|template)\b[^>]*>.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+_HTML_BLOCK = re.compile(r"<\s*(?:br|/?p|/?div|/?li|/?tr|/?h[1-6]|/?section|/?article)\b[^>]*>", re.IGNORECASE)
+_HTML_TAG = re.compile(r"<[^>]+>")
+
+# Títulos de seção, tanto das bulas da Anvisa ("INDICAÇÕES", "PARA QUE ESTE
+# MEDICAMENTO É INDICADO?") quanto dos verbetes do guia ("Ação:", "Interação:")
+SECTION_PATTERNS = {
+    "indications": r"indica[çc](?:[ãa]o|[õo]es)|para que (?:este medicamento )?(?:[ée] indicado|serve)|a[çc][ãa]o",
+    "dosage": r"posologia|como (?:devo )?(?:usar|tomar)(?: este medicamento)?|dosagem|dose",
+    "contraindications": r"contra-?indica[çc](?:[ãa]o|[õo]es)|quando n[ãa]o devo usar(?: este medicamento)?",
+    "side_effects": r"rea[çc](?:[ãa]o|[õo]es)\s+adv\s*er\s*sas?|efeitos (?:colaterais|indesej[áa]veis)"
+                    r"|quais os males que este medicamento pode (?:me )?causar",
+    "precautions": r"precau[çc](?:[ãa]o|[õo]es)|advert[êe]ncias(?: e precau[çc][õo]es)?|cuidados"
+                   r"|o que devo saber antes de usar(?: este medicamento)?",
+    "interactions": r"intera[çc](?:[ãa]o|[õo]es)(?: medicamentosas?)?",
+}
+# Um único padrão com grupos nomeados: título no início da linha, seguido de ':', ';', '?' ou fim de linha.
+# O lookahead com as iniciais possíveis descarta a maioria das linhas antes de testar as alternativas
+_SECTION = re.compile(
+    r"^[ \t]*(?=[\dacdeiopqr])(?:\d+[.)][ \t]*)?(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in SECTION_PATTERNS.items())
+    + r")[ \t]*(?:[:;?]|$)",
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def fold_accents(text: str) -> str:
+    """Remove acentos via tabelas de tradução ("Ação" -> "Acao")."""
+    try:
+        return text.encode("latin-1").translate(_LATIN1_FOLD).decode("latin-1")
+    except UnicodeEncodeError:
+        # Só os trechos fora do Latin-1 passam pelo str.translate (lento por caractere)
+        parts = _NON_LATIN1.split(text)
+        parts[0::2] = [part.encode("latin-1").translate(_LATIN1_FOLD).decode("latin-1") for part in parts[0::2]]
+        parts[1::2] = [part.translate(_FOLD_TABLE) for part in parts[1::2]]
+        return "".join(parts)
+
+
+def strip_page_markers(text: str) -> str:
+    """Remove as linhas de numeração de página ("- 83 -")."""
+    if "-" not in text:
+        return text
+    return _PAGE_MARKER.sub("", "\n" + text)[1:]
+
+
+def _join_hyphenated(match: re.Match, words: frozenset, compounds: frozenset) -> str:
+    text, start = match.string, match.start()
+    if not start or not text[start - 1].islower():
+        return match.group()
+    before = _WORD_BEFORE.search(text, max(0, start - 40), start)
+    after = _WORD_AFTER.match(text, match.end())
+    prefix = before.group().lower() if before else ""
+    suffix = after.group().lower() if after else ""
+    if prefix in _COMPOUND_PREFIXES or f"{prefix}-{suffix}" in compounds:
+        return "-"
+    # Sem evidência de que é quebra de sílaba, o hífen fica: "pacien-tes" ainda é
+    # legível, "causaefeito" é uma palavra que não existe
+    return "" if prefix + suffix in words else "-"
+
+
+def remove_hyphenation(text: str) -> str:
+    """
+    Junta palavras quebradas com hífen no fim da linha ("pacien-\ntes") quando a
+    palavra inteira aparece no texto. Palavras compostas ("anti-\ninflamatório",
+    "causa-\nefeito") ficam numa linha só, com o hífen.
     """
-    🔹 IMPLEMENTAR: Limpa e normaliza texto de bula.
-    
-    Remove caracteres especiais, normaliza espaços,
-    remove quebras de linha excessivas, etc.
-    
+    if "-" not in text or not _HYPHENATION.search(text):
+        return text
+    lowered = text.lower()
+    words = frozenset(_WORD_AFTER.findall(lowered))
+    compounds = frozenset(_HYPHENATED_WORD.findall(lowered))
+    return _HYPHENATION.sub(lambda match: _join_hyphenated(match, words, compounds), text)
+
+
+def clean_text(text: str, keep_newlines: bool = False) -> str:
+    """
+    Limpa e normaliza texto de bula.
+
+    Normaliza o Unicode (NFC), troca espaços especiais e remove caracteres
+    invisíveis, marcadores de página e hifenização, e colapsa espaços.
+
     Args:
         text: Texto a ser limpo
-        
+        keep_newlines: Mantém as quebras de linha (no máximo uma linha em
+            branco seguida), útil antes do split em chunks
+
     Returns:
         Texto limpo e normalizado
     """
     if not text:
         return ""
-    
-    # TODO: Implementar limpeza
-    # - Remover caracteres especiais desnecessários
-    # - Normalizar espaços múltiplos
-    # - Remover quebras de linha excessivas
-    # - Normalizar encoding
-    
-    # Exemplo básico:
-    text = re.sub(r'\s+', ' ', text)  # Múltiplos espaços -> um espaço
-    text = text.strip()
-    
-    return text
+
+    text = unicodedata.normalize("NFC", text)
+    if not text.isascii():
+        text = _INVISIBLE.sub("", text)
+    text = remove_hyphenation(strip_page_markers(text))
+    # str.split()/join colapsam qualquer espaço Unicode em C, sem regex por palavra
+    if not keep_newlines:
+        return " ".join(text.split())
+
+    text = "\n".join(map(" ".join, map(str.split, text.splitlines())))
+    if "\n\n\n" in text:
+        text = _MULTI_NEWLINE.sub("\n\n", text)
+    return text.strip()
 
 
 def normalize_medication_name(name: str) -> str:
     """
-    🔹 IMPLEMENTAR: Normaliza nome de medicamento para busca.
-    
-    Remove acentos, converte para minúsculas, remove espaços extras.
-    
+    Normaliza nome de medicamento para busca.
+
+    Remove acentos, converte para minúsculas, troca pontuação por espaço
+    (mantendo o '+' das associações) e remove espaços extras.
+
     Args:
         name: Nome do medicamento
-        
+
     Returns:
-        Nome normalizado
+        Nome normalizado ("Dipirona Sódica + Cafeína" -> "dipirona sodica + cafeina")
     """
     if not name:
         return ""
-    
-    # TODO: Implementar normalização completa
-    # - Converter para minúsculas
-    # - Remover acentos
-    # - Remover espaços extras
-    # - Padronizar formato
-    
-    normalized = name.lower().strip()
-    
-    # Remover acentos (exemplo básico)
-    # Para implementação completa, usar unidecode ou similar
-    # from unidecode import unidecode
-    # normalized = unidecode(normalized)
-    
-    return normalized
+
+    normalized = _NON_NAME.sub(" ", fold_accents(unicodedata.normalize("NFC", name)).lower())
+    return " ".join(normalized.split())
 
 
 def extract_key_sections(text: str) -> dict:
     """
-    🔹 IMPLEMENTAR: Extrai seções importantes de uma bula.
-    
+    Extrai seções importantes de uma bula numa única passada.
+
     Identifica e extrai seções como:
     - Indicações
     - Posologia
     - Contraindicações
     - Efeitos colaterais
     - Cuidados
-    
+    - Interações
+
     Args:
-        text: Texto completo da bula
-        
+        text: Texto completo da bula (com quebras de linha)
+
     Returns:
-        Dicionário com seções extraídas
-    """
-    sections = {
-        "indications": "",
-        "dosage": "",
-        "contraindications": "",
-        "side_effects": "",
-        "precautions": ""
-    }
-    
-    # TODO: Implementar extração de seções
-    # Usar regex ou NLP para identificar seções
-    # patterns = {
-    #     "indications": r"(?i)indica[çc][õo]es?|para que serve",
-    #     "dosage": r"(?i)posologia|como tomar|dosagem",
-    #     ...
-    # }
-    
+        Dicionário com seções extraídas (vazias se ausentes); títulos
+        repetidos acumulam o texto
+    """
+    sections = dict.fromkeys(SECTION_PATTERNS, "")
+    matches = list(_SECTION.finditer(text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = " ".join(text[match.end():end].split()).strip(" ;")
+        if body:
+            name = match.lastgroup
+            sections[name] = f"{sections[name]} {body}" if sections[name] else body
+
     return sections
 
 
+def section_heading(line: str) -> Optional[Tuple[str, int]]:
+    """
+    Seção cujo título abre a linha ("Posologia:", "3. Reações adversas").
+
+    Args:
+        line: Uma linha (ou bloco de HTML) de texto
+
+    Returns:
+        (nome da seção, posição onde o título termina), ou None
+    """
+    match = _SECTION.match(line)
+    return (match.lastgroup, match.end()) if match else None
+
+
 def detect_language(text: str) -> Optional[str]:
     """
     🔹 IMPLEMENTAR: Detecta idioma do texto.
-    
+
     Args:
         text: Texto a analisar
-        
+
     Returns:
         Código do idioma (pt, en, etc.) ou None
     """
     # TODO: Implementar detecção de idioma
     # Pode usar bibliotecas como langdetect
-    
+
     # Por padrão, assumir português
     return "pt"
 
@@ -137,19 +250,44 @@ def detect_language(text: str) -> Optional[str]:
 def remove_html_tags(text: str) -> str:
     """
     Remove tags HTML do texto.
-    
+
+    Descarta scripts, estilos e comentários, converte tags de bloco em
+    quebras de linha e decodifica entidades (&ccedil; -> ç).
+
     Args:
         text: Texto com HTML
-        
+
     Returns:
         Texto sem tags HTML
     """
-    # TODO: Usar BeautifulSoup ou regex para remover tags
-    # from bs4 import BeautifulSoup
-    # soup = BeautifulSoup(text, 'html.parser')
-    # return soup.get_text()
-    
-    # Regex básico
-    text = re.sub(r'<[^>]+>', '', text)
-    return text
+    if not text:
+        return ""
+
+    text = _HTML_BLOCK.sub("\n", _HTML_DROP.sub("", text))
+    return html.unescape(_HTML_TAG.sub("", text))
+
+
+def process_documents(documents: Union[str, Iterable[str]], html_input: bool = False,
+                      sections: bool = True) -> List[Dict]:
+    """
+    API em lote: limpa e separa em seções um documento inteiro ou uma lista.
+
+    Args:
+        documents: Um texto ou iterável de textos
+        html_input: Se True, remove o HTML antes da limpeza
+        sections: Se False, pula a extração de seções
+
+    Returns:
+        [{'text': texto limpo (com quebras de linha), 'sections': {...}}]
+    """
+    if isinstance(documents, str):
+        documents = [documents]
+
+    results = []
+    for document in documents:
+        if html_input:
+            document = remove_html_tags(document)
+        text = clean_text(document, keep_newlines=True)
+        results.append({"text": text, "sections": extract_key_sections(text) if sections else {}})
 
+    return results
@@ -0,0 +1,89 @@
+"""
+Benchmark das funções reais de modules/calendar_manager.py contra o servidor
+falso do Google Calendar (benchmarks/fake_calendar_server.py).
+
+Para cada cenário de latência, mede:
+1. Agendamento direto (uma inserção por dose)
+2. Agendamento via outbox (resposta + sincronização em batch)
+3. Busca por nome (q) e por treatment_id (privateExtendedProperty)
+4. Reagendamento e cancelamento de um tratamento
+
+Executar a partir da pasta Backend:
+    python benchmarks/bench_calendar_manager.py --doses 84 --latency-ms 0 50
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from google.oauth2.credentials import Credentials
+import modules.calendar_manager as calendar
+from modules.calendar_client import build_calendar_service
+from modules.outbox import Outbox
+from fake_calendar_server import FakeCalendarConfig, FakeCalendarServer
+
+
+def _timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"  {label:<52} {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+def run_scenario(doses: int, latency_ms: float, error_rate: float):
+    print(f"=== latência {latency_ms:.0f} ms | erros {error_rate:.0%} | {doses} doses ===")
+    config = FakeCalendarConfig(latency_ms=latency_ms, error_rate=error_rate)
+    with FakeCalendarServer(config) as server:
+        service = build_calendar_service(Credentials(token="fake"), root_url=server.root_url)
+        start_time = calendar.datetime.now(calendar.TZ_SAO_PAULO) + timedelta(minutes=5)
+        details = {"medicamento": "Dipirona", "intervalo_horas": 8, "duracao_dias": doses * 8 // 24}
+
+        direct = _timed("agendar (inserção direta)",
+                        lambda: calendar.create_calendar_events(service, details, start_time))
+        print(f"    -> {direct['total_doses']} doses criadas")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = Outbox(os.path.join(tmp, "outbox.db"))
+            queued = _timed("agendar via outbox (resposta)",
+                            lambda: calendar.create_calendar_events(
+                                service, {**details, "medicamento": "Losartana"}, start_time,
+                                outbox=outbox, user_id="bench"))
+            applied = _timed("  sincronizar outbox (batches de 50)",
+                             lambda: outbox.drain(lambda user_id: service))
+            print(f"    -> {applied}/{queued['total_doses']} doses sincronizadas, "
+                  f"{outbox.pending_count()} pendentes")
+            outbox.stop()
+
+        by_name = _timed("buscar por nome (propriedade)",
+                         lambda: calendar.find_future_events_by_name(service, "Dipirona"))
+        by_treatment = _timed("buscar por treatment_id (privateExtendedProperty)",
+                              lambda: calendar.find_future_events_by_treatment(service, direct["treatment_id"]))
+        print(f"    -> {len(by_name)} / {len(by_treatment)} eventos")
+
+        new_start = (start_time + timedelta(hours=1)).strftime('%d/%m/%Y %H:%M')
+        _timed("reagendar tratamento (patch por dose)",
+               lambda: calendar.edit_treatment(service, direct["treatment_id"], new_start))
+        _timed("cancelar tratamento",
+               lambda: calendar.delete_treatment(service, direct["treatment_id"]))
+        print(f"  chamadas à API: {server.fake.calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do calendar_manager contra o Calendar falso")
+    parser.add_argument("--doses", type=int, default=84)
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[0.0, 50.0])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    for latency in args.latency_ms:
+        run_scenario(args.doses, latency, args.error_rate)
+
+
+if __name__ == "__main__":
+    main()
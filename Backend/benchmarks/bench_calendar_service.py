@@ -0,0 +1,101 @@
+"""
+Micro-benchmark da construção do serviço do Google Calendar.
+
+Compara o caminho antigo (build('calendar', 'v3', ...) com transporte httplib2
+novo a cada serviço) com o novo (discovery pré-parseado + pool HTTP keep-alive):
+
+1. Tempo para construir o serviço
+2. Latência por chamada (events().list) contra um servidor HTTP local
+
+Executar a partir da pasta Backend:
+    python benchmarks/bench_calendar_service.py
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from modules.calendar_client import build_calendar_service
+
+BUILD_ROUNDS = 50
+CALL_ROUNDS = 200
+EMPTY_LIST = json.dumps({"kind": "calendar#events", "items": []}).encode()
+
+
+class _ListHandler(BaseHTTPRequestHandler):
+    """Responde qualquer GET com uma lista de eventos vazia (keep-alive)."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(EMPTY_LIST)))
+        self.end_headers()
+        self.wfile.write(EMPTY_LIST)
+
+    def log_message(self, *args):
+        pass
+
+
+def _timeit(func, rounds: int) -> list:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples: list):
+    print(f"{label:<42} média {statistics.mean(samples):7.2f} ms | "
+          f"p50 {statistics.median(samples):7.2f} ms | "
+          f"p95 {sorted(samples)[int(len(samples) * 0.95) - 1]:7.2f} ms")
+
+
+def main():
+    creds = Credentials(token="benchmark-token")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ListHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    root_url = f"http://127.0.0.1:{server.server_port}/"
+
+    print("=== Construção do serviço ===")
+    _report("antes: build() padrão",
+            _timeit(lambda: build('calendar', 'v3', credentials=creds, cache_discovery=False), BUILD_ROUNDS))
+    build_calendar_service(creds)  # aquece o cache do discovery
+    _report("depois: discovery pré-parseado + pool",
+            _timeit(lambda: build_calendar_service(creds), BUILD_ROUNDS))
+
+    print("=== Latência por chamada (events().list) ===")
+    old_service = build('calendar', 'v3', credentials=creds, cache_discovery=False,
+                        client_options={'api_endpoint': root_url + 'calendar/v3/'})
+    new_service = build_calendar_service(creds, root_url=root_url)
+
+    # "antes" por requisição: no main.py antigo cada login/processo criava um
+    # transporte httplib2 próprio; aqui medimos o mesmo serviço sendo reutilizado
+    _report("antes: httplib2 (AuthorizedHttp)",
+            _timeit(lambda: old_service.events().list(calendarId='primary').execute(), CALL_ROUNDS))
+    _report("depois: requests.Session com pool",
+            _timeit(lambda: new_service.events().list(calendarId='primary').execute(), CALL_ROUNDS))
+    _report("antes: serviço novo por requisição",
+            _timeit(lambda: build('calendar', 'v3', credentials=creds, cache_discovery=False,
+                                  client_options={'api_endpoint': root_url + 'calendar/v3/'})
+                    .events().list(calendarId='primary').execute(), CALL_ROUNDS // 4))
+    _report("depois: serviço novo por requisição",
+            _timeit(lambda: build_calendar_service(creds, root_url=root_url)
+                    .events().list(calendarId='primary').execute(), CALL_ROUNDS // 4))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark da extração de bulas em HTML (app/services/bula_extractor.py).
+
+Compara o extrator em streaming (HTMLPullParser do lxml) com o
+BeautifulSoup (html.parser e lxml), os três alimentando o mesmo separador de
+seções, sobre páginas salvas em disco:
+
+- comum:  ~35 KB, como uma página de bula típica (CSS/JS inline, menu, rodapé)
+- grande: ~2 MB, com milhares de comentários e produtos relacionados
+
+As páginas são geradas a partir dos verbetes de app/batches (o repositório
+não guarda HTML de terceiros); --fixtures usa uma pasta com páginas .html
+baixadas. Cada método roda num processo próprio para medir o pico de memória
+(VmHWM, que inclui o que a libxml2 aloca fora do Python) sem interferência
+dos outros; o texto extraído tem de ser igual nos três.
+
+Executar a partir da pasta Backend:
+    python benchmarks/bench_html_extract.py
+    python benchmarks/bench_html_extract.py --fixtures ~/bulas_salvas
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import resource
+import tempfile
+import subprocess
+from html import escape
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.bula_extractor import (
+    BLOCK_TAGS, SKIP_TAGS, iter_blocks, sections_from_blocks, format_sections
+)
+from app.utils.text_processing import clean_text, extract_key_sections
+
+BATCHES_DIR = Path(__file__).resolve().parent.parent / "app" / "batches"
+MIN_SECONDS = 1.0
+METHODS = ["bs4 (html.parser)", "bs4 (lxml)", "lxml streaming"]
+# Títulos das páginas: estilo bula do paciente e estilo bula do profissional
+TITLES = [
+    {"indications": "1. PARA QUE ESTE MEDICAMENTO É INDICADO?", "contraindications": "3. QUANDO NÃO DEVO USAR ESTE MEDICAMENTO?",
+     "dosage": "6. COMO DEVO USAR ESTE MEDICAMENTO?", "side_effects": "8. QUAIS OS MALES QUE ESTE MEDICAMENTO PODE ME CAUSAR?",
+     "interactions": "Interações medicamentosas"},
+    {"indications": "Indicações", "contraindications": "Contraindicações", "dosage": "Posologia",
+     "side_effects": "Reações adversas", "interactions": "Interações"},
+]
+
+
+# ---------------------------------------------------------------- páginas
+
+def _entries(limit: int) -> list:
+    entries = []
+    for path in sorted(BATCHES_DIR.glob("*.txt"))[:limit]:
+        text = clean_text(path.read_text(encoding="utf-8"), keep_newlines=True)
+        lines = [line for line in text.splitlines() if line.strip()]
+        sections = extract_key_sections(text)
+        if len(lines) > 1 and sections["indications"] and sections["dosage"]:
+            entries.append((lines[1], sections))
+    return entries
+
+
+def _paragraphs(text: str) -> str:
+    parts = [part.strip() for part in text.split(";") if part.strip()]
+    return "".join(f"<p>{escape(part)}.</p>" if i % 3 else f"<p><b>{escape(part)}</b>.</p>"
+                   for i, part in enumerate(parts))
+
+
+def build_page(name: str, sections: dict, style: int, comments: int, related: int, rng: random.Random) -> str:
+    titles = TITLES[style]
+    css = "".join(f".c{i}{{margin:{i}px;padding:{i % 7}px;color:#{i:06x}}}\n" for i in range(400))
+    script = "".join(f"window.dataLayer.push({{event:'view',id:{i},q:'<p>Posologia: {i}</p>'}});\n" for i in range(200))
+    menu = "".join(f'<li><a href="/{key}">{title}</a></li>' for key, title in titles.items())
+    body = "".join(f'<h2 id="{key}">{escape(titles[key])}</h2>{_paragraphs(sections[key] or "Sem informações")}'
+                   for key in ("indications", "contraindications", "dosage", "side_effects", "interactions"))
+    words = "ótimo remédio funcionou muito bem para mim recomendo tomei por uma semana melhorou bastante".split()
+    comment_html = "".join(
+        f'<div class="comentario"><p class="autor">Usuário {i}</p><p>{" ".join(rng.choices(words, k=40))}</p></div>'
+        for i in range(comments))
+    related_html = "".join(f'<li><a href="/bula/{i}">Medicamento relacionado {i}</a></li>' for i in range(related))
+    return (
+        f'<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8"><title>{escape(name)} - Bula</title>'
+        f'<style>{css}</style><script>window.dataLayer=[];{script}</script></head><body>'
+        f'<header><nav><ul>{menu}</ul></nav><form><input name="q"><button>Buscar</button></form></header>'
+        f'<main><article><h1>{escape(name)}</h1><p>Bula de {escape(name)} para o paciente.</p>{body}</article>'
+        f'<section class="comentarios"><h3>Comentários</h3>{comment_html}</section></main>'
+        f'<aside><h3>Relacionados</h3><ul>{related_html}</ul></aside>'
+        f'<footer><p>Posologia e demais informações: consulte seu médico.</p></footer></body></html>'
+    )
+
+
+def write_fixtures(folder: Path) -> dict:
+    """Grava as páginas geradas em folder/comum e folder/grande."""
+    rng = random.Random(48)
+    entries = _entries(120)
+    sets = {"comum": (entries[:100], 0, 40), "grande": (entries[100:108], 6000, 4000)}
+    for label, (chosen, comments, related) in sets.items():
+        (folder / label).mkdir(parents=True, exist_ok=True)
+        for i, (name, sections) in enumerate(chosen):
+            page = build_page(name, sections, i % 2, comments, related, rng)
+            (folder / label / f"{i:03d}.html").write_text(page, encoding="utf-8")
+    return {label: folder / label for label in sets}
+
+
+# ---------------------------------------------------------------- métodos
+
+def _bs4_blocks(html: bytes, features: str):
+    """O que se faria com o BeautifulSoup: árvore inteira, remove o ruído, percorre os blocos."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, features)
+    for tag in soup.find_all(list(SKIP_TAGS)):
+        tag.decompose()
+    for element in soup.find_all(list(BLOCK_TAGS)):
+        if element.find(list(BLOCK_TAGS)) is None:
+            text = element.get_text()
+        else:
+            text = "".join(element.find_all(string=True, recursive=False))
+        text = " ".join(text.split())
+        if text:
+            yield element.name, text
+
+
+def _extract(method: str, html: bytes) -> str:
+    if method == "lxml streaming":
+        blocks = iter_blocks(html)
+    else:
+        blocks = _bs4_blocks(html, "html.parser" if "html.parser" in method else "lxml")
+    return format_sections(sections_from_blocks(blocks))
+
+
+def _rss_mb(field: str) -> float:
+    """VmRSS (atual) ou VmHWM (pico) do processo, em MB."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _reset_peak() -> float:
+    """
+    Zera o pico de memória (Linux: /proc/self/clear_refs) e devolve a memória
+    atual; sem isso, o pico da importação esconderia o do parse.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _rss_mb("VmRSS")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _peak_mb() -> float:
+    peak = _rss_mb("VmHWM") if os.path.exists("/proc/self/status") else 0.0
+    return peak or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def worker(method: str, folder: str):
+    """Roda um método sobre as páginas da pasta e imprime o resultado em JSON."""
+    pages = [path.read_bytes() for path in sorted(Path(folder).glob("*.html"))]
+    _extract(method, b"<html><body><p>Posologia: aquecimento</p></body></html>")
+    baseline = _reset_peak()
+    digest = hashlib.sha256()
+    for page in pages:
+        digest.update(_extract(method, page).encode("utf-8"))
+    rss_delta = _peak_mb() - baseline
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < MIN_SECONDS or count < len(pages):
+        _extract(method, pages[count % len(pages)])
+        count += 1
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "pages_per_sec": count / elapsed,
+        "mb_per_sec": sum(len(pages[i % len(pages)]) for i in range(count)) / elapsed / 2 ** 20,
+        "rss_delta_mb": rss_delta,
+        "sha256": digest.hexdigest(),
+    }))
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.fixtures:
+            folders = {Path(args.fixtures).name: Path(args.fixtures)}
+        else:
+            folders = write_fixtures(Path(tmp))
+
+        for label, folder in folders.items():
+            paths = sorted(folder.glob("*.html"))
+            size_kb = sum(path.stat().st_size for path in paths) / len(paths) / 1024
+            print(f"\nPáginas '{label}': {len(paths)} arquivos, {size_kb:,.0f} KB em média")
+            digests = set()
+            baseline = None
+            for method in METHODS:
+                output = subprocess.run([sys.executable, __file__, "--worker", method, str(folder)],
+                                        capture_output=True, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                digests.add(result["sha256"])
+                baseline = baseline or result["pages_per_sec"]
+                print(f"  {method:<20} {result['pages_per_sec']:9.1f} páginas/s  {result['mb_per_sec']:6.1f} MB/s  "
+                      f"pico de memória +{result['rss_delta_mb']:6.1f} MB  "
+                      f"({result['pages_per_sec'] / baseline:5.1f}x)")
+            print(f"  mesmo texto extraído nos três: {'sim' if len(digests) == 1 else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extração de bulas em HTML: lxml em streaming x BeautifulSoup")
+    parser.add_argument("--fixtures", help="Pasta com páginas .html salvas (padrão: páginas geradas)")
+    parser.add_argument("--worker", nargs=2, metavar=("METODO", "PASTA"), help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    if arguments.worker:
+        worker(*arguments.worker)
+    else:
+        main(arguments)
@@ -0,0 +1,146 @@
+"""
+Benchmark da latência de consulta durante uma reingestão.
+
+Um processo grava enquanto o processo principal consulta sem parar (busca
+vetorial + filtro 'where', como o RAGManager). Vetores aleatórios, sem
+modelo de embeddings:
+
+1. Ocioso: só consultas
+2. No lugar (antigo): a reingestão apaga e regrava na mesma coleção que a
+   API lê (mesmo SQLite)
+3. Blue/green (modules/index_versions): a reingestão copia a versão ativa
+   para bulas_local@vN, grava na cópia e troca o ponteiro; o IndexRouter
+   passa para a nova versão e aposenta a antiga
+
+Além da latência, conta as consultas que viram o índice pela metade (filtro
+'where' com menos chunks do que o medicamento tem).
+
+Executar a partir da pasta Backend:
+    python benchmarks/bench_index_swap.py
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+import threading
+import multiprocessing
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import chromadb
+from modules.index_versions import IndexRouter, read_pointer, write_pointer, version_dir, version_name
+
+COLLECTION = "bulas_local"
+CHUNKS = 5000
+DIM = 384
+BATCH = 250
+PHASE_SEC = 6.0
+
+
+class _Version:
+    """Coleção do Chroma aberta num diretório (o que o RAGManager guarda por versão)."""
+
+    def __init__(self, directory: str):
+        self.client = chromadb.PersistentClient(path=directory)
+        self.collection = self.client.get_or_create_collection(COLLECTION)
+
+    def close(self):
+        self.client.close()
+
+
+def _vectors(seed: int, count: int) -> np.ndarray:
+    return np.random.default_rng(seed).random((count, DIM), dtype=np.float32)
+
+
+def _fill(collection, seed: int):
+    vectors = _vectors(seed, CHUNKS)
+    for start in range(0, CHUNKS, BATCH):
+        ids = [f"c{i}" for i in range(start, start + BATCH)]
+        collection.upsert(ids=ids, embeddings=vectors[start:start + BATCH],
+                          documents=[f"trecho {i}" for i in range(start, start + BATCH)],
+                          metadatas=[{"medicamento_norm": f"m{i % 300}"} for i in range(start, start + BATCH)])
+
+
+def _rebuild_in_place(base_dir: str, directory: str):
+    collection = chromadb.PersistentClient(path=directory).get_collection(COLLECTION)
+    collection.delete(where={"medicamento_norm": {"$ne": ""}})
+    _fill(collection, seed=2)
+
+
+def _rebuild_blue_green(base_dir: str, directory: str):
+    pointer = read_pointer(base_dir)
+    name = version_name(COLLECTION, pointer["number"] + 1)
+    shutil.copytree(version_dir(pointer["version"], base_dir), version_dir(name, base_dir))
+    collection = chromadb.PersistentClient(path=version_dir(name, base_dir)).get_collection(COLLECTION)
+    collection.delete(where={"medicamento_norm": {"$ne": ""}})
+    _fill(collection, seed=2)
+    write_pointer(name, pointer["number"] + 1, base_dir)
+
+
+def _query_loop(router: IndexRouter, stop: threading.Event, latencies: list, errors: list, partial: list):
+    rng = np.random.default_rng(7)
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        key = i % 300
+        try:
+            with router.acquire() as version:
+                version.collection.query(query_embeddings=rng.random((1, DIM), dtype=np.float32), n_results=5)
+                found = version.collection.get(where={"medicamento_norm": f"m{key}"}, include=[])
+            if len(found["ids"]) != len(range(key, CHUNKS, 300)):
+                partial.append(key)
+        except Exception as e:
+            errors.append(repr(e))
+        latencies.append(time.perf_counter() - start)
+        i += 1
+
+
+def _phase(label: str, router: IndexRouter, writer=None, args=()) -> None:
+    latencies, errors, partial, stop = [], [], [], threading.Event()
+    reader = threading.Thread(target=_query_loop, args=(router, stop, latencies, errors, partial))
+    reader.start()
+    elapsed = PHASE_SEC
+    if writer is not None:
+        start = time.perf_counter()
+        process = multiprocessing.get_context("spawn").Process(target=writer, args=args)
+        process.start()
+        process.join()
+        elapsed = time.perf_counter() - start
+        time.sleep(1.0)  # dá tempo do router trocar de versão
+    else:
+        time.sleep(PHASE_SEC)
+    stop.set()
+    reader.join()
+    ordered = sorted(latencies)
+    print(f"{label:<28} {len(latencies):>6} consultas  p50 {statistics.median(ordered) * 1000:7.2f} ms  "
+          f"p99 {ordered[int(len(ordered) * 0.99)] * 1000:7.2f} ms  max {ordered[-1] * 1000:8.2f} ms  "
+          f"parciais {len(partial):>5}  erros {len(errors)}  (gravação {elapsed:.1f}s)")
+
+
+def main():
+    base_dir = tempfile.mkdtemp()
+    first = version_name(COLLECTION, 1)
+    version = _Version(version_dir(first, base_dir))
+    _fill(version.collection, seed=1)
+    write_pointer(first, 1, base_dir)
+    print(f"Coleção: {CHUNKS} chunks de {DIM} dimensões\n")
+
+    router = IndexRouter(version, first)
+    _phase("ocioso", router)
+    _phase("reingestão no lugar", router, _rebuild_in_place, (base_dir, version_dir(first, base_dir)))
+
+    router = IndexRouter(_Version(version_dir(first, base_dir)), first,
+                         opener=lambda pointer: _Version(version_dir(pointer["version"], base_dir)),
+                         base_dir=base_dir, poll_interval=0.2)
+    _phase("reingestão blue/green", router, _rebuild_blue_green, (base_dir, None))
+    print(f"\nVersão ativa após a troca: {router.version}")
+    router.close()
+    shutil.rmtree(base_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
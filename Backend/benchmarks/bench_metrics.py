@@ -0,0 +1,123 @@
+"""
+Benchmark do custo das métricas (modules/metrics.py) no caminho da requisição.
+
+Mede:
+1. Custo por operação: Counter.inc, Histogram.observe, labels() + observe e
+   o context manager time()
+2. Requisição completa chamando o app ASGI direto (o TestClient soma
+   centenas de µs de ruído por requisição): sem e com o MetricsMiddleware
+3. Renderização de /metrics com todas as séries que a API cria em uso
+
+Executar a partir da pasta Backend:
+    python benchmarks/bench_metrics.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from fastapi import FastAPI
+from modules.metrics import (
+    Counter, Histogram, MetricsMiddleware, CALENDAR_CALLS, CALENDAR_SECONDS, HTTP_REQUEST_SECONDS,
+    LLM_SECONDS, record_cache, render
+)
+
+ROUNDS = 200_000
+REQUESTS = 2_000
+
+
+def _per_call_ns(func, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e9
+
+
+def bench_operations():
+    counter = Counter("bench_total", "bench", ("cache", "result"))
+    histogram = Histogram("bench_seconds", "bench", ("operation",))
+    child = histogram.labels("events.list")
+
+    def timed():
+        with child.time():
+            pass
+
+    rows = [
+        ("Counter.labels().inc()", lambda: counter.labels("treatment_index", "hit").inc()),
+        ("Histogram child.observe()", lambda: child.observe(0.042)),
+        ("Histogram.labels().observe()", lambda: histogram.labels("events.list").observe(0.042)),
+        ("child.time() (with)", timed),
+        ("record_cache()", lambda: record_cache("bench", hits=1)),
+    ]
+    for name, func in rows:
+        print(f"  {name:<32} {_per_call_ns(func):7.0f} ns")
+
+
+def _app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    app.get("/v1/calendar/events/{medicamento_nome}")(lambda medicamento_nome: {"medicamento": medicamento_nome})
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def _request_us(app: FastAPI) -> float:
+    path = "/v1/calendar/events/amoxicilina"
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": [],
+             "server": ("bench", 80), "client": ("127.0.0.1", 50000)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def bench_requests():
+    results = {}
+    for instrumented in (False, True) * 3:
+        elapsed = asyncio.run(_request_us(_app(instrumented)))
+        results[instrumented] = min(results.get(instrumented, elapsed), elapsed)
+    overhead = results[True] - results[False]
+    print(f"  sem middleware  {results[False]:8.1f} µs/requisição")
+    print(f"  com middleware  {results[True]:8.1f} µs/requisição  ({overhead:+.1f} µs, "
+          f"{overhead / results[False] * 100:+.1f}%)")
+
+
+def bench_render():
+    # Séries típicas de um processo em uso: rotas x status, operações do Calendar, pontos de LLM
+    for route in ("/v1/rag/query", "/v1/calendar/events/{medicamento_nome}", "/v1/calendar/schedule",
+                  "/v1/calendar/preview", "/v1/treatments/{treatment_id}/events", "/health"):
+        for status in ("200", "202", "404", "500"):
+            HTTP_REQUEST_SECONDS.labels("GET", route, status).observe(0.01)
+    for operation in ("events.list", "events.insert", "events.patch", "events.delete", "batch"):
+        CALENDAR_CALLS.labels(operation, "200").inc()
+        CALENDAR_SECONDS.labels(operation).observe(0.2)
+    for call_site in ("rag", "fallback", "intent", "parser"):
+        LLM_SECONDS.labels(call_site).observe(1.3)
+    body = render()
+    elapsed = _per_call_ns(render, 500) / 1000
+    print(f"  {body.count(chr(10))} linhas, {len(body) / 1024:.1f} KB em {elapsed:.0f} µs")
+
+
+def main():
+    print("Custo por operação")
+    bench_operations()
+    print("\nRequisição completa via ASGI")
+    bench_requests()
+    print("\nRenderização de /metrics")
+    bench_render()
+
+
+if __name__ == "__main__":
+    main()
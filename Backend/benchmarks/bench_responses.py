@@ -0,0 +1,145 @@
+"""
+Benchmark da serialização e compressão das respostas da API (modules/responses.py).
+
+Respostas representativas, montadas com as funções reais dos módulos:
+
+- eventos: GET /v1/calendar/events/{medicamento} com 250 eventos formatados
+- preview: POST /v1/calendar/preview com 500 doses
+- rag:     POST /v1/rag/query (resposta antiga: JSON em string dentro do JSON)
+
+Mede:
+1. Serialização: JSONResponse + jsonable_encoder (padrão do FastAPI), o mesmo
+   com orjson (default_response_class) e ORJSONResponse devolvida pronta
+2. Tamanho do corpo: sem compressão, gzip e brotli, e o tempo de cada um
+3. Requisição completa (ASGI): app antigo x app com orjson + CompressionMiddleware
+
+Executar a partir da pasta Backend:
+    python benchmarks/bench_responses.py
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import uuid
+import random
+import string
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from starlette.responses import JSONResponse
+import modules.calendar_manager as calendar
+from modules.dose_timeline import dose_instants
+from modules.responses import (
+    ORJSONResponse, CompressionMiddleware, COMPRESSION_MIN_SIZE, GZIP_LEVEL, BROTLI_QUALITY, brotli
+)
+
+ROUNDS = 300
+RAG_ANSWER = ("As reações adversas mais comuns da amoxicilina são diarreia, náusea e erupções na pele "
+              "(urticária, coceira). Com menos frequência podem ocorrer vômitos, candidíase e reações "
+              "alérgicas graves; nesse caso, suspenda o uso e procure atendimento médico imediatamente. ") * 3
+
+
+def _google_id(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase[:22] + string.digits, k=26))
+
+
+def sample_responses() -> dict:
+    rng = random.Random(49)
+    treatment_id = uuid.UUID(int=rng.getrandbits(128)).hex
+    start = calendar.TZ_SAO_PAULO.localize(datetime(2026, 11, 1, 8))
+    events = [calendar._format_event({
+        "id": _google_id(rng), "summary": "Tomar AMOXICILINA",
+        "start": {"dateTime": (start + timedelta(hours=8 * i)).isoformat()},
+        "extendedProperties": {"private": {"treatment_id": treatment_id}},
+    }) for i in range(250)]
+    doses = [{"dose": i + 1, "start_time": dose_time.isoformat(),
+              "start_time_formatted": dose_time.strftime('%d/%m/%Y %H:%M'), "dose_proxima": None}
+             for i, dose_time in dose_instants(start, 6, 125, 0, 500)]
+    details = {"medicamento": "Amoxicilina", "intervalo_horas": 6, "duracao_dias": 125}
+    answer = {"answer": RAG_ANSWER, "confidence": 0.87}
+    return {
+        "eventos": {"medicamento": "amoxicilina", "events": events},
+        "preview": {**details, "avisos": [], "total_doses": 500, "page": 1, "page_size": 500,
+                    "next_page": None, "doses": doses},
+        "rag (antigo)": {"query": "amoxicilina", "response": json.dumps(answer, ensure_ascii=False),
+                         "confidence": 0.87, "time_sec": 1.42},
+        "rag": {"query": "amoxicilina", "response": answer, "confidence": 0.87, "time_sec": 1.42},
+    }
+
+
+def _per_call_us(func, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def bench_serialization(responses: dict):
+    print(f"{'resposta':<14} {'JSONResponse+encoder':>22} {'orjson+encoder':>16} {'ORJSONResponse':>16}")
+    for name, content in responses.items():
+        default = _per_call_us(lambda: JSONResponse(jsonable_encoder(content)).body)
+        encoded = _per_call_us(lambda: ORJSONResponse(jsonable_encoder(content)).body)
+        direct = _per_call_us(lambda: ORJSONResponse(content).body)
+        print(f"{name:<14} {default:>19.0f} µs {encoded:>13.0f} µs {direct:>13.0f} µs  ({default / direct:4.1f}x)")
+
+
+def bench_sizes(responses: dict):
+    print(f"{'resposta':<14} {'sem compressão':>15} {f'gzip {GZIP_LEVEL}':>18} {'gzip 9':>18} "
+          f"{f'brotli {BROTLI_QUALITY}':>18}")
+    for name, content in responses.items():
+        body = ORJSONResponse(content).body
+        cells = []
+        for compress in (lambda: gzip.compress(body, GZIP_LEVEL), lambda: gzip.compress(body, 9),
+                         (lambda: brotli.compress(body, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY))
+                         if brotli is not None else None):
+            if compress is None:
+                cells.append(f"{'(sem brotli)':>18}")
+                continue
+            size = len(compress())
+            cells.append(f"{size:>7} B {_per_call_us(compress, 50):>5.0f} µs")
+        note = "" if len(body) >= COMPRESSION_MIN_SIZE else "  (abaixo do limite: sai sem compressão)"
+        print(f"{name:<14} {len(body):>13} B " + " ".join(cells) + f"  ({len(body) / size:4.1f}x){note}")
+
+
+def _app(content: dict, new: bool) -> FastAPI:
+    if not new:
+        app = FastAPI()
+        app.get("/r")(lambda: content)
+        return app
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware)
+    app.get("/r")(lambda: ORJSONResponse(content))
+    return app
+
+
+def bench_requests(responses: dict):
+    print(f"{'resposta':<14} {'antigo':>22} {'orjson + gzip':>22} {'orjson + brotli':>22}")
+    for name in ("eventos", "preview"):
+        cells = []
+        for new, encoding in ((False, "gzip, br"), (True, "gzip"), (True, "gzip, br")):
+            client = TestClient(_app(responses[name], new))
+            headers = {"Accept-Encoding": encoding}
+            wire = int(client.get("/r", headers=headers).headers["content-length"])
+            elapsed = _per_call_us(lambda: client.get("/r", headers=headers), 100)
+            cells.append(f"{wire:>7} B {elapsed / 1000:>6.2f} ms")
+        print(f"{name:<14} " + " ".join(f"{cell:>22}" for cell in cells))
+
+
+def main():
+    responses = sample_responses()
+    print("Serialização (por resposta)")
+    bench_serialization(responses)
+    print("\nCorpo da resposta e tempo de compressão")
+    bench_sizes(responses)
+    print("\nRequisição completa via ASGI (bytes no fio, tempo por requisição)")
+    bench_requests(responses)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark do ScraperService contra servidores HTTP locais (stub).
+
+Três "sites de bula" locais, cada um com 150 ms de latência e uma política
+de cache diferente:
+
+- fresh:   Cache-Control: max-age=300 + ETag   (repetição não vai à rede)
+- etag:    Cache-Control: no-cache + ETag      (repetição custa um 304)
+- lastmod: Cache-Control: max-age=0 + Last-Modified (304 via If-Modified-Since)
+
+Compara o scraper antigo (requests.Session síncrono dentro de uma corrotina,
+um site por vez) com o novo (httpx assíncrono, fontes em paralelo, cache em
+disco), mede o atraso do event loop durante a busca e confere o limite de
+requisições simultâneas por host.
+
+Executar a partir da pasta Backend:
+    python benchmarks/bench_scraper.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+from email.utils import formatdate
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+os.environ.setdefault("SCRAPER_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "http_cache.db"))
+os.environ.setdefault("SCRAPER_PER_HOST_LIMIT", "4")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from app.services.scraper_service import ScraperService, scraper_stats, close_http_client
+
+LATENCY_SEC = 0.15
+LAST_MODIFIED = formatdate(time.time() - 86400, usegmt=True)
+POLICIES = {
+    "fresh": {"Cache-Control": "max-age=300"},
+    "etag": {"Cache-Control": "no-cache"},
+    "lastmod": {"Cache-Control": "max-age=0", "Last-Modified": LAST_MODIFIED},
+}
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes = 0
+        self.active = 0
+        self.max_active = 0
+
+    def reset(self):
+        with self.lock:
+            self.requests = self.not_modified = self.bytes = self.active = self.max_active = 0
+
+
+STATS = _Stats()
+
+
+def _page(policy: str, name: str) -> bytes:
+    sections = "".join(f"<h2>{title}</h2>" + "".join(f"<p>{name}: parágrafo {i} sobre {title.lower()} "
+                                                     f"para o paciente.</p>" for i in range(10))
+                       for title in ("Indicações", "Posologia", "Reações adversas", "Interações"))
+    return (f"<html><head><title>{name}</title><script>var x = 1;</script></head><body>"
+            f"<nav>menu</nav><article><h1>{name.upper()}</h1>{sections}</article>"
+            f"<footer>rodapé ({policy})</footer></body></html>").encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    policy = "fresh"
+
+    def do_GET(self):
+        with STATS.lock:
+            STATS.requests += 1
+            STATS.active += 1
+            STATS.max_active = max(STATS.max_active, STATS.active)
+        try:
+            time.sleep(LATENCY_SEC)
+            name = parse_qs(urlsplit(self.path).query).get("q", ["?"])[0]
+            body = _page(self.policy, name)
+            headers = dict(POLICIES[self.policy])
+            if "Last-Modified" not in headers:
+                headers["ETag"] = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            if "ETag" in headers:
+                not_modified = self.headers.get("If-None-Match") == headers["ETag"]
+            else:
+                not_modified = self.headers.get("If-Modified-Since") == headers["Last-Modified"]
+            self.send_response(304 if not_modified else 200)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Date", formatdate(usegmt=True))
+            if not_modified:
+                self.end_headers()
+                with STATS.lock:
+                    STATS.not_modified += 1
+                return
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with STATS.lock:
+                STATS.bytes += len(body)
+        finally:
+            with STATS.lock:
+                STATS.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(policy: str) -> str:
+    handler = type(f"Handler_{policy}", (_Handler,), {"policy": policy})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/bula"
+
+
+async def _loop_lag(stop: asyncio.Event, lags: list):
+    """Atraso de um timer de 5 ms: mede quanto o event loop ficou bloqueado."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append(time.perf_counter() - start - 0.005)
+
+
+async def _measure(label: str, coro_factory):
+    STATS.reset()
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(_loop_lag(stop, lags))
+    await asyncio.sleep(0)  # o timer começa antes da busca
+    start = time.perf_counter()
+    results = await coro_factory()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    print(f"{label:<38} {elapsed * 1000:8.1f} ms  requisições {STATS.requests:>3}  304 {STATS.not_modified:>3}  "
+          f"bytes {STATS.bytes:>7}  atraso máx. do loop {max(lags, default=0) * 1000:6.1f} ms")
+    return results
+
+
+async def main():
+    sites = [_serve(policy) for policy in POLICIES]
+    session = requests.Session()
+
+    async def old_scraper(name: str):
+        # Como o ScraperService antigo: requests síncrono, um site por vez
+        results = []
+        for site in sites:
+            response = session.get(site, params={"q": name}, timeout=10)
+            results.append(response.text)
+        return results
+
+    scraper = ScraperService()
+    scraper.bula_sites = sites
+
+    print(f"{len(sites)} sites locais, {LATENCY_SEC * 1000:.0f} ms de latência cada\n")
+    await _measure("antigo (requests, sequencial)", lambda: old_scraper("dipirona"))
+    # A primeira busca inclui a criação do pool (certificados TLS, ~150 ms, em thread)
+    results = await _measure("novo, cache frio (cria o pool)", lambda: scraper.search_multiple_sources("Dipirona"))
+    await _measure("novo, cache frio (pool pronto)", lambda: scraper.search_multiple_sources("Amoxicilina"))
+    await _measure("novo, repetição (fresh/304/304)", lambda: scraper.search_multiple_sources("Dipirona"))
+    print(f"\nFontes com conteúdo: {len(results)}; trecho: {results[0]['content'][:60]!r}")
+
+    names = [f"medicamento {i}" for i in range(20)]
+    scraper.bula_sites = sites[:1]
+    await _measure("20 medicamentos no mesmo host", lambda: asyncio.gather(
+        *(scraper.search_multiple_sources(name) for name in names)))
+    print(f"Máximo de requisições simultâneas no host: {STATS.max_active} "
+          f"(limite {os.environ['SCRAPER_PER_HOST_LIMIT']})")
+    print(f"Cache HTTP: {scraper_stats()}")
+    await close_http_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark da normalização de texto (app/utils/text_processing.py).
+
+Roda cada etapa sobre o corpus inteiro de app/batches e reporta a vazão em
+MB/s, comparando com a abordagem ingênua (unicodedata caractere a caractere
+e re.sub com padrões em string a cada chamada):
+
+1. Remoção de acentos
+2. clean_text (sem e com quebras de linha)
+3. extract_key_sections
+4. process_documents (lote: limpeza + seções)
+
+Executar a partir da pasta Backend:
+    python benchmarks/bench_text_processing.py
+"""
+
+import os
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.text_processing import (
+    fold_accents, clean_text, extract_key_sections, process_documents, normalize_medication_name
+)
+
+BATCHES_DIR = Path(__file__).resolve().parent.parent / "app" / "batches"
+ROUNDS = 20
+
+
+def _naive_fold(text: str) -> str:
+    return "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+
+
+def _naive_clean(text: str) -> str:
+    text = re.sub(r"^[ \t]*-[ \t]*\d+[ \t]*-[ \t]*$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"(?<=[a-z])-\s*\n\s*(?=[a-z])", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _naive_sections(text: str) -> dict:
+    # Uma busca por seção (o que o TODO original sugeria)
+    patterns = {
+        "indications": r"(?im)^\s*(?:indica[çc][õo]es?|a[çc][ãa]o)\s*[:;]",
+        "dosage": r"(?im)^\s*(?:posologia|dose)\s*[:;]",
+        "side_effects": r"(?im)^\s*rea[çc](?:[ãa]o|[õo]es)\s+adversas?\s*[:;]",
+        "interactions": r"(?im)^\s*intera[çc][ãa]o\s*[:;]",
+    }
+    starts = sorted((m.start(), m.end(), name) for name, p in patterns.items() for m in re.finditer(p, text))
+    return {name: text[end:(starts[i + 1][0] if i + 1 < len(starts) else len(text))].strip()
+            for i, (_, end, name) in enumerate(starts)}
+
+
+def _bench(label: str, func, documents: list, size_mb: float, per_document: bool = True):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        if per_document:
+            for document in documents:
+                func(document)
+        else:
+            func(documents)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {size_mb * ROUNDS / elapsed:8.1f} MB/s  ({elapsed / ROUNDS * 1000:7.2f} ms/corpus)")
+    return elapsed
+
+
+def main():
+    documents = [path.read_text(encoding="utf-8") for path in sorted(BATCHES_DIR.glob("*.txt"))]
+    size_mb = sum(len(document.encode("utf-8")) for document in documents) / 1024 / 1024
+    print(f"Corpus: {len(documents)} arquivos, {size_mb:.2f} MB, {ROUNDS} rodadas\n")
+
+    naive = _bench("acentos (unicodedata por caractere)", _naive_fold, documents, size_mb)
+    fast = _bench("acentos (fold_accents / tabelas)", fold_accents, documents, size_mb)
+    print(f"{'':<44} {naive / fast:8.1f}x\n")
+
+    naive = _bench("limpeza (re.sub por chamada)", _naive_clean, documents, size_mb)
+    fast = _bench("limpeza (clean_text)", clean_text, documents, size_mb)
+    print(f"{'':<44} {naive / fast:8.1f}x")
+    _bench("limpeza (clean_text, keep_newlines=True)",
+           lambda document: clean_text(document, keep_newlines=True), documents, size_mb)
+    print()
+
+    naive = _bench("seções (uma busca por seção)", _naive_sections, documents, size_mb)
+    fast = _bench("seções (extract_key_sections)", extract_key_sections, documents, size_mb)
+    print(f"{'':<44} {naive / fast:8.1f}x\n")
+
+    _bench("lote (process_documents)", process_documents, documents, size_mb, per_document=False)
+
+    names = [document.strip().splitlines()[2] if len(document.strip().splitlines()) > 2 else "" for document in documents]
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for name in names:
+            normalize_medication_name(name)
+    elapsed = time.perf_counter() - start
+    print(f"{'normalize_medication_name':<44} {len(names) * ROUNDS / elapsed:8.0f} nomes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Servidor falso do Google Calendar v3 para testes e benchmarks locais.
+
+Implementa, em memória, o subconjunto da API usado pelo backend:
+- events: insert, list, get, patch, update, delete
+- list com q, timeMin, timeMax, maxResults, pageToken, syncToken,
+  privateExtendedProperty, orderBy=startTime e respostas parciais (fields=)
+- batch (multipart/mixed em /batch/calendar/v3)
+
+Permite injetar latência, erros (503) e limite de cota (403 rateLimitExceeded),
+via FakeCalendarConfig ou em tempo de execução com POST /_fake/config.
+
+Executar isolado a partir da pasta Backend:
+    python benchmarks/fake_calendar_server.py --port 8001 --latency-ms 80
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import urlparse, parse_qs
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+EVENTS_PATH = re.compile(r"^/calendar/v3/calendars/(?P<calendar>[^/]+)/events(?:/(?P<event>[^/]+))?$")
+
+
+@dataclass
+class FakeCalendarConfig:
+    latency_ms: float = 0.0       # latência fixa por requisição HTTP
+    jitter_ms: float = 0.0        # variação aleatória somada à latência
+    error_rate: float = 0.0       # fração de requisições que recebem 503
+    quota_per_minute: int = 0     # 0 = sem limite
+
+
+def _parse_time(value: str) -> datetime:
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _event_time(event: dict, key: str) -> datetime:
+    value = event.get(key, {})
+    return _parse_time(value.get('dateTime') or value.get('date') + 'T00:00:00+00:00')
+
+
+def parse_fields(spec: str) -> dict:
+    """Converte 'nextPageToken,items(id,start/dateTime)' em árvore {campo: subárvore|None}."""
+    def parse(i):
+        tree, name = {}, ""
+        while i < len(spec):
+            char = spec[i]
+            if char == ',':
+                if name:
+                    _add_path(tree, name, None)
+                name, i = "", i + 1
+            elif char == '(':
+                sub, i = parse(i + 1)
+                _add_path(tree, name, sub)
+                name = ""
+            elif char == ')':
+                if name:
+                    _add_path(tree, name, None)
+                return tree, i + 1
+            else:
+                name, i = name + char, i + 1
+        if name:
+            _add_path(tree, name, None)
+        return tree, i
+
+    return parse(0)[0]
+
+
+def _add_path(tree: dict, path: str, sub):
+    parts = path.strip().split('/')
+    for part in parts[:-1]:
+        tree = tree.setdefault(part, {})
+    tree[parts[-1]] = sub
+
+
+def apply_fields(obj, tree):
+    if tree is None:
+        return obj
+    if isinstance(obj, list):
+        return [apply_fields(item, tree) for item in obj]
+    if isinstance(obj, dict):
+        return {key: apply_fields(obj[key], sub) for key, sub in tree.items() if key in obj}
+    return obj
+
+
+def _error(status: int, reason: str, message: str):
+    return status, {"error": {"code": status, "message": message, "errors": [{"reason": reason, "message": message}]}}
+
+
+class FakeCalendar:
+    """Estado em memória e regras da API. Independente de HTTP, para ser chamado pelo batch."""
+
+    def __init__(self, config: FakeCalendarConfig = None):
+        self.config = config or FakeCalendarConfig()
+        self.events = {}       # (calendar_id, event_id) -> evento (inclusive 'cancelled')
+        self.seq = 0           # contador de alterações, base do syncToken
+        self.calls = {}        # (método, operação) -> quantidade, para os relatórios
+        self._requests = deque()
+        self._lock = threading.Lock()
+
+    # --- Injeção de falhas ---
+
+    def check_faults(self):
+        """Erro injetado para esta requisição, ou None."""
+        config = self.config
+        if config.quota_per_minute:
+            now = time.monotonic()
+            with self._lock:
+                while self._requests and now - self._requests[0] > 60:
+                    self._requests.popleft()
+                if len(self._requests) >= config.quota_per_minute:
+                    return _error(403, "rateLimitExceeded", "Rate Limit Exceeded")
+                self._requests.append(now)
+        if config.error_rate and random.random() < config.error_rate:
+            return _error(503, "backendError", "Backend Error")
+        return None
+
+    def delay(self) -> float:
+        return max(0.0, self.config.latency_ms + random.uniform(0, self.config.jitter_ms)) / 1000
+
+    # --- Roteamento ---
+
+    def handle(self, method: str, path: str, query: dict, body):
+        """Executa uma requisição da API. query: {param: [valores]}. Retorna (status, payload)."""
+        match = EVENTS_PATH.match(path)
+        if not match:
+            return _error(404, "notFound", f"Not Found: {path}")
+
+        fault = self.check_faults()
+        if fault:
+            return fault
+
+        calendar_id, event_id = match.group('calendar'), match.group('event')
+        operation = {
+            ('POST', False): self.insert, ('GET', False): self.list,
+            ('GET', True): self.get, ('PATCH', True): self.patch,
+            ('PUT', True): self.update, ('DELETE', True): self.delete,
+        }.get((method, event_id is not None))
+        if operation is None:
+            return _error(405, "methodNotAllowed", "Method Not Allowed")
+
+        with self._lock:
+            self.calls[operation.__name__] = self.calls.get(operation.__name__, 0) + 1
+            status, payload = operation(calendar_id, event_id, query, body)
+
+        fields = query.get('fields', [None])[0]
+        if payload is not None and fields and status < 300:
+            payload = apply_fields(payload, parse_fields(fields))
+        return status, payload
+
+    # --- Operações (chamadas com o lock) ---
+
+    def _touch(self, event: dict):
+        self.seq += 1
+        event['_seq'] = self.seq
+        event['updated'] = datetime.now(timezone.utc).isoformat()
+        event['etag'] = f'"{self.seq}"'
+
+    @staticmethod
+    def _public(event: dict) -> dict:
+        return {key: value for key, value in event.items() if not key.startswith('_')}
+
+    def insert(self, calendar_id, _, query, body):
+        body = dict(body or {})
+        event_id = body.get('id') or uuid.uuid4().hex
+        if (calendar_id, event_id) in self.events:
+            return _error(409, "duplicate", "The requested identifier already exists.")
+        event = {**body, 'id': event_id, 'kind': 'calendar#event', 'status': 'confirmed'}
+        self._touch(event)
+        self.events[(calendar_id, event_id)] = event
+        return 200, self._public(event)
+
+    def get(self, calendar_id, event_id, query, body):
+        event = self.events.get((calendar_id, event_id))
+        if event is None:
+            return _error(404, "notFound", "Not Found")
+        return 200, self._public(event)
+
+    def patch(self, calendar_id, event_id, query, body):
+        event = self.events.get((calendar_id, event_id))
+        if event is None or event['status'] == 'cancelled':
+            return _error(404, "notFound", "Not Found")
+        for key, value in (body or {}).items():
+            if isinstance(value, dict) and isinstance(event.get(key), dict):
+                event[key] = {**event[key], **value}
+            else:
+                event[key] = value
+        self._touch(event)
+        return 200, self._public(event)
+
+    def update(self, calendar_id, event_id, query, body):
+        event = self.events.get((calendar_id, event_id))
+        if event is None or event['status'] == 'cancelled':
+            return _error(404, "notFound", "Not Found")
+        event = {**(body or {}), 'id': event_id, 'kind': 'calendar#event', 'status': 'confirmed'}
+        self._touch(event)
+        self.events[(calendar_id, event_id)] = event
+        return 200, self._public(event)
+
+    def delete(self, calendar_id, event_id, query, body):
+        event = self.events.get((calendar_id, event_id))
+        if event is None:
+            return _error(404, "notFound", "Not Found")
+        if event['status'] == 'cancelled':
+            return _error(410, "deleted", "Resource has been deleted")
+        event['status'] = 'cancelled'
+        self._touch(event)
+        return 204, None
+
+    def list(self, calendar_id, _, query, body):
+        param = lambda name, default=None: query.get(name, [default])[0]
+        sync_token = param('syncToken')
+        events = [event for (cal, _), event in self.events.items() if cal == calendar_id]
+
+        if sync_token:
+            # Sincronização incremental: tudo que mudou desde o token, inclusive cancelados
+            events = [event for event in events if event['_seq'] > int(sync_token)]
+            events.sort(key=lambda event: event['_seq'])
+        else:
+            events = [event for event in events if event['status'] != 'cancelled']
+            if param('timeMin'):
+                time_min = _parse_time(param('timeMin'))
+                events = [event for event in events if _event_time(event, 'end') > time_min]
+            if param('timeMax'):
+                time_max = _parse_time(param('timeMax'))
+                events = [event for event in events if _event_time(event, 'start') < time_max]
+            if param('q'):
+                terms = param('q').lower().split()
+                events = [event for event in events
+                          if all(term in f"{event.get('summary', '')} {event.get('description', '')}".lower()
+                                 for term in terms)]
+            for condition in query.get('privateExtendedProperty', []):
+                key, _, value = condition.partition('=')
+                events = [event for event in events
+                          if event.get('extendedProperties', {}).get('private', {}).get(key) == value]
+            if param('orderBy') == 'startTime':
+                events.sort(key=lambda event: _event_time(event, 'start'))
+
+        max_results = min(int(param('maxResults', 250)), 2500)
+        offset = int(param('pageToken', 0))
+        page = events[offset:offset + max_results]
+        result = {"kind": "calendar#events", "items": [self._public(event) for event in page]}
+        if offset + max_results < len(events):
+            result["nextPageToken"] = str(offset + max_results)
+        else:
+            result["nextSyncToken"] = str(self.seq)
+        return 200, result
+
+    # --- Batch ---
+
+    def handle_batch(self, content_type: str, body: bytes) -> tuple:
+        """Executa um batch multipart/mixed e devolve (content_type, corpo) da resposta."""
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in message.iter_parts():
+            raw = part.get_payload(decode=True) or part.get_payload().encode()
+            head, _, request_body = raw.replace(b"\r\n", b"\n").partition(b"\n\n")
+            request_line, *_ = head.decode().split("\n")
+            method, target, _ = request_line.split(" ", 2)
+            url = urlparse(target)
+            payload = json.loads(request_body) if request_body.strip() else None
+
+            status, result = self.handle(method, url.path, parse_qs(url.query), payload)
+            response_body = json.dumps(result) if result is not None else ""
+            parts.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{response_body}\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(parts).encode()
+
+
+def create_app(fake: FakeCalendar = None) -> FastAPI:
+    fake = fake or FakeCalendar()
+    app = FastAPI(title="Fake Google Calendar v3")
+    app.state.fake = fake
+
+    @app.post("/_fake/config")
+    async def set_config(request: Request):
+        for key, value in (await request.json()).items():
+            setattr(fake.config, key, value)
+        return asdict(fake.config)
+
+    @app.post("/_fake/reset")
+    async def reset():
+        with fake._lock:
+            fake.events.clear()
+            fake.calls.clear()
+        return {"ok": True}
+
+    @app.get("/_fake/stats")
+    async def stats():
+        return {"events": len(fake.events), "calls": fake.calls, "config": asdict(fake.config)}
+
+    @app.post("/batch/calendar/v3")
+    async def batch(request: Request):
+        await asyncio.sleep(fake.delay())
+        content_type, body = fake.handle_batch(request.headers["content-type"], await request.body())
+        return Response(content=body, media_type=content_type)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PATCH", "PUT", "DELETE"])
+    async def api(path: str, request: Request):
+        await asyncio.sleep(fake.delay())
+        raw = await request.body()
+        query = parse_qs(request.url.query)
+        status, payload = fake.handle(request.method, "/" + path, query, json.loads(raw) if raw else None)
+        if payload is None:
+            return Response(status_code=status)
+        return Response(content=json.dumps(payload), status_code=status, media_type="application/json")
+
+    return app
+
+
+class FakeCalendarServer:
+    """Sobe o servidor falso numa thread (uso em benchmarks): with FakeCalendarServer() as server: ..."""
+
+    def __init__(self, config: FakeCalendarConfig = None, port: int = 0):
+        self.fake = FakeCalendar(config)
+        self._server = uvicorn.Server(uvicorn.Config(
+            create_app(self.fake), host="127.0.0.1", port=port, log_level="warning"
+        ))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def root_url(self) -> str:
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/"
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor falso do Google Calendar v3")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-per-minute", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeCalendarConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.quota_per_minute)
+    uvicorn.run(create_app(FakeCalendar(config)), host="127.0.0.1", port=args.port)
@@ -1,29 +1,179 @@
+"""
+Ingestão das bulas de app/batches no índice vetorial.
+
+Retomável: cada arquivo gravado entra num checkpoint da versão em
+construção; se a ingestão cair (ex.: no arquivo 300 de 360), rodar de novo
+continua de onde parou. Mostra o progresso ao vivo e grava um relatório
+JSON (tempo por estágio, chunks, pico de memória) para comparar entre releases.
+
+Executar a partir da pasta Backend:
+    python ingest_data.py                      # retoma, se houver ingestão interrompida
+    python ingest_data.py --fresh              # ignora o checkpoint e recomeça
+    python ingest_data.py --report relatorio.json --workers 4
+"""
+
+import argparse
 import asyncio
+import json
 import os
 import sys
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 # Adicionar o diretório atual ao path para importar módulos do app
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.services.vector_service import VectorService
 
-async def main():
+BATCHES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "batches")
+REPORT_PATH = os.path.join("logs", "ingest_report.json")
+
+
+class Progress:
+    """Linha de progresso ao vivo (arquivos/s, chunks/s, ETA), no máximo a cada interval segundos."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._last = 0.0
+        self.shown = False
+
+    def __call__(self, state: dict):
+        now = time.perf_counter()
+        done = state["total"] and state["files"] >= state["total"]
+        if now - self._last < self.interval and not done:
+            return
+        self._last = now
+        elapsed = state["elapsed_sec"] or 1e-9
+        files_per_sec = state["files"] / elapsed
+        eta = (state["total"] - state["files"]) / files_per_sec if state["total"] and files_per_sec else 0.0
+        print(f"\r  {state['files']}/{state['total'] or '?'} arquivos | {files_per_sec:6.1f} arquivos/s | "
+              f"{state['chunks_written'] / elapsed:7.1f} chunks/s | ETA {eta:5.0f}s", end="", flush=True)
+        self.shown = True
+
+
+def peak_rss_mb() -> dict:
+    """Pico de memória residente do processo e dos processos de leitura/split (MB)."""
+    if resource is None:
+        return {"main": None, "workers": None}
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "main": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20, 1),
+        "workers": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2 ** 20, 1),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestão das bulas no índice vetorial (retomável).")
+    parser.add_argument("--dir", default=BATCHES_DIR, help="Diretório dos arquivos .txt (padrão: app/batches)")
+    parser.add_argument("--workers", type=int, default=None, help="Processos de leitura/split (padrão: CPUs)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Ignora uma ingestão interrompida e começa uma versão nova do índice")
+    parser.add_argument("--report", default=REPORT_PATH, help=f"Relatório JSON final (padrão: {REPORT_PATH})")
+    parser.add_argument("--no-progress", action="store_true", help="Não mostra o progresso ao vivo")
+    return parser.parse_args(argv)
+
+
+async def main(args):
     print("=== Iniciando Ingestão de Dados ===")
-    
-    # Caminho para a pasta batches
-    batches_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "batches")
-    
-    if not os.path.exists(batches_dir):
-        print(f"Erro: Diretório não encontrado: {batches_dir}")
-        return
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    start = time.perf_counter()
+
+    if not os.path.exists(args.dir):
+        print(f"Erro: Diretório não encontrado: {args.dir}")
+        return 1
 
     service = VectorService()
-    
-    print(f"Lendo arquivos de: {batches_dir}")
-    count = await service.process_directory(batches_dir)
-    
+    # Grava numa versão nova do índice; a API segue na versão ativa até a troca
+    version = service.begin_build(resume=not args.fresh)
+    print(f"Construindo a versão {version} do índice")
+
+    print(f"Lendo arquivos de: {args.dir}")
+    progress = None if args.no_progress else Progress()
+    count = await service.process_directory(args.dir, workers=args.workers, progress=progress)
+    if progress is not None and progress.shown:
+        print()
+
+    report = service.last_report
     print(f"=== Ingestão Concluída ===")
     print(f"Total de arquivos processados: {count}")
+    print(f"Arquivos novos: {report['new']} | alterados: {report['modified']} | "
+          f"sem mudança: {report['unchanged']} | removidos: {report['removed']} | "
+          f"retomados do checkpoint: {report['resumed']}")
+    print(f"Chunks gravados: {report['chunks']}")
+    dedup = report["dedup"]
+    if dedup["threshold"] is not None:
+        print(f"Deduplicação (Jaccard >= {dedup['threshold']}): {dedup['dropped']}/{dedup['checked']} chunks "
+              f"descartados ({dedup['reduction_pct']}% menor), {dedup['index_chunks']} chunks canônicos")
+    print(f"Tempo de ponta a ponta: {report['elapsed_sec']:.2f}s ({report['files_per_sec']} arquivos/s)")
+    cache = report["embedding_cache"]
+    print(f"Cache de embeddings: {cache['entries']} vetores ({cache['size_mb']} MB), "
+          f"taxa de acerto {cache['hit_rate']:.0%}, ~{cache['time_saved_sec']:.1f}s economizados")
+    for name, stage in report["stages"].items():
+        print(f"  {name:<11} {stage['items']:>6} {stage['unit']:<7} "
+              f"{stage['busy_sec']:>8.2f}s ocupado  {stage[stage['unit'] + '_per_sec']:>9.1f} {stage['unit']}/s")
+
+    publish_start = time.perf_counter()
+    published = service.publish_build()
+    publish_sec = time.perf_counter() - publish_start
+    if published["published"]:
+        print(f"Versão ativa: {published['version']} (smoke check ok, {published['smoke_check']['chunks']} chunks); "
+              f"aposentadas: {', '.join(published['retired']) or 'nenhuma'}")
+        if published["web_replayed"]:
+            print(f"  {published['web_replayed']} chunks de bulas da web gravados durante o build copiados")
+    else:
+        print(f"Nenhuma mudança; versão ativa continua {published['version']}")
+
+    # Artefato de deploy: a API abre o snapshot via mmap em vez do ChromaDB
+    snapshot = service.export_snapshot()
+    print(f"Snapshot do índice: {snapshot['count']} chunks, {snapshot['size_mb']} MB "
+          f"(sha256 {snapshot['sha256'][:12]}) em {snapshot['elapsed_sec']:.2f}s")
+
+    summary = {
+        "started_at": started_at,
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "elapsed_sec": round(time.perf_counter() - start, 3),
+        "version": published["version"],
+        "published": published["published"],
+        "web_replayed": published["web_replayed"],
+        "files": {
+            "total": count + len(report["files_failed"]),
+            "processed": report["files"],
+            "new": report["new"],
+            "modified": report["modified"],
+            "unchanged": report["unchanged"],
+            "dependents": report["dependents"],
+            "removed": report["removed"],
+            "resumed": report["resumed"],
+            "failed": report["files_failed"],
+            "per_sec": report["files_per_sec"],
+        },
+        "chunks": {
+            "written": report["chunks"],
+            "dedup_checked": dedup["checked"],
+            "dedup_dropped": dedup["dropped"],
+            "index": snapshot["count"],
+        },
+        "stages": {
+            **report["stages"],
+            "ingest": {"busy_sec": report["elapsed_sec"]},
+            "publish": {"busy_sec": round(publish_sec, 3)},
+            "snapshot": {"busy_sec": snapshot["elapsed_sec"]},
+        },
+        "embedding_cache": cache,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"Relatório: {args.report} (pico de memória {summary['peak_rss_mb']['main']} MB)")
+    return 1 if report["files_failed"] else 0
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(asyncio.run(main(parse_args())))
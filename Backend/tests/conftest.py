@@ -0,0 +1,77 @@
+"""
+Configuração dos testes (executar a partir da pasta Backend: python -m pytest).
+
+A API importa os módulos como 'modules.x' (cwd = app/) e os serviços da
+ingestão como 'app.services.x' (cwd = Backend/): as duas pastas entram no path,
+além de benchmarks/ (servidor falso do Google Calendar).
+"""
+
+import os
+import sys
+import hashlib
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, "app"), os.path.join(BACKEND_DIR, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class FakeEmbeddings:
+    """Substitui o modelo do HuggingFace: vetor derivado do hash do texto."""
+
+    def __init__(self, **kwargs):
+        self.calls = 0
+
+    def _vector(self, text: str) -> list:
+        return [byte / 255 for byte in hashlib.sha256(text.encode("utf-8")).digest()[:16]]
+
+    def embed_documents(self, texts: list) -> list:
+        self.calls += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self._vector(text)
+
+
+@pytest.fixture
+def vector_service(tmp_path, monkeypatch):
+    """VectorService num diretório temporário (ChromaDB real, embeddings determinísticos)."""
+    pytest.importorskip("langchain_huggingface")
+    from app.modules.embedding_cache import CachedEmbeddings, EmbeddingCache
+    from app.services import vector_service as module
+
+    monkeypatch.setattr(module, "HuggingFaceEmbeddings", FakeEmbeddings)
+    monkeypatch.setattr(module, "CachedEmbeddings", lambda embeddings, model_name: CachedEmbeddings(
+        embeddings, model_name=model_name, cache=EmbeddingCache(str(tmp_path / "embedding_cache.db"))))
+    monkeypatch.setattr(module, "DB_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setattr(module, "DRUG_CATALOG_PATH", str(tmp_path / "drug_catalog.json"))
+    monkeypatch.setattr(module, "read_pointer", lambda: None)
+    return module.VectorService()
+
+
+@pytest.fixture(scope="session")
+def _calendar_server():
+    from fake_calendar_server import FakeCalendarServer
+    with FakeCalendarServer() as server:
+        yield server
+
+
+@pytest.fixture
+def calendar_server(_calendar_server):
+    """Servidor falso do Calendar v3 (benchmarks/fake_calendar_server.py), zerado a cada teste."""
+    from fake_calendar_server import FakeCalendarConfig
+    fake = _calendar_server.fake
+    with fake._lock:
+        fake.events.clear()
+        fake.calls.clear()
+        fake.config = FakeCalendarConfig()
+    return _calendar_server
+
+
+@pytest.fixture
+def calendar_service(calendar_server):
+    """Serviço 'calendar' real (googleapiclient, pool HTTP) apontado para o servidor falso."""
+    from google.oauth2.credentials import Credentials
+    from modules.calendar_client import build_calendar_service
+    return build_calendar_service(Credentials(token="fake"), root_url=calendar_server.root_url)
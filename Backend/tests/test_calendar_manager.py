@@ -0,0 +1,88 @@
+"""calendar_manager contra o servidor falso do Google Calendar (googleapiclient real, HTTP local)."""
+
+import pytest
+from datetime import datetime, timedelta
+import modules.calendar_manager as calendar
+from modules.outbox import Outbox
+
+DETAILS = {"medicamento": "Dipirona", "intervalo_horas": 8, "duracao_dias": 2}
+
+
+@pytest.fixture
+def start_time():
+    return (datetime.now(calendar.TZ_SAO_PAULO) + timedelta(days=1)).replace(second=0, microsecond=0)
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    yield outbox
+    outbox.conn.close()
+
+
+def test_schedule_is_idempotent_per_treatment(calendar_service, calendar_server, start_time):
+    first = calendar.create_calendar_events(calendar_service, DETAILS, start_time, treatment_id="medsched_t1")
+    again = calendar.create_calendar_events(calendar_service, DETAILS, start_time, treatment_id="medsched_t1")
+
+    assert first["total_doses"] == again["total_doses"] == 6
+    assert len(calendar_server.fake.events) == 6  # reenvio: 409 nos mesmos IDs, sem duplicar
+    events = calendar.find_future_events_by_treatment(calendar_service, "medsched_t1")
+    assert [event["treatment_id"] for event in events] == ["medsched_t1"] * 6
+    assert events[0]["start_time"] == start_time.isoformat()
+
+
+def test_edit_and_delete_treatment(calendar_service, start_time):
+    calendar.create_calendar_events(calendar_service, DETAILS, start_time, treatment_id="medsched_t1")
+    new_start = start_time + timedelta(hours=2)
+
+    edited = calendar.edit_treatment(calendar_service, "medsched_t1", new_start.strftime('%d/%m/%Y %H:%M'))
+    assert (edited["updated_count"], edited["offset_minutes"], edited["errors"]) == (6, 120, [])
+    starts = [event["start_time"] for event in calendar.find_future_events_by_treatment(calendar_service, "medsched_t1")]
+    assert starts[0] == new_start.isoformat()
+    assert starts[1] == (new_start + timedelta(hours=8)).isoformat()
+
+    deleted = calendar.delete_treatment(calendar_service, "medsched_t1")
+    assert deleted["deleted_count"] == 6
+    assert calendar.find_future_events_by_treatment(calendar_service, "medsched_t1") == []
+
+
+def test_schedule_through_outbox(calendar_service, calendar_server, outbox, start_time):
+    result = calendar.create_calendar_events(calendar_service, DETAILS, start_time, treatment_id="medsched_t1",
+                                             outbox=outbox, user_id="u1")
+    assert result["pending_sync"] == 6
+    assert calendar_server.fake.events == {}  # resposta sem esperar o Google
+
+    assert outbox.drain(lambda user_id: calendar_service) == 6
+    assert calendar_server.fake.calls == {"insert": 6}  # um batch HTTP com as 6 inserções
+    assert len(calendar.find_future_events_by_treatment(calendar_service, "medsched_t1")) == 6
+
+
+def test_cancel_before_sync_sends_nothing(calendar_service, calendar_server, outbox, start_time):
+    calendar.create_calendar_events(calendar_service, DETAILS, start_time, treatment_id="medsched_t1",
+                                    outbox=outbox, user_id="u1")
+    deleted = calendar.delete_treatment(calendar_service, "medsched_t1", outbox=outbox, user_id="u1")
+    assert deleted["deleted_count"] == 6
+
+    outbox.drain(lambda user_id: calendar_service)
+    assert outbox.pending_count("u1") == 0
+    assert "insert" not in calendar_server.fake.calls and "delete" not in calendar_server.fake.calls
+
+
+def test_find_by_name_ignores_case_and_spacing(calendar_service, calendar_server, start_time):
+    details = {**DETAILS, "medicamento": "Dipirona Sódica"}
+    calendar.create_calendar_events(calendar_service, details, start_time, treatment_id="medsched_t1")
+
+    assert len(calendar.find_future_events_by_name(calendar_service, "  dipirona sódica ")) == 6
+    assert len(calendar.find_future_events_by_name(calendar_service, "DIPIRONA SÓDICA")) == 6
+    assert calendar.find_future_events_by_name(calendar_service, "dipirona") == []  # não casa por prefixo
+
+
+def test_find_by_name_falls_back_to_title_for_legacy_events(calendar_service, start_time):
+    # Evento criado antes da propriedade privada 'medicamento'
+    calendar_service.events().insert(calendarId="primary", body={
+        "summary": "Tomar DIPIRONA",
+        "start": {"dateTime": start_time.isoformat()},
+        "end": {"dateTime": (start_time + timedelta(minutes=15)).isoformat()}}).execute()
+
+    events = calendar.find_future_events_by_name(calendar_service, "dipirona")
+    assert [event["summary"] for event in events] == ["Tomar DIPIRONA"]
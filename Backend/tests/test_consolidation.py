@@ -0,0 +1,78 @@
+"""Modo consolidado: doses de tratamentos ativos próximas viram um único evento."""
+
+import pytest
+from datetime import datetime, timedelta
+import modules.calendar_manager as calendar
+import modules.consolidation as consolidation
+from modules.treatment_store import TreatmentStore
+
+DIPIRONA = {"medicamento": "Dipirona", "intervalo_horas": 12, "duracao_dias": 1}
+LOSARTANA = {"medicamento": "Losartana", "intervalo_horas": 12, "duracao_dias": 1}
+
+
+@pytest.fixture
+def start_time():
+    return (datetime.now(calendar.TZ_SAO_PAULO) + timedelta(days=1)).replace(hour=8, minute=0, second=0,
+                                                                             microsecond=0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TreatmentStore(str(tmp_path / "treatments.db"))
+    yield store
+    store.close()
+
+
+def summaries(calendar_server) -> list:
+    return sorted(event["summary"] for event in calendar_server.fake.events.values()
+                  if event["status"] != "cancelled")
+
+
+def test_doses_join_a_treatment_with_its_own_events(calendar_service, calendar_server, store, start_time):
+    # Dipirona agendada sem consolidar: um evento por dose
+    store.add_treatment("u1", "medsched_d1", DIPIRONA, start_time)
+    calendar.create_calendar_events(calendar_service, DIPIRONA, start_time, treatment_id="medsched_d1")
+    assert summaries(calendar_server) == ["Tomar DIPIRONA"] * 2
+
+    result = consolidation.schedule_consolidated(calendar_service, store, "u1", LOSARTANA,
+                                                 start_time + timedelta(minutes=10), "medsched_l1",
+                                                 window_minutes=30)
+
+    assert result["errors"] == []
+    assert summaries(calendar_server) == ["Tomar DIPIRONA + LOSARTANA"] * 2
+    assert store.get_treatment("u1", "medsched_d1")["consolidated"] == 30
+    assert len(store.treatment_slots("u1", "medsched_d1")) == 2
+
+    # A dipirona, agora consolidada, é cancelada sem levar a losartana junto
+    consolidation.cancel_consolidated(calendar_service, store, "u1", "medsched_d1")
+    assert summaries(calendar_server) == ["Tomar LOSARTANA"] * 2
+
+
+def test_distant_treatments_keep_their_own_events(calendar_service, calendar_server, store, start_time):
+    store.add_treatment("u1", "medsched_d1", DIPIRONA, start_time)
+    calendar.create_calendar_events(calendar_service, DIPIRONA, start_time, treatment_id="medsched_d1")
+
+    consolidation.schedule_consolidated(calendar_service, store, "u1", LOSARTANA,
+                                        start_time + timedelta(hours=3), "medsched_l1", window_minutes=30)
+    assert summaries(calendar_server) == ["Tomar DIPIRONA"] * 2 + ["Tomar LOSARTANA"] * 2
+    assert store.get_treatment("u1", "medsched_d1")["consolidated"] == 0
+
+
+def test_schedule_writes_all_doses_or_none(calendar_service, calendar_server, store, start_time, monkeypatch):
+    add_member = store.add_member
+    calls = []
+
+    def failing_add_member(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("disco cheio")
+        return add_member(*args)
+
+    monkeypatch.setattr(store, "add_member", failing_add_member)
+    with pytest.raises(RuntimeError):
+        consolidation.schedule_consolidated(calendar_service, store, "u1", LOSARTANA, start_time, "medsched_l1")
+
+    assert store.get_treatment("u1", "medsched_l1") is None
+    assert store.conn.execute("SELECT count(*) FROM slots").fetchone()[0] == 0
+    assert store.conn.execute("SELECT count(*) FROM slot_members").fetchone()[0] == 0
+    assert calendar_server.fake.events == {}
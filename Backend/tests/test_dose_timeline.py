@@ -0,0 +1,67 @@
+"""Horários das doses em America/Sao_Paulo, incluindo a entrada no horário de verão (04/11/2018)."""
+
+from datetime import datetime, timedelta
+from modules.dose_timeline import (TZ_SAO_PAULO, total_doses, dose_instant, dose_instants,
+                                   dose_index, rebase_start)
+
+
+def local(*args) -> datetime:
+    return TZ_SAO_PAULO.localize(datetime(*args))
+
+
+def test_total_doses():
+    assert total_doses(8, 7) == 21
+    assert total_doses(24, 10) == 10
+    assert total_doses(48, 5) == 2
+
+
+def test_daily_dose_keeps_wall_clock_across_dst():
+    start = local(2018, 11, 2, 8, 0)
+    doses = [dose for _, dose in dose_instants(start, 24, 5)]
+
+    assert [(dose.day, dose.hour, dose.minute) for dose in doses] == [(d, 8, 0) for d in range(2, 7)]
+    assert doses[1].utcoffset() == timedelta(hours=-3)
+    assert doses[2].utcoffset() == timedelta(hours=-2)
+    # O dia da mudança tem 23h reais
+    assert doses[2] - doses[1] == timedelta(hours=23)
+
+
+def test_daily_dose_in_skipped_hour_moves_forward():
+    # 00:30 de 04/11/2018 não existe (o relógio pulou de 00:00 para 01:00)
+    dose = dose_instant(local(2018, 11, 3, 0, 30), 24, 1)
+    assert (dose.day, dose.hour, dose.minute) == (4, 1, 30)
+
+
+def test_hourly_interval_keeps_real_gap_across_dst():
+    start = local(2018, 11, 3, 16, 0)
+    doses = [dose for _, dose in dose_instants(start, 8, 2)]
+
+    assert all(b - a == timedelta(hours=8) for a, b in zip(doses, doses[1:]))
+    # 00:00 -03 (horário pulado) vira 01:00 -02
+    assert (doses[1].hour, doses[1].utcoffset()) == (1, timedelta(hours=-2))
+    assert doses[2].hour == 9
+
+
+def test_dose_instants_pages_without_generating_previous_doses():
+    start = local(2018, 11, 1, 8, 0)
+    page = list(dose_instants(start, 8, 30, first_dose=40, limit=5))
+    assert [i for i, _ in page] == list(range(40, 45))
+    assert page[0][1] == dose_instant(start, 8, 40)
+    assert list(dose_instants(start, 8, 1, first_dose=2, limit=10)) == [(2, dose_instant(start, 8, 2))]
+
+
+def test_dose_index_rounds_to_nearest_dose_across_dst():
+    start = local(2018, 11, 2, 8, 0)
+    for i in range(5):
+        assert dose_index(start, 24, dose_instant(start, 24, i)) == i
+    assert dose_index(start, 8, start + timedelta(hours=8 * 7 + 2)) == 7
+
+
+def test_rebase_start_moves_the_chosen_dose():
+    start = local(2018, 11, 2, 8, 0)
+    old = dose_instant(start, 24, 3)
+    new = old.replace(hour=10)
+    new_start = rebase_start(start, 24, old, TZ_SAO_PAULO.normalize(new))
+
+    assert dose_instant(new_start, 24, 3) == TZ_SAO_PAULO.normalize(new)
+    assert (new_start.day, new_start.hour) == (2, 10)
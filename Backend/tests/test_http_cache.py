@@ -0,0 +1,119 @@
+"""Cache HTTP do scraper: frescor (RFC 9111), armazenamento e revalidação condicional."""
+
+import asyncio
+import time
+import httpx
+import pytest
+from email.utils import formatdate
+from app.services import scraper_service
+from app.services.http_cache import HttpCache, CachedResponse, parse_cache_control, is_storable
+
+
+def response(headers: dict, stored_at: float = 1_000_000.0) -> CachedResponse:
+    return CachedResponse("https://example.org/bula", 200, headers, b"bula", stored_at)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HttpCache(str(tmp_path / "http_cache.db"))
+    yield cache
+    cache.close()
+
+
+def test_parse_cache_control():
+    assert parse_cache_control('max-age=60, No-Cache, private="x"') == {
+        "max-age": "60", "no-cache": None, "private": "x"}
+
+
+def test_freshness_lifetime():
+    now = 1_000_000.0
+    assert response({"cache-control": "max-age=300"}).freshness_lifetime() == 300
+    assert response({"cache-control": "no-cache, max-age=300"}).freshness_lifetime() == 0
+    assert response({"date": formatdate(now, usegmt=True),
+                     "expires": formatdate(now + 120, usegmt=True)}).freshness_lifetime() == 120
+    assert response({"expires": "0"}).freshness_lifetime() == 0
+    # Heurística: 10% da idade do Last-Modified, no máximo 1 dia
+    assert response({"date": formatdate(now, usegmt=True),
+                     "last-modified": formatdate(now - 1000, usegmt=True)}).freshness_lifetime() == 100
+    assert response({"date": formatdate(now, usegmt=True),
+                     "last-modified": formatdate(now - 10**8, usegmt=True)}).freshness_lifetime() == 86400
+    assert response({}).freshness_lifetime() == 0
+
+
+def test_is_fresh_counts_age_header():
+    cached = response({"cache-control": "max-age=100", "age": "60"}, stored_at=1000.0)
+    assert cached.is_fresh(now=1030.0)
+    assert not cached.is_fresh(now=1041.0)
+
+
+def test_validators():
+    cached = response({"etag": '"v1"', "last-modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    assert cached.validators() == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert response({}).validators() == {}
+
+
+def test_put_skips_unstorable_responses(cache):
+    url = "https://example.org/bula"
+    assert cache.put(url, 200, {"Cache-Control": "max-age=60"}, b"v1") is not None
+    assert cache.get(url).content == b"v1"
+
+    # no-store apaga a versão guardada
+    assert cache.put(url, 200, {"Cache-Control": "no-store"}, b"v2") is None
+    assert cache.get(url) is None
+    assert cache.put(url, 200, {"Vary": "*"}, b"v3") is None
+    assert cache.put(url, 404, {}, b"") is None
+    assert cache.get(url) is None
+    assert not is_storable(500, {})
+    assert is_storable(200, {"cache-control": "no-cache"})
+
+
+def test_refresh_applies_304_headers_and_resets_age(cache):
+    url = "https://example.org/bula"
+    stored = cache.put(url, 200, {"ETag": '"v1"', "Cache-Control": "max-age=0", "Age": "30",
+                                  "Content-Type": "text/html"}, b"bula")
+    refreshed = cache.refresh(stored, {"Cache-Control": "max-age=600", "ETag": '"v1"', "Content-Type": "x"})
+
+    assert refreshed.headers["cache-control"] == "max-age=600"
+    assert refreshed.headers["content-type"] == "text/html"  # só os cabeçalhos de frescor são renovados
+    assert "age" not in refreshed.headers
+    assert refreshed.content == b"bula"
+    assert cache.get(url).is_fresh()
+
+
+def test_scraper_fetch_serves_fresh_and_revalidates_stale(cache, monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"', "Cache-Control": "max-age=600"})
+        return httpx.Response(200, headers={"ETag": '"v1"', "Cache-Control": "max-age=0"}, content=b"bula v1")
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        async def get_client():
+            return client
+
+        monkeypatch.setattr(scraper_service, "get_http_client", get_client)
+        monkeypatch.setattr(scraper_service, "get_http_cache", lambda: cache)
+        scraper = scraper_service.ScraperService()
+        try:
+            first = await scraper.fetch("https://example.org/bula", {"q": "dipirona"})
+            second = await scraper.fetch("https://example.org/bula", {"q": "dipirona"})
+            third = await scraper.fetch("https://example.org/bula", {"q": "dipirona"})
+        finally:
+            await client.aclose()
+        return first, second, third
+
+    stats_before = dict(scraper_service._stats)
+    first, second, third = asyncio.run(run())
+
+    # 1ª: rede (max-age=0); 2ª: condicional -> 304; 3ª: fresca, sem rede
+    assert len(requests) == 2
+    assert "if-none-match" not in requests[0].headers
+    assert requests[1].headers["if-none-match"] == '"v1"'
+    assert first.content == second.content == third.content == b"bula v1"
+    assert cache.get("https://example.org/bula?q=dipirona").is_fresh(time.time())
+    for counter in ("misses", "revalidated", "hits"):
+        assert scraper_service._stats[counter] == stats_before[counter] + 1
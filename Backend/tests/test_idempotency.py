@@ -0,0 +1,97 @@
+"""Idempotency-Key: respostas salvas, conflito de corpo e requisições em andamento."""
+
+import os
+import time
+import pytest
+from modules.idempotency import IdempotencyStore, IdempotencyConflict, request_fingerprint
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.db"), ttl=60)
+    yield store
+    store.close()
+
+
+def test_fingerprint_ignores_key_order():
+    assert request_fingerprint({"a": 1, "b": [1, 2]}) == request_fingerprint({"b": [1, 2], "a": 1})
+    assert request_fingerprint({"a": 1}) != request_fingerprint({"a": 2})
+
+
+def test_replay_returns_saved_response(store):
+    fingerprint = request_fingerprint({"medicamento": "Dipirona"})
+    assert store.get("u1", "schedule", "k1", fingerprint) is None
+    store.save("u1", "schedule", "k1", fingerprint, {"job_id": "j1"})
+
+    assert store.get("u1", "schedule", "k1", fingerprint) == {"job_id": "j1"}
+    # Chave escopada por usuário e operação
+    assert store.get("u2", "schedule", "k1", fingerprint) is None
+    assert store.get("u1", "delete", "k1", fingerprint) is None
+
+
+def test_same_key_with_other_body_conflicts(store):
+    store.save("u1", "schedule", "k1", request_fingerprint({"x": 1}), {"ok": True})
+    with pytest.raises(IdempotencyConflict):
+        store.get("u1", "schedule", "k1", request_fingerprint({"x": 2}))
+
+
+def test_in_flight_key_is_exclusive(store):
+    assert store.begin("u1", "schedule", "k1")
+    assert not store.begin("u1", "schedule", "k1")
+    assert store.begin("u2", "schedule", "k1")
+    store.end("u1", "schedule", "k1")
+    assert store.begin("u1", "schedule", "k1")
+
+
+def test_expired_responses_are_ignored_and_purged(store):
+    fingerprint = request_fingerprint({})
+    store.save("u1", "schedule", "k1", fingerprint, {"ok": True})
+    store.conn.execute("UPDATE idempotency SET created_at = ?", (time.time() - 120,))
+    store.conn.commit()
+
+    assert store.get("u1", "schedule", "k1", fingerprint) is None
+    assert store.purge_expired() == 1
+
+
+def _import_main(monkeypatch, store):
+    """Importa a API (exige GOOGLE_API_KEY) com o store do teste no app_state."""
+    pytest.importorskip("langchain_huggingface")
+    monkeypatch.setenv("GOOGLE_API_KEY", os.getenv("GOOGLE_API_KEY") or "teste")
+    import main
+    monkeypatch.setitem(main.app_state, "idempotency", store)
+    return main
+
+
+def test_run_idempotent_replays_and_rejects(store, monkeypatch):
+    from fastapi import HTTPException
+    main = _import_main(monkeypatch, store)
+    calls = []
+
+    def operation():
+        calls.append(1)
+        return {"job_id": f"j{len(calls)}"}
+
+    payload = {"medicamento": "Dipirona"}
+    assert main.run_idempotent("u1", "schedule", "k1", payload, operation) == {"job_id": "j1"}
+    assert main.run_idempotent("u1", "schedule", "k1", payload, operation) == {"job_id": "j1"}
+    assert len(calls) == 1
+    # Sem chave: sempre executa
+    assert main.run_idempotent("u1", "schedule", None, payload, operation) == {"job_id": "j2"}
+
+    with pytest.raises(HTTPException) as conflict:
+        main.run_idempotent("u1", "schedule", "k1", {"medicamento": "Outro"}, operation)
+    assert conflict.value.status_code == 422
+
+    store.begin("u1", "schedule", "k2")
+    with pytest.raises(HTTPException) as in_flight:
+        main.run_idempotent("u1", "schedule", "k2", payload, operation)
+    assert in_flight.value.status_code == 409
+
+
+def test_run_idempotent_does_not_save_errors(store, monkeypatch):
+    main = _import_main(monkeypatch, store)
+    results = iter([{"error": "Falha temporária"}, {"ok": True}])
+    operation = lambda: next(results)
+
+    assert main.run_idempotent("u1", "schedule", "k1", {}, operation) == {"error": "Falha temporária"}
+    assert main.run_idempotent("u1", "schedule", "k1", {}, operation) == {"ok": True}
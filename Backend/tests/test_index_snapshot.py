@@ -0,0 +1,60 @@
+"""Snapshot do índice: abertura só confere cabeçalho/tamanho; o checksum completo fica na gravação."""
+
+import json
+import numpy as np
+import pytest
+from modules.index_snapshot import IndexSnapshot, SnapshotError, write_snapshot, verify_snapshot
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "index.snap")
+    vectors = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0]], dtype=np.float32)
+    write_snapshot(path, ["a", "b", "c"], vectors, ["dipirona", "losartana", "ibuprofeno"],
+                   [{"source": "a.txt"}, {"source": "b.txt"}, {"source": "c.txt"}], [], model="m", collection="c")
+    return path
+
+
+def flip_last_byte(path: str):
+    with open(path, "r+b") as f:
+        f.seek(-1, 2)
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+
+def test_open_checks_header_without_hashing(snapshot_path):
+    flip_last_byte(snapshot_path)  # corpo corrompido, tamanho e cabeçalho intactos
+
+    snapshot = IndexSnapshot(snapshot_path)
+    assert snapshot.search([0, 1, 0, 0], 1) == [(1, 0.0)]
+    assert snapshot.document(2) == "ibuprofeno"
+    with pytest.raises(SnapshotError):
+        snapshot.verify()
+    snapshot.close()
+    with pytest.raises(SnapshotError):
+        verify_snapshot(snapshot_path)
+
+
+def test_open_rejects_truncated_or_inconsistent_files(snapshot_path, tmp_path):
+    with open(snapshot_path, "rb") as f:
+        data = f.read()
+
+    truncated = tmp_path / "truncated.snap"
+    truncated.write_bytes(data[:-10])
+    with pytest.raises(SnapshotError):
+        IndexSnapshot(str(truncated))
+
+    # Cabeçalho com count que não bate com as seções (mesmo tamanho de arquivo)
+    header_start = data.index(b"{")
+    header_end = data.index(b"}", data.index(b'"sha256"')) + 1
+    header = json.loads(data[header_start:header_end])
+    header["count"] = 4
+    patched = json.dumps(header, separators=(",", ":")).encode()
+    patched += b" " * (header_end - header_start - len(patched))
+    inconsistent = tmp_path / "inconsistent.snap"
+    inconsistent.write_bytes(data[:header_start] + patched + data[header_end:])
+    with pytest.raises(SnapshotError):
+        IndexSnapshot(str(inconsistent))
+
+    assert verify_snapshot(snapshot_path)["count"] == 3
@@ -0,0 +1,62 @@
+"""Checkpoint da ingestão: diário com linha cortada e retomada depois de uma queda."""
+
+import pytest
+from app.modules.drug_catalog import DrugRecord
+from app.services.ingestion_pipeline import IngestManifest, IngestCheckpoint
+
+
+def write(path, text: str) -> str:
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def bula(name: str) -> str:
+    return (f"{name}\n\nINDICAÇÕES\n{name} é indicado para o tratamento de dor e febre em adultos. "
+            + f"Reações adversas de {name}: náusea, cefaleia e tontura em alguns pacientes. " * 30)
+
+
+def test_checkpoint_ignores_torn_last_line(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    checkpoint = IngestCheckpoint(str(path))
+    assert checkpoint.load() == []
+    record = DrugRecord(number="1", name="Dipirona", source="a.txt")
+    checkpoint.record("a.txt", "ha", ["a:0"], [("a.txt", 5, "x:0")], record)
+    checkpoint.record("b.txt", "hb", ["b:0"])
+    checkpoint.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"name": "c.txt", "hash": "h')  # queda no meio da gravação
+
+    entries = checkpoint.load()
+    assert [entry["name"] for entry in entries] == ["a.txt", "b.txt"]
+    assert entries[0]["duplicates"] == [["a.txt", 5, "x:0"]]
+    assert entries[0]["record"]["name"] == "Dipirona"
+    assert entries[1]["record"] is None
+
+    checkpoint.clear()
+    assert not path.exists()
+
+
+def test_ingestion_resumes_from_checkpoint_after_crash(tmp_path, vector_service, monkeypatch):
+    from app.services import vector_service as module
+
+    docs = tmp_path / "batches"
+    docs.mkdir()
+    files = [write(docs / f"{name}.txt", bula(name)) for name in ("dipirona", "ibuprofeno")]
+
+    # Queda depois de gravar os chunks e antes de salvar o manifesto
+    def crash(self):
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as patch:
+        patch.setattr(module.IngestManifest, "save", crash)
+        with pytest.raises(KeyboardInterrupt):
+            vector_service.ingest_files(files, workers=1)
+    assert len(IngestCheckpoint(vector_service.checkpoint_path).load()) == 2
+    stored = len(vector_service.vectordb._collection.get()["ids"])
+
+    report = vector_service.ingest_files(files, workers=1)
+    assert report["resumed"] == 2
+    assert (report["new"], report["modified"], report["chunks"]) == (0, 0, 0)
+    assert len(vector_service.vectordb._collection.get()["ids"]) == stored
+    assert IngestCheckpoint(vector_service.checkpoint_path).load() == []
+    assert set(IngestManifest(vector_service.manifest_path).entries) == {"dipirona.txt", "ibuprofeno.txt"}
@@ -0,0 +1,78 @@
+"""Ingestão incremental: plano do manifesto, duplicatas dependentes e arquivos sem mudança."""
+
+import json
+from app.services.ingestion_pipeline import IngestManifest, file_hash
+
+
+def write(path, text: str) -> str:
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def bula(name: str) -> str:
+    return (f"{name}\n\nINDICAÇÕES\n{name} é indicado para o tratamento de dor e febre em adultos. "
+            + f"Reações adversas de {name}: náusea, cefaleia e tontura em alguns pacientes. " * 30)
+
+
+def test_manifest_plan_classifies_files(tmp_path):
+    a = write(tmp_path / "a.txt", "bula a")
+    b = write(tmp_path / "b.txt", "bula b")
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.update("a.txt", file_hash(a), ["a:0"])
+    manifest.update("b.txt", "hash-antigo", ["b:0"])
+    manifest.update("c.txt", "x", ["c:0"])
+    manifest.update("d.pdf", "x", ["d:0"], kind="pdf")
+    new = write(tmp_path / "n.txt", "bula nova")
+
+    plan = manifest.plan([a, b, new], purge_missing=True)
+    assert plan["unchanged"] == [a]
+    assert plan["modified"] == [b]
+    assert plan["new"] == [new]
+    assert plan["removed"] == ["c.txt"]  # PDFs ingeridos à parte não são limpos
+    assert plan["hashes"]["a.txt"] == file_hash(a)
+    assert manifest.plan([a])["removed"] == []
+
+
+def test_manifest_roundtrip_and_dependents(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = IngestManifest(path)
+    manifest.update("a.txt", "ha", ["a:0", "a:1"])
+    manifest.update("b.txt", "hb", ["b:0"], duplicates=[("b.txt", 10, "a:1")])
+    manifest.update("c.txt", "hc", ["c:0"], duplicates=[("c.txt", 0, "b:0")])
+    manifest.update("d.txt", "hd", ["d:0"])
+    manifest.save()
+
+    loaded = IngestManifest(path)
+    assert loaded.entries == manifest.entries
+    # c depende de b, que depende de a
+    assert loaded.dependents(["a.txt"]) == ["b.txt", "c.txt"]
+    assert loaded.dependents(["d.txt"]) == []
+    assert loaded.duplicate_locations() == {"a:1": [("b.txt", 10)], "b:0": [("c.txt", 0)]}
+
+    loaded.invalidate("b.txt")
+    assert loaded.entries["b.txt"]["hash"] == ""
+    assert loaded.chunk_ids(["b.txt"]) == ["b:0"]
+
+
+def test_manifest_of_other_version_is_ignored(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"version": 0, "files": {"a.txt": {}}}), encoding="utf-8")
+    assert IngestManifest(str(path)).entries == {}
+
+
+def test_incremental_ingestion_skips_unchanged_files(tmp_path, vector_service):
+    docs = tmp_path / "batches"
+    docs.mkdir()
+    files = [write(docs / f"{name}.txt", bula(name)) for name in ("dipirona", "ibuprofeno")]
+
+    first = vector_service.ingest_files(files, workers=1)
+    assert (first["new"], first["unchanged"]) == (2, 0)
+    assert first["chunks"] > 0
+
+    write(docs / "ibuprofeno.txt", bula("ibuprofeno") + "Nova advertência.")
+    second = vector_service.ingest_files(files, workers=1, purge_missing=True)
+    assert (second["new"], second["modified"], second["unchanged"]) == (0, 1, 1)
+
+    third = vector_service.ingest_files(files[:1], workers=1, purge_missing=True)
+    assert (third["unchanged"], third["removed"]) == (1, 1)
+    assert vector_service.vectordb._collection.get(where={"source": "ibuprofeno.txt"})["ids"] == []
@@ -0,0 +1,156 @@
+"""Outbox do Calendar contra o servidor falso: coalescência, isolamento por usuário, backoff e re-drive."""
+
+import pytest
+from googleapiclient.errors import HttpError
+from modules.outbox import Outbox, coalesce, is_transient, INSERT, PATCH, DELETE
+
+
+class _Status(dict):
+    def __init__(self, status: int):
+        super().__init__()
+        self.status = status
+        self.reason = "erro"
+
+
+def http_error(status: int) -> HttpError:
+    return HttpError(_Status(status), b'{"error": {"message": "erro"}}')
+
+
+def event(event_id: str, summary: str) -> dict:
+    return {"id": event_id, "summary": summary, "start": {"dateTime": "2030-01-01T08:00:00-03:00"},
+            "end": {"dateTime": "2030-01-01T08:30:00-03:00"}}
+
+
+@pytest.fixture
+def offline_service():
+    """Serviço apontado para uma porta fechada: conexão recusada em toda chamada."""
+    from google.oauth2.credentials import Credentials
+    from modules.calendar_client import build_calendar_service
+    return build_calendar_service(Credentials(token="fake"), root_url="http://127.0.0.1:9/")
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    yield outbox
+    outbox.conn.close()
+
+
+def _make_due(outbox):
+    outbox.conn.execute("UPDATE outbox SET next_attempt_at = 0")
+    outbox.conn.commit()
+
+
+def test_coalesce_collapses_operations_of_one_event():
+    assert coalesce([(1, INSERT, {"a": 1}, 0), (2, DELETE, None, 0)]) == [(None, None, [1, 2])]
+    assert coalesce([(1, INSERT, {"a": 1}, 0), (2, PATCH, {"b": 2}, 0)]) == [(INSERT, {"a": 1, "b": 2}, [1, 2])]
+    assert coalesce([(1, PATCH, {"a": 1}, 0), (2, PATCH, {"a": 3}, 0)]) == [(PATCH, {"a": 3}, [1, 2])]
+    assert coalesce([(1, PATCH, {"a": 1}, 2), (2, DELETE, None, 0)]) == [(DELETE, None, [1, 2])]
+
+
+def test_coalesce_keeps_operations_after_an_attempted_insert():
+    # O insert falhou por timeout: pode ter chegado ao Google
+    assert coalesce([(1, INSERT, {"a": 1}, 1), (2, DELETE, None, 0)]) == [(INSERT, {"a": 1}, [1]), (DELETE, None, [2])]
+    assert coalesce([(1, INSERT, {"a": 1}, 1), (2, PATCH, {"b": 2}, 0), (3, DELETE, None, 0)]) == [
+        (INSERT, {"a": 1}, [1]), (DELETE, None, [2, 3])]
+
+
+def test_drain_sends_one_coalesced_request_per_event(outbox, calendar_service, calendar_server):
+    outbox.append_many("u1", [(INSERT, "e1", event("e1", "A")), (PATCH, "e1", {"summary": "B"}),
+                              (INSERT, "e2", event("e2", "C")), (DELETE, "e2", None)])
+
+    assert outbox.drain(lambda user_id: calendar_service) == 2
+    # insert+patch enviados como um insert; insert+delete não chegam ao Google
+    assert calendar_server.fake.calls == {"insert": 1}
+    assert calendar_service.events().get(calendarId="primary", eventId="e1").execute()["summary"] == "B"
+    assert outbox.pending_count() == 0
+
+
+def test_credential_error_of_one_user_does_not_block_others(outbox, calendar_service, calendar_server):
+    outbox.append("revogado", INSERT, "e1", event("e1", "A"))
+    outbox.append("u2", INSERT, "e2", event("e2", "B"))
+
+    def provider(user_id):
+        if user_id == "revogado":
+            raise RuntimeError("invalid_grant")
+        return calendar_service
+
+    assert outbox.drain(provider) == 1
+    assert [key[1] for key in calendar_server.fake.events] == ["e2"]
+    assert outbox.pending_count("revogado") == 1
+    attempts, = outbox.conn.execute("SELECT attempts FROM outbox WHERE user_id = 'revogado'").fetchone()
+    assert attempts == 0
+
+
+def test_transient_failures_back_off_without_spending_attempts(outbox, calendar_service, calendar_server,
+                                                               offline_service):
+    outbox.append("u1", INSERT, "e1", event("e1", "A"))
+    for _ in range(10):
+        _make_due(outbox)
+        outbox.drain(lambda user_id: offline_service)  # conexão recusada
+    calendar_server.fake.config.error_rate = 1.0       # 503 em toda requisição
+    for _ in range(10):
+        _make_due(outbox)
+        outbox.drain(lambda user_id: calendar_service)
+
+    attempts, retries, status = outbox.conn.execute("SELECT attempts, retries, status FROM outbox").fetchone()
+    assert (attempts, status) == (0, "pending")
+    assert retries == 20
+
+    # Em backoff: a próxima rodada não envia nada
+    calendar_server.fake.config.error_rate = 0.0
+    assert outbox.drain(lambda user_id: calendar_service) == 0
+    assert calendar_server.fake.events == {}
+
+
+def test_delete_after_a_failed_insert_is_still_sent(outbox, calendar_service, calendar_server):
+    outbox.append("u1", INSERT, "e1", event("e1", "A"))
+    calendar_server.fake.config.error_rate = 1.0
+    outbox.drain(lambda user_id: calendar_service)
+    calendar_server.fake.config.error_rate = 0.0
+    # A falha foi só na resposta: o evento chegou a ser criado
+    calendar_service.events().insert(calendarId="primary", body=event("e1", "A")).execute()
+    outbox.append("u1", DELETE, "e1")
+
+    _make_due(outbox)
+    assert outbox.drain(lambda user_id: calendar_service) == 1  # insert: 409
+    assert outbox.drain(lambda user_id: calendar_service) == 1
+    assert calendar_server.fake.events[("primary", "e1")]["status"] == "cancelled"
+    assert outbox.pending_count("u1") == 0
+
+
+def test_permanent_failures_end_failed_and_can_be_redriven(outbox, calendar_service, monkeypatch):
+    monkeypatch.setattr("modules.outbox.OUTBOX_MAX_ATTEMPTS", 3)
+    outbox.append("u1", PATCH, "e1", {"summary": "B"})  # evento inexistente: 404
+    for _ in range(3):
+        _make_due(outbox)
+        outbox.drain(lambda user_id: calendar_service)
+
+    failed = outbox.failed("u1")
+    assert [op["event_id"] for op in failed] == ["e1"]
+    assert outbox.pending_count("u1") == 0
+
+    calendar_service.events().insert(calendarId="primary", body=event("e1", "A")).execute()
+    assert outbox.retry_failed("u1") == 1
+    assert outbox.drain(lambda user_id: calendar_service) == 1
+    assert outbox.failed("u1") == []
+    assert calendar_service.events().get(calendarId="primary", eventId="e1").execute()["summary"] == "B"
+
+
+def test_already_applied_operations_are_acknowledged(outbox, calendar_service):
+    calendar_service.events().insert(calendarId="primary", body=event("e1", "A")).execute()
+    outbox.append("u1", INSERT, "e1", event("e1", "A"))
+    assert outbox.drain(lambda user_id: calendar_service) == 1  # insert duplicado (409)
+    outbox.append("u1", DELETE, "e1")
+    outbox.append("u1", DELETE, "e1")
+    assert outbox.drain(lambda user_id: calendar_service) == 1
+    assert outbox.drain(lambda user_id: calendar_service) == 1  # segundo delete: 410
+    assert outbox.pending_count("u1") == 0
+
+
+def test_is_transient():
+    assert is_transient(OSError("timeout"))
+    assert is_transient(http_error(429))
+    assert is_transient(http_error(502))
+    assert not is_transient(http_error(400))
+    assert not is_transient(http_error(404))
@@ -0,0 +1,80 @@
+"""RAGManager: bula buscada na web (write-through) responde as próximas consultas pelo índice local."""
+
+import pytest
+
+BULA_WEB = ("Remedio Teste\n\nREAÇÕES ADVERSAS\n"
+            + "Remedio Teste pode causar náusea, cefaleia e sonolência em alguns pacientes. " * 20)
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+
+        class Response:
+            content = '{"answer": "Náusea e cefaleia.", "confidence": 0.9}'
+
+        return Response()
+
+
+@pytest.fixture
+def make_rag(tmp_path, monkeypatch, vector_service):
+    """RAGManager lendo o mesmo diretório temporário em que o vector_service grava."""
+    from app.services import vector_service as vs_module
+    from modules import rag_manager
+    from modules.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+    monkeypatch.setattr(rag_manager, "HuggingFaceEmbeddings", vs_module.HuggingFaceEmbeddings)
+    monkeypatch.setattr(rag_manager, "CachedEmbeddings", lambda embeddings, model_name, on_lookup=None: CachedEmbeddings(
+        embeddings, model_name=model_name, cache=EmbeddingCache(str(tmp_path / "rag_cache.db")), on_lookup=on_lookup))
+    monkeypatch.setattr(rag_manager, "DB_DIR", vs_module.DB_DIR)
+    monkeypatch.setattr(rag_manager, "DRUG_CATALOG_PATH", vs_module.DRUG_CATALOG_PATH)
+    monkeypatch.setattr(rag_manager, "SNAPSHOT_PATH", str(tmp_path / "index.snap"))
+    monkeypatch.setattr(rag_manager, "read_pointer", lambda: None)
+
+    def make(web_calls: list):
+        def web_fallback(name):
+            # Como o hook da API, mas vetorizando na hora em vez de pela fila
+            web_calls.append(name)
+            vector_service.ingest_web_document(name, BULA_WEB, "https://example.org/remedio-teste")
+            return BULA_WEB
+
+        rag = rag_manager.RAGManager(google_api_key="teste", web_fallback=web_fallback)
+        assert rag.router is not None
+        rag.llm_rag = FakeLLM()
+        return rag
+
+    return make
+
+
+def test_second_query_is_answered_locally(make_rag):
+    web_calls = []
+    rag = make_rag(web_calls)
+
+    first = rag.query("Quais as reações adversas do Remedio Teste?", "reações adversas", "Remedio Teste")
+    assert web_calls == ["Remedio Teste"]
+    assert first["confidence"] == pytest.approx(0.7)
+
+    second = rag.query("Quais as reações adversas do Remedio Teste?", "reações adversas", "Remedio Teste")
+    assert web_calls == ["Remedio Teste"]  # catálogo relido: busca exata, sem web
+    assert second["confidence"] == 1.0
+    assert "sonolência" in rag.llm_rag.prompts[-1]
+
+
+def test_web_documents_are_found_when_serving_from_snapshot(tmp_path, make_rag, vector_service):
+    from modules import rag_manager
+
+    vector_service.ingest_web_document("Outro Remedio", BULA_WEB.replace("Remedio Teste", "Outro Remedio"))
+    vector_service.export_snapshot(rag_manager.SNAPSHOT_PATH)
+    web_calls = []
+    rag = make_rag(web_calls)
+    with rag.router.acquire() as index:
+        assert index.snapshot is not None
+
+    rag.query("Quais as reações adversas do Remedio Teste?", "reações adversas", "Remedio Teste")
+    second = rag.query("Quais as reações adversas do Remedio Teste?", "reações adversas", "Remedio Teste")
+    assert web_calls == ["Remedio Teste"]
+    assert second["confidence"] == 1.0
+    assert "Remedio Teste pode causar" in rag.llm_rag.prompts[-1]
@@ -0,0 +1,106 @@
+"""TokenStore: tokens revogados deixam de ser renovados; ID do usuário vem do id_token verificado."""
+
+import json
+import time
+import pytest
+from datetime import datetime, timedelta
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, jwt
+from google.auth.exceptions import RefreshError
+from google.oauth2.credentials import Credentials
+from modules.token_store import TokenStore, CalendarServiceCache, google_user_id
+
+CLIENT_ID = "cliente.apps.googleusercontent.com"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("TOKEN_ENCRYPTION_KEY", Fernet.generate_key().decode())
+    store = TokenStore(str(tmp_path / "tokens.db"))
+    yield store
+    store.close()
+
+
+def expired_creds() -> Credentials:
+    return Credentials(token="t", refresh_token="r", client_id=CLIENT_ID, client_secret="s",
+                       token_uri="https://oauth2.googleapis.com/token",
+                       expiry=datetime.utcnow() - timedelta(minutes=1))
+
+
+def test_revoked_token_is_not_refreshed_again(store, monkeypatch):
+    calls = []
+
+    def refresh(self, request):
+        calls.append(request)
+        raise RefreshError("invalid_grant: Token has been expired or revoked.", {"error": "invalid_grant"})
+
+    monkeypatch.setattr(Credentials, "refresh", refresh)
+    store.save("u1", expired_creds())
+    cache = CalendarServiceCache(store)
+
+    assert cache.refresh_expiring() == 0
+    assert cache.refresh_expiring() == 0
+    assert len(calls) == 1
+    assert store.load("u1") is None
+    assert cache.get("u1") is None  # sem login até o usuário autorizar de novo
+
+    store.save("u1", expired_creds())  # novo login
+    assert store.expiring_users() == ["u1"]
+
+
+def test_transient_refresh_failure_is_retried(store, monkeypatch):
+    calls = []
+
+    def refresh(self, request):
+        calls.append(request)
+        raise RefreshError("Unable to refresh: 503", retryable=True)
+
+    monkeypatch.setattr(Credentials, "refresh", refresh)
+    store.save("u1", expired_creds())
+    cache = CalendarServiceCache(store)
+    cache.refresh_expiring()
+    cache.refresh_expiring()
+    assert len(calls) == 2
+    assert store.load("u1") is not None
+
+
+class _CertsRequest:
+    """Transporte falso: responde a busca das chaves públicas do Google."""
+
+    def __init__(self, certs: dict):
+        self.certs = certs
+
+    def __call__(self, url, method="GET", **kwargs):
+        class Response:
+            status = 200
+            data = json.dumps(self.certs).encode()
+        return Response()
+
+
+def signed_id_token(key, claims: dict) -> str:
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption())
+    return jwt.encode(crypt.RSASigner.from_string(pem, key_id="k1"), claims).decode()
+
+
+def test_google_user_id_uses_verified_sub():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = key.public_key().public_bytes(serialization.Encoding.PEM,
+                                               serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    request = _CertsRequest({"k1": public_pem})
+    now = int(time.time())
+    claims = {"iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234567890",
+              "iat": now, "exp": now + 3600}
+
+    creds = Credentials(token="t", id_token=signed_id_token(key, claims))
+    assert google_user_id(creds, CLIENT_ID, request) == "1234567890"
+
+    with pytest.raises(ValueError):  # emitido para outro cliente OAuth
+        google_user_id(creds, "outro.apps.googleusercontent.com", request)
+    other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with pytest.raises(ValueError):  # assinatura que não é do Google
+        google_user_id(Credentials(token="t", id_token=signed_id_token(other_key, claims)), CLIENT_ID, request)
+    with pytest.raises(ValueError):
+        google_user_id(Credentials(token="t"), CLIENT_ID, request)
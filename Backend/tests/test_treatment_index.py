@@ -0,0 +1,89 @@
+"""IntervalTree e consultas do TreatmentIndex."""
+
+import random
+from datetime import datetime, timedelta
+from modules.dose_timeline import TZ_SAO_PAULO
+from modules.treatment_index import IntervalTree, TreatmentIndex
+
+
+def test_overlap_uses_half_open_intervals():
+    tree = IntervalTree([(0, 10, "a"), (10, 20, "b"), (5, 15, "c")])
+
+    assert len(tree) == 3
+    assert sorted(tree.overlap(0, 10)) == ["a", "c"]
+    assert sorted(tree.overlap(10, 11)) == ["b", "c"]
+    assert tree.overlap(20, 30) == []
+    assert tree.overlap(-5, 0) == []
+    assert sorted(tree.overlap(9.5, 10.5)) == ["a", "b", "c"]
+
+
+def test_empty_tree():
+    tree = IntervalTree([])
+    assert len(tree) == 0
+    assert tree.overlap(0, 100) == []
+
+
+def test_overlap_matches_brute_force():
+    rng = random.Random(42)
+    intervals = []
+    for i in range(300):
+        start = rng.uniform(0, 1000)
+        intervals.append((start, start + rng.uniform(0.1, 80), i))
+    tree = IntervalTree(intervals)
+
+    for _ in range(200):
+        start = rng.uniform(-50, 1050)
+        end = start + rng.uniform(0.1, 100)
+        expected = sorted(i for s, e, i in intervals if s < end and e > start)
+        assert sorted(tree.overlap(start, end)) == expected
+
+
+class FakeStore:
+    def __init__(self, treatments):
+        self.treatments = treatments
+        self.calls = 0
+
+    def active_treatments(self, user_id):
+        self.calls += 1
+        return self.treatments
+
+
+def _treatment(treatment_id, medicamento, start, intervalo_horas, duracao_dias):
+    return {
+        "treatment_id": treatment_id,
+        "medicamento": medicamento,
+        "intervalo_horas": intervalo_horas,
+        "duracao_dias": duracao_dias,
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(days=duracao_dias)).isoformat(),
+    }
+
+
+def test_overlapping_and_duplicate_warning():
+    now = datetime.now(TZ_SAO_PAULO).replace(microsecond=0)
+    store = FakeStore([_treatment("t1", "Dipirona", now - timedelta(days=1), 8, 5)])
+    index = TreatmentIndex(store)
+
+    assert [t["treatment_id"] for t in index.overlapping("u1", now, now + timedelta(days=1))] == ["t1"]
+    assert index.overlapping("u1", now + timedelta(days=6), now + timedelta(days=7)) == []
+    assert store.calls == 1  # índice reaproveitado
+
+    warnings = index.check("u1", {"medicamento": "dipirona", "intervalo_horas": 8},
+                           now, now + timedelta(days=2))
+    assert [w["tipo"] for w in warnings] == ["duplicado"]
+
+    index.invalidate("u1")
+    index.overlapping("u1", now, now + timedelta(hours=1))
+    assert store.calls == 2
+
+
+def test_nearest_dose_ignores_past_doses():
+    now = datetime.now(TZ_SAO_PAULO).replace(microsecond=0)
+    start = now - timedelta(days=2, minutes=30)
+    index = TreatmentIndex(FakeStore([_treatment("t1", "Amoxicilina", start, 8, 7)]))
+
+    dose = index.nearest_dose("u1", now - timedelta(hours=1))
+    # A dose de 30 min atrás (a 30 min do alvo) já passou e não é indexada: vale a próxima
+    assert dose["treatment_id"] == "t1"
+    assert dose["dose"] == 8
+    assert dose["distance_minutes"] == 8 * 60 + 30
@@ -76,9 +76,8 @@ export default function MainContent() {
 
       else if (intentData.intent === 'query_rag') {
         setMessages(prev => [...prev, { role: 'bot', text: "🔍 Consultando a bula..." }]);
-        const ragResult = await api.queryRag(textoUsuario, intentData.topic);
-        let respostaFinal = ragResult.response;
-        try { const parsed = JSON.parse(ragResult.response); respostaFinal = parsed.answer; } catch(e) {}
+        const ragResult = await api.queryRag(textoUsuario, intentData.topic, intentData.medicamento);
+        const respostaFinal = ragResult.response?.answer ?? "Desculpe, não consegui consultar a bula.";
         setMessages(prev => [...prev, { role: 'bot', text: respostaFinal }]);
       }
 
@@ -3,6 +3,31 @@ const BASE_URL = "http://127.0.0.1:8000";
 // URL para os endpoints da API (v1) - Para chat, rag, calendar
 const API_URL = `${BASE_URL}/v1`;
 
+// Sessão assinada pelo backend. O callback do login a devolve no fragmento da
+// URL (/chat#session=...), que o navegador não envia a servidores: guardamos
+// no sessionStorage e limpamos a URL.
+const SESSION_KEY = "session";
+
+const captureSession = () => {
+  const params = new URLSearchParams(window.location.hash.slice(1));
+  const session = params.get(SESSION_KEY);
+  if (session) {
+    sessionStorage.setItem(SESSION_KEY, session);
+    window.history.replaceState(null, "", window.location.pathname + window.location.search);
+  }
+};
+captureSession();
+
+// fetch com a sessão: Bearer (API em outro host) + cookie (mesmo site)
+const request = (url, options = {}) => {
+  const session = sessionStorage.getItem(SESSION_KEY);
+  const headers = { ...options.headers };
+  if (session) {
+    headers.Authorization = `Bearer ${session}`;
+  }
+  return fetch(url, { ...options, headers, credentials: "include" });
+};
+
 export const api = {
 
   // ============================================================
@@ -18,13 +43,9 @@ export const api = {
   },
 
   logout: async () => {
-    const response = await fetch(`${BASE_URL}/auth/logout`, {
+    const response = await request(`${BASE_URL}/auth/logout`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        // Adicione o token aqui se sua API exigir autenticação via Header
-        // 'Authorization': `Bearer ${sessionStorage.getItem('token')}`
-      },
+      headers: { 'Content-Type': 'application/json' },
     });
 
     if (!response.ok) {
@@ -41,7 +62,7 @@ export const api = {
   // 2. O CÉREBRO: Classifica o que o usuário quer dizer
   classifyIntent: async (text) => {
     try {
-      const response = await fetch(`${API_URL}/chat/classify_intent`, {
+      const response = await request(`${API_URL}/chat/classify_intent`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ query: text }),
@@ -58,14 +79,16 @@ export const api = {
   },
 
   // 3. O RAG: Consulta a bula do medicamento
-  queryRag: async (originalQuery, topic) => {
+  // medicamento (do classificador de intenção) permite buscar a bula na web se ela não estiver no índice
+  queryRag: async (originalQuery, topic, medicamento = null) => {
     try {
-      const response = await fetch(`${API_URL}/rag/query`, {
+      const response = await request(`${API_URL}/rag/query`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
             original_query: originalQuery,
-            topic: topic
+            topic: topic,
+            medicamento: medicamento
         }),
       });
 
@@ -75,7 +98,7 @@ export const api = {
       return await response.json();
     } catch (error) {
       console.error("Erro no RAG:", error);
-      return { response: JSON.stringify({ answer: "Desculpe, não consegui conectar ao servidor." }) };
+      return { response: { answer: "Desculpe, não consegui conectar ao servidor.", confidence: 0 } };
     }
   },
 
@@ -86,7 +109,7 @@ export const api = {
   // 4. CALENDAR: Agendar um tratamento
   scheduleTreatment: async (instrucao, startTime = "agora") => {
     try {
-      const response = await fetch(`${API_URL}/calendar/schedule`, {
+      const response = await request(`${API_URL}/calendar/schedule`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -104,7 +127,7 @@ export const api = {
   // 5. CALENDAR: Listar eventos de um medicamento
   getEvents: async (medicamento) => {
     try {
-      const response = await fetch(`${API_URL}/calendar/events/${medicamento}`);
+      const response = await request(`${API_URL}/calendar/events/${medicamento}`);
       return await response.json();
     } catch (error) {
       console.error("Erro ao buscar eventos:", error);
@@ -115,7 +138,7 @@ export const api = {
   // 6. CALENDAR: Deletar eventos
   deleteEvents: async (eventIds) => {
     try {
-      const response = await fetch(`${API_URL}/calendar/delete`, {
+      const response = await request(`${API_URL}/calendar/delete`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ event_ids: eventIds }),
@@ -130,7 +153,7 @@ export const api = {
   // 7. CALENDAR: Editar um evento
   editEvent: async (eventId, newStartTime) => {
     try {
-      const response = await fetch(`${API_URL}/calendar/edit/${eventId}`, {
+      const response = await request(`${API_URL}/calendar/edit/${eventId}`, {
         method: "PUT",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ new_start_time_str: newStartTime }),